@@ -1,8 +1,8 @@
 from fastapi import Request, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
-import httpx
 import logging
 from ..config import settings
+from ..core.http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -44,16 +44,16 @@ class ClerkAuthMiddleware(BaseHTTPMiddleware):
     
     async def verify_clerk_token(self, token: str) -> dict:
         """Verificar token con la API de Clerk"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://api.clerk.dev/v1/sessions/verify",
-                headers={
-                    "Authorization": f"Bearer {settings.clerk_secret_key}",
-                    "X-Session-Token": token
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=401, detail="Token inválido")
-            
-            return response.json()
\ No newline at end of file
+        client = get_http_client(
+            "https://api.clerk.dev",
+            {"Authorization": f"Bearer {settings.clerk_secret_key}"}
+        )
+        response = await client.get(
+            "/v1/sessions/verify",
+            headers={"X-Session-Token": token}
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(status_code=401, detail="Token inválido")
+        
+        return response.json()
\ No newline at end of file
@@ -40,10 +40,105 @@ class Settings(BaseSettings):
     # Cache
     cache_ttl_seconds: int = 300
     cache_enabled: bool = True
-    
+    cache_backend: str = "http"  # "http" (Redis Cloud API) o "redis" (protocolo nativo)
+
+    # Redis nativo (cache_backend="redis")
+    redis_dsn: str = "redis://localhost:6379/0"
+    redis_max_connections: int = 50
+    redis_socket_timeout: float = 5.0
+
+    # Cache L1 en proceso (requiere cache_backend="redis" para invalidación entre workers)
+    cache_l1_enabled: bool = True
+    cache_l1_max_items: int = 10000
+    cache_l1_max_bytes: int = 64 * 1024 * 1024
+    cache_l1_ttl_seconds: int = 60
+    cache_invalidation_channel: str = "cms:cache:invalidate"
+
+    # Protección contra estampidas (get_or_compute)
+    cache_xfetch_beta: float = 1.0  # 0 desactiva el refresco anticipado
+    cache_lock_enabled: bool = False  # lock distribuido entre workers (requiere Redis nativo)
+    cache_lock_timeout_seconds: float = 10.0
+
+    # Stale-while-revalidate (componentes de dashboard)
+    cache_stale_ttl_seconds: int = 3600  # un valor vencido se sirve este tiempo mientras se recalcula
+    dashboard_component_ttl_seconds: int = 300  # si el componente no define configuracion.cache_ttl
+    dashboard_component_timeout_seconds: float = 2.0  # un componente sin cache más lento queda pendiente
+
+    # Clientes HTTP salientes compartidos (N8N, WAHA, APIs externas)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http_timeout_seconds: float = 30.0
+    http_connect_timeout_seconds: float = 5.0
+    http2_enabled: bool = True  # requiere el paquete "h2" (httpx[http2])
+
+    # Rate limiting de APIs externas (token bucket): "local" por worker o "redis" compartido
+    api_rate_limit_backend: str = "local"
+
+    # Circuit breaker y reintentos de APIs externas
+    api_breaker_failure_threshold: int = 5
+    api_breaker_open_seconds: float = 30.0
+    api_breaker_half_open_max_calls: int = 1
+    api_retry_budget_ratio: float = 0.2  # reintentos como fracción de las peticiones recientes
+    api_retry_budget_min_retries: int = 3
+    api_retry_base_delay_seconds: float = 0.1
+    api_retry_max_delay_seconds: float = 2.0
+
+    # Cache en proceso de EntityConfig/ViewConfig: pasado el TTL solo se comprueba updated_at
+    config_cache_ttl_seconds: float = 10.0
+
+    # Totales de listados: "exact", "estimated", "capped", "cached" o "facet"
+    count_default_strategy: str = "exact"
+    count_cap: int = 1000
+    count_cache_ttl_seconds: int = 60
+
+    # Agregaciones de componentes de dashboard calculadas en MongoDB
+    aggregation_cache_ttl_seconds: int = 60
+    aggregation_max_groups: int = 500  # puntos máximos de una serie agrupada
+
+    # Exportación en streaming: documentos por lote leído del cursor o de la API
+    export_batch_size: int = 1000
+
+    # Endpoints /bulk: items por request y documentos por insert_many/bulk_write
+    bulk_max_items: int = 50000
+    bulk_write_batch_size: int = 1000
+
+    # Importación en streaming (NDJSON/CSV)
+    import_batch_size: int = 1000  # filas validadas antes de escribir y leer más del body
+    import_max_line_bytes: int = 1_048_576
+    import_max_error_rows: int = 10000  # filas rechazadas guardadas por job (se cuentan todas)
+
+    # Índices de colecciones de entidades ({business_id}_{entidad})
+    index_manager_enabled: bool = True
+    index_manager_interval_seconds: float = 300.0
+    index_slow_query_ms: float = 100.0  # consultas más lentas cuentan para aprender índices
+    index_learn_min_hits: int = 5
+    index_unused_drop_days: int = 30  # índices aprendidos sin uso se eliminan
+    index_max_learned_per_collection: int = 5  # tope de índices cms_auto_* por colección
+
+    # Reportes de analytics en background
+    report_job_workers: int = 2
+    report_job_queue_size: int = 100
+    report_freshness_seconds: int = 300  # un reporte terminado se reutiliza durante este tiempo
+    report_job_timeout_seconds: int = 600  # un job en curso más viejo se considera caído
+    report_job_poll_seconds: float = 1.0
+
+    # Registro en memoria de businesses activos (polling si no hay change streams)
+    business_registry_enabled: bool = True
+    business_registry_poll_seconds: float = 5.0
+
+    # Push de componentes de dashboard (SSE / WebSocket)
+    realtime_max_connections: int = 10000  # por worker
+    realtime_queue_size: int = 100  # mensajes pendientes por conexión antes de pedir resync
+    realtime_heartbeat_seconds: float = 15.0
+    realtime_debounce_seconds: float = 0.5  # eventos agrupados en un solo recálculo
+    realtime_channel: str = "cms:realtime:events"
+
     # Rate Limiting
     rate_limit_enabled: bool = True
     rate_limit_requests_per_minute: int = 60
+    rate_limit_key: str = "ip"  # "ip", "user" o "business"
+    rate_limit_backend: str = "local"  # "local" por worker o "redis" compartido
     
     # Logging
     log_level: str = "INFO"
@@ -0,0 +1,239 @@
+# ================================
+# app/core/aggregation_pushdown.py - Agregaciones de componentes en MongoDB
+# ================================
+
+import hashlib
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from ..config import settings
+from ..models.user import User
+from ..services.cache_service import CacheService, component_tag, entity_tag
+from ..utils.exceptions import PermissionDeniedError
+from .config_cache import get_config_cache
+from .dynamic_crud import DynamicCrudGenerator
+from .index_manager import get_index_manager
+
+logger = logging.getLogger(__name__)
+
+AGGREGATION_OPERATIONS = ("count", "sum", "avg", "min", "max")
+
+# Formato de la clave de cada período ($dateToString y strftime usan los mismos códigos)
+DATE_PERIODS = {
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m"
+}
+
+# Operaciones de gráfico heredadas: count_by_<período>
+_LEGACY_OPERATIONS = {f"count_by_{period}": period for period in DATE_PERIODS}
+
+class AggregationSpec(NamedTuple):
+    """Qué calcular para un componente: un escalar o una serie agrupada"""
+    entidad: str
+    operacion: str = "count"
+    campo: Optional[str] = None
+    filtro: Optional[Any] = None
+    agrupar_por: Optional[str] = None
+    periodo: Optional[str] = None
+    campo_fecha: str = "created_at"
+
+    @property
+    def is_series(self) -> bool:
+        return bool(self.agrupar_por or self.periodo)
+
+def spec_from_component(config: Dict[str, Any], entidad: Optional[str] = None) -> AggregationSpec:
+    """Traducir la configuración de un stats_card o serie de gráfico a AggregationSpec"""
+    # Las configuraciones guardadas desde el modelo traen las claves con None
+    operacion = config.get("operacion") or "count"
+    periodo = config.get("periodo")
+    if operacion in _LEGACY_OPERATIONS:
+        periodo, operacion = _LEGACY_OPERATIONS[operacion], "count"
+    if operacion not in AGGREGATION_OPERATIONS:
+        raise ValueError(f"Operación de agregación no soportada: {operacion}")
+    if periodo is not None and periodo not in DATE_PERIODS:
+        raise ValueError(f"Período no soportado: {periodo}")
+
+    campo = config.get("campo")
+    if operacion == "sum":
+        campo = config.get("campo_suma") or campo
+    elif operacion == "avg":
+        campo = config.get("campo_promedio") or campo
+
+    return AggregationSpec(
+        entidad=entidad or config.get("entidad"),
+        operacion=operacion,
+        campo=campo,
+        filtro=config.get("filtro"),
+        agrupar_por=config.get("agrupar_por"),
+        periodo=periodo,
+        campo_fecha=config.get("campo_fecha") or "created_at"
+    )
+
+def build_pipeline(spec: AggregationSpec, filter_query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Pipeline que devuelve solo el resultado: un documento o uno por grupo"""
+    match = dict(filter_query)
+    if spec.operacion != "count":
+        # Igual que el cálculo en Python: solo cuentan los valores numéricos
+        match = {"$and": [match, {spec.campo: {"$type": "number"}}]} if match else {spec.campo: {"$type": "number"}}
+
+    if spec.operacion == "count":
+        accumulator = {"$sum": 1}
+    else:
+        accumulator = {f"${spec.operacion}": f"${spec.campo}"}
+
+    pipeline: List[Dict[str, Any]] = [{"$match": match}]
+
+    if spec.periodo:
+        # Fechas guardadas como datetime o como string ISO
+        pipeline.append({"$group": {
+            "_id": {"$dateToString": {
+                "format": DATE_PERIODS[spec.periodo],
+                "date": {"$convert": {
+                    "input": f"${spec.campo_fecha}", "to": "date", "onError": None, "onNull": None
+                }}
+            }},
+            "valor": accumulator
+        }})
+        pipeline.append({"$match": {"_id": {"$ne": None}}})
+    elif spec.agrupar_por:
+        pipeline.append({"$group": {"_id": f"${spec.agrupar_por}", "valor": accumulator}})
+    else:
+        pipeline.append({"$group": {"_id": None, "valor": accumulator}})
+        return pipeline
+
+    pipeline.append({"$sort": {"_id": 1}})
+    pipeline.append({"$limit": settings.aggregation_max_groups})
+    return pipeline
+
+def _series_key(spec: AggregationSpec) -> str:
+    return "fecha" if spec.periodo else "clave"
+
+def _plain(value: Any) -> Any:
+    """Valores de grupo serializables (ObjectId, fechas...) para la cache"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def aggregate_items(items: List[Dict[str, Any]], spec: AggregationSpec) -> Any:
+    """Mismo resultado que build_pipeline calculado en Python (entidades de API externa)"""
+    groups: Dict[Any, List[Any]] = defaultdict(list)
+    for item in items:
+        if spec.periodo:
+            date_value = item.get(spec.campo_fecha)
+            try:
+                if isinstance(date_value, str):
+                    date_value = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
+                key = date_value.strftime(DATE_PERIODS[spec.periodo])
+            except (AttributeError, ValueError):
+                continue
+        elif spec.agrupar_por:
+            key = _plain(item.get(spec.agrupar_por))
+        else:
+            key = None
+
+        if spec.operacion == "count":
+            groups[key].append(1)
+        else:
+            value = item.get(spec.campo)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                groups[key].append(value)
+
+    def reduce(values: List[Any]) -> Any:
+        if spec.operacion in ("count", "sum"):
+            return sum(values)
+        if spec.operacion == "avg":
+            return sum(values) / len(values)
+        return min(values) if spec.operacion == "min" else max(values)
+
+    if not spec.is_series:
+        return reduce(groups[None]) if groups.get(None) else 0
+
+    key_name = _series_key(spec)
+    ordered = sorted((key for key in groups if groups[key]), key=lambda key: (key is not None, str(key)))
+    return [
+        {key_name: key, "valor": reduce(groups[key])}
+        for key in ordered[:settings.aggregation_max_groups]
+    ]
+
+class AggregationPushdown:
+    """Calcula count/sum/avg/min/max (opcionalmente agrupados) sin traer documentos.
+
+    Para entidades en base de datos local la agregación se ejecuta en MongoDB
+    y solo vuelve el escalar o la serie. El resultado se cachea por
+    componente y se invalida con los tags de la entidad y del componente.
+    """
+
+    def __init__(self, crud_generator: Optional[DynamicCrudGenerator] = None):
+        self.crud_generator = crud_generator or DynamicCrudGenerator()
+        self.cache_service = CacheService()
+
+    async def aggregate(
+        self,
+        business_id: str,
+        spec: AggregationSpec,
+        user: User,
+        component_id: Optional[str] = None,
+        force_refresh: bool = False
+    ) -> Any:
+        """Escalar (sin agrupación) o lista de {fecha|clave, valor}"""
+        if spec.operacion != "count" and not spec.campo:
+            # Sin campo no hay nada que sumar/promediar
+            return [] if spec.is_series else 0
+
+        config = await self.crud_generator.get_entity_config(business_id, spec.entidad)
+        self.crud_generator._check_read_permission(user, config)
+        self._check_field_permission(config, spec, user)
+
+        if self.crud_generator._uses_api(config):
+            return await self._aggregate_from_api(business_id, spec, user)
+
+        filter_query = self.crud_generator._build_filter_query(spec.filtro)
+        spec_hash = hashlib.sha1(
+            json.dumps(spec._asdict(), sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+        tags = [entity_tag(business_id, spec.entidad)]
+        if component_id:
+            tags.append(component_tag(business_id, component_id))
+
+        return await self.cache_service.get_or_compute(
+            f"agg:{business_id}:{spec.entidad}:{component_id or '-'}:{spec_hash}",
+            lambda: self._aggregate_in_db(config, spec, filter_query),
+            ttl=settings.aggregation_cache_ttl_seconds,
+            force_refresh=force_refresh,
+            tags=tags
+        )
+
+    async def _aggregate_in_db(self, config, spec: AggregationSpec, filter_query: Dict[str, Any]) -> Any:
+        collection = self.crud_generator.db[f"{config.business_id}_{config.entidad}"]
+        start = time.perf_counter()
+        docs = await collection.aggregate(build_pipeline(spec, filter_query)).to_list(None)
+        get_index_manager().record_query(config, filter_query, None, (time.perf_counter() - start) * 1000)
+
+        if not spec.is_series:
+            return docs[0]["valor"] if docs else 0
+
+        key_name = _series_key(spec)
+        return [{key_name: _plain(doc["_id"]), "valor": doc["valor"]} for doc in docs]
+
+    async def _aggregate_from_api(self, business_id: str, spec: AggregationSpec, user: User) -> Any:
+        """La API externa no agrega: se calcula en Python sobre todas las páginas"""
+        items: List[Dict[str, Any]] = []
+        async for batch in self.crud_generator.iter_entities(business_id, spec.entidad, user, filters=spec.filtro):
+            items.extend(batch)
+        return aggregate_items(items, spec)
+
+    def _check_field_permission(self, config, spec: AggregationSpec, user: User):
+        """Un agregado no debe revelar campos que el rol no puede ver"""
+        visible_fields = get_config_cache().plan_for(config).visible_fields(user.rol)
+        if not visible_fields:
+            return
+        for field in (spec.campo, spec.agrupar_por, spec.campo_fecha if spec.periodo else None):
+            if field and field not in visible_fields and field not in ("_id", "created_at", "updated_at"):
+                raise PermissionDeniedError(f"Sin permisos para agregar el campo {field}")
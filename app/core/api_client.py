@@ -4,25 +4,67 @@
 
 import httpx
 import asyncio
-from typing import Dict, Any, Optional, List, Union
+import base64
+from typing import Dict, Any, Optional, List, Tuple, Union
 from datetime import datetime, timedelta
 import logging
 import json
+from urllib.parse import urlparse
 
-from ..models.api_config import ApiConfiguration
+from pydantic import BaseModel, ConfigDict
+
+from ..config import settings
+from ..models.api_config import ApiConfiguration, AuthConfig
 from ..services.crypto_service import CryptoService
-from ..utils.exceptions import CMSException
+from ..utils.exceptions import CMSException, RateLimitExceededError
+from .circuit_breaker import IDEMPOTENT_METHODS, decorrelated_jitter, get_circuit_breaker, get_retry_budget
+from .http_clients import no_cookies
+from .rate_limiter import RateLimitDecision, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
+class ApiAuth(BaseModel):
+    """Credenciales ya desencriptadas de una ApiConfiguration (inmutables).
+
+    Se resuelven una sola vez por versión de la configuración; la
+    ApiConfiguration original nunca se modifica.
+    """
+    headers: Tuple[Tuple[str, str], ...] = ()
+    params: Tuple[Tuple[str, str], ...] = ()
+
+    model_config = ConfigDict(frozen=True)
+
+    @classmethod
+    async def from_config(cls, auth: AuthConfig, crypto_service: CryptoService) -> "ApiAuth":
+        """Desencriptar credenciales y armar headers/params de autenticación"""
+        token = await crypto_service.decrypt(auth.token) if auth.token else None
+        password = await crypto_service.decrypt(auth.password) if auth.password else None
+        api_key = await crypto_service.decrypt(auth.api_key) if auth.api_key else None
+
+        headers: Dict[str, str] = {}
+        params: Dict[str, str] = {}
+        if auth.tipo == "bearer" and token:
+            headers["Authorization"] = f"Bearer {token}"
+        elif auth.tipo == "api_key_header" and api_key:
+            headers[auth.header_name] = api_key
+        elif auth.tipo == "api_key_query" and api_key:
+            params[auth.query_param] = api_key
+        elif auth.tipo == "basic" and auth.username and password:
+            credentials = base64.b64encode(f"{auth.username}:{password}".encode()).decode()
+            headers["Authorization"] = f"Basic {credentials}"
+
+        return cls(headers=tuple(headers.items()), params=tuple(params.items()))
+
 class GenericApiClient:
     """Cliente genérico para APIs externas con funcionalidades avanzadas"""
     
-    def __init__(self, config: ApiConfiguration):
+    def __init__(self, config: ApiConfiguration, auth: Optional[ApiAuth] = None):
         self.config = config
+        self.auth = auth
         self.crypto_service = CryptoService()
         self._client: Optional[httpx.AsyncClient] = None
-        self._rate_limiter = {}
+        # Los clientes del ApiClientManager son compartidos: no se cierran al salir del context manager
+        self._managed = False
     
     async def __aenter__(self):
         """Async context manager entrada"""
@@ -31,45 +73,35 @@ class GenericApiClient:
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager salida"""
-        await self.close()
+        if not self._managed:
+            await self.close()
     
     async def _initialize_client(self):
         """Inicializar cliente HTTP"""
         if self._client:
             return
         
-        # Desencriptar credenciales
-        auth_config = self.config.configuracion.auth
-        if auth_config.token:
-            auth_config.token = await self.crypto_service.decrypt(auth_config.token)
-        if auth_config.password:
-            auth_config.password = await self.crypto_service.decrypt(auth_config.password)
-        if auth_config.api_key:
-            auth_config.api_key = await self.crypto_service.decrypt(auth_config.api_key)
+        # Desencriptar credenciales (una vez por cliente)
+        if self.auth is None:
+            self.auth = await ApiAuth.from_config(self.config.auth, self.crypto_service)
         
-        # Configurar headers
-        headers = self.config.configuracion.headers.copy()
-        
-        # Configurar autenticación
-        if auth_config.tipo == "bearer" and auth_config.token:
-            headers[auth_config.header] = f"Bearer {auth_config.token}"
-        elif auth_config.tipo == "api_key" and auth_config.api_key:
-            headers[auth_config.header] = auth_config.api_key
-        elif auth_config.tipo == "basic" and auth_config.username and auth_config.password:
-            import base64
-            credentials = base64.b64encode(
-                f"{auth_config.username}:{auth_config.password}".encode()
-            ).decode()
-            headers["Authorization"] = f"Basic {credentials}"
+        # Configurar headers y parámetros por defecto + autenticación
+        headers = dict(self.config.default_headers or {})
+        headers.update(self.auth.headers)
+        params = dict(self.config.default_query_params or {})
+        params.update(self.auth.params)
         
         # Crear cliente
         self._client = httpx.AsyncClient(
-            base_url=self.config.configuracion.base_url,
+            base_url=self.config.base_url,
             headers=headers,
-            timeout=self.config.configuracion.timeout,
+            params=params,
+            cookies=no_cookies(),
+            timeout=settings.http_timeout_seconds,
             limits=httpx.Limits(
                 max_connections=20,
-                max_keepalive_connections=10
+                max_keepalive_connections=10,
+                keepalive_expiry=settings.http_keepalive_expiry_seconds
             )
         )
     
@@ -80,25 +112,23 @@ class GenericApiClient:
         params: Optional[Dict[str, Any]] = None,
         data: Optional[Dict[str, Any]] = None,
         headers: Optional[Dict[str, str]] = None,
-        timeout: Optional[float] = None
+        timeout: Optional[float] = None,
+        wait_for_rate_limit: bool = True
     ) -> Dict[str, Any]:
-        """Realizar petición HTTP con manejo completo de errores y reintentos"""
+        """Realizar petición HTTP con manejo completo de errores y reintentos.
+
+        Con wait_for_rate_limit=False, si la API no tiene cupo se lanza
+        RateLimitExceededError (con wait_ms) en lugar de esperar.
+        """
         
         if not self._client:
             await self._initialize_client()
         
         # Verificar rate limiting
-        await self._check_rate_limit()
+        await self._check_rate_limit(wait=wait_for_rate_limit)
         
-        # Preparar URL
+        # Preparar URL (relativa a base_url salvo que sea absoluta)
         url = endpoint
-        if not endpoint.startswith('http'):
-            # Buscar endpoint en configuración
-            endpoints = self.config.configuracion.endpoints
-            if endpoint in endpoints:
-                url = endpoints[endpoint]
-            else:
-                url = endpoint
         
         # Realizar petición con reintentos
         return await self._request_with_retry(
@@ -114,93 +144,118 @@ class GenericApiClient:
         headers: Optional[Dict[str, str]],
         timeout: Optional[float]
     ) -> Dict[str, Any]:
-        """Realizar petición con reintentos automáticos"""
+        """Realizar petición con circuit breaker y reintentos acotados.
+
+        Solo se reintentan métodos idempotentes, con jitter decorrelacionado
+        y mientras quede presupuesto de reintentos para el upstream. Con el
+        circuito abierto se falla inmediatamente (CircuitOpenError).
+        """
         
-        retry_config = self.config.configuracion.retry_config
+        retry_config = self.config.retry_config
+        breaker = get_circuit_breaker(self.upstream)
+        retry_budget = get_retry_budget(self.upstream)
+        retryable = method.upper() in IDEMPOTENT_METHODS
+        base_delay = settings.api_retry_base_delay_seconds * retry_config.backoff_factor
+        delay = base_delay
         last_exception = None
         
+        retry_budget.record_request()
+        
         for attempt in range(retry_config.max_retries + 1):
+            breaker.before_request()
+            
+            # Preparar argumentos de petición
+            request_kwargs = {
+                "method": method,
+                "url": url,
+                "timeout": timeout or settings.http_timeout_seconds
+            }
+            
+            if params:
+                request_kwargs["params"] = params
+            
+            if data and method.upper() != "GET":
+                request_kwargs["json"] = data
+            
+            if headers:
+                request_kwargs["headers"] = headers
+            
             try:
-                # Preparar argumentos de petición
-                request_kwargs = {
-                    "method": method,
-                    "url": url,
-                    "timeout": timeout or self.config.configuracion.timeout
-                }
-                
-                if params:
-                    request_kwargs["params"] = params
-                
-                if data and method.upper() != "GET":
-                    request_kwargs["json"] = data
-                
-                if headers:
-                    request_kwargs["headers"] = headers
-                
-                # Realizar petición
                 response = await self._client.request(**request_kwargs)
-                
-                # Verificar si debemos reintentar por status code
+            except httpx.TransportError as e:
+                # Timeout o error de conexión: el upstream no responde
+                breaker.record_failure()
+                last_exception = e
+            else:
                 if response.status_code in retry_config.retry_on_status:
-                    raise httpx.HTTPStatusError(
+                    breaker.record_failure()
+                    last_exception = httpx.HTTPStatusError(
                         f"HTTP {response.status_code}: {response.text}",
                         request=response.request,
                         response=response
                     )
-                
-                # Verificar éxito
-                response.raise_for_status()
-                
-                # Parsear respuesta
-                try:
-                    return response.json()
-                except json.JSONDecodeError:
-                    return {"raw_response": response.text}
-                
-            except Exception as e:
-                last_exception = e
-                
-                if attempt < retry_config.max_retries:
-                    wait_time = retry_config.backoff_factor ** attempt
-                    logger.warning(
-                        f"Intento {attempt + 1} falló para {method} {url}, "
-                        f"reintentando en {wait_time}s: {e}"
-                    )
-                    await asyncio.sleep(wait_time)
                 else:
-                    logger.error(f"Todos los reintentos fallaron para {method} {url}: {e}")
-                    break
+                    # El upstream respondió: un 4xx es error del request, no del upstream
+                    breaker.record_success()
+                    try:
+                        response.raise_for_status()
+                    except httpx.HTTPStatusError as e:
+                        raise CMSException(f"Error en petición API: {str(e)}")
+                    
+                    # Parsear respuesta
+                    try:
+                        return response.json()
+                    except json.JSONDecodeError:
+                        return {"raw_response": response.text}
+            
+            if not retryable or attempt >= retry_config.max_retries:
+                break
+            if not retry_budget.try_withdraw():
+                logger.warning(f"Presupuesto de reintentos agotado para {self.upstream}")
+                break
+            
+            delay = decorrelated_jitter(delay, base_delay, settings.api_retry_max_delay_seconds)
+            logger.warning(
+                f"Intento {attempt + 1} falló para {method} {url}, "
+                f"reintentando en {delay:.2f}s: {last_exception}"
+            )
+            await asyncio.sleep(delay)
         
-        # Si llegamos aquí, todos los reintentos fallaron
+        logger.error(f"Petición fallida para {method} {url}: {last_exception}")
         raise CMSException(f"Error en petición API: {str(last_exception)}")
     
-    async def _check_rate_limit(self):
-        """Verificar y aplicar rate limiting"""
-        rate_limit = self.config.configuracion.rate_limit
-        now = datetime.now()
-        minute_ago = now - timedelta(minutes=1)
-        
-        # Limpiar peticiones antiguas
-        self._rate_limiter = {
-            timestamp: count for timestamp, count in self._rate_limiter.items()
-            if timestamp > minute_ago
-        }
-        
-        # Contar peticiones en el último minuto
-        total_requests = sum(self._rate_limiter.values())
-        
-        if total_requests >= rate_limit.requests_per_minute:
-            # Calcular tiempo de espera hasta que se libere una petición
-            oldest_request = min(self._rate_limiter.keys())
-            wait_time = (oldest_request + timedelta(minutes=1) - now).total_seconds()
-            
-            if wait_time > 0:
-                logger.info(f"Rate limit alcanzado, esperando {wait_time:.2f}s")
-                await asyncio.sleep(wait_time)
+    @property
+    def upstream(self) -> str:
+        """Host del upstream (un circuito por host)"""
+        return urlparse(self.config.base_url).netloc
+    
+    @property
+    def rate_limit_key(self) -> str:
+        """Bucket de rate limit de esta API (compartido por todos sus clientes)"""
+        return f"{self.config.business_id}:{self.config.name}"
+    
+    async def try_acquire_rate_limit(self, tokens: int = 1) -> RateLimitDecision:
+        """Pedir cupo sin esperar: si no se concede, wait_ms indica cuánto faltaría"""
+        rate_limit = self.config.rate_limit
+        if not rate_limit.enabled:
+            return RateLimitDecision(True, 0, float(rate_limit.burst))
+        return await get_rate_limiter().try_acquire(
+            self.rate_limit_key,
+            rate_limit.requests_per_minute,
+            rate_limit.burst,
+            tokens
+        )
+    
+    async def _check_rate_limit(self, wait: bool = True):
+        """Verificar y aplicar rate limiting (token bucket por API)"""
+        decision = await self.try_acquire_rate_limit()
         
-        # Registrar petición actual
-        current_minute = now.replace(second=0, microsecond=0)
-        self._rate_limiter[current_minute] = self._rate_limiter.get(current_minute, 0) + 1
+        while not decision.allowed:
+            if not wait:
+                raise RateLimitExceededError(self.rate_limit_key, decision.wait_ms)
+            logger.info(f"Rate limit alcanzado para {self.rate_limit_key}, esperando {decision.wait_ms}ms")
+            await asyncio.sleep(decision.wait_ms / 1000)
+            decision = await self.try_acquire_rate_limit()
     
     async def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
         """Petición GET"""
@@ -265,4 +320,127 @@ class GenericApiClient:
         """Cerrar cliente HTTP"""
         if self._client:
             await self._client.aclose()
-            self._client = None
\ No newline at end of file
+            self._client = None
+
+class ApiClientManager:
+    """Clientes de APIs externas reutilizables por (business_id, api_name, versión).
+
+    Cada configuración mantiene un cliente "caliente" (conexiones keep-alive y
+    credenciales ya desencriptadas). La versión es el updated_at guardado: si
+    cambia, se crea un cliente nuevo y el anterior se cierra cuando terminan
+    las peticiones en curso.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str], Tuple[Any, GenericApiClient]] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._retiring: Dict[asyncio.Task, GenericApiClient] = {}
+        self.created = 0
+        self.reused = 0
+
+    async def get_client(self, config: ApiConfiguration) -> GenericApiClient:
+        """Cliente para una configuración ya cargada"""
+        key = (config.business_id, config.name)
+        entry = self._clients.get(key)
+        if entry is not None and entry[0] == config.updated_at:
+            self.reused += 1
+            return entry[1]
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._clients.get(key)
+            if entry is not None and entry[0] == config.updated_at:
+                self.reused += 1
+                return entry[1]
+
+            # Copia propia: cambios posteriores al objeto del caller no afectan al cliente
+            client = GenericApiClient(config.model_copy(deep=True))
+            client._managed = True
+            await client._initialize_client()
+            self._clients[key] = (config.updated_at, client)
+            self.created += 1
+            logger.info(f"Cliente API creado: {config.business_id}.{config.name}")
+
+        if entry is not None:
+            self._retire(entry[1])
+        return client
+
+    async def get_client_for(self, business_id: str, api_name: str) -> Optional[GenericApiClient]:
+        """Cliente para una API guardada; solo relee la configuración si cambió"""
+        from ..database import get_database
+
+        db = get_database()
+        query = {"business_id": business_id, "name": api_name}
+        current = await db.api_configurations.find_one(query, {"updated_at": 1})
+        if current is None:
+            self.invalidate(business_id, api_name)
+            return None
+
+        entry = self._clients.get((business_id, api_name))
+        if entry is not None and entry[0] == current.get("updated_at"):
+            self.reused += 1
+            return entry[1]
+
+        doc = await db.api_configurations.find_one(query)
+        if doc is None:
+            return None
+        return await self.get_client(ApiConfiguration(**doc))
+
+    def invalidate(self, business_id: str, api_name: Optional[str] = None):
+        """Descartar los clientes de un business (o de una API concreta)"""
+        keys = [
+            key for key in self._clients
+            if key[0] == business_id and (api_name is None or key[1] == api_name)
+        ]
+        for key in keys:
+            _, client = self._clients.pop(key)
+            self._retire(client)
+
+    def _retire(self, client: GenericApiClient):
+        async def close_later():
+            # Dar tiempo a que terminen las peticiones que ya usan este cliente
+            await asyncio.sleep(settings.http_timeout_seconds)
+            await client.close()
+
+        task = asyncio.create_task(close_later())
+        self._retiring[task] = client
+        task.add_done_callback(lambda done: self._retiring.pop(done, None))
+
+    async def close(self):
+        """Cerrar todos los clientes (shutdown de la app)"""
+        clients = [client for _, client in self._clients.values()]
+        for task, client in list(self._retiring.items()):
+            task.cancel()
+            clients.append(client)
+        self._clients.clear()
+        self._retiring.clear()
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.error(f"Error cerrando cliente API: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._clients),
+            "created": self.created,
+            "reused": self.reused,
+            "retiring": len(self._retiring)
+        }
+
+# Manager del proceso
+_api_client_manager: Optional[ApiClientManager] = None
+
+def get_api_client_manager() -> ApiClientManager:
+    """Obtener (o crear) el manager de clientes API del proceso"""
+    global _api_client_manager
+    if _api_client_manager is None:
+        _api_client_manager = ApiClientManager()
+    return _api_client_manager
+
+async def close_api_clients():
+    """Cerrar los clientes API del proceso (shutdown de la app)"""
+    global _api_client_manager
+    if _api_client_manager is not None:
+        await _api_client_manager.close()
+        _api_client_manager = None
@@ -0,0 +1,211 @@
+# ================================
+# app/core/business_registry.py - Registro en memoria de businesses activos
+# ================================
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo.errors import OperationFailure
+
+from ..config import settings
+from ..database import get_database
+
+logger = logging.getLogger(__name__)
+
+# Campos que se mantienen en memoria por business
+CORE_FIELDS = {
+    "business_id": 1,
+    "nombre": 1,
+    "tipo_base": 1,
+    "configuracion": 1,
+    "suscripcion": 1,
+    "activo": 1,
+    "updated_at": 1
+}
+
+# Códigos de MongoDB cuando el servidor no soporta change streams (standalone)
+_CHANGE_STREAMS_UNSUPPORTED = {40573, 40324}
+
+class BusinessRegistry:
+    """Businesses activos y su configuración base, en memoria del proceso.
+
+    Se carga entera al arrancar y se mantiene al día con un change stream
+    sobre business_instances. Si MongoDB no es replica set, hace polling
+    por updated_at. Las comprobaciones de existencia no hacen I/O.
+    """
+
+    def __init__(self, db=None, poll_seconds: Optional[float] = None):
+        self._db = db
+        self.poll_seconds = poll_seconds or settings.business_registry_poll_seconds
+        self._businesses: Dict[str, Dict[str, Any]] = {}
+        # _id -> business_id: los deletes del change stream solo traen el _id
+        self._ids: Dict[Any, str] = {}
+        self._watermark: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+        self.mode = "stopped"
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else get_database()
+
+    async def load(self):
+        """Cargar todos los businesses (reemplaza el contenido actual)"""
+        businesses: Dict[str, Dict[str, Any]] = {}
+        ids: Dict[Any, str] = {}
+        watermark = None
+        async for doc in self.db.business_instances.find({}, CORE_FIELDS):
+            ids[doc["_id"]] = doc["business_id"]
+            if doc.get("activo", True):
+                businesses[doc["business_id"]] = doc
+            updated_at = doc.get("updated_at")
+            if updated_at and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+
+        self._businesses, self._ids, self._watermark = businesses, ids, watermark
+        self.loaded = True
+        logger.info(f"Registro de businesses cargado: {len(businesses)} activos")
+
+    def apply(self, doc: Dict[str, Any]):
+        """Aplicar un documento de business_instances insertado o modificado"""
+        business_id = doc["business_id"]
+        if "_id" in doc:
+            self._ids[doc["_id"]] = business_id
+        if doc.get("activo", True):
+            self._businesses[business_id] = {key: doc[key] for key in doc if key == "_id" or key in CORE_FIELDS}
+        else:
+            self._businesses.pop(business_id, None)
+
+        updated_at = doc.get("updated_at")
+        if updated_at and (self._watermark is None or updated_at > self._watermark):
+            self._watermark = updated_at
+
+    def remove(self, business_id: str):
+        """Quitar un business eliminado"""
+        self._businesses.pop(business_id, None)
+        self._ids = {_id: bid for _id, bid in self._ids.items() if bid != business_id}
+
+    async def refresh_business(self, business_id: str):
+        """Releer un business tras un update parcial (update_one sin documento)"""
+        doc = await self.db.business_instances.find_one({"business_id": business_id}, CORE_FIELDS)
+        if doc:
+            self.apply(doc)
+        else:
+            self.remove(business_id)
+
+    def exists(self, business_id: str) -> bool:
+        """True si el business existe y está activo (sin I/O)"""
+        return business_id in self._businesses
+
+    def get(self, business_id: str) -> Optional[Dict[str, Any]]:
+        """Configuración base del business activo"""
+        return self._businesses.get(business_id)
+
+    # ================================
+    # SINCRONIZACIÓN
+    # ================================
+
+    def _apply_change(self, change: Dict[str, Any]):
+        operation = change["operationType"]
+        if operation == "delete":
+            business_id = self._ids.pop(change["documentKey"]["_id"], None)
+            if business_id:
+                self._businesses.pop(business_id, None)
+        elif change.get("fullDocument"):
+            self.apply(change["fullDocument"])
+
+    async def _watch(self):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        async with self.db.business_instances.watch(pipeline, full_document="updateLookup") as stream:
+            # Recargar con el stream abierto: no se pierde nada entre la carga y el watch
+            await self.load()
+            self.mode = "change_stream"
+            async for change in stream:
+                self._apply_change(change)
+
+    async def poll_once(self):
+        """Aplicar los cambios desde la última modificación vista"""
+        query = {"updated_at": {"$gte": self._watermark}} if self._watermark else {}
+        async for doc in self.db.business_instances.find(query, CORE_FIELDS):
+            self.apply(doc)
+
+        # Los borrados no dejan rastro en updated_at: recargar si cambió el total
+        if await self.db.business_instances.count_documents({}) != len(self._ids):
+            await self.load()
+
+    async def _poll(self):
+        self.mode = "polling"
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"Error refrescando registro de businesses: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in _CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams no disponibles: registro de businesses por polling")
+                    await self._poll()
+                    return
+                logger.error(f"Error en change stream de businesses: {e}")
+            except Exception as e:
+                logger.error(f"Error en change stream de businesses: {e}")
+            # Reintentar: _watch recarga todo al reabrir el stream
+            self.mode = "reconnecting"
+            await asyncio.sleep(self.poll_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.mode = "stopped"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "mode": self.mode,
+            "active_businesses": len(self._businesses),
+            "watermark": self._watermark.isoformat() if self._watermark else None
+        }
+
+_registry: Optional[BusinessRegistry] = None
+
+def get_business_registry() -> BusinessRegistry:
+    global _registry
+    if _registry is None:
+        _registry = BusinessRegistry()
+    return _registry
+
+async def start_business_registry():
+    """Cargar el registro y empezar a seguir los cambios (startup de la app)"""
+    if not settings.business_registry_enabled:
+        return
+    registry = get_business_registry()
+    try:
+        await registry.load()
+    except Exception as e:
+        # Sin registro el middleware sigue consultando MongoDB
+        logger.error(f"Error cargando registro de businesses: {e}")
+        return
+    registry.start()
+
+async def stop_business_registry():
+    """Detener la sincronización (shutdown de la app)"""
+    if _registry is not None:
+        await _registry.stop()
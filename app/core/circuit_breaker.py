@@ -0,0 +1,175 @@
+# ================================
+# app/core/circuit_breaker.py - Circuit breaker y presupuesto de reintentos
+# ================================
+
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from ..config import settings
+from ..utils.exceptions import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# Métodos que se pueden repetir sin efectos secundarios adicionales (RFC 9110)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+class CircuitBreaker:
+    """Circuito closed/open/half-open por upstream.
+
+    closed: pasan todas las peticiones; N fallos seguidos lo abren.
+    open: falla inmediatamente hasta que pasa open_seconds.
+    half_open: deja pasar unas pocas peticiones de prueba; un éxito lo
+    cierra y un fallo lo vuelve a abrir.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        open_seconds: Optional[float] = None,
+        half_open_max_calls: Optional[int] = None
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.api_breaker_failure_threshold
+        self.open_seconds = open_seconds or settings.api_breaker_open_seconds
+        self.half_open_max_calls = half_open_max_calls or settings.api_breaker_half_open_max_calls
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.half_open_since = 0.0
+        self.total_failures = 0
+        self.total_rejected = 0
+
+    def before_request(self):
+        """Lanzar CircuitOpenError si la petición no debe salir"""
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.open_seconds:
+                self.total_rejected += 1
+                raise CircuitOpenError(self.name, self.open_seconds - elapsed)
+            self._enter_half_open()
+            logger.info(f"Circuito {self.name} en half-open: probando upstream")
+
+        if self.state == self.HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls:
+                # Una prueba cancelada no registra resultado: no bloquear para siempre
+                if time.monotonic() - self.half_open_since < self.open_seconds:
+                    self.total_rejected += 1
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self._enter_half_open()
+            self.half_open_calls += 1
+
+    def _enter_half_open(self):
+        self.state = self.HALF_OPEN
+        self.half_open_calls = 0
+        self.half_open_since = time.monotonic()
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"Circuito {self.name} cerrado: upstream recuperado")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.total_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuito {self.name} abierto tras {self.consecutive_failures} fallos")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        retry_after = 0.0
+        if self.state == self.OPEN:
+            retry_after = max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "total_rejected": self.total_rejected,
+            "retry_after_seconds": round(retry_after, 1)
+        }
+
+class RetryBudget:
+    """Reintentos limitados a una fracción del tráfico reciente del upstream.
+
+    Permite un reintento si los reintentos de la ventana no superan
+    min_retries + ratio * peticiones. Así una caída no multiplica la carga.
+    """
+
+    def __init__(
+        self,
+        ratio: Optional[float] = None,
+        min_retries: Optional[int] = None,
+        window_seconds: float = 10.0
+    ):
+        self.ratio = settings.api_retry_budget_ratio if ratio is None else ratio
+        self.min_retries = settings.api_retry_budget_min_retries if min_retries is None else min_retries
+        self.window_seconds = window_seconds
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+
+    def _trim(self, now: float):
+        cutoff = now - self.window_seconds
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_request(self):
+        # Recortar aquí también: sin reintentos ni lecturas de stats la
+        # ventana no se recortaría nunca
+        now = time.monotonic()
+        self._trim(now)
+        self._requests.append(now)
+
+    def try_withdraw(self) -> bool:
+        """Consumir un reintento del presupuesto (False si no queda)"""
+        now = time.monotonic()
+        self._trim(now)
+        if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+            return False
+        self._retries.append(now)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        return {"requests": len(self._requests), "retries": len(self._retries)}
+
+def decorrelated_jitter(previous_delay: float, base: float, cap: float) -> float:
+    """Siguiente espera: aleatoria entre base y 3x la anterior, acotada por cap"""
+    return min(cap, random.uniform(base, max(base, previous_delay * 3)))
+
+# Breakers y presupuestos por upstream, compartidos por todo el proceso
+_breakers: Dict[str, CircuitBreaker] = {}
+_retry_budgets: Dict[str, RetryBudget] = {}
+
+def get_circuit_breaker(upstream: str) -> CircuitBreaker:
+    breaker = _breakers.get(upstream)
+    if breaker is None:
+        breaker = _breakers[upstream] = CircuitBreaker(upstream)
+    return breaker
+
+def get_retry_budget(upstream: str) -> RetryBudget:
+    budget = _retry_budgets.get(upstream)
+    if budget is None:
+        budget = _retry_budgets[upstream] = RetryBudget()
+    return budget
+
+def get_circuit_breaker_stats() -> Dict[str, Any]:
+    """Estado de cada circuito y su presupuesto de reintentos"""
+    return {
+        upstream: {
+            **breaker.stats(),
+            "retry_budget": get_retry_budget(upstream).stats()
+        }
+        for upstream, breaker in _breakers.items()
+    }
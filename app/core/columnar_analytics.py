@@ -0,0 +1,291 @@
+# ================================
+# app/core/columnar_analytics.py - Analytics vectorizados por columnas (NumPy)
+# ================================
+
+import logging
+import operator
+from datetime import datetime, timedelta, timezone
+from itertools import compress, repeat
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Campos de fecha de creación, en orden de preferencia
+DATE_FIELDS = ("created_at", "fecha_creacion", "date", "timestamp")
+
+# Nunca se codifican como categorías (identificadores de documento)
+_ID_FIELDS = frozenset(["_id", "id"])
+
+_NONE = type(None)
+_NUMERIC_TYPES = frozenset([int, float])
+_NUMERIC_OR_NONE = frozenset([int, float, _NONE])
+_TEXT_OR_NONE = frozenset([str, _NONE])
+_DATETIME_OR_NONE = frozenset([datetime, _NONE])
+_EPOCH = datetime(1970, 1, 1)
+_NAT = np.datetime64("NaT", "us")
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    """datetime naive en UTC desde datetime o string ISO (None si no es una fecha)"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    elif not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _datetime_array(values: List[Optional[datetime]]) -> np.ndarray:
+    """datetime64[us] desde datetimes naive (None -> NaT).
+
+    Pasa por segundos desde epoch: convertir los objetos datetime con
+    np.array es unas diez veces más lento.
+    """
+    present = np.fromiter(map(operator.is_not, values, repeat(None)), dtype=bool, count=len(values))
+    dates = values if present.all() else list(compress(values, present))
+    seconds = np.fromiter(
+        map(timedelta.total_seconds, map(operator.sub, dates, repeat(_EPOCH))),
+        dtype=np.float64,
+        count=len(dates)
+    )
+    result = np.full(len(values), _NAT)
+    result[present] = np.rint(seconds * 1e6).astype(np.int64).view("datetime64[us]")
+    return result
+
+class _ColumnBuilder:
+    """Acumula un campo lote a lote; el tipo se decide con la columna completa"""
+
+    __slots__ = (
+        "parse_dates", "encode_text", "numbers", "has_numbers", "all_int",
+        "codes", "categories", "dates", "has_dates", "missing"
+    )
+
+    def __init__(self, field: str):
+        self.parse_dates = field in DATE_FIELDS
+        self.encode_text = field not in _ID_FIELDS
+        self.numbers: List[np.ndarray] = []
+        self.has_numbers = False
+        self.all_int = True
+        self.codes: List[np.ndarray] = []
+        self.categories: Dict[str, int] = {}
+        self.dates: List[np.ndarray] = []
+        self.has_dates = False
+        self.missing = 0
+
+    def add(self, values: List[Any]):
+        types = set(map(type, values))
+        self.missing += values.count(None) + values.count("")
+
+        # Números (bool no cuenta como número)
+        if types <= _NUMERIC_OR_NONE:
+            numbers = np.array(values, dtype=np.float64)
+        elif types & _NUMERIC_TYPES:
+            numbers = np.array([v if type(v) in _NUMERIC_TYPES else None for v in values], dtype=np.float64)
+        else:
+            numbers = None
+        if numbers is not None and types & _NUMERIC_TYPES:
+            self.has_numbers = True
+            self.all_int = self.all_int and float not in types
+        self.numbers.append(numbers if numbers is not None else np.full(len(values), np.nan))
+
+        # Textos como códigos de categoría (-1 = no es texto)
+        if str in types and self.encode_text:
+            texts = values if types <= _TEXT_OR_NONE else [v if type(v) is str else None for v in values]
+            categories = self.categories
+            for value in dict.fromkeys(texts):
+                if value not in categories:
+                    categories[value] = len(categories)
+            codes = np.fromiter(map(categories.__getitem__, texts), dtype=np.int32, count=len(texts))
+        else:
+            codes = None
+        self.codes.append(codes)
+
+        # Fechas: objetos datetime o, en los campos de fecha, strings ISO
+        dates = None
+        if types <= _DATETIME_OR_NONE and datetime in types:
+            try:
+                dates = _datetime_array(values)
+            except TypeError:
+                # datetimes con zona horaria
+                pass
+        if dates is None and (datetime in types or (self.parse_dates and str in types)):
+            dates = _datetime_array([_to_datetime(v) for v in values])
+        if dates is not None and not np.isnat(dates).all():
+            self.has_dates = True
+        self.dates.append(dates if dates is not None else np.full(len(values), _NAT))
+
+    def build(self, name: str, length: int) -> "Column":
+        codes = None
+        if self.categories:
+            none_code = self.categories.get(None, -1)
+            codes = np.concatenate([
+                chunk if chunk is not None else np.full(len(numbers), -1, dtype=np.int32)
+                for chunk, numbers in zip(self.codes, self.numbers)
+            ])
+            if none_code >= 0:
+                codes[codes == none_code] = -1
+        return Column(
+            name=name,
+            length=length,
+            numbers=np.concatenate(self.numbers) if self.has_numbers else None,
+            all_int=self.all_int,
+            codes=codes,
+            categories=list(self.categories),
+            dates=np.concatenate(self.dates) if self.has_dates else None,
+            missing=self.missing
+        )
+
+class Column:
+    """Un campo de la entidad en formato columnar.
+
+    numbers: float64 con NaN donde el valor no es numérico.
+    codes: int32, índice en categories o -1 donde el valor no es texto.
+    dates: datetime64[us] (UTC naive) con NaT donde no hay fecha.
+    """
+
+    __slots__ = ("name", "length", "numbers", "all_int", "codes", "categories", "dates", "missing")
+
+    def __init__(self, name, length, numbers, all_int, codes, categories, dates, missing):
+        self.name = name
+        self.length = length
+        self.numbers: Optional[np.ndarray] = numbers
+        self.all_int = all_int
+        self.codes: Optional[np.ndarray] = codes
+        self.categories: List[Any] = categories
+        self.dates: Optional[np.ndarray] = dates
+        self.missing = missing
+
+class ColumnarFrameBuilder:
+    """Convierte lotes de items (dicts) en columnas a medida que llegan.
+
+    Cada lote se descarta después de convertirlo: la memoria es la de los
+    arrays, no la de los dicts de la entidad completa.
+    """
+
+    def __init__(self):
+        self._columns: Dict[str, _ColumnBuilder] = {}
+        self._length = 0
+
+    def add(self, items: List[Dict[str, Any]]):
+        if not items:
+            return
+        fields = set()
+        for shape in set(map(tuple, map(dict.keys, items))):
+            fields.update(shape)
+        for field in self._columns.keys() - fields:
+            # Campo ausente en todo el lote
+            self._columns[field].add([None] * len(items))
+        for field in fields:
+            builder = self._columns.get(field)
+            if builder is None:
+                builder = self._columns[field] = _ColumnBuilder(field)
+                if self._length:
+                    builder.add([None] * self._length)
+            builder.add(list(map(dict.get, items, repeat(field))))
+        self._length += len(items)
+
+    def build(self) -> "ColumnarFrame":
+        return ColumnarFrame(
+            self._length,
+            {name: builder.build(name, self._length) for name, builder in self._columns.items()}
+        )
+
+class ColumnarFrame:
+    """Columnas de una entidad y las estadísticas que el reporte calcula sobre ellas"""
+
+    def __init__(self, length: int, columns: Dict[str, Column]):
+        self.length = length
+        self.columns = columns
+
+    @classmethod
+    def from_items(cls, items: Iterable[Dict[str, Any]]) -> "ColumnarFrame":
+        builder = ColumnarFrameBuilder()
+        builder.add(list(items))
+        return builder.build()
+
+    def date_field(self) -> Optional[str]:
+        """Primer campo de DATE_FIELDS con alguna fecha"""
+        for field in DATE_FIELDS:
+            column = self.columns.get(field)
+            if column is not None and column.dates is not None:
+                return field
+        return None
+
+    def numeric_summary(self) -> Dict[str, Dict[str, Any]]:
+        """count/min/max/mean/median/std_dev/sum de cada campo con valores numéricos"""
+        analytics = {}
+        for name, column in self.columns.items():
+            if column.numbers is None:
+                continue
+            values = column.numbers[~np.isnan(column.numbers)]
+            if not values.size:
+                continue
+            cast = int if column.all_int else float
+            analytics[name] = {
+                "count": int(values.size),
+                "min": cast(values.min()),
+                "max": cast(values.max()),
+                "mean": round(float(values.mean()), 2),
+                "median": round(float(np.median(values)), 2),
+                "std_dev": round(float(values.std(ddof=1)), 2) if values.size > 1 else 0,
+                "sum": cast(values.sum())
+            }
+        return analytics
+
+    def top_categories(self, k: int = 10) -> Dict[str, Dict[str, Any]]:
+        """Valores distintos y los k más frecuentes de cada campo de texto (sin ids ni fechas)"""
+        analytics = {}
+        for name, column in self.columns.items():
+            if column.codes is None or column.dates is not None:
+                continue
+            codes = column.codes[column.codes >= 0]
+            if not codes.size:
+                continue
+            counts = np.bincount(codes, minlength=len(column.categories))
+            # Orden estable: a igual frecuencia, primero el que apareció antes
+            order = np.argsort(-counts, kind="stable")[:k]
+            order = order[counts[order] > 0]
+            total = int(codes.size)
+            top = [(column.categories[i], int(counts[i])) for i in order]
+            analytics[name] = {
+                "unique_values": int(np.count_nonzero(counts)),
+                "most_common": top[:5],
+                "distribution": [
+                    {"value": value, "count": count, "percentage": round(count / total * 100, 1)}
+                    for value, count in top
+                ]
+            }
+        return analytics
+
+    def daily_histogram(self, field: str, start_date: datetime, end_date: datetime) -> Tuple[int, List[Dict[str, Any]]]:
+        """(registros en el período, conteo y acumulado por día del período)"""
+        start_day = np.datetime64(start_date.date(), "D")
+        days = np.arange(start_day, np.datetime64(end_date.date(), "D") + 1)
+        column = self.columns.get(field)
+        if column is None or column.dates is None:
+            counts = np.zeros(len(days), dtype=np.int64)
+            in_period = 0
+        else:
+            dates = column.dates
+            mask = (dates >= np.datetime64(start_date, "us")) & (dates <= np.datetime64(end_date, "us"))
+            offsets = (dates[mask].astype("datetime64[D]") - start_day).astype(np.int64)
+            counts = np.bincount(offsets, minlength=len(days))[:len(days)]
+            in_period = int(mask.sum())
+        cumulative = np.cumsum(counts)
+        return in_period, [
+            {"date": str(day), "count": int(count), "cumulative": int(total)}
+            for day, count, total in zip(days, counts, cumulative)
+        ]
+
+    def completeness(self) -> Dict[str, float]:
+        """Porcentaje de valores presentes (no nulos ni vacíos) por campo"""
+        if not self.length:
+            return {}
+        return {
+            name: round((self.length - column.missing) / self.length * 100, 1)
+            for name, column in self.columns.items()
+        }
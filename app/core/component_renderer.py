@@ -4,7 +4,10 @@
 
 from typing import Dict, Any, List, Optional
 import logging
+from datetime import datetime
 
+from .aggregation_pushdown import AggregationPushdown, spec_from_component
+from .dynamic_crud import DynamicCrudGenerator
 from ..models.view import ComponenteVista
 from ..models.user import User
 from ..services.api_service import ApiService
@@ -19,6 +22,7 @@ class ComponentRenderer:
     def __init__(self):
         self.api_service = ApiService()
         self.crud_service = DynamicCrudService()
+        self.aggregations = AggregationPushdown()
     
     async def render_component(
         self,
@@ -43,9 +47,9 @@ class ComponentRenderer:
             
             # Renderizar según tipo
             if component_type == "stats_card":
-                data = await self._render_stats_card(business_id, config, user)
+                data = await self._render_stats_card(business_id, config, user, component.id)
             elif component_type == "chart":
-                data = await self._render_chart(business_id, config, user)
+                data = await self._render_chart(business_id, config, user, component.id)
             elif component_type == "data_table":
                 data = await self._render_data_table(business_id, config, user, context)
             elif component_type == "form":
@@ -81,7 +85,8 @@ class ComponentRenderer:
         self,
         business_id: str,
         config: Dict[str, Any],
-        user: User
+        user: User,
+        component_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """Renderizar tarjeta de estadísticas"""
         
@@ -93,40 +98,11 @@ class ComponentRenderer:
             return {"error": "Entidad no especificada"}
         
         try:
-            # Obtener datos de la entidad
-            crud_generator = DynamicCrudGenerator()
-            
-            # Para estadísticas, obtenemos todos los datos (sin paginación)
-            result = await crud_generator.list_entities(
-                business_id=business_id,
-                entity_name=entidad,
-                user=user,
-                page=1,
-                per_page=1000,  # Límite alto para estadísticas
-                filters=filtro
+            # La agregación se resuelve en la base de datos: solo vuelve el valor
+            valor = await self.aggregations.aggregate(
+                business_id, spec_from_component(config), user, component_id
             )
             
-            items = result.get("items", [])
-            
-            # Calcular valor según operación
-            if operacion == "count":
-                valor = len(items)
-            elif operacion == "sum":
-                campo = config.get("campo_suma")
-                if campo:
-                    valor = sum(item.get(campo, 0) for item in items if isinstance(item.get(campo), (int, float)))
-                else:
-                    valor = 0
-            elif operacion == "avg":
-                campo = config.get("campo_promedio")
-                if campo:
-                    valores = [item.get(campo, 0) for item in items if isinstance(item.get(campo), (int, float))]
-                    valor = sum(valores) / len(valores) if valores else 0
-                else:
-                    valor = 0
-            else:
-                valor = len(items)
-            
             # Calcular tendencia (comparar con período anterior)
             tendencia = await self._calculate_trend(business_id, entidad, filtro, operacion, config)
             
@@ -147,7 +123,8 @@ class ComponentRenderer:
         self,
         business_id: str,
         config: Dict[str, Any],
-        user: User
+        user: User,
+        component_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """Renderizar gráfico"""
         
@@ -159,31 +136,13 @@ class ComponentRenderer:
         
         try:
             chart_data = []
-            crud_generator = DynamicCrudGenerator()
             
             for entidad_config in entidades:
                 entidad_name = entidad_config.get("entidad")
-                campo_fecha = entidad_config.get("campo_fecha", "created_at")
-                operacion = entidad_config.get("operacion", "count_by_month")
-                
-                # Obtener datos de la entidad
-                result = await crud_generator.list_entities(
-                    business_id=business_id,
-                    entity_name=entidad_name,
-                    user=user,
-                    page=1,
-                    per_page=1000
-                )
+                spec = spec_from_component({"operacion": "count_by_month", **entidad_config})
                 
-                items = result.get("items", [])
-                
-                # Procesar datos para el gráfico
-                if operacion == "count_by_month":
-                    processed_data = self._group_by_month(items, campo_fecha)
-                elif operacion == "count_by_day":
-                    processed_data = self._group_by_day(items, campo_fecha)
-                else:
-                    processed_data = items
+                # Serie agrupada por período calculada en la base de datos
+                processed_data = await self.aggregations.aggregate(business_id, spec, user, component_id)
                 
                 chart_data.append({
                     "name": entidad_config.get("label", entidad_name),
@@ -294,60 +253,6 @@ class ComponentRenderer:
         permisos_rol = component.permisos_rol
         return "*" in permisos_rol or user.rol in permisos_rol
     
-    def _group_by_month(self, items: List[Dict[str, Any]], date_field: str) -> List[Dict[str, Any]]:
-        """Agrupar items por mes"""
-        from collections import defaultdict
-        from datetime import datetime
-        
-        monthly_counts = defaultdict(int)
-        
-        for item in items:
-            date_value = item.get(date_field)
-            if date_value:
-                try:
-                    # Convertir a datetime si es string
-                    if isinstance(date_value, str):
-                        date_obj = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
-                    else:
-                        date_obj = date_value
-                    
-                    month_key = date_obj.strftime("%Y-%m")
-                    monthly_counts[month_key] += 1
-                except:
-                    continue
-        
-        # Convertir a formato para gráficos
-        return [
-            {"fecha": month, "valor": count}
-            for month, count in sorted(monthly_counts.items())
-        ]
-    
-    def _group_by_day(self, items: List[Dict[str, Any]], date_field: str) -> List[Dict[str, Any]]:
-        """Agrupar items por día"""
-        from collections import defaultdict
-        from datetime import datetime
-        
-        daily_counts = defaultdict(int)
-        
-        for item in items:
-            date_value = item.get(date_field)
-            if date_value:
-                try:
-                    if isinstance(date_value, str):
-                        date_obj = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
-                    else:
-                        date_obj = date_value
-                    
-                    day_key = date_obj.strftime("%Y-%m-%d")
-                    daily_counts[day_key] += 1
-                except:
-                    continue
-        
-        return [
-            {"fecha": day, "valor": count}
-            for day, count in sorted(daily_counts.items())
-        ]
-    
     async def _calculate_trend(
         self,
         business_id: str,
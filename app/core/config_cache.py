@@ -0,0 +1,172 @@
+# ================================
+# app/core/config_cache.py - Cache versionada de EntityConfig / ViewConfig
+# ================================
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..database import get_database
+from ..models.entity import EntityConfig
+from ..models.view import ViewConfig
+from ..services.validation_service import EntityValidator
+
+logger = logging.getLogger(__name__)
+
+class EntityPlan:
+    """Configuración de entidad precompilada para el hot path de CRUD.
+
+    Se construye una vez por versión de la configuración: campos visibles
+    por rol, cadena de validadores compilada y tablas de mapeo directa e inversa.
+    """
+
+    __slots__ = ("config", "version", "validators", "entity_validator", "mapeo", "reverse_mapeo", "_field_roles", "_visible_by_role")
+
+    def __init__(self, config: EntityConfig):
+        configuracion = config.configuracion or {}
+        campos = configuracion.get("campos") or []
+        api_config = configuracion.get("api_config") or {}
+
+        self.config = config
+        self.version = config.updated_at
+        # (campo, obligatorio, configuración del campo) en el orden de `campos`
+        self.validators: List[Tuple[str, bool, Dict[str, Any]]] = [
+            (campo["campo"], bool(campo.get("obligatorio", False)), campo) for campo in campos
+        ]
+        # Los mismos validadores compilados a una función síncrona por entidad
+        self.entity_validator = EntityValidator(campos)
+        # campo_api -> campo_entidad y su inverso
+        self.mapeo: Dict[str, str] = dict(api_config.get("mapeo") or {})
+        self.reverse_mapeo: Dict[str, str] = {v: k for k, v in self.mapeo.items()}
+        self._field_roles = [
+            (campo["campo"], frozenset(campo.get("visible_roles", ["*"]))) for campo in campos
+        ]
+        self._visible_by_role: Dict[str, Tuple[str, ...]] = {}
+
+    def visible_fields(self, rol: str) -> Tuple[str, ...]:
+        """Campos visibles para el rol (vacío si la entidad no define campos)"""
+        fields = self._visible_by_role.get(rol)
+        if fields is None:
+            fields = tuple(
+                campo for campo, roles in self._field_roles if "*" in roles or rol in roles
+            )
+            self._visible_by_role[rol] = fields
+        return fields
+
+class _Entry:
+    __slots__ = ("value", "version", "checked_at")
+
+    def __init__(self, value, version):
+        self.value = value
+        self.version = version
+        self.checked_at = time.monotonic()
+
+class ConfigCache:
+    """Cache en proceso de configuraciones por (business_id, entidad|vista).
+
+    Dentro del TTL se responde sin I/O. Pasado el TTL solo se lee
+    updated_at: si no cambió, no se vuelve a validar con Pydantic ni a
+    compilar. Los routers de admin invalidan al escribir; el TTL acota
+    lo que tarda en verse un cambio hecho desde otro worker.
+    """
+
+    def __init__(self, db=None, ttl_seconds: Optional[float] = None):
+        self._db = db
+        self.ttl_seconds = settings.config_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entities: Dict[Tuple[str, str], _Entry] = {}
+        self._views: Dict[Tuple[str, str], _Entry] = {}
+        self.hits = 0
+        self.revalidations = 0
+        self.loads = 0
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else get_database()
+
+    async def _get(self, entries, collection, query: Dict[str, str], build) -> Optional[Any]:
+        key = tuple(query.values())
+        entry = entries.get(key)
+
+        if entry is not None:
+            if time.monotonic() - entry.checked_at < self.ttl_seconds:
+                self.hits += 1
+                return entry.value
+            version_doc = await collection.find_one(query, {"updated_at": 1})
+            if version_doc is not None and version_doc.get("updated_at") == entry.version:
+                entry.checked_at = time.monotonic()
+                self.revalidations += 1
+                return entry.value
+
+        doc = await collection.find_one(query)
+        self.loads += 1
+        if not doc:
+            entries.pop(key, None)
+            return None
+
+        value = build(doc)
+        entries[key] = _Entry(value, doc.get("updated_at"))
+        return value
+
+    async def get_entity_plan(self, business_id: str, entidad: str) -> Optional[EntityPlan]:
+        """Plan compilado de la entidad (None si no existe)"""
+        return await self._get(
+            self._entities,
+            self.db.entities_config,
+            {"business_id": business_id, "entidad": entidad},
+            lambda doc: EntityPlan(EntityConfig(**doc))
+        )
+
+    def plan_for(self, config: EntityConfig) -> EntityPlan:
+        """Plan de una configuración ya obtenida (compila si no viene de la cache)"""
+        entry = self._entities.get((config.business_id, config.entidad))
+        if entry is not None and entry.value.config is config:
+            return entry.value
+        return EntityPlan(config)
+
+    async def get_view_config(self, business_id: str, vista: str) -> Optional[ViewConfig]:
+        """ViewConfig validada (None si no existe)"""
+        return await self._get(
+            self._views,
+            self.db.views_config,
+            {"business_id": business_id, "vista": vista},
+            lambda doc: ViewConfig(**doc)
+        )
+
+    def invalidate_entity(self, business_id: str, entidad: Optional[str] = None):
+        """Descartar una entidad (o todas las del business)"""
+        self._invalidate(self._entities, business_id, entidad)
+
+    def invalidate_view(self, business_id: str, vista: Optional[str] = None):
+        """Descartar una vista (o todas las del business)"""
+        self._invalidate(self._views, business_id, vista)
+
+    @staticmethod
+    def _invalidate(entries: Dict[Tuple[str, str], _Entry], business_id: str, name: Optional[str]):
+        if name is not None:
+            entries.pop((business_id, name), None)
+            return
+        for key in [key for key in entries if key[0] == business_id]:
+            del entries[key]
+
+    def clear(self):
+        self._entities.clear()
+        self._views.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entities": len(self._entities),
+            "views": len(self._views),
+            "hits": self.hits,
+            "revalidations": self.revalidations,
+            "loads": self.loads,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+_config_cache: Optional[ConfigCache] = None
+
+def get_config_cache() -> ConfigCache:
+    global _config_cache
+    if _config_cache is None:
+        _config_cache = ConfigCache()
+    return _config_cache
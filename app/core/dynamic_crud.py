@@ -2,21 +2,35 @@
 # app/core/dynamic_crud.py
 # ================================
 
-from typing import Dict, Any, List, Optional, Type
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple, Type, Union
 from fastapi import HTTPException
+import hashlib
 import logging
+import time
 from datetime import datetime
 
+from bson import ObjectId, json_util
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ..config import settings
 from ..database import get_database
+from .config_cache import get_config_cache
+from .index_manager import get_index_manager
+from .metrics_rollup import EntityRollupDelta, get_metrics_rollup, rollup_projection
+from .realtime_hub import entity_topic, get_realtime_hub
 from ..models.entity import EntityConfig, CampoConfig
 from ..models.user import User
 from ..services.api_service import ApiService
-from ..services.validation_service import ValidationService
-from ..utils.exceptions import EntityNotFoundError, ValidationError, PermissionDeniedError
-from ..utils.helpers import parse_filter_string
+from ..services.cache_service import CacheService, entity_tag
+from ..services.validation_service import EntityValidator, ValidationService
+from ..utils.exceptions import EntityNotFoundError, InvalidCursorError, PermissionDeniedError
+from ..utils.helpers import decode_cursor, encode_cursor, parse_filter_string
 
 logger = logging.getLogger(__name__)
 
+COUNT_STRATEGIES = ("exact", "estimated", "capped", "cached", "facet")
+
 class DynamicCrudGenerator:
     """Generador de operaciones CRUD dinámicas basado en configuración"""
     
@@ -26,16 +40,13 @@ class DynamicCrudGenerator:
         self.validation_service = ValidationService()
     
     async def get_entity_config(self, business_id: str, entity_name: str) -> EntityConfig:
-        """Obtener configuración de entidad"""
-        config_doc = await self.db.entities_config.find_one({
-            "business_id": business_id,
-            "entidad": entity_name
-        })
+        """Obtener configuración de entidad (cacheada y compilada)"""
+        plan = await get_config_cache().get_entity_plan(business_id, entity_name)
         
-        if not config_doc:
+        if plan is None:
             raise EntityNotFoundError(entity_name)
         
-        return EntityConfig(**config_doc)
+        return plan.config
     
     async def list_entities(
         self,
@@ -46,9 +57,17 @@ class DynamicCrudGenerator:
         per_page: int = 10,
         filters: Optional[str] = None,
         sort_by: Optional[str] = None,
-        sort_order: str = "asc"
+        sort_order: str = "asc",
+        pagination: str = "offset",
+        cursor: Optional[str] = None,
+        count_strategy: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Listar entidades con paginación y filtros"""
+        """Listar entidades con paginación y filtros.
+        
+        pagination="cursor" (solo base de datos local) pagina por keyset:
+        devuelve next_cursor en lugar de total y todas las páginas cuestan lo mismo.
+        count_strategy elige cómo se calcula el total (ver COUNT_STRATEGIES).
+        """
         
         config = await self.get_entity_config(business_id, entity_name)
         
@@ -56,11 +75,66 @@ class DynamicCrudGenerator:
         self._check_read_permission(user, config)
         
         # Obtener datos desde API externa si está configurada
-        if hasattr(config.configuracion, 'api_config') and config.configuracion.get('api_config'):
+        if self._uses_api(config):
             return await self._list_from_api(config, page, per_page, filters, sort_by, sort_order, user)
         else:
             # Obtener desde base de datos local
-            return await self._list_from_db(config, page, per_page, filters, sort_by, sort_order, user)
+            if pagination == "cursor" or cursor:
+                return await self._list_from_db_by_cursor(config, per_page, filters, sort_by, sort_order, cursor, user)
+            return await self._list_from_db(
+                config, page, per_page, filters, sort_by, sort_order, user, count_strategy
+            )
+    
+    async def iter_entities(
+        self,
+        business_id: str,
+        entity_name: str,
+        user: User,
+        filters: Optional[Union[str, Dict[str, Any]]] = None,
+        sort_by: Optional[str] = None,
+        sort_order: str = "asc",
+        batch_size: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Recorrer todas las entidades del filtro en lotes (exportaciones).
+        
+        En base de datos local es un único cursor de MongoDB; con API externa
+        se piden páginas hasta alcanzar el total que informa la API o hasta
+        una página vacía (muchas APIs limitan per_page por debajo de
+        batch_size, así que una página incompleta no indica el final). La
+        memoria depende del tamaño del lote, no del total.
+        """
+        
+        config = await self.get_entity_config(business_id, entity_name)
+        self._check_read_permission(user, config)
+        batch_size = batch_size or settings.export_batch_size
+        
+        if self._uses_api(config):
+            page = 1
+            seen = 0
+            while True:
+                items, total = await self._fetch_api_page(config, page, batch_size, filters, sort_by, sort_order, user)
+                if not items:
+                    return
+                yield items
+                seen += len(items)
+                if total is not None and seen >= total:
+                    return
+                page += 1
+        
+        collection = self.db[f"{config.business_id}_{config.entidad}"]
+        cursor = collection.find(self._build_filter_query(filters)).batch_size(batch_size)
+        if sort_by:
+            sort_direction = 1 if sort_order == "asc" else -1
+            cursor = cursor.sort([(sort_by, sort_direction), ("_id", sort_direction)])
+        
+        batch = []
+        async for doc in cursor:
+            batch.append(self._convert_objectid_to_str(doc))
+            if len(batch) >= batch_size:
+                yield self._filter_fields_for_user(batch, config, user)
+                batch = []
+        if batch:
+            yield self._filter_fields_for_user(batch, config, user)
     
     async def get_entity(
         self,
@@ -76,7 +150,7 @@ class DynamicCrudGenerator:
         # Verificar permisos
         self._check_read_permission(user, config)
         
-        if hasattr(config.configuracion, 'api_config') and config.configuracion.get('api_config'):
+        if self._uses_api(config):
             return await self._get_from_api(config, entity_id, user)
         else:
             return await self._get_from_db(config, entity_id, user)
@@ -98,7 +172,7 @@ class DynamicCrudGenerator:
         # Validar datos
         validated_data = await self._validate_entity_data(config, data, is_create=True)
         
-        if hasattr(config.configuracion, 'api_config') and config.configuracion.get('api_config'):
+        if self._uses_api(config):
             return await self._create_in_api(config, validated_data, user)
         else:
             return await self._create_in_db(config, validated_data, user)
@@ -121,7 +195,7 @@ class DynamicCrudGenerator:
         # Validar datos
         validated_data = await self._validate_entity_data(config, data, is_create=False)
         
-        if hasattr(config.configuracion, 'api_config') and config.configuracion.get('api_config'):
+        if self._uses_api(config):
             return await self._update_in_api(config, entity_id, validated_data, user)
         else:
             return await self._update_in_db(config, entity_id, validated_data, user)
@@ -140,11 +214,137 @@ class DynamicCrudGenerator:
         # Verificar permisos de eliminación
         self._check_delete_permission(user, config)
         
-        if hasattr(config.configuracion, 'api_config') and config.configuracion.get('api_config'):
+        if self._uses_api(config):
             return await self._delete_in_api(config, entity_id, user)
         else:
             return await self._delete_in_db(config, entity_id, user)
     
+    async def bulk_create_entities(
+        self,
+        business_id: str,
+        entity_name: str,
+        items: List[Dict[str, Any]],
+        user: User,
+        validate_all: bool = True,
+        continue_on_error: bool = False
+    ) -> Dict[str, Any]:
+        """Crear muchas entidades: una configuración, una pasada de validación e insert_many por lotes.
+        
+        validate_all: si algún item no valida (y no continue_on_error) no se crea ninguno.
+        continue_on_error: inserta sin orden y reporta el error de cada item; si no,
+        se detiene en el primer fallo igual que creando item a item.
+        """
+        
+        config = await self.get_entity_config(business_id, entity_name)
+        self._check_create_permission(user, config)
+        
+        validate = self._entity_validator(config).validate
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        errors: List[Dict[str, Any]] = []
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, validate(item, True)))
+            except Exception as e:
+                errors.append({"index": index, "success": False, "error": str(e), "data": item})
+                if not validate_all and not continue_on_error:
+                    break
+        
+        if errors and validate_all and not continue_on_error:
+            return {
+                "created": 0,
+                "failed": len(errors),
+                "results": [],
+                "errors": errors,
+                "validation_failed": True,
+                "total_processed": 0
+            }
+        
+        if self._uses_api(config):
+            results, write_errors = await self._bulk_create_in_api(config, valid, user, continue_on_error)
+        else:
+            results, write_errors = await self._bulk_create_in_db(config, valid, user, continue_on_error)
+        
+        errors = sorted(errors + write_errors, key=lambda error: error["index"])
+        return {
+            "created": len(results),
+            "failed": len(errors),
+            "results": results,
+            "errors": errors,
+            "total_processed": len(results) + len(errors)
+        }
+    
+    async def bulk_update_entities(
+        self,
+        business_id: str,
+        entity_name: str,
+        updates: List[Dict[str, Any]],
+        user: User
+    ) -> Dict[str, Any]:
+        """Actualizar muchas entidades (cada item con su `id`) con bulk_write por lotes"""
+        
+        config = await self.get_entity_config(business_id, entity_name)
+        self._check_update_permission(user, config)
+        
+        validate = self._entity_validator(config).validate
+        valid: List[Tuple[int, str, Dict[str, Any]]] = []
+        errors: List[Dict[str, Any]] = []
+        for index, update in enumerate(updates):
+            if "id" not in update:
+                errors.append({"index": index, "success": False, "error": "Campo 'id' requerido", "data": update})
+                continue
+            
+            entity_id = str(update["id"])
+            data = {key: value for key, value in update.items() if key != "id"}
+            try:
+                valid.append((index, entity_id, validate(data, False)))
+            except Exception as e:
+                errors.append({"index": index, "id": entity_id, "success": False, "error": str(e), "data": data})
+        
+        if self._uses_api(config):
+            # Datos ya validados: directo a la API sin volver a validar
+            results, write_errors = await self._bulk_each(
+                valid, lambda entity_id, data: self._update_in_api(config, entity_id, data, user)
+            )
+        else:
+            results, write_errors = await self._bulk_update_in_db(config, valid, user)
+        
+        errors = sorted(errors + write_errors, key=lambda error: error["index"])
+        return {
+            "updated": len(results),
+            "failed": len(errors),
+            "results": results,
+            "errors": errors
+        }
+    
+    async def bulk_delete_entities(
+        self,
+        business_id: str,
+        entity_name: str,
+        entity_ids: List[str],
+        user: User
+    ) -> Dict[str, Any]:
+        """Eliminar muchas entidades con un delete_many por lote"""
+        
+        config = await self.get_entity_config(business_id, entity_name)
+        self._check_delete_permission(user, config)
+        
+        if self._uses_api(config):
+            results, errors = await self._bulk_each(
+                [(index, entity_id, None) for index, entity_id in enumerate(entity_ids)],
+                lambda entity_id, _: self._delete_in_api(config, entity_id, user)
+            )
+            results = [{"id": result["id"], "success": True} for result in results]
+            errors = [{"id": error["id"], "success": False, "error": error["error"]} for error in errors]
+        else:
+            results, errors = await self._bulk_delete_in_db(config, entity_ids)
+        
+        return {
+            "deleted": len(results),
+            "failed": len(errors),
+            "results": results,
+            "errors": errors
+        }
+    
     # === MÉTODOS PARA API EXTERNA ===
     
     async def _list_from_api(
@@ -159,6 +359,26 @@ class DynamicCrudGenerator:
     ) -> Dict[str, Any]:
         """Listar desde API externa"""
         
+        items, total = await self._fetch_api_page(config, page, per_page, filters, sort_by, sort_order, user)
+        return {
+            "items": items,
+            "page": page,
+            "per_page": per_page,
+            "total": total if total is not None else len(items)
+        }
+    
+    async def _fetch_api_page(
+        self,
+        config: EntityConfig,
+        page: int,
+        per_page: int,
+        filters: Optional[str],
+        sort_by: Optional[str],
+        sort_order: str,
+        user: User
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Una página de la API externa: (items visibles, total informado por la API o None)"""
+        
         api_config = config.configuracion.get('api_config')
         if not api_config:
             raise ValueError("Configuración de API no encontrada")
@@ -189,17 +409,13 @@ class DynamicCrudGenerator:
         )
         
         # Mapear datos según configuración
-        mapped_data = self._map_api_response(response, api_config.get('mapeo', {}))
+        mapped_data = self._map_api_response(response, get_config_cache().plan_for(config).mapeo)
         
         # Filtrar campos según permisos del usuario
         filtered_data = self._filter_fields_for_user(mapped_data, config, user)
         
-        return {
-            "items": filtered_data,
-            "page": page,
-            "per_page": per_page,
-            "total": response.get("total", len(filtered_data))
-        }
+        total = response.get("total") if isinstance(response, dict) else None
+        return filtered_data, total if isinstance(total, int) else None
     
     async def _create_in_api(
         self,
@@ -215,8 +431,10 @@ class DynamicCrudGenerator:
         if not crud_config.get('crear', {}).get('habilitado', False):
             raise PermissionDeniedError("Creación no permitida para esta entidad")
         
+        plan = get_config_cache().plan_for(config)
+        
         # Mapear datos al formato de la API
-        mapped_data = self._map_data_for_api(data, api_config.get('mapeo', {}))
+        mapped_data = self._map_data_for_api(data, plan.reverse_mapeo)
         
         # Realizar petición de creación
         endpoint = crud_config['crear'].get('endpoint', api_config['endpoint'])
@@ -230,7 +448,84 @@ class DynamicCrudGenerator:
             use_cache=False
         )
         
-        return self._map_api_response(response, api_config.get('mapeo', {}))
+        return self._map_api_response(response, plan.mapeo)
+    
+    async def _get_from_api(
+        self,
+        config: EntityConfig,
+        entity_id: str,
+        user: User
+    ) -> Dict[str, Any]:
+        """Obtener un item de la API externa ({endpoint}/{id})"""
+        
+        api_config = config.configuracion.get('api_config')
+        response = await self.api_service.make_request(
+            config.business_id,
+            api_config['fuente'],
+            f"{api_config['endpoint'].rstrip('/')}/{entity_id}",
+            method="GET"
+        )
+        
+        items = self._map_api_response(response, get_config_cache().plan_for(config).mapeo)
+        if isinstance(items, dict):
+            # Sin mapeo la respuesta vuelve tal cual
+            items = [items]
+        if not items:
+            raise EntityNotFoundError(f"{config.entidad}/{entity_id}")
+        return self._filter_fields_for_user(items, config, user)[0]
+    
+    async def _update_in_api(
+        self,
+        config: EntityConfig,
+        entity_id: str,
+        data: Dict[str, Any],
+        user: User
+    ) -> Dict[str, Any]:
+        """Actualizar en API externa"""
+        
+        api_config = config.configuracion.get('api_config')
+        crud_config = config.configuracion.get('crud_config', {})
+        
+        if not crud_config.get('editar', {}).get('habilitado', False):
+            raise PermissionDeniedError("Edición no permitida para esta entidad")
+        
+        plan = get_config_cache().plan_for(config)
+        endpoint = crud_config['editar'].get('endpoint') or api_config['endpoint']
+        
+        response = await self.api_service.make_request(
+            config.business_id,
+            api_config['fuente'],
+            f"{endpoint.rstrip('/')}/{entity_id}",
+            method="PUT",
+            data=self._map_data_for_api(data, plan.reverse_mapeo),
+            use_cache=False
+        )
+        
+        return self._map_api_response(response, plan.mapeo)
+    
+    async def _delete_in_api(
+        self,
+        config: EntityConfig,
+        entity_id: str,
+        user: User
+    ) -> bool:
+        """Eliminar en API externa"""
+        
+        api_config = config.configuracion.get('api_config')
+        crud_config = config.configuracion.get('crud_config', {})
+        
+        if not crud_config.get('eliminar', {}).get('habilitado', False):
+            raise PermissionDeniedError("Eliminación no permitida para esta entidad")
+        
+        endpoint = crud_config['eliminar'].get('endpoint') or api_config['endpoint']
+        await self.api_service.make_request(
+            config.business_id,
+            api_config['fuente'],
+            f"{endpoint.rstrip('/')}/{entity_id}",
+            method="DELETE",
+            use_cache=False
+        )
+        return True
     
     # === MÉTODOS PARA BASE DE DATOS LOCAL ===
     
@@ -242,40 +537,56 @@ class DynamicCrudGenerator:
         filters: Optional[str],
         sort_by: Optional[str],
         sort_order: str,
-        user: User
+        user: User,
+        count_strategy: Optional[str] = None
     ) -> Dict[str, Any]:
         """Listar desde base de datos local"""
         
         collection = self.db[f"{config.business_id}_{config.entidad}"]
+        strategy = count_strategy or settings.count_default_strategy
+        if strategy not in COUNT_STRATEGIES:
+            raise ValueError(f"Estrategia de conteo no soportada: {strategy}")
         
-        # Construir filtro
-        filter_query = {}
-        if filters:
-            filter_query.update(parse_filter_string(filters))
-        
-        # Contar total
-        total = await collection.count_documents(filter_query)
+        filter_query = self._build_filter_query(filters)
+        start = time.perf_counter()
         
-        # Construir pipeline de agregación
-        pipeline = [{"$match": filter_query}]
+        # Stages de la página
+        page_stages = []
         
         # Ordenamiento
         if sort_by:
             sort_direction = 1 if sort_order == "asc" else -1
-            pipeline.append({"$sort": {sort_by: sort_direction}})
+            page_stages.append({"$sort": {sort_by: sort_direction}})
         
         # Paginación
         skip = (page - 1) * per_page
-        pipeline.extend([
+        page_stages.extend([
             {"$skip": skip},
             {"$limit": per_page}
         ])
         
-        # Ejecutar consulta
-        cursor = collection.aggregate(pipeline)
-        items = []
-        async for doc in cursor:
-            items.append(self._convert_objectid_to_str(doc))
+        if strategy == "facet":
+            # Página y total en un solo round trip
+            pipeline = [
+                {"$match": filter_query},
+                {"$facet": {"items": page_stages, "total": [{"$count": "n"}]}}
+            ]
+            result = await collection.aggregate(pipeline).to_list(1)
+            facet = result[0] if result else {"items": [], "total": []}
+            docs = facet["items"]
+            count_info = {
+                "total": facet["total"][0]["n"] if facet["total"] else 0,
+                "count_strategy": "facet",
+                "total_capped": False
+            }
+        else:
+            count_info = await self._count_documents(collection, config, filter_query, strategy)
+            docs = await collection.aggregate([{"$match": filter_query}, *page_stages]).to_list(per_page)
+        
+        # Las consultas lentas alimentan los índices aprendidos
+        get_index_manager().record_query(config, filter_query, sort_by, (time.perf_counter() - start) * 1000)
+        
+        items = [self._convert_objectid_to_str(doc) for doc in docs]
         
         # Filtrar campos según permisos
         filtered_items = self._filter_fields_for_user(items, config, user)
@@ -284,9 +595,144 @@ class DynamicCrudGenerator:
             "items": filtered_items,
             "page": page,
             "per_page": per_page,
-            "total": total
+            **count_info
         }
     
+    async def _count_documents(
+        self,
+        collection,
+        config: EntityConfig,
+        filter_query: Dict[str, Any],
+        strategy: str
+    ) -> Dict[str, Any]:
+        """Total del listado según la estrategia; indica cuál se usó realmente"""
+        
+        # Sin filtro el total sale de los metadatos de la colección (sin escanear)
+        if strategy == "estimated":
+            if not filter_query:
+                total = await collection.estimated_document_count()
+                return {"total": total, "count_strategy": "estimated", "total_capped": False}
+            strategy = "capped"
+        
+        if strategy == "capped":
+            # Contar como mucho count_cap + 1 documentos ("1000+")
+            counted = await collection.count_documents(filter_query, limit=settings.count_cap + 1)
+            capped = counted > settings.count_cap
+            return {
+                "total": settings.count_cap if capped else counted,
+                "count_strategy": "capped",
+                "total_capped": capped
+            }
+        
+        if strategy == "cached":
+            filter_hash = hashlib.sha1(
+                json_util.dumps(filter_query, sort_keys=True).encode()
+            ).hexdigest()[:16]
+            total = await CacheService().get_or_compute(
+                f"count:{config.business_id}:{config.entidad}:{filter_hash}",
+                lambda: collection.count_documents(filter_query),
+                ttl=settings.count_cache_ttl_seconds,
+                tags=[entity_tag(config.business_id, config.entidad)]
+            )
+            return {"total": total, "count_strategy": "cached", "total_capped": False}
+        
+        total = await collection.count_documents(filter_query)
+        return {"total": total, "count_strategy": "exact", "total_capped": False}
+    
+    async def _list_from_db_by_cursor(
+        self,
+        config: EntityConfig,
+        per_page: int,
+        filters: Optional[str],
+        sort_by: Optional[str],
+        sort_order: str,
+        cursor: Optional[str],
+        user: User
+    ) -> Dict[str, Any]:
+        """Listar desde base de datos local con paginación keyset (sin $skip ni count)"""
+        
+        collection = self.db[f"{config.business_id}_{config.entidad}"]
+        sort_field = sort_by or "_id"
+        sort_direction = 1 if sort_order == "asc" else -1
+        
+        filter_query = self._build_filter_query(filters)
+        if cursor:
+            position = self._decode_position(cursor, sort_field, sort_order)
+            filter_query = {"$and": [filter_query, self._keyset_filter(sort_field, sort_direction, position)]}
+        
+        # _id desempata valores repetidos del campo de orden
+        sort_spec = [(sort_field, sort_direction)]
+        if sort_field != "_id":
+            sort_spec.append(("_id", sort_direction))
+        
+        # Un documento extra indica si hay página siguiente
+        start = time.perf_counter()
+        docs = await collection.find(filter_query).sort(sort_spec).limit(per_page + 1).to_list(per_page + 1)
+        get_index_manager().record_query(
+            config, self._build_filter_query(filters), sort_by, (time.perf_counter() - start) * 1000
+        )
+        has_more = len(docs) > per_page
+        docs = docs[:per_page]
+        
+        next_cursor = None
+        if has_more:
+            last = docs[-1]
+            next_cursor = encode_cursor({
+                "s": sort_field,
+                "o": sort_order,
+                "v": last.get(sort_field),
+                "id": last["_id"]
+            })
+        
+        items = [self._convert_objectid_to_str(doc) for doc in docs]
+        
+        return {
+            "items": self._filter_fields_for_user(items, config, user),
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
+    
+    def _build_filter_query(self, filters: Optional[Union[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Filtro de MongoDB desde query string o dict (JSON)"""
+        if not filters:
+            return {}
+        if isinstance(filters, dict):
+            return dict(filters)
+        return parse_filter_string(filters)
+    
+    def _decode_position(self, cursor: str, sort_field: str, sort_order: str) -> Dict[str, Any]:
+        """Posición del cursor; debe corresponder al mismo orden de la consulta"""
+        try:
+            position = decode_cursor(cursor)
+        except ValueError:
+            raise InvalidCursorError()
+        if position.get("s") != sort_field or position.get("o") != sort_order or "id" not in position:
+            raise InvalidCursorError()
+        return position
+    
+    def _keyset_filter(self, sort_field: str, sort_direction: int, position: Dict[str, Any]) -> Dict[str, Any]:
+        """Documentos posteriores a la posición del cursor en el orden (sort_field, _id)"""
+        after = "$gt" if sort_direction == 1 else "$lt"
+        last_id = position["id"]
+        
+        if sort_field == "_id":
+            return {"_id": {after: last_id}}
+        
+        last_value = position.get("v")
+        same_value = {sort_field: last_value, "_id": {after: last_id}}
+        
+        # null/ausente ordena antes que cualquier valor: $gt/$lt no lo comparan
+        if last_value is None:
+            if sort_direction == 1:
+                return {"$or": [{sort_field: {"$ne": None}}, same_value]}
+            return same_value
+        
+        branches = [{sort_field: {after: last_value}}, same_value]
+        if sort_direction == -1:
+            branches.append({sort_field: None})
+        return {"$or": branches}
+    
     async def _create_in_db(
         self,
         config: EntityConfig,
@@ -309,10 +755,270 @@ class DynamicCrudGenerator:
         result = await collection.insert_one(data)
         data["_id"] = result.inserted_id
         
+        # Totales cacheados y datos de la entidad quedan obsoletos
+        await CacheService().invalidate_tags(entity_tag(config.business_id, config.entidad))
+        await get_metrics_rollup().entity_created(config, [data])
+        get_realtime_hub().notify(config.business_id, entity_topic(config.entidad))
+        
         return self._convert_objectid_to_str(data)
     
+    async def _get_from_db(
+        self,
+        config: EntityConfig,
+        entity_id: str,
+        user: User
+    ) -> Dict[str, Any]:
+        """Obtener de base de datos local"""
+        
+        collection = self.db[f"{config.business_id}_{config.entidad}"]
+        doc = await collection.find_one({"_id": self._entity_object_id(entity_id)})
+        if doc is None:
+            raise EntityNotFoundError(f"{config.entidad}/{entity_id}")
+        
+        return self._filter_fields_for_user([self._convert_objectid_to_str(doc)], config, user)[0]
+    
+    async def _update_in_db(
+        self,
+        config: EntityConfig,
+        entity_id: str,
+        data: Dict[str, Any],
+        user: User
+    ) -> Dict[str, Any]:
+        """Actualizar en base de datos local"""
+        
+        collection = self.db[f"{config.business_id}_{config.entidad}"]
+        changes = {**data, "updated_at": datetime.utcnow(), "updated_by": str(user.id)}
+        
+        # Documento anterior: los rollups descuentan sus valores
+        before = await collection.find_one_and_update(
+            {"_id": self._entity_object_id(entity_id)},
+            {"$set": changes},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            raise EntityNotFoundError(f"{config.entidad}/{entity_id}")
+        doc = {**before, **changes}
+        
+        await CacheService().invalidate_tags(entity_tag(config.business_id, config.entidad))
+        await get_metrics_rollup().entity_updated(config, [(before, doc)])
+        get_realtime_hub().notify(config.business_id, entity_topic(config.entidad))
+        
+        return self._convert_objectid_to_str(doc)
+    
+    async def _delete_in_db(
+        self,
+        config: EntityConfig,
+        entity_id: str,
+        user: User
+    ) -> bool:
+        """Eliminar en base de datos local"""
+        
+        collection = self.db[f"{config.business_id}_{config.entidad}"]
+        
+        doc = await collection.find_one_and_delete(
+            {"_id": self._entity_object_id(entity_id)},
+            projection=rollup_projection(config)
+        )
+        if doc is None:
+            raise EntityNotFoundError(f"{config.entidad}/{entity_id}")
+        
+        await CacheService().invalidate_tags(entity_tag(config.business_id, config.entidad))
+        await get_metrics_rollup().entity_deleted(config, [doc])
+        get_realtime_hub().notify(config.business_id, entity_topic(config.entidad))
+        
+        return True
+    
+    async def _bulk_create_in_db(
+        self,
+        config: EntityConfig,
+        valid: List[Tuple[int, Dict[str, Any]]],
+        user: User,
+        continue_on_error: bool
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """insert_many por lotes; los errores de escritura se asignan al índice original"""
+        
+        collection = self.db[f"{config.business_id}_{config.entidad}"]
+        now = datetime.utcnow()
+        user_id = str(user.id)
+        results: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        rollup = EntityRollupDelta(config)
+        
+        for chunk in self._bulk_chunks(valid):
+            docs = [
+                {**data, "created_at": now, "created_by": user_id, "updated_at": now, "updated_by": user_id}
+                for _, data in chunk
+            ]
+            failed: Dict[int, str] = {}
+            try:
+                await collection.insert_many(docs, ordered=not continue_on_error)
+            except BulkWriteError as e:
+                failed = self._bulk_write_errors(e)
+            
+            # Con ordered=True MongoDB no intenta nada después del primer fallo
+            stop_at = min(failed) if failed and not continue_on_error else None
+            for position, (index, data) in enumerate(chunk):
+                if stop_at is not None and position > stop_at:
+                    break
+                if position in failed:
+                    errors.append({"index": index, "success": False, "error": failed[position], "data": data})
+                else:
+                    results.append({"index": index, "success": True, "id": str(docs[position]["_id"])})
+                    rollup.created(docs[position])
+            if stop_at is not None:
+                break
+        
+        if results:
+            await CacheService().invalidate_tags(entity_tag(config.business_id, config.entidad))
+            await get_metrics_rollup().apply(rollup)
+            get_realtime_hub().notify(config.business_id, entity_topic(config.entidad))
+        return results, errors
+    
+    async def _bulk_create_in_api(
+        self,
+        config: EntityConfig,
+        valid: List[Tuple[int, Dict[str, Any]]],
+        user: User,
+        continue_on_error: bool
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """La API externa no tiene creación bulk: un request por item"""
+        results: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        for index, data in valid:
+            try:
+                result = await self._create_in_api(config, data, user)
+                results.append({"index": index, "success": True, "data": result})
+            except Exception as e:
+                errors.append({"index": index, "success": False, "error": str(e), "data": data})
+                if not continue_on_error:
+                    break
+        return results, errors
+    
+    async def _bulk_update_in_db(
+        self,
+        config: EntityConfig,
+        valid: List[Tuple[int, str, Dict[str, Any]]],
+        user: User
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """bulk_write de UpdateOne por lotes; un find por lote detecta los ids inexistentes"""
+        
+        collection = self.db[f"{config.business_id}_{config.entidad}"]
+        now = datetime.utcnow()
+        user_id = str(user.id)
+        results: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        rollup_changes: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        
+        for chunk in self._bulk_chunks(valid):
+            existing = await self._existing_docs(collection, [entity_id for _, entity_id, _ in chunk], config)
+            operations = []
+            pending = []
+            for index, entity_id, data in chunk:
+                object_id = self._entity_object_id(entity_id)
+                if object_id not in existing:
+                    errors.append({"index": index, "id": entity_id, "success": False, "error": "No encontrado", "data": data})
+                    continue
+                operations.append(UpdateOne(
+                    {"_id": object_id},
+                    {"$set": {**data, "updated_at": now, "updated_by": user_id}}
+                ))
+                pending.append((index, entity_id, data))
+            
+            if not operations:
+                continue
+            failed: Dict[int, str] = {}
+            try:
+                await collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                failed = self._bulk_write_errors(e)
+            
+            for position, (index, entity_id, data) in enumerate(pending):
+                if position in failed:
+                    errors.append({"index": index, "id": entity_id, "success": False, "error": failed[position], "data": data})
+                else:
+                    results.append({"index": index, "id": entity_id, "success": True})
+                    before = existing[self._entity_object_id(entity_id)]
+                    rollup_changes.append((before, {**before, **data}))
+        
+        if results:
+            await CacheService().invalidate_tags(entity_tag(config.business_id, config.entidad))
+            await get_metrics_rollup().entity_updated(config, rollup_changes)
+            get_realtime_hub().notify(config.business_id, entity_topic(config.entidad))
+        return results, errors
+    
+    async def _bulk_delete_in_db(
+        self,
+        config: EntityConfig,
+        entity_ids: List[str]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """delete_many por lotes de ids; los que no existen se reportan como error"""
+        
+        collection = self.db[f"{config.business_id}_{config.entidad}"]
+        results: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        deleted: List[Dict[str, Any]] = []
+        
+        for chunk in self._bulk_chunks(entity_ids):
+            existing = await self._existing_docs(collection, chunk, config)
+            if existing:
+                await collection.delete_many({"_id": {"$in": list(existing)}})
+                deleted.extend(existing.values())
+            for entity_id in chunk:
+                if self._entity_object_id(entity_id) in existing:
+                    results.append({"id": entity_id, "success": True})
+                else:
+                    errors.append({"id": entity_id, "success": False, "error": "No encontrado"})
+        
+        if results:
+            await CacheService().invalidate_tags(entity_tag(config.business_id, config.entidad))
+            await get_metrics_rollup().entity_deleted(config, deleted)
+            get_realtime_hub().notify(config.business_id, entity_topic(config.entidad))
+        return results, errors
+    
+    async def _bulk_each(self, items: List[Tuple[int, str, Any]], operation) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Aplicar operation(entity_id, data) item a item (fuentes sin operaciones bulk)"""
+        results: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        for index, entity_id, data in items:
+            try:
+                await operation(entity_id, data)
+                results.append({"index": index, "id": entity_id, "success": True})
+            except Exception as e:
+                errors.append({"index": index, "id": entity_id, "success": False, "error": str(e), "data": data})
+        return results, errors
+    
+    def _bulk_chunks(self, items: List[Any]):
+        size = max(settings.bulk_write_batch_size, 1)
+        for start in range(0, len(items), size):
+            yield items[start:start + size]
+    
+    async def _existing_docs(self, collection, entity_ids: List[str], config: EntityConfig) -> Dict[Any, Dict[str, Any]]:
+        """_id -> campos de rollup de los documentos que existen (para descontarlos de los rollups)"""
+        object_ids = [self._entity_object_id(entity_id) for entity_id in entity_ids]
+        docs = await collection.find({"_id": {"$in": object_ids}}, rollup_projection(config)).to_list(None)
+        return {doc["_id"]: doc for doc in docs}
+    
+    def _entity_object_id(self, entity_id: str) -> Union[ObjectId, str]:
+        """Los documentos creados aquí usan ObjectId; ids no válidos se buscan tal cual"""
+        return ObjectId(entity_id) if ObjectId.is_valid(entity_id) else entity_id
+    
+    def _bulk_write_errors(self, error: BulkWriteError) -> Dict[int, str]:
+        """Posición en el lote -> mensaje de cada writeError"""
+        failed = {}
+        for write_error in error.details.get("writeErrors", []):
+            if write_error.get("code") == 11000:
+                message = f"Valor duplicado: {write_error.get('keyValue') or write_error.get('errmsg')}"
+            else:
+                message = write_error.get("errmsg", "Error de escritura")
+            failed[write_error["index"]] = message
+        return failed
+    
     # === MÉTODOS DE UTILIDAD ===
     
+    def _uses_api(self, config: EntityConfig) -> bool:
+        """Los datos de la entidad viven en una API externa (configuracion.api_config)"""
+        return bool(config.configuracion.get('api_config'))
+    
     def _check_read_permission(self, user: User, config: EntityConfig):
         """Verificar permisos de lectura"""
         if user.rol in ["super_admin", "admin"]:
@@ -363,28 +1069,11 @@ class DynamicCrudGenerator:
         is_create: bool = True
     ) -> Dict[str, Any]:
         """Validar datos de entidad según configuración"""
-        
-        campos = config.configuracion.get('campos', [])
-        validated_data = {}
-        
-        for campo_config in campos:
-            campo_name = campo_config['campo']
-            campo_value = data.get(campo_name)
-            
-            # Verificar campos obligatorios
-            if campo_config.get('obligatorio', False) and is_create:
-                if campo_value is None or campo_value == "":
-                    raise ValidationError(campo_name, "Campo obligatorio")
-            
-            # Validar solo si el campo está presente
-            if campo_value is not None:
-                validated_value = await self.validation_service.validate_field(
-                    campo_value,
-                    campo_config
-                )
-                validated_data[campo_name] = validated_value
-        
-        return validated_data
+        return self._entity_validator(config).validate(data, is_create)
+    
+    def _entity_validator(self, config: EntityConfig) -> EntityValidator:
+        """Validador compilado de la entidad (cacheado junto con su configuración)"""
+        return get_config_cache().plan_for(config).entity_validator
     
     def _map_api_response(self, response: Dict[str, Any], mapeo: Dict[str, str]) -> List[Dict[str, Any]]:
         """Mapear respuesta de API según configuración"""
@@ -411,11 +1100,11 @@ class DynamicCrudGenerator:
     
     def _map_single_item(self, item: Dict[str, Any], mapeo: Dict[str, str]) -> Dict[str, Any]:
         """Mapear un solo item según configuración de mapeo"""
-        mapped_item = {}
-        
-        for api_field, entity_field in mapeo.items():
-            if api_field in item:
-                mapped_item[entity_field] = item[api_field]
+        mapped_item = {
+            entity_field: item[api_field]
+            for api_field, entity_field in mapeo.items()
+            if api_field in item
+        }
         
         # Conservar campos no mapeados
         for key, value in item.items():
@@ -424,20 +1113,15 @@ class DynamicCrudGenerator:
         
         return mapped_item
     
-    def _map_data_for_api(self, data: Dict[str, Any], mapeo: Dict[str, str]) -> Dict[str, Any]:
-        """Mapear datos para envío a API (reverso del mapeo)"""
-        if not mapeo:
+    def _map_data_for_api(self, data: Dict[str, Any], reverse_mapeo: Dict[str, str]) -> Dict[str, Any]:
+        """Mapear datos para envío a API con el mapeo inverso precompilado"""
+        if not reverse_mapeo:
             return data
         
-        # Crear mapeo inverso
-        reverse_mapeo = {v: k for k, v in mapeo.items()}
-        
-        mapped_data = {}
-        for entity_field, value in data.items():
-            api_field = reverse_mapeo.get(entity_field, entity_field)
-            mapped_data[api_field] = value
-        
-        return mapped_data
+        return {
+            reverse_mapeo.get(entity_field, entity_field): value
+            for entity_field, value in data.items()
+        }
     
     def _filter_fields_for_user(
         self,
@@ -447,13 +1131,7 @@ class DynamicCrudGenerator:
     ) -> List[Dict[str, Any]]:
         """Filtrar campos según permisos del usuario"""
         
-        campos = config.configuracion.get('campos', [])
-        visible_fields = []
-        
-        for campo_config in campos:
-            visible_roles = campo_config.get('visible_roles', ['*'])
-            if '*' in visible_roles or user.rol in visible_roles:
-                visible_fields.append(campo_config['campo'])
+        visible_fields = get_config_cache().plan_for(config).visible_fields(user.rol)
         
         # Si no hay configuración de campos, mostrar todos
         if not visible_fields:
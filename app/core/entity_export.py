@@ -0,0 +1,268 @@
+# ================================
+# app/core/entity_export.py - Exportación en streaming (CSV, NDJSON, XLSX)
+# ================================
+
+import csv
+import io
+import json
+import logging
+import math
+import re
+import zipfile
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+from xml.sax.saxutils import escape
+
+from fastapi.responses import StreamingResponse
+
+from ..models.entity import EntityConfig
+from ..models.user import User
+from .config_cache import get_config_cache
+from .dynamic_crud import DynamicCrudGenerator
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+def export_columns(config: EntityConfig, user: User) -> List[str]:
+    """Columnas desde los `campos` de la entidad visibles para el rol (vacío si no define campos)"""
+    fields = get_config_cache().plan_for(config).visible_fields(user.rol)
+    if not fields:
+        return []
+    return ["_id", *[field for field in fields if field != "_id"]]
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _text(value: Any) -> str:
+    """Valor de celda como texto (mismo criterio en CSV y XLSX)"""
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+class _CsvEncoder:
+    def __init__(self, columns: List[str], sheet_name: str):
+        self.columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data.encode("utf-8")
+
+    def header(self) -> bytes:
+        self._writer.writerow(self.columns)
+        return self._drain()
+
+    def rows(self, items: List[Dict[str, Any]]) -> bytes:
+        self._writer.writerows([_text(item.get(column)) for column in self.columns] for item in items)
+        return self._drain()
+
+    def footer(self) -> bytes:
+        return b""
+
+class _NdjsonEncoder:
+    def __init__(self, columns: List[str], sheet_name: str):
+        self.columns = columns
+
+    def header(self) -> bytes:
+        return b""
+
+    def rows(self, items: List[Dict[str, Any]]) -> bytes:
+        return "".join(
+            json.dumps({column: item.get(column) for column in self.columns}, default=_json_default, ensure_ascii=False) + "\n"
+            for item in items
+        ).encode("utf-8")
+
+    def footer(self) -> bytes:
+        return b""
+
+class _ChunkSink:
+    """Destino no seekable para zipfile: acumula lo escrito hasta que se drena"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+# Caracteres que XML 1.0 no admite ni escapados
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+_XLSX_MAX_CELL_CHARS = 32767
+_XML_ATTR_ENTITIES = {'"': "&quot;"}
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+class _XlsxEncoder:
+    """XLSX de una hoja escrito en streaming.
+
+    zipfile escribe en un destino no seekable usando data descriptors, así
+    que cada lote se comprime y se entrega sin guardar el archivo completo.
+    Las celdas de texto van como inlineStr: no hace falta una tabla de
+    shared strings que crecería con el número de filas.
+    """
+
+    def __init__(self, columns: List[str], sheet_name: str):
+        self.columns = columns
+        self.sheet_name = _INVALID_SHEET_CHARS.sub("_", sheet_name)[:31] or "Datos"
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheet = None
+        self._row = 0
+
+    @staticmethod
+    def _cell(value: Any) -> str:
+        if isinstance(value, bool):
+            return f'<c t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, int) or (isinstance(value, float) and math.isfinite(value)):
+            return f'<c t="n"><v>{value}</v></c>'
+        text = _INVALID_XML_CHARS.sub("", _text(value))[:_XLSX_MAX_CELL_CHARS]
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+    def _write_row(self, values: List[Any]):
+        self._row += 1
+        cells = "".join(self._cell(value) for value in values)
+        self._sheet.write(f'<row r="{self._row}">{cells}</row>'.encode("utf-8"))
+
+    def header(self) -> bytes:
+        self._zip.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        self._zip.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(self.sheet_name, _XML_ATTR_ENTITIES)}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        )
+        self._zip.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self._write_row(self.columns)
+        return self._sink.drain()
+
+    def rows(self, items: List[Dict[str, Any]]) -> bytes:
+        for item in items:
+            self._write_row([item.get(column) for column in self.columns])
+        return self._sink.drain()
+
+    def footer(self) -> bytes:
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+        return self._sink.drain()
+
+_ENCODERS = {
+    "csv": _CsvEncoder,
+    "ndjson": _NdjsonEncoder,
+    "xlsx": _XlsxEncoder
+}
+
+async def stream_export(
+    batches: AsyncIterator[List[Dict[str, Any]]],
+    columns: List[str],
+    format: str,
+    sheet_name: str = "Datos"
+) -> AsyncIterator[bytes]:
+    """Codificar los lotes a medida que llegan.
+
+    Sin columnas configuradas se usan las claves del primer lote.
+    """
+    encoder = None
+    try:
+        async for items in batches:
+            if encoder is None:
+                encoder = _ENCODERS[format](columns or list(items[0].keys()), sheet_name)
+                yield encoder.header()
+            chunk = encoder.rows(items)
+            if chunk:
+                yield chunk
+    except Exception as e:
+        # Los headers ya se enviaron: solo queda cortar la respuesta
+        logger.error(f"Error exportando {sheet_name} a {format}: {e}")
+        raise
+
+    if encoder is None:
+        encoder = _ENCODERS[format](columns, sheet_name)
+        yield encoder.header()
+    footer = encoder.footer()
+    if footer:
+        yield footer
+
+async def export_entities(
+    business_id: str,
+    entity_name: str,
+    user: User,
+    format: str,
+    filters: Optional[Union[str, Dict[str, Any]]] = None,
+    sort_by: Optional[str] = None,
+    sort_order: str = "asc",
+    crud_generator: Optional[DynamicCrudGenerator] = None
+) -> StreamingResponse:
+    """StreamingResponse con todas las entidades del filtro en CSV, NDJSON o XLSX"""
+    if format not in _ENCODERS:
+        raise ValueError(f"Formato de exportación no soportado: {format}")
+
+    crud_generator = crud_generator or DynamicCrudGenerator()
+
+    # Entidad inexistente o sin permisos falla antes de empezar a enviar
+    config = await crud_generator.get_entity_config(business_id, entity_name)
+    crud_generator._check_read_permission(user, config)
+
+    batches = crud_generator.iter_entities(business_id, entity_name, user, filters, sort_by, sort_order)
+    return StreamingResponse(
+        stream_export(batches, export_columns(config, user), format, entity_name),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{entity_name}.{format}"'}
+    )
@@ -0,0 +1,290 @@
+# ================================
+# app/core/entity_import.py - Importación en streaming (NDJSON, CSV) con jobs
+# ================================
+
+import codecs
+import csv
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..database import get_database
+from ..models.entity import EntityConfig
+from ..models.user import User
+from .config_cache import get_config_cache
+from .dynamic_crud import DynamicCrudGenerator
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+
+class ImportLineTooLong(Exception):
+    """Una línea (o registro CSV) supera import_max_line_bytes"""
+
+def column_mapping(config: EntityConfig) -> Dict[str, str]:
+    """Columna de origen -> campo de la entidad (nombres de `campos` y `mapeo` de la API)"""
+    campos = [campo["campo"] for campo in (config.configuracion or {}).get("campos") or []]
+    mapping = {campo: campo for campo in campos}
+    for source, target in get_config_cache().plan_for(config).mapeo.items():
+        if target in mapping and source not in mapping:
+            mapping[source] = target
+    return mapping
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[str]:
+    """Líneas completas del stream sin acumular más de una línea pendiente"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        if len(pending) > max_line_bytes:
+            raise ImportLineTooLong()
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job para la respuesta de la API (job_id en lugar de _id)"""
+    return {"job_id": job["_id"], **{key: value for key, value in job.items() if key != "_id"}}
+
+async def iter_ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """(número de línea, documento o excepción) por cada línea no vacía"""
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Cada línea debe ser un objeto JSON")
+            yield line_number, record
+        except ValueError as e:
+            yield line_number, e
+
+async def iter_csv_records(lines: AsyncIterator[str], max_line_bytes: int) -> AsyncIterator[Tuple[int, Any]]:
+    """(número de línea, fila como dict o excepción); la primera fila son los headers.
+
+    Un registro con un campo entre comillas puede ocupar varias líneas: se
+    acumulan hasta que el número de comillas es par.
+    """
+    header: Optional[List[str]] = None
+    record_lines: List[str] = []
+    start_line = line_number = 0
+
+    async for line in lines:
+        line_number += 1
+        if not record_lines:
+            start_line = line_number
+        record_lines.append(line)
+        record = "\n".join(record_lines)
+        if record.count('"') % 2:
+            if len(record) > max_line_bytes:
+                raise ImportLineTooLong()
+            continue
+        record_lines = []
+        if not record.strip():
+            continue
+
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            yield start_line, e
+            continue
+
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        if len(values) > len(header):
+            yield start_line, ValueError(f"La fila tiene {len(values)} columnas y el header {len(header)}")
+            continue
+        yield start_line, dict(zip(header, values))
+
+    if record_lines:
+        yield start_line, ValueError("Comillas sin cerrar al final del archivo")
+
+class ImportJobStore:
+    """Jobs de importación y sus filas rechazadas en MongoDB (visibles desde cualquier worker)"""
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else get_database()
+
+    async def create(self, job_id: str, business_id: str, entidad: str, format: str, user: User) -> Dict[str, Any]:
+        job = {
+            "_id": job_id,
+            "business_id": business_id,
+            "entidad": entidad,
+            "format": format,
+            "status": "running",
+            "created_by": str(user.id),
+            "started_at": datetime.utcnow(),
+            "finished_at": None,
+            "bytes_read": 0,
+            "rows_processed": 0,
+            "created": 0,
+            "failed": 0,
+            "errors_stored": 0,
+            "ignored_columns": [],
+            "error": None
+        }
+        await self.db.import_jobs.insert_one(job)
+        return job
+
+    async def update(self, job_id: str, changes: Dict[str, Any]):
+        await self.db.import_jobs.update_one({"_id": job_id}, {"$set": changes})
+
+    async def get(self, business_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.import_jobs.find_one({"_id": job_id, "business_id": business_id})
+
+    async def add_errors(self, job_id: str, rows: List[Dict[str, Any]]):
+        if rows:
+            await self.db.import_job_errors.insert_many(
+                [{"job_id": job_id, **row} for row in rows], ordered=False
+            )
+
+    async def iter_errors(self, job_id: str) -> AsyncIterator[bytes]:
+        """Archivo de errores como NDJSON: una fila rechazada por línea"""
+        cursor = self.db.import_job_errors.find({"job_id": job_id}, {"_id": 0, "job_id": 0}).sort("line", 1)
+        async for row in cursor.batch_size(settings.export_batch_size):
+            yield (json.dumps(row, default=str, ensure_ascii=False) + "\n").encode("utf-8")
+
+class EntityImporter:
+    """Importa un stream NDJSON/CSV a una entidad en lotes acotados.
+
+    El cuerpo se lee de a chunks y solo se pide el siguiente cuando el lote
+    actual ya se escribió: la memoria depende de import_batch_size y del
+    largo máximo de línea, nunca del tamaño del archivo. El progreso se
+    guarda en el job después de cada lote.
+    """
+
+    def __init__(self, crud_generator: Optional[DynamicCrudGenerator] = None, store: Optional[ImportJobStore] = None):
+        self.crud_generator = crud_generator or DynamicCrudGenerator()
+        self.store = store or ImportJobStore()
+
+    async def start(
+        self,
+        business_id: str,
+        entity_name: str,
+        format: str,
+        user: User,
+        job_id: Optional[str] = None
+    ) -> Tuple[EntityConfig, Dict[str, Any]]:
+        """Verificar entidad y permisos y registrar el job antes de leer el cuerpo"""
+        if format not in IMPORT_FORMATS:
+            raise ValueError(f"Formato de importación no soportado: {format}")
+        config = await self.crud_generator.get_entity_config(business_id, entity_name)
+        self.crud_generator._check_create_permission(user, config)
+        job = await self.store.create(job_id or uuid.uuid4().hex, business_id, entity_name, format, user)
+        return config, job
+
+    async def run(
+        self,
+        config: EntityConfig,
+        job: Dict[str, Any],
+        chunks: AsyncIterator[bytes],
+        user: User
+    ) -> Dict[str, Any]:
+        """Procesar el stream completo y devolver el job final"""
+        job_id = job["_id"]
+        mapping = column_mapping(config)
+        progress = {key: job[key] for key in ("bytes_read", "rows_processed", "created", "failed", "errors_stored")}
+        ignored_columns = set()
+        validate = self.crud_generator._entity_validator(config).validate
+
+        async def counted(source: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+            async for chunk in source:
+                progress["bytes_read"] += len(chunk)
+                yield chunk
+
+        lines = iter_lines(counted(chunks), settings.import_max_line_bytes)
+        if job["format"] == "csv":
+            records = iter_csv_records(lines, settings.import_max_line_bytes)
+        else:
+            records = iter_ndjson_records(lines)
+
+        batch: List[Tuple[int, Dict[str, Any]]] = []
+        rejected: List[Dict[str, Any]] = []
+        try:
+            async for line, record in records:
+                progress["rows_processed"] += 1
+                if isinstance(record, Exception):
+                    rejected.append({"line": line, "error": str(record), "row": None})
+                else:
+                    data, unknown = self._map_row(record, mapping, job["format"] == "csv")
+                    ignored_columns.update(unknown)
+                    try:
+                        batch.append((line, validate(data, True)))
+                    except Exception as e:
+                        rejected.append({"line": line, "error": str(e), "row": record})
+
+                if len(batch) + len(rejected) >= settings.import_batch_size:
+                    await self._flush(config, job_id, batch, rejected, progress, user)
+                    batch, rejected = [], []
+
+            await self._flush(config, job_id, batch, rejected, progress, user)
+            status, error = "completed", None
+        except ImportLineTooLong:
+            status, error = "failed", f"Línea de más de {settings.import_max_line_bytes} bytes"
+        except Exception as e:
+            logger.error(f"Error en importación {job_id}: {e}")
+            status, error = "failed", str(e)
+
+        final = {
+            **progress,
+            "status": status,
+            "error": error,
+            "ignored_columns": sorted(ignored_columns),
+            "finished_at": datetime.utcnow()
+        }
+        await self.store.update(job_id, final)
+        return {**job, **final}
+
+    def _map_row(self, record: Dict[str, Any], mapping: Dict[str, str], from_csv: bool) -> Tuple[Dict[str, Any], List[str]]:
+        """Renombrar columnas a campos; en CSV una celda vacía es un valor ausente"""
+        if not mapping:
+            return dict(record), []
+        data = {}
+        unknown = []
+        for column, value in record.items():
+            target = mapping.get(column)
+            if target is None:
+                unknown.append(column)
+            elif not (from_csv and value == ""):
+                data[target] = value
+        return data, unknown
+
+    async def _flush(
+        self,
+        config: EntityConfig,
+        job_id: str,
+        batch: List[Tuple[int, Dict[str, Any]]],
+        rejected: List[Dict[str, Any]],
+        progress: Dict[str, Any],
+        user: User
+    ):
+        """Escribir el lote, guardar sus errores y actualizar el progreso del job"""
+        if batch:
+            if self.crud_generator._uses_api(config):
+                results, write_errors = await self.crud_generator._bulk_create_in_api(config, batch, user, True)
+            else:
+                results, write_errors = await self.crud_generator._bulk_create_in_db(config, batch, user, True)
+            progress["created"] += len(results)
+            rejected = rejected + [
+                {"line": error["index"], "error": error["error"], "row": error["data"]} for error in write_errors
+            ]
+
+        progress["failed"] += len(rejected)
+        room = max(settings.import_max_error_rows - progress["errors_stored"], 0)
+        await self.store.add_errors(job_id, rejected[:room])
+        progress["errors_stored"] += min(len(rejected), room)
+        await self.store.update(job_id, dict(progress))
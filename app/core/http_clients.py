@@ -0,0 +1,188 @@
+# ================================
+# app/core/http_clients.py - Clientes HTTP salientes compartidos
+# ================================
+
+import hashlib
+import json
+import logging
+import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Transport que cuenta requests, errores y latencia por host"""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport, host_stats: Dict[str, Dict[str, Any]]):
+        self._transport = transport
+        self._host_stats = host_stats
+
+    def _stats_for(self, host: str) -> Dict[str, Any]:
+        stats = self._host_stats.get(host)
+        if stats is None:
+            stats = self._host_stats[host] = {
+                "requests": 0,
+                "errors": 0,
+                "in_flight": 0,
+                "peak_in_flight": 0,
+                "total_time_ms": 0.0
+            }
+        return stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self._stats_for(request.url.host)
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        start = time.perf_counter()
+        try:
+            return await self._transport.handle_async_request(request)
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            stats["in_flight"] -= 1
+            stats["total_time_ms"] += (time.perf_counter() - start) * 1000
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Conexiones del pool: activas (con request en curso) e inactivas (keep-alive)"""
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "connections": len(connections),
+            "active": len(connections) - idle,
+            "idle": idle,
+            "max_connections": settings.http_max_connections
+        }
+
+def no_cookies() -> CookieJar:
+    """Jar que rechaza todas las cookies de las respuestas.
+
+    Un cliente compartido entre usuarios y businesses no debe reenviar en
+    un request la cookie que un servidor le puso a otro. Se pasa el
+    CookieJar tal cual: envuelto en httpx.Cookies el cliente lo copiaría a
+    un jar con la política por defecto.
+    """
+    return CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+
+class HttpClientRegistry:
+    """Un httpx.AsyncClient de larga vida por base URL + credenciales.
+
+    Los clientes se reutilizan entre requests (keep-alive, sin handshake
+    TCP/TLS por llamada) y se cierran juntos en el shutdown de la app.
+    Nunca usar los clientes como context manager: eso los cerraría para
+    todos los demás.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Tuple[httpx.AsyncClient, _InstrumentedTransport]] = {}
+        self._host_stats: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _client_key(base_url: str, headers: Optional[Dict[str, str]]) -> str:
+        # Las credenciales forman parte de la key pero no se exponen en métricas
+        digest = hashlib.sha256(
+            json.dumps(sorted((headers or {}).items())).encode()
+        ).hexdigest()[:12]
+        return f"{base_url or '*'}#{digest}"
+
+    def _create_client(self, base_url: str, headers: Optional[Dict[str, str]]):
+        transport = _InstrumentedTransport(
+            httpx.AsyncHTTPTransport(
+                http2=settings.http2_enabled and HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=settings.http_max_connections,
+                    max_keepalive_connections=settings.http_max_keepalive_connections,
+                    keepalive_expiry=settings.http_keepalive_expiry_seconds
+                )
+            ),
+            self._host_stats
+        )
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            cookies=no_cookies(),
+            transport=transport,
+            timeout=httpx.Timeout(
+                settings.http_timeout_seconds,
+                connect=settings.http_connect_timeout_seconds
+            )
+        )
+        return client, transport
+
+    def get(self, base_url: str = "", headers: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+        """Obtener (o crear) el cliente para base_url + headers"""
+        base_url = base_url.rstrip("/")
+        key = self._client_key(base_url, headers)
+        entry = self._clients.get(key)
+        if entry is None or entry[0].is_closed:
+            entry = self._clients[key] = self._create_client(base_url, headers)
+            logger.info(f"Cliente HTTP creado para {base_url or 'URLs absolutas'}")
+        return entry[0]
+
+    async def aclose(self):
+        """Cerrar todos los clientes (shutdown de la app)"""
+        clients, self._clients = self._clients, {}
+        for key, (client, _) in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error cerrando cliente HTTP {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Uso del pool por cliente y contadores por host"""
+        hosts = {}
+        for host, stats in self._host_stats.items():
+            completed = stats["requests"] - stats["in_flight"]
+            hosts[host] = {
+                **stats,
+                "total_time_ms": round(stats["total_time_ms"], 1),
+                "avg_time_ms": round(stats["total_time_ms"] / completed, 1) if completed else 0
+            }
+        return {
+            "http2": settings.http2_enabled and HTTP2_AVAILABLE,
+            "clients": {key: transport.pool_stats() for key, (_, transport) in self._clients.items()},
+            "hosts": hosts
+        }
+
+# Registro del proceso: se crea en el lifespan y se cierra en el shutdown
+_registry: Optional[HttpClientRegistry] = None
+
+def init_http_clients() -> HttpClientRegistry:
+    """Crear el registro de clientes HTTP (startup de la app)"""
+    global _registry
+    if _registry is None:
+        _registry = HttpClientRegistry()
+    return _registry
+
+def get_http_client(base_url: str = "", headers: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+    """Cliente compartido para base_url + headers (sin base_url: URLs absolutas)"""
+    return init_http_clients().get(base_url, headers)
+
+async def close_http_clients():
+    """Cerrar todos los clientes HTTP (shutdown de la app)"""
+    global _registry
+    if _registry is not None:
+        await _registry.aclose()
+        _registry = None
+
+def get_http_client_stats() -> Dict[str, Any]:
+    """Métricas de los clientes HTTP salientes"""
+    if _registry is None:
+        return {"http2": settings.http2_enabled and HTTP2_AVAILABLE, "clients": {}, "hosts": {}}
+    return _registry.stats()
@@ -0,0 +1,336 @@
+# ================================
+# app/core/index_manager.py - Índices de las colecciones de entidades
+# ================================
+
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from ..config import settings
+from ..database import get_database
+from ..models.entity import EntityConfig
+
+logger = logging.getLogger(__name__)
+
+# Solo se crean/eliminan índices con este prefijo; los demás no se tocan
+INDEX_PREFIX = "cms_"
+_LEARNED_PREFIX = "cms_auto_"
+# Campos que no están en la configuración pero sí en todos los documentos
+_SYSTEM_FIELDS = ("created_at", "updated_at")
+# Tipos que cuentan para la unicidad de un campo opcional (null y ausente no)
+_UNIQUE_VALUE_TYPES = ["string", "number", "date", "bool", "objectId"]
+
+def declared_fields(campos: List[Dict[str, Any]]) -> set:
+    """Campos sobre los que se puede aprender un índice"""
+    return {campo["campo"] for campo in campos if campo.get("campo")} | set(_SYSTEM_FIELDS)
+
+def _is_unused(accesses: Optional[Dict[str, Any]], days: int) -> bool:
+    """Sin operaciones desde hace más de `days` días según $indexStats"""
+    if not accesses or accesses.get("ops", 0) > 0:
+        return False
+    since = accesses.get("since")
+    return since is not None and since < datetime.utcnow() - timedelta(days=days)
+
+class IndexManager:
+    """Índices de {business_id}_{entidad} derivados de la configuración y del uso.
+
+    - Configuración: los flags unico/filtrable/ordenable de cada campo.
+    - Uso: los campos declarados de filtro y orden de las consultas lentas
+      se acumulan en entity_index_usage; a partir de index_learn_min_hits se
+      crea un índice cms_auto_* (los index_max_learned_per_collection con
+      más consultas), que se elimina si $indexStats no registra uso en
+      index_unused_drop_days.
+
+    Se reconcilia en background cada index_manager_interval_seconds.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+        # (business_id, entidad, kind, field) -> consultas lentas aún sin persistir
+        self._pending: Counter = Counter()
+        self._last_sync: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[datetime] = None
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else get_database()
+
+    def record_query(
+        self,
+        config: EntityConfig,
+        filter_query: Dict[str, Any],
+        sort_by: Optional[str],
+        elapsed_ms: float
+    ):
+        """Registrar los campos declarados de una consulta de listado si fue lenta.
+
+        Los filtros y el orden vienen del cliente: un campo que no está en la
+        configuración no genera uso (ni índices).
+        """
+        if elapsed_ms < settings.index_slow_query_ms:
+            return
+        fields = declared_fields((config.configuracion or {}).get("campos") or [])
+        business_id, entidad = config.business_id, config.entidad
+        for field in filter_query:
+            if field in fields:
+                self._pending[(business_id, entidad, "filter", field)] += 1
+        if sort_by in fields:
+            self._pending[(business_id, entidad, "sort", sort_by)] += 1
+
+    async def flush_usage(self):
+        """Persistir los contadores de consultas lentas"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, Counter()
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"business_id": business_id, "entidad": entidad, "kind": kind, "field": field},
+                {"$inc": {"hits": hits}, "$set": {"last_seen": now}},
+                upsert=True
+            )
+            for (business_id, entidad, kind, field), hits in pending.items()
+        ]
+        await self.db.entity_index_usage.bulk_write(operations, ordered=False)
+
+    # ================================
+    # ÍNDICES DESEADOS
+    # ================================
+
+    @staticmethod
+    def config_indexes(campos: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Índices que pide la configuración de los campos"""
+        indexes = {}
+        for campo in campos:
+            field = campo.get("campo")
+            if not field:
+                continue
+            if campo.get("unico") and campo.get("obligatorio"):
+                indexes[f"cms_uniq_{field}"] = {"keys": [(field, 1)], "unique": True, "origin": "config"}
+            elif campo.get("unico"):
+                # MongoDB indexa el campo ausente como null: sin el filtro parcial
+                # solo un documento podría omitir un campo opcional
+                indexes[f"cms_uniqp_{field}"] = {
+                    "keys": [(field, 1)], "unique": True, "origin": "config",
+                    "partial": {field: {"$exists": True, "$type": _UNIQUE_VALUE_TYPES}}
+                }
+            if campo.get("ordenable"):
+                # (campo, _id) sirve para filtrar, ordenar y paginar por cursor
+                indexes[f"cms_sort_{field}"] = {"keys": [(field, 1), ("_id", 1)], "unique": False, "origin": "config"}
+            elif campo.get("filtrable") and not (campo.get("unico") and campo.get("obligatorio")):
+                # Un índice parcial solo sirve a consultas que incluyen su filtro
+                indexes[f"cms_cfg_{field}"] = {"keys": [(field, 1)], "unique": False, "origin": "config"}
+        return indexes
+
+    async def learned_indexes(
+        self,
+        business_id: str,
+        entidad: str,
+        covered_fields: set,
+        allowed_fields: set
+    ) -> Dict[str, Dict[str, Any]]:
+        """Índices aprendidos de consultas lentas (campos declarados no cubiertos por la configuración)"""
+        indexes = {}
+        query = {"business_id": business_id, "entidad": entidad, "hits": {"$gte": settings.index_learn_min_hits}}
+        async for usage in self.db.entity_index_usage.find(query):
+            field, kind = usage["field"], usage["kind"]
+            if field in covered_fields or field not in allowed_fields:
+                continue
+            if kind == "sort":
+                indexes[f"{_LEARNED_PREFIX}sort_{field}"] = {
+                    "keys": [(field, 1), ("_id", 1)], "unique": False, "origin": "learned",
+                    "kind": kind, "field": field, "hits": usage["hits"]
+                }
+            else:
+                indexes[f"{_LEARNED_PREFIX}{field}"] = {
+                    "keys": [(field, 1)], "unique": False, "origin": "learned",
+                    "kind": kind, "field": field, "hits": usage["hits"]
+                }
+
+        # El índice de orden también sirve para filtrar por el mismo campo
+        for name in [name for name, spec in indexes.items() if spec["kind"] == "filter"]:
+            if f"{_LEARNED_PREFIX}sort_{indexes[name]['field']}" in indexes:
+                del indexes[name]
+
+        # Cada índice encarece las escrituras: solo los más consultados
+        ranked = sorted(indexes.items(), key=lambda item: (-item[1]["hits"], item[0]))
+        return dict(ranked[:max(settings.index_max_learned_per_collection, 0)])
+
+    async def desired_indexes(self, business_id: str, entidad: str, campos: List[Dict[str, Any]]):
+        desired = self.config_indexes(campos)
+        covered = {spec["keys"][0][0] for spec in desired.values() if "partial" not in spec}
+        desired.update(await self.learned_indexes(business_id, entidad, covered, declared_fields(campos)))
+        return desired
+
+    @staticmethod
+    async def _existing_indexes(collection):
+        existing = {}
+        async for index in collection.list_indexes():
+            existing[index["name"]] = {"keys": list(index["key"].items()), "unique": index.get("unique", False)}
+        usage = {}
+        try:
+            async for stat in collection.aggregate([{"$indexStats": {}}]):
+                usage[stat["name"]] = stat.get("accesses")
+        except Exception as e:
+            # $indexStats requiere permisos clusterMonitor: sin él no se elimina nada por desuso
+            logger.debug(f"$indexStats no disponible para {collection.name}: {e}")
+        return existing, usage
+
+    # ================================
+    # SINCRONIZACIÓN
+    # ================================
+
+    async def sync_entity(self, business_id: str, entidad: str, campos: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Crear los índices que faltan y eliminar los obsoletos de una entidad"""
+        collection = self.db[f"{business_id}_{entidad}"]
+        desired = await self.desired_indexes(business_id, entidad, campos)
+        existing, usage = await self._existing_indexes(collection)
+        result = {"created": [], "dropped": [], "errors": [], "synced_at": datetime.utcnow()}
+
+        for name, spec in desired.items():
+            if name in existing:
+                continue
+            try:
+                options = {"partialFilterExpression": spec["partial"]} if "partial" in spec else {}
+                await collection.create_index(spec["keys"], name=name, unique=spec["unique"], background=True, **options)
+                result["created"].append(name)
+                logger.info(f"Índice {name} creado en {collection.name} ({spec['origin']})")
+            except Exception as e:
+                # Típicamente un índice único sobre datos duplicados
+                result["errors"].append({"index": name, "error": str(e)})
+
+        for name in existing:
+            if not name.startswith(INDEX_PREFIX):
+                continue
+            spec = desired.get(name)
+            if spec is not None and not (
+                spec["origin"] == "learned" and _is_unused(usage.get(name), settings.index_unused_drop_days)
+            ):
+                continue
+            try:
+                await collection.drop_index(name)
+                result["dropped"].append(name)
+                if spec is not None:
+                    # Volver a aprender desde cero si las consultas vuelven a ser lentas
+                    await self.db.entity_index_usage.delete_one({
+                        "business_id": business_id, "entidad": entidad, "kind": spec["kind"], "field": spec["field"]
+                    })
+                logger.info(f"Índice {name} eliminado de {collection.name}")
+            except Exception as e:
+                result["errors"].append({"index": name, "error": str(e)})
+
+        self._last_sync[(business_id, entidad)] = result
+        return result
+
+    async def reconcile(self):
+        """Sincronizar los índices de todas las entidades con datos"""
+        await self.flush_usage()
+        collections = set(await self.db.list_collection_names())
+        cursor = self.db.entities_config.find({}, {"business_id": 1, "entidad": 1, "configuracion.campos": 1})
+        async for config in cursor:
+            business_id, entidad = config["business_id"], config["entidad"]
+            if f"{business_id}_{entidad}" not in collections:
+                continue
+            campos = (config.get("configuracion") or {}).get("campos") or []
+            try:
+                await self.sync_entity(business_id, entidad, campos)
+            except Exception as e:
+                logger.error(f"Error sincronizando índices de {business_id}_{entidad}: {e}")
+        self.last_run = datetime.utcnow()
+
+    async def entity_report(self, business_id: str, entidad: str, campos: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Índices existentes, deseados, uso aprendido y última sincronización de una entidad"""
+        collection = self.db[f"{business_id}_{entidad}"]
+        desired = await self.desired_indexes(business_id, entidad, campos)
+        existing, usage = await self._existing_indexes(collection)
+
+        indexes = []
+        for name, index in existing.items():
+            if name in desired:
+                origin = desired[name]["origin"]
+            elif name.startswith(INDEX_PREFIX):
+                origin = "obsolete"
+            else:
+                origin = "system" if name == "_id_" else "manual"
+            accesses = usage.get(name) or {}
+            indexes.append({
+                "name": name,
+                "keys": index["keys"],
+                "unique": index["unique"],
+                "origin": origin,
+                "ops": accesses.get("ops"),
+                "since": accesses.get("since")
+            })
+
+        learned_usage = []
+        async for doc in self.db.entity_index_usage.find({"business_id": business_id, "entidad": entidad}):
+            learned_usage.append({
+                "kind": doc["kind"],
+                "field": doc["field"],
+                "hits": doc["hits"] + self._pending.get((business_id, entidad, doc["kind"], doc["field"]), 0),
+                "last_seen": doc.get("last_seen")
+            })
+
+        return {
+            "collection": collection.name,
+            "indexes": indexes,
+            "missing": [name for name in desired if name not in existing],
+            "obsolete": [index["name"] for index in indexes if index["origin"] == "obsolete"],
+            "slow_query_usage": learned_usage,
+            "last_sync": self._last_sync.get((business_id, entidad)),
+            "last_run": self.last_run
+        }
+
+    # ================================
+    # BACKGROUND
+    # ================================
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reconciliando índices de entidades: {e}")
+            await asyncio.sleep(settings.index_manager_interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush_usage()
+        except Exception as e:
+            logger.error(f"Error guardando uso de índices: {e}")
+
+_index_manager: Optional[IndexManager] = None
+
+def get_index_manager() -> IndexManager:
+    global _index_manager
+    if _index_manager is None:
+        _index_manager = IndexManager()
+    return _index_manager
+
+async def start_index_manager():
+    """Reconciliar índices en background (startup de la app)"""
+    if settings.index_manager_enabled:
+        get_index_manager().start()
+
+async def stop_index_manager():
+    """Detener la reconciliación (shutdown de la app)"""
+    if _index_manager is not None:
+        await _index_manager.stop()
@@ -0,0 +1,568 @@
+# ================================
+# app/core/metrics_rollup.py - Métricas pre-agregadas por business, entidad y día
+# ================================
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from ..database import get_database
+from ..models.entity import EntityConfig
+
+logger = logging.getLogger(__name__)
+
+ENTITY_SCOPE = "entity"
+WHATSAPP_SCOPE = "whatsapp"
+CONVERSATIONS = "atencion_humana"
+CONVERSATION_STATES = ("pendiente", "atendiendo", "finalizado")
+
+_DAY_FORMAT = "%Y-%m-%d"
+
+def day_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, moment.day)
+
+def _rollup_id(business_id: str, scope: str, name: str, day: Optional[datetime]) -> str:
+    return f"{business_id}|{scope}|{name}|{day.strftime(_DAY_FORMAT) if day else 'total'}"
+
+def _value_key(value: Any) -> Optional[str]:
+    """Valor de categoría como clave de subdocumento ('.' y '$' no son válidos en claves)"""
+    if value is None or value == "":
+        return None
+    return str(value)[:100].replace(".", "．").replace("$", "＄")
+
+def _value_from_key(key: str) -> str:
+    return key.replace("．", ".").replace("＄", "$")
+
+def rollup_fields(config: EntityConfig) -> Tuple[List[str], List[str], List[str]]:
+    """(campos numéricos, campos select, todos los campos) de la configuración"""
+    campos = (config.configuracion or {}).get("campos") or []
+    numeric = [campo["campo"] for campo in campos if campo.get("tipo") == "number"]
+    categorical = [campo["campo"] for campo in campos if campo.get("tipo") == "select"]
+    return numeric, categorical, [campo["campo"] for campo in campos]
+
+class RollupDelta:
+    """Incrementos pendientes por día, aplicados con un bulk_write de upserts"""
+
+    def __init__(self, business_id: str, scope: str, name: str):
+        self.business_id = business_id
+        self.scope = scope
+        self.name = name
+        # día (None = totales) -> {"$inc": {...}, "$min": {...}, "$max": {...}}
+        self._days: Dict[Optional[datetime], Dict[str, Dict[str, Any]]] = {}
+
+    def __bool__(self):
+        return bool(self._days)
+
+    def _update(self, day: Optional[datetime]) -> Dict[str, Dict[str, Any]]:
+        update = self._days.get(day)
+        if update is None:
+            update = self._days[day] = {"$inc": {}, "$min": {}, "$max": {}}
+        return update
+
+    def inc(self, day: Optional[datetime], path: str, amount: float = 1):
+        increments = self._update(day)["$inc"]
+        increments[path] = increments.get(path, 0) + amount
+
+    def min(self, day: Optional[datetime], path: str, value: float):
+        current = self._update(day)["$min"].get(path)
+        if current is None or value < current:
+            self._update(day)["$min"][path] = value
+
+    def max(self, day: Optional[datetime], path: str, value: float):
+        current = self._update(day)["$max"].get(path)
+        if current is None or value > current:
+            self._update(day)["$max"][path] = value
+
+    def operations(self) -> List[UpdateOne]:
+        operations = []
+        for day, update in self._days.items():
+            update = {operator: values for operator, values in update.items() if values}
+            update["$setOnInsert"] = {
+                "business_id": self.business_id, "scope": self.scope, "name": self.name, "day": day
+            }
+            operations.append(UpdateOne(
+                {"_id": _rollup_id(self.business_id, self.scope, self.name, day)}, update, upsert=True
+            ))
+        return operations
+
+def rollup_projection(config: EntityConfig) -> Dict[str, int]:
+    """Campos de un documento que aportan a sus rollups (para descontarlo al modificarlo o borrarlo)"""
+    return {"created_at": 1, **{campo: 1 for campo in rollup_fields(config)[2]}}
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _creation_day(doc: Dict[str, Any]) -> Optional[datetime]:
+    """Día en el que cuenta un documento; sin created_at de tipo fecha no está en los rollups"""
+    created_at = doc.get("created_at")
+    return day_start(created_at) if isinstance(created_at, datetime) else None
+
+class EntityRollupDelta(RollupDelta):
+    """Eventos de una entidad: altas con sus valores, modificaciones y bajas.
+
+    Los valores de un documento cuentan en su día de creación: una
+    modificación descuenta los valores anteriores y suma los nuevos, una baja
+    los descuenta. Mínimos y máximos no se pueden descontar; los valores
+    quitados quedan en `removed` para recalcular el extremo del día si hace falta.
+    """
+
+    def __init__(self, config: EntityConfig):
+        super().__init__(config.business_id, ENTITY_SCOPE, config.entidad)
+        self.numeric, self.categorical, self.campos = rollup_fields(config)
+        # (día, campo) -> valores numéricos quitados
+        self.removed: Dict[Tuple[datetime, str], List[float]] = {}
+
+    def _values(self, doc: Dict[str, Any], day: datetime, sign: int, campos: List[str]):
+        for campo in campos:
+            value = doc.get(campo)
+            if value not in (None, ""):
+                self.inc(day, f"present.{campo}", sign)
+            if campo in self.numeric and _is_number(value):
+                self.inc(day, f"fields.{campo}.count", sign)
+                self.inc(day, f"fields.{campo}.sum", sign * value)
+                self.inc(day, f"fields.{campo}.sumsq", sign * value * value)
+                if sign > 0:
+                    self.min(day, f"fields.{campo}.min", value)
+                    self.max(day, f"fields.{campo}.max", value)
+                else:
+                    self.removed.setdefault((day, campo), []).append(value)
+            if campo in self.categorical:
+                key = _value_key(value)
+                if key is not None:
+                    self.inc(day, f"categories.{campo}.{key}", sign)
+
+    def created(self, doc: Dict[str, Any], when: Optional[datetime] = None):
+        moment = doc.get("created_at") or when or datetime.utcnow()
+        day = day_start(moment)
+        self.inc(day, "created")
+        self.inc(None, "created")
+        self._values(doc, day, 1, self.campos)
+
+    def updated(self, before: Dict[str, Any], after: Dict[str, Any], when: Optional[datetime] = None):
+        """Documento antes y después de la modificación"""
+        self.inc(day_start(when or datetime.utcnow()), "updated")
+        self.inc(None, "updated")
+        day = _creation_day(before)
+        if day is None:
+            return
+        changed = [campo for campo in self.campos if before.get(campo) != after.get(campo)]
+        self._values(before, day, -1, changed)
+        self._values(after, day, 1, changed)
+
+    def deleted(self, doc: Dict[str, Any], when: Optional[datetime] = None):
+        """Documento borrado (al menos los campos de rollup_projection)"""
+        self.inc(day_start(when or datetime.utcnow()), "deleted")
+        self.inc(None, "deleted")
+        day = _creation_day(doc)
+        if day is None:
+            return
+        # El total acumula altas y bajas; el día refleja los documentos vigentes
+        self.inc(day, "created", -1)
+        self._values(doc, day, -1, self.campos)
+
+class MetricsRollup:
+    """Contadores y sumas por business/entidad/día en la colección metrics_rollups.
+
+    Se actualizan en cada alta, modificación y baja de entidades locales y
+    en cada cambio de estado de una conversación de atención humana; los
+    reportes leen un documento por día del período en lugar de los datos.
+
+    - Entidades: modificaciones y bajas cuentan en el día en que ocurren;
+      altas, sumas, mínimos, máximos y categorías son de los documentos
+      vigentes, en su día de creación.
+    - Conversaciones: cuentan en el día de creación de la conversación,
+      con su estado actual (un cambio de estado mueve el contador).
+
+    Un documento "total" por entidad/conversaciones guarda los acumulados y
+    `built_at`; si falta, el reporte reconstruye los rollups desde los datos.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else get_database()
+
+    async def apply(self, delta: RollupDelta):
+        """Aplicar los incrementos; un fallo se registra sin afectar la escritura original"""
+        if not delta:
+            return
+        try:
+            await self.db.metrics_rollups.bulk_write(delta.operations(), ordered=False)
+            if isinstance(delta, EntityRollupDelta) and delta.removed:
+                await self._refresh_extremes(delta)
+        except Exception as e:
+            logger.warning(f"Error actualizando rollups de {delta.business_id}/{delta.name}: {e}")
+
+    # ================================
+    # EVENTOS
+    # ================================
+
+    async def entity_created(self, config: EntityConfig, docs: List[Dict[str, Any]]):
+        delta = EntityRollupDelta(config)
+        for doc in docs:
+            delta.created(doc)
+        await self.apply(delta)
+
+    async def entity_updated(self, config: EntityConfig, changes: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """changes: (documento antes, documento después) de cada modificación"""
+        delta = EntityRollupDelta(config)
+        for before, after in changes:
+            delta.updated(before, after)
+        await self.apply(delta)
+
+    async def entity_deleted(self, config: EntityConfig, docs: List[Dict[str, Any]]):
+        delta = EntityRollupDelta(config)
+        for doc in docs:
+            delta.deleted(doc)
+        await self.apply(delta)
+
+    async def _refresh_extremes(self, delta: EntityRollupDelta):
+        """Recalcular min/max de los días donde se quitó el valor extremo"""
+        collection = self.db[f"{delta.business_id}_{delta.name}"]
+        for (day, campo), values in delta.removed.items():
+            rollup_id = _rollup_id(delta.business_id, ENTITY_SCOPE, delta.name, day)
+            rollup = await self.db.metrics_rollups.find_one({"_id": rollup_id})
+            stats = ((rollup or {}).get("fields") or {}).get(campo) or {}
+            if stats.get("min") is None or (min(values) > stats["min"] and max(values) < stats["max"]):
+                continue
+            rows = await collection.aggregate(day_extremes_pipeline(campo, day)).to_list(None)
+            row = rows[0] if rows else {}
+            await self.db.metrics_rollups.update_one({"_id": rollup_id}, {"$set": {
+                f"fields.{campo}.min": row.get("min"), f"fields.{campo}.max": row.get("max")
+            }})
+
+    async def conversation_changed(
+        self,
+        business_id: str,
+        created_at: datetime,
+        estado: str,
+        previous_estado: Optional[str] = None,
+        area: Optional[str] = None,
+        resolution_minutes: Optional[float] = None
+    ):
+        """Conversación nueva (sin previous_estado) o cambio de estado de una existente"""
+        delta = RollupDelta(business_id, WHATSAPP_SCOPE, CONVERSATIONS)
+        day = day_start(created_at)
+        if previous_estado is None:
+            delta.inc(day, "opened")
+            delta.inc(None, "opened")
+            area_key = _value_key(area)
+            if area_key is not None:
+                delta.inc(day, f"areas.{area_key}")
+        elif previous_estado == estado:
+            return
+        else:
+            delta.inc(day, f"estados.{previous_estado}", -1)
+        delta.inc(day, f"estados.{estado}")
+        if resolution_minutes is not None:
+            delta.inc(day, "resolution.count")
+            delta.inc(day, "resolution.minutes", resolution_minutes)
+        await self.apply(delta)
+
+    # ================================
+    # LECTURA
+    # ================================
+
+    async def read(
+        self,
+        business_id: str,
+        scope: str,
+        name: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """(documento total, documentos por día del período en orden)"""
+        total = await self.db.metrics_rollups.find_one({"_id": _rollup_id(business_id, scope, name, None)})
+        cursor = self.db.metrics_rollups.find({
+            "business_id": business_id,
+            "scope": scope,
+            "name": name,
+            "day": {"$gte": day_start(start_date), "$lte": day_start(end_date)}
+        }).sort("day", 1)
+        return total, await cursor.to_list(length=None)
+
+    async def entity_report(
+        self,
+        config: EntityConfig,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, Any]:
+        """Analytics del período de una entidad local desde sus rollups"""
+        total, days = await self.read(config.business_id, ENTITY_SCOPE, config.entidad, start_date, end_date)
+        if not total or not total.get("built_at"):
+            await self.rebuild_entity(config)
+            total, days = await self.read(config.business_id, ENTITY_SCOPE, config.entidad, start_date, end_date)
+        return summarize_entity(total or {}, days, start_date, end_date, rollup_fields(config)[2])
+
+    async def conversations_report(
+        self,
+        business_id: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, Any]:
+        """Conversaciones de atención humana creadas en el período desde sus rollups"""
+        total, days = await self.read(business_id, WHATSAPP_SCOPE, CONVERSATIONS, start_date, end_date)
+        if not total or not total.get("built_at"):
+            await self.rebuild_conversations(business_id)
+            total, days = await self.read(business_id, WHATSAPP_SCOPE, CONVERSATIONS, start_date, end_date)
+        return summarize_conversations(days, end_date)
+
+    # ================================
+    # RECONSTRUCCIÓN DESDE LOS DATOS
+    # ================================
+
+    async def _replace(self, business_id: str, scope: str, name: str, docs: List[Dict[str, Any]], total: Dict[str, Any]):
+        """Reemplazar todos los rollups de business/scope/name"""
+        now = datetime.utcnow()
+        documents = [
+            {"_id": _rollup_id(business_id, scope, name, doc["day"]), "business_id": business_id,
+             "scope": scope, "name": name, **doc}
+            for doc in docs
+        ]
+        documents.append({
+            "_id": _rollup_id(business_id, scope, name, None), "business_id": business_id,
+            "scope": scope, "name": name, "day": None, "built_at": now, **total
+        })
+        await self.db.metrics_rollups.delete_many({"business_id": business_id, "scope": scope, "name": name})
+        await self.db.metrics_rollups.insert_many(documents, ordered=False)
+
+    async def rebuild_entity(self, config: EntityConfig):
+        """Recalcular los rollups de una entidad local con agregaciones en MongoDB"""
+        collection = self.db[f"{config.business_id}_{config.entidad}"]
+        numeric, categorical, campos = rollup_fields(config)
+        by_day: Dict[str, Dict[str, Any]] = {}
+
+        async for row in collection.aggregate(entity_rebuild_pipeline(numeric, campos)):
+            doc = by_day[row["_id"]] = {
+                "day": datetime.strptime(row["_id"], _DAY_FORMAT),
+                "created": row["created"],
+                "present": {campo: row[f"p{i}"] for i, campo in enumerate(campos) if row[f"p{i}"]},
+                "fields": {}
+            }
+            for i, campo in enumerate(numeric):
+                if row[f"n{i}_count"]:
+                    doc["fields"][campo] = {
+                        stat: row[f"n{i}_{stat}"] for stat in ("count", "sum", "sumsq", "min", "max")
+                    }
+
+        for campo in categorical:
+            async for row in collection.aggregate(category_rebuild_pipeline(campo)):
+                doc = by_day.get(row["_id"]["day"])
+                key = _value_key(row["_id"]["value"])
+                if doc is not None and key is not None:
+                    doc.setdefault("categories", {}).setdefault(campo, {})[key] = row["n"]
+
+        created = await collection.count_documents({})
+        await self._replace(config.business_id, ENTITY_SCOPE, config.entidad, list(by_day.values()), {"created": created})
+        logger.info(f"Rollups reconstruidos: {config.business_id}/{config.entidad} ({len(by_day)} días)")
+
+    async def rebuild_conversations(self, business_id: str):
+        """Recalcular los rollups de atención humana con agregaciones en MongoDB"""
+        by_day: Dict[str, Dict[str, Any]] = {}
+        opened = 0
+        async for row in self.db.atencion_humana.aggregate(conversations_rebuild_pipeline(business_id)):
+            opened += row["opened"]
+            by_day[row["_id"]] = {
+                "day": datetime.strptime(row["_id"], _DAY_FORMAT),
+                "opened": row["opened"],
+                "estados": {estado: row[estado] for estado in CONVERSATION_STATES if row[estado]},
+                "resolution": {"count": row["resolved"], "minutes": row["minutes"]},
+                "areas": {}
+            }
+        async for row in self.db.atencion_humana.aggregate(conversation_areas_pipeline(business_id)):
+            doc = by_day.get(row["_id"]["day"])
+            key = _value_key(row["_id"]["area"])
+            if doc is not None and key is not None:
+                doc["areas"][key] = row["n"]
+
+        await self._replace(business_id, WHATSAPP_SCOPE, CONVERSATIONS, list(by_day.values()), {"opened": opened})
+
+# ================================
+# PIPELINES DE RECONSTRUCCIÓN
+# ================================
+
+def _day_of(field: str) -> Dict[str, Any]:
+    return {"$dateToString": {"format": _DAY_FORMAT, "date": f"${field}"}}
+
+def entity_rebuild_pipeline(numeric: List[str], campos: List[str]) -> List[Dict[str, Any]]:
+    """Altas por día de created_at con estadísticas de campos numéricos y presencia de campos"""
+    group: Dict[str, Any] = {"_id": _day_of("created_at"), "created": {"$sum": 1}}
+    for i, campo in enumerate(campos):
+        group[f"p{i}"] = {"$sum": {"$cond": [{"$ne": [{"$ifNull": [f"${campo}", ""]}, ""]}, 1, 0]}}
+    for i, campo in enumerate(numeric):
+        is_number = {"$isNumber": f"${campo}"}
+        group[f"n{i}_count"] = {"$sum": {"$cond": [is_number, 1, 0]}}
+        group[f"n{i}_sum"] = {"$sum": f"${campo}"}
+        group[f"n{i}_sumsq"] = {"$sum": {"$cond": [is_number, {"$multiply": [f"${campo}", f"${campo}"]}, 0]}}
+        group[f"n{i}_min"] = {"$min": {"$cond": [is_number, f"${campo}", None]}}
+        group[f"n{i}_max"] = {"$max": {"$cond": [is_number, f"${campo}", None]}}
+    return [{"$match": {"created_at": {"$type": "date"}}}, {"$group": group}]
+
+def day_extremes_pipeline(campo: str, day: datetime) -> List[Dict[str, Any]]:
+    """Mínimo y máximo de un campo numérico entre los documentos creados un día"""
+    return [
+        {"$match": {"created_at": {"$gte": day, "$lt": day + timedelta(days=1)}, campo: {"$type": "number"}}},
+        {"$group": {"_id": None, "min": {"$min": f"${campo}"}, "max": {"$max": f"${campo}"}}}
+    ]
+
+def category_rebuild_pipeline(campo: str) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"created_at": {"$type": "date"}, campo: {"$type": "string", "$ne": ""}}},
+        {"$group": {"_id": {"day": _day_of("created_at"), "value": f"${campo}"}, "n": {"$sum": 1}}}
+    ]
+
+def conversations_rebuild_pipeline(business_id: str) -> List[Dict[str, Any]]:
+    group: Dict[str, Any] = {"_id": _day_of("created_at"), "opened": {"$sum": 1}}
+    for estado in CONVERSATION_STATES:
+        group[estado] = {"$sum": {"$cond": [{"$eq": ["$conversacion.estado", estado]}, 1, 0]}}
+    resolved = {"$and": [
+        {"$eq": ["$conversacion.estado", "finalizado"]},
+        {"$eq": [{"$type": "$conversacion.fecha_finalizacion"}, "date"]}
+    ]}
+    group["resolved"] = {"$sum": {"$cond": [resolved, 1, 0]}}
+    group["minutes"] = {"$sum": {"$cond": [
+        resolved,
+        {"$divide": [{"$subtract": ["$conversacion.fecha_finalizacion", "$conversacion.fecha_inicio"]}, 60000]},
+        0
+    ]}}
+    return [{"$match": {"business_id": business_id, "created_at": {"$type": "date"}}}, {"$group": group}]
+
+def conversation_areas_pipeline(business_id: str) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"business_id": business_id, "created_at": {"$type": "date"}}},
+        {"$group": {
+            "_id": {"day": _day_of("created_at"), "area": "$conversacion.area_solicitada"},
+            "n": {"$sum": 1}
+        }}
+    ]
+
+# ================================
+# RESÚMENES DEL PERÍODO
+# ================================
+
+def _period_days(start_date: datetime, end_date: datetime) -> List[datetime]:
+    day, last = day_start(start_date), day_start(end_date)
+    days = []
+    while day <= last:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+def _merge_counts(target: Dict[str, float], counts: Optional[Dict[str, float]]):
+    for key, count in (counts or {}).items():
+        target[key] = target.get(key, 0) + count
+
+def summarize_entity(
+    total: Dict[str, Any],
+    days: List[Dict[str, Any]],
+    start_date: datetime,
+    end_date: datetime,
+    campos: List[str]
+) -> Dict[str, Any]:
+    """Mismo formato que el análisis sobre los datos, desde los rollups del período"""
+    created_by_day = {doc["day"]: doc.get("created", 0) for doc in days}
+    growth = []
+    cumulative = 0
+    for day in _period_days(start_date, end_date):
+        count = created_by_day.get(day, 0)
+        cumulative += count
+        growth.append({"date": day.strftime(_DAY_FORMAT), "count": count, "cumulative": cumulative})
+
+    fields: Dict[str, Dict[str, float]] = {}
+    categories: Dict[str, Dict[str, float]] = {}
+    present: Dict[str, float] = {}
+    for doc in days:
+        for campo, stats in (doc.get("fields") or {}).items():
+            merged = fields.setdefault(campo, {"count": 0, "sum": 0, "sumsq": 0})
+            for stat in ("count", "sum", "sumsq"):
+                merged[stat] += stats.get(stat, 0)
+            for stat, pick in (("min", min), ("max", max)):
+                if stats.get(stat) is not None:
+                    merged[stat] = pick(merged[stat], stats[stat]) if stat in merged else stats[stat]
+        for campo, counts in (doc.get("categories") or {}).items():
+            _merge_counts(categories.setdefault(campo, {}), counts)
+        _merge_counts(present, doc.get("present"))
+
+    numeric_fields = {}
+    for campo, stats in fields.items():
+        n = stats["count"]
+        if not n:
+            continue
+        variance = (stats["sumsq"] - stats["sum"] ** 2 / n) / (n - 1) if n > 1 else 0
+        numeric_fields[campo] = {
+            "count": n,
+            "min": stats.get("min"),
+            "max": stats.get("max"),
+            "mean": round(stats["sum"] / n, 2),
+            "std_dev": round(max(variance, 0) ** 0.5, 2),
+            "sum": stats["sum"]
+        }
+
+    categorical_fields = {}
+    for campo, counts in categories.items():
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        top = [(_value_from_key(key), count) for key, count in ranked[:10]]
+        total_count = sum(counts.values())
+        categorical_fields[campo] = {
+            "unique_values": len(counts),
+            "most_common": top[:5],
+            "distribution": [
+                {"value": value, "count": count, "percentage": round(count / total_count * 100, 1)}
+                for value, count in top
+            ]
+        }
+
+    period_records = cumulative
+    completeness = {
+        campo: round(present.get(campo, 0) / period_records * 100, 1) for campo in campos
+    } if period_records else {}
+
+    return {
+        "total_records": total.get("created", 0) - total.get("deleted", 0),
+        "period_records": period_records,
+        "daily_growth": growth,
+        "numeric_fields": numeric_fields,
+        "categorical_fields": categorical_fields,
+        "data_quality": {
+            "completeness": round(sum(completeness.values()) / len(completeness), 1) if completeness else 0,
+            "fields": completeness
+        },
+        "activity": {
+            "updated": sum(doc.get("updated", 0) for doc in days),
+            "deleted": sum(doc.get("deleted", 0) for doc in days)
+        },
+        "source": "rollup"
+    }
+
+def summarize_conversations(days: List[Dict[str, Any]], end_date: datetime) -> Dict[str, Any]:
+    """Totales de conversaciones del período desde los rollups"""
+    estados: Dict[str, float] = {}
+    areas: Dict[str, float] = {}
+    resolution = {"count": 0, "minutes": 0}
+    opened_today = 0
+    for doc in days:
+        _merge_counts(estados, doc.get("estados"))
+        _merge_counts(areas, doc.get("areas"))
+        _merge_counts(resolution, doc.get("resolution"))
+        if doc["day"] == day_start(end_date):
+            opened_today = doc.get("opened", 0)
+
+    return {
+        "total": sum(doc.get("opened", 0) for doc in days),
+        "estados": {estado: estados.get(estado, 0) for estado in CONVERSATION_STATES},
+        "avg_resolution_minutes": resolution["minutes"] / resolution["count"] if resolution["count"] else 0,
+        "opened_today": opened_today,
+        "areas": {_value_from_key(key): count for key, count in areas.items()}
+    }
+
+_metrics_rollup: Optional[MetricsRollup] = None
+
+def get_metrics_rollup() -> MetricsRollup:
+    global _metrics_rollup
+    if _metrics_rollup is None:
+        _metrics_rollup = MetricsRollup()
+    return _metrics_rollup
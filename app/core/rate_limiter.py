@@ -0,0 +1,135 @@
+# ================================
+# app/core/rate_limiter.py - Token bucket para APIs externas
+# ================================
+
+import logging
+import math
+import time
+from typing import Dict, NamedTuple, Optional
+
+import redis.asyncio as aioredis
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class RateLimitDecision(NamedTuple):
+    """Resultado de pedir tokens: si se concedieron y cuánto habría que esperar"""
+    allowed: bool
+    wait_ms: int
+    remaining: float
+
+class TokenBucket:
+    """Bucket de capacidad `burst` que se rellena a `requests_per_minute`"""
+
+    def __init__(self, requests_per_minute: int, burst: int):
+        self.configure(requests_per_minute, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def configure(self, requests_per_minute: int, burst: int):
+        self.capacity = max(burst, 1)
+        self.rate_per_second = max(requests_per_minute, 1) / 60.0
+
+    def try_acquire(self, tokens: int = 1, now: Optional[float] = None) -> RateLimitDecision:
+        now = time.monotonic() if now is None else now
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_second)
+        self.updated_at = now
+
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return RateLimitDecision(True, 0, self.tokens)
+
+        # No consume nada: el caller decide si espera o reordena el trabajo
+        wait_ms = math.ceil((tokens - self.tokens) / self.rate_per_second * 1000)
+        return RateLimitDecision(False, wait_ms, self.tokens)
+
+class LocalRateLimiter:
+    """Token buckets en memoria del proceso (un bucket por API)"""
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def try_acquire(
+        self,
+        key: str,
+        requests_per_minute: int,
+        burst: int,
+        tokens: int = 1
+    ) -> RateLimitDecision:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(requests_per_minute, burst)
+        else:
+            # La configuración de la API puede haber cambiado
+            bucket.configure(requests_per_minute, burst)
+        return bucket.try_acquire(tokens)
+
+class RedisRateLimiter:
+    """Token buckets en Redis compartidos entre workers (script Lua atómico)"""
+
+    # Usa el reloj de Redis para que todos los workers vean el mismo tiempo
+    _TOKEN_BUCKET_SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate_per_ms = tonumber(ARGV[2])
+    local requested = tonumber(ARGV[3])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate_per_ms)
+
+    local allowed = 0
+    local wait_ms = 0
+    if tokens >= requested then
+        tokens = tokens - requested
+        allowed = 1
+    else
+        wait_ms = math.ceil((requested - tokens) / rate_per_ms)
+    end
+
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate_per_ms) + 1000)
+    return {allowed, wait_ms, tostring(tokens)}
+    """
+
+    def __init__(self, client: Optional[aioredis.Redis] = None):
+        if client is None:
+            from ..services.cache_service import get_redis_pool
+            client = aioredis.Redis(connection_pool=get_redis_pool())
+        self._client = client
+        self._script = client.register_script(self._TOKEN_BUCKET_SCRIPT)
+        # Si Redis no responde, se limita por worker en lugar de no limitar
+        self._fallback = LocalRateLimiter()
+
+    async def try_acquire(
+        self,
+        key: str,
+        requests_per_minute: int,
+        burst: int,
+        tokens: int = 1
+    ) -> RateLimitDecision:
+        try:
+            allowed, wait_ms, remaining = await self._script(
+                keys=[f"ratelimit:api:{key}"],
+                args=[max(burst, 1), max(requests_per_minute, 1) / 60000.0, tokens]
+            )
+            return RateLimitDecision(bool(allowed), int(wait_ms), float(remaining))
+        except Exception as e:
+            logger.error(f"Error en rate limiter Redis para {key}: {e}")
+            return await self._fallback.try_acquire(key, requests_per_minute, burst, tokens)
+
+_rate_limiter = None
+
+def get_rate_limiter():
+    """Rate limiter del proceso según settings.api_rate_limit_backend"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        if settings.api_rate_limit_backend == "redis":
+            _rate_limiter = RedisRateLimiter()
+        else:
+            _rate_limiter = LocalRateLimiter()
+    return _rate_limiter
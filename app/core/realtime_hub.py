@@ -0,0 +1,325 @@
+# ================================
+# app/core/realtime_hub.py - Push de componentes de dashboard (SSE / WebSocket)
+# ================================
+
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import redis.asyncio as aioredis
+
+from ..config import settings
+from ..models.user import User
+from ..services.cache_service import get_redis_pool
+
+logger = logging.getLogger(__name__)
+
+# (business_id, vista, component_config, user, refresh) -> componente
+ComponentCompute = Callable[[str, str, Dict[str, Any], User, bool], Awaitable[Dict[str, Any]]]
+# (evento, JSON) ya serializado una vez para todas las conexiones
+Message = Tuple[str, str]
+
+WHATSAPP_TOPIC = "whatsapp"
+N8N_TOPIC = "n8n"
+CONVERSATIONS_TOPIC = "conversations"
+ANY_TOPIC = "*"
+
+_WORKER_ID = uuid.uuid4().hex
+_RESYNC: Message = ("resync", json.dumps({"type": "resync"}))
+# Campos que cambian en cada cálculo aunque los datos sean los mismos
+_VOLATILE_FIELDS = ("timestamp", "cache_info")
+
+def entity_topic(entidad: str) -> str:
+    """Tópico de las escrituras de una entidad"""
+    return f"entity:{entidad}"
+
+def component_topics(component_config: Dict[str, Any]) -> Set[str]:
+    """Tópicos de los que dependen los datos de un componente"""
+    tipo = component_config.get("tipo")
+    entidad = (component_config.get("configuracion") or {}).get("entidad")
+    if tipo == "whatsapp_panel":
+        return {WHATSAPP_TOPIC, CONVERSATIONS_TOPIC}
+    if tipo == "n8n_panel":
+        return {N8N_TOPIC}
+    if tipo == "integration_status":
+        return {WHATSAPP_TOPIC, N8N_TOPIC}
+    if tipo == "recent_activity":
+        return {ANY_TOPIC}
+    if entidad == "whatsapp_sessions":
+        return {WHATSAPP_TOPIC}
+    if entidad == "n8n_workflows":
+        return {N8N_TOPIC}
+    return {entity_topic(entidad)} if entidad else set()
+
+def _component_hash(component: Dict[str, Any]) -> str:
+    stable = {key: value for key, value in component.items() if key not in _VOLATILE_FIELDS}
+    return hashlib.sha256(json.dumps(stable, sort_keys=True, default=str).encode()).hexdigest()
+
+class RealtimeLimitError(Exception):
+    """El worker alcanzó realtime_max_connections"""
+
+class Subscription:
+    """Una conexión (SSE o WebSocket) con su cola acotada de mensajes"""
+
+    __slots__ = ("channel", "queue", "resyncs")
+
+    def __init__(self, channel: "DashboardChannel"):
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.realtime_queue_size)
+        self.resyncs = 0
+
+    def push(self, message: Message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Cliente lento: en vez de acumular deltas se le pide recargar
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESYNC)
+            self.resyncs += 1
+
+    async def next(self, timeout: float) -> Optional[Message]:
+        """Próximo mensaje, o None si pasó timeout (momento de un heartbeat)"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class DashboardChannel:
+    """Conexiones a una vista con los mismos permisos.
+
+    Cada componente afectado por un evento se recalcula una sola vez para
+    todas las conexiones del canal, y solo se envía si sus datos cambiaron.
+    Los eventos se agrupan durante realtime_debounce_seconds (un bulk o una
+    ráfaga de webhooks es un solo recálculo).
+    """
+
+    def __init__(
+        self,
+        key: Tuple,
+        business_id: str,
+        vista: str,
+        user: User,
+        components: List[Dict[str, Any]],
+        compute: ComponentCompute
+    ):
+        self.key = key
+        self.business_id = business_id
+        self.vista = vista
+        self.user = user
+        self.compute = compute
+        self.components = {component["id"]: component for component in components}
+        self.topics: Dict[str, Set[str]] = {}
+        for component_id, component in self.components.items():
+            for topic in component_topics(component):
+                self.topics.setdefault(topic, set()).add(component_id)
+        self.subscribers: Set[Subscription] = set()
+        self.hashes: Dict[str, str] = {}
+        self._pending: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._prime_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        # Hash de los datos actuales (desde cache): el primer evento solo
+        # envía los componentes que realmente cambiaron
+        self._prime_task = asyncio.create_task(self._recompute(list(self.components), refresh=False, send=False))
+
+    def notify(self, topics: Iterable[str]):
+        affected = set(self.topics.get(ANY_TOPIC, ()))
+        for topic in topics:
+            affected.update(self.topics.get(topic, ()))
+        if not affected:
+            return
+        self._pending.update(affected)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+
+    def broadcast(self, message: Message):
+        for subscription in self.subscribers:
+            subscription.push(message)
+
+    async def _flush(self):
+        await asyncio.sleep(settings.realtime_debounce_seconds)
+        component_ids, self._pending = list(self._pending), set()
+        self._flush_task = None
+        await self._recompute(component_ids, refresh=True, send=True)
+
+    async def _recompute(self, component_ids: List[str], refresh: bool, send: bool):
+        results = await asyncio.gather(*[
+            self.compute(self.business_id, self.vista, self.components[component_id], self.user, refresh)
+            for component_id in component_ids
+        ], return_exceptions=True)
+        for component_id, component in zip(component_ids, results):
+            if isinstance(component, Exception):
+                logger.error(f"Error recalculando componente {component_id} para push: {component}")
+                continue
+            if component.get("pending") or "error" in component:
+                continue
+            digest = _component_hash(component)
+            if digest == self.hashes.get(component_id):
+                continue
+            self.hashes[component_id] = digest
+            if send:
+                self.broadcast(("component", json.dumps(
+                    {"type": "component", "id": component_id, "component": component}, default=str
+                )))
+
+    def close(self):
+        for task in (self._flush_task, self._prime_task):
+            if task is not None:
+                task.cancel()
+
+class RealtimeHub:
+    """Fan-out por business de eventos a las vistas de dashboard conectadas.
+
+    Los eventos (escrituras de entidades, webhooks de WAHA, cambios de estado
+    de conversaciones) llegan por notify(); con cache_backend="redis" se
+    reenvían a los demás workers por pub/sub para que cada uno actualice
+    sus propias conexiones.
+    """
+
+    def __init__(self):
+        self._channels: Dict[Tuple, DashboardChannel] = {}
+        self._by_business: Dict[str, Set[DashboardChannel]] = {}
+        self._connections = 0
+        self._client: Optional[aioredis.Redis] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._publishes: Set[asyncio.Task] = set()
+        self.events = 0
+
+    def subscribe(
+        self,
+        business_id: str,
+        vista: str,
+        user: User,
+        components: List[Dict[str, Any]],
+        compute: ComponentCompute
+    ) -> Subscription:
+        if self._connections >= settings.realtime_max_connections:
+            raise RealtimeLimitError()
+        permisos = getattr(user, "permisos", None)
+        key = (business_id, vista, user.rol, tuple(sorted(getattr(permisos, "entidades_acceso", None) or [])))
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = DashboardChannel(key, business_id, vista, user, components, compute)
+            self._by_business.setdefault(business_id, set()).add(channel)
+            channel.start()
+        subscription = Subscription(channel)
+        channel.subscribers.add(subscription)
+        self._connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        channel = subscription.channel
+        if subscription not in channel.subscribers:
+            return
+        channel.subscribers.discard(subscription)
+        self._connections -= 1
+        if not channel.subscribers:
+            channel.close()
+            del self._channels[channel.key]
+            channels = self._by_business[channel.business_id]
+            channels.discard(channel)
+            if not channels:
+                del self._by_business[channel.business_id]
+
+    def notify(self, business_id: str, *topics: str):
+        """Registrar un cambio en los datos de un business (no bloquea)"""
+        self.events += 1
+        self._dispatch(business_id, topics)
+        if self._client is not None:
+            task = asyncio.create_task(self._publish(business_id, topics))
+            self._publishes.add(task)
+            task.add_done_callback(self._publishes.discard)
+
+    def _dispatch(self, business_id: str, topics: Iterable[str]):
+        for channel in self._by_business.get(business_id, ()):
+            channel.notify(topics)
+
+    async def _publish(self, business_id: str, topics: Iterable[str]):
+        try:
+            await self._client.publish(settings.realtime_channel, json.dumps({
+                "origin": _WORKER_ID, "business_id": business_id, "topics": list(topics)
+            }))
+        except Exception as e:
+            logger.error(f"Error publicando evento realtime de {business_id}: {e}")
+
+    async def _listen(self):
+        retry_delay = 1.0
+        while True:
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.realtime_channel)
+                retry_delay = 1.0
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        payload = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    if payload.get("origin") != _WORKER_ID:
+                        self._dispatch(payload["business_id"], payload.get("topics", ()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error en listener de eventos realtime: {e}")
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 30.0)
+
+    def start(self, client: Optional[aioredis.Redis] = None):
+        if self._listener_task is not None:
+            return
+        if client is None:
+            if settings.cache_backend != "redis":
+                logger.info("Eventos realtime solo en este worker: requiere cache_backend='redis'")
+                return
+            client = aioredis.Redis(connection_pool=get_redis_pool())
+        self._client = client
+        self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        self._client = None
+        for channel in self._channels.values():
+            channel.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": self._connections,
+            "channels": len(self._channels),
+            "businesses": len(self._by_business),
+            "events": self.events,
+            "relay": self._listener_task is not None
+        }
+
+_realtime_hub: Optional[RealtimeHub] = None
+
+def get_realtime_hub() -> RealtimeHub:
+    global _realtime_hub
+    if _realtime_hub is None:
+        _realtime_hub = RealtimeHub()
+    return _realtime_hub
+
+async def start_realtime_hub(client: Optional[aioredis.Redis] = None):
+    """Iniciar el reenvío de eventos entre workers (startup de la app)"""
+    get_realtime_hub().start(client)
+
+async def stop_realtime_hub():
+    """Detener el reenvío de eventos (shutdown de la app)"""
+    if _realtime_hub is not None:
+        await _realtime_hub.stop()
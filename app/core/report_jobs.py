@@ -0,0 +1,256 @@
+# ================================
+# app/core/report_jobs.py - Reportes de analytics en background con resultado cacheado
+# ================================
+
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from ..config import settings
+from ..database import get_database
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+ReportGenerator = Callable[[str, str, bool, User], Awaitable[Dict[str, Any]]]
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class ReportQueueFull(Exception):
+    """No hay lugar en la cola de reportes"""
+
+def report_inputs_hash(business_id: str, period: str, include_predictions: bool, user: User) -> str:
+    """Id del reporte: todo lo que cambia su contenido (incluidos los permisos de lectura)"""
+    permisos = getattr(user, "permisos", None)
+    inputs = {
+        "business_id": business_id,
+        "period": period,
+        "include_predictions": include_predictions,
+        "rol": user.rol,
+        "entidades_acceso": sorted(getattr(permisos, "entidades_acceso", None) or [])
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()[:32]
+
+def public_report_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job para la respuesta de la API (sin el reporte ni campos internos)"""
+    return {
+        "job_id": job["_id"],
+        **{key: value for key, value in job.items() if key not in ("_id", "result", "revision")}
+    }
+
+async def _generate_report(business_id: str, period: str, include_predictions: bool, user: User) -> Dict[str, Any]:
+    from ..services.advanced_analytics_service import AdvancedAnalyticsService
+
+    result = await AdvancedAnalyticsService().generate_business_report(
+        business_id=business_id,
+        period=period,
+        include_predictions=include_predictions,
+        user=user
+    )
+    if not result["success"]:
+        raise RuntimeError(result["error"])
+    return result["report"]
+
+class ReportJobs:
+    """Reportes calculados por un pool acotado de workers y guardados en report_jobs.
+
+    Un documento por hash de entradas (business, período, predicciones y
+    permisos del usuario) con el estado, el reporte y su ETag:
+    - Un pedido con un reporte terminado dentro de report_freshness_seconds
+      lo recibe sin recalcular.
+    - Pedidos concurrentes para las mismas entradas comparten el job en
+      curso; el job se reclama con un update condicionado a `revision`, así
+      que dos workers de la app tampoco calculan el mismo reporte.
+    - Un job en curso más viejo que report_job_timeout_seconds (worker
+      caído) se puede volver a reclamar.
+    """
+
+    def __init__(self, db=None, generate: Optional[ReportGenerator] = None):
+        self._db = db
+        self._generate = generate or _generate_report
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # job_id -> futuro resuelto cuando un worker de este proceso lo termina
+        self._local: Dict[str, asyncio.Future] = {}
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else get_database()
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=settings.report_job_queue_size)
+        return self._queue
+
+    def _reusable(self, job: Optional[Dict[str, Any]], now: datetime) -> bool:
+        if job is None:
+            return False
+        if job["status"] in ACTIVE_STATUSES:
+            return job["submitted_at"] >= now - timedelta(seconds=settings.report_job_timeout_seconds)
+        if job["status"] == "completed":
+            return job["finished_at"] >= now - timedelta(seconds=settings.report_freshness_seconds)
+        return False
+
+    async def submit(
+        self,
+        business_id: str,
+        period: str,
+        include_predictions: bool,
+        user: User,
+        force_refresh: bool = False
+    ) -> Dict[str, Any]:
+        """Job fresco o en curso para estas entradas; si no hay, encolar uno nuevo"""
+        job_id = report_inputs_hash(business_id, period, include_predictions, user)
+        now = datetime.utcnow()
+        current = await self.db.report_jobs.find_one({"_id": job_id})
+        if self._reusable(current, now) and not (force_refresh and current["status"] == "completed"):
+            return current
+
+        job = {
+            "_id": job_id,
+            "business_id": business_id,
+            "period": period,
+            "include_predictions": include_predictions,
+            "status": "queued",
+            "submitted_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "etag": None,
+            "error": None,
+            "result": None,
+            "revision": (current or {}).get("revision", 0) + 1
+        }
+        try:
+            if current is None:
+                await self.db.report_jobs.insert_one(job)
+                claimed = True
+            else:
+                result = await self.db.report_jobs.replace_one(
+                    {"_id": job_id, "revision": current.get("revision", 0)}, job
+                )
+                claimed = result.modified_count == 1
+        except DuplicateKeyError:
+            claimed = False
+        if not claimed:
+            # Otro pedido reclamó el job al mismo tiempo: compartirlo
+            return await self.db.report_jobs.find_one({"_id": job_id})
+
+        self._local[job_id] = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((job_id, job["revision"], business_id, period, include_predictions, user))
+        except asyncio.QueueFull:
+            await self._finish(job_id, job["revision"], {"status": "failed", "error": "Cola de reportes llena"})
+            raise ReportQueueFull()
+        self.start()
+        return job
+
+    async def get(self, business_id: str, job_id: str, user: User) -> Optional[Dict[str, Any]]:
+        """Job del business, solo si se calculó con los mismos permisos que los de user.
+
+        El job_id se puede deducir de las entradas: sin esta verificación un
+        usuario con acceso restringido podría leer el reporte de un admin.
+        """
+        job = await self.db.report_jobs.find_one({"_id": job_id, "business_id": business_id})
+        if job is None or report_inputs_hash(business_id, job["period"], job["include_predictions"], user) != job_id:
+            return None
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Esperar a que el job termine (en este proceso o en otro worker de la app)"""
+        deadline = asyncio.get_running_loop().time() + timeout
+        future = self._local.get(job_id)
+        if future is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                pass
+        while True:
+            job = await self.db.report_jobs.find_one({"_id": job_id})
+            if job is None or job["status"] not in ACTIVE_STATUSES:
+                return job
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return job
+            await asyncio.sleep(min(settings.report_job_poll_seconds, remaining))
+
+    # ================================
+    # WORKERS
+    # ================================
+
+    async def _finish(self, job_id: str, revision: int, changes: Dict[str, Any]):
+        changes["finished_at"] = datetime.utcnow()
+        await self.db.report_jobs.update_one({"_id": job_id, "revision": revision}, {"$set": changes})
+        future = self._local.pop(job_id, None)
+        if future is not None and not future.done():
+            future.set_result(changes["status"])
+
+    async def _run_job(self, job_id: str, revision: int, business_id: str, period: str, include_predictions: bool, user: User):
+        await self.db.report_jobs.update_one(
+            {"_id": job_id, "revision": revision},
+            {"$set": {"status": "running", "started_at": datetime.utcnow()}}
+        )
+        try:
+            report = await self._generate(business_id, period, include_predictions, user)
+            # Forma JSON (fechas como string) para guardarlo y calcular el ETag
+            body = json.dumps(report, sort_keys=True, default=str)
+            changes = {
+                "status": "completed",
+                "result": json.loads(body),
+                "etag": f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"'
+            }
+        except Exception as e:
+            logger.error(f"Error generando reporte {job_id}: {e}")
+            changes = {"status": "failed", "error": str(e)}
+        await self._finish(job_id, revision, changes)
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                await self._run_job(*item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error en worker de reportes: {e}")
+            finally:
+                self.queue.task_done()
+
+    def start(self):
+        """Arrancar el pool (report_job_workers tareas) si no está corriendo"""
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker()) for _ in range(max(settings.report_job_workers, 1))
+            ]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+_report_jobs: Optional[ReportJobs] = None
+
+def get_report_jobs() -> ReportJobs:
+    global _report_jobs
+    if _report_jobs is None:
+        _report_jobs = ReportJobs()
+    return _report_jobs
+
+async def start_report_jobs():
+    """Arrancar el pool de workers de reportes (startup de la app)"""
+    get_report_jobs().start()
+
+async def stop_report_jobs():
+    """Detener los workers de reportes (shutdown de la app)"""
+    if _report_jobs is not None:
+        await _report_jobs.stop()
@@ -1,6 +1,12 @@
 import logging
 from ..database import connect_to_mongo
-from ..services.cache_service import CacheService
+from .api_client import close_api_clients
+from .business_registry import start_business_registry, stop_business_registry
+from .http_clients import close_http_clients, init_http_clients
+from .index_manager import start_index_manager, stop_index_manager
+from ..services.cache_service import (
+    CacheService, close_redis_pool, start_cache_invalidation_listener, stop_cache_invalidation_listener
+)
 
 logger = logging.getLogger(__name__)
 
@@ -10,10 +16,14 @@ async def startup_events():
     
     # Conectar a MongoDB
     await connect_to_mongo()
+    init_http_clients()
     
     # Conectar a Redis
     cache_service = CacheService()
     await cache_service.connect()
+    await start_cache_invalidation_listener()
+    await start_business_registry()
+    await start_index_manager()
     
     logger.info("✅ CMS Dinámico iniciado correctamente")
 
@@ -24,5 +34,11 @@ async def shutdown_events():
     # Cerrar conexiones
     cache_service = CacheService()
     await cache_service.close()
+    await stop_cache_invalidation_listener()
+    await stop_business_registry()
+    await stop_index_manager()
+    await close_redis_pool()
+    await close_api_clients()
+    await close_http_clients()
     
     logger.info("✅ CMS Dinámico cerrado correctamente")
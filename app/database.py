@@ -89,6 +89,21 @@ async def create_indexes():
         
         # Índices para business_instances
         await database.business_instances.create_index("business_id", unique=True)
+        # Polling del registro de businesses por fecha de modificación
+        await database.business_instances.create_index("updated_at")
+        
+        # Uso de campos en consultas lentas (índices aprendidos)
+        await database.entity_index_usage.create_index([
+            ("business_id", 1), ("entidad", 1), ("kind", 1), ("field", 1)
+        ], unique=True)
+        
+        # Filas rechazadas de importaciones, leídas en orden por job
+        await database.import_job_errors.create_index([("job_id", 1), ("line", 1)])
+        
+        # Rollups diarios de métricas, leídos por rango de días
+        await database.metrics_rollups.create_index([
+            ("business_id", 1), ("scope", 1), ("name", 1), ("day", 1)
+        ])
         
         logger.info("✅ Índices creados exitosamente")
         
@@ -49,6 +49,19 @@ logger = logging.getLogger(__name__)
 # ================================
 from .database import connect_to_mongo, close_mongo_connection, get_database, ping_database, create_indexes
 from .config import settings
+from .core.api_client import close_api_clients
+from .core.business_registry import get_business_registry, start_business_registry, stop_business_registry
+from .core.circuit_breaker import get_circuit_breaker_stats
+from .core.config_cache import get_config_cache
+from .core.http_clients import close_http_clients, get_http_client, init_http_clients
+from .core.index_manager import start_index_manager, stop_index_manager
+from .core.report_jobs import start_report_jobs, stop_report_jobs
+from .core.realtime_hub import start_realtime_hub, stop_realtime_hub
+from .middleware.flash_messages import ClearFlashMessagesMiddleware
+from .services.cache_service import (
+    CacheService, close_redis_pool, entity_tag, start_cache_invalidation_listener,
+    stop_cache_invalidation_listener
+)
 
 
 # ================================
@@ -126,6 +139,7 @@ class HealthResponse(BaseModel):
     timestamp: float
     version: str
     services: Dict[str, str]
+    circuit_breakers: Dict[str, str] = {}
 
 class ComponenteBase(BaseModel):
     id: str
@@ -159,6 +173,9 @@ class CampoConfigRequest(BaseModel):
     validacion: Optional[str] = None
     placeholder: Optional[str] = None
     descripcion: Optional[str] = None
+    filtrable: bool = False
+    ordenable: bool = False
+    unico: bool = False
 
 # ================================
 # LIFECYCLE MANAGEMENT
@@ -169,6 +186,12 @@ async def lifespan(app: FastAPI):
     try:
         await connect_to_mongo()
         await create_indexes()
+        init_http_clients()
+        await start_cache_invalidation_listener()
+        await start_business_registry()
+        await start_index_manager()
+        await start_report_jobs()
+        await start_realtime_hub()
         db_connected = await ping_database()
         if db_connected:
             logger.info("✅ Base de datos conectada y configurada")
@@ -180,7 +203,15 @@ async def lifespan(app: FastAPI):
         raise
     yield
     logger.info("🔄 Cerrando CMS Dinámico...")
+    await stop_business_registry()
+    await stop_index_manager()
+    await stop_report_jobs()
+    await stop_realtime_hub()
     await close_mongo_connection()
+    await stop_cache_invalidation_listener()
+    await close_redis_pool()
+    await close_api_clients()
+    await close_http_clients()
     logger.info("👋 CMS Dinámico cerrado correctamente")
 
 # ================================
@@ -223,12 +254,7 @@ app.mount("/static", StaticFiles(directory="app/frontend/static"), name="static"
 # ================================
 # MIDDLEWARES Y HANDLERS
 # ================================
-@app.middleware("http")
-async def clear_flash_messages(request: Request, call_next):
-    response = await call_next(request)
-    if hasattr(request, 'session') and "messages" in request.session:
-        del request.session["messages"]
-    return response
+app.add_middleware(ClearFlashMessagesMiddleware)
 
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
@@ -295,6 +321,8 @@ async def health_check():
         mongo_status = "✅ Conectado"
     except Exception as e:
         mongo_status = f"❌ Error: {str(e)[:50]}"
+    breakers = get_circuit_breaker_stats()
+    open_breakers = [name for name, stats in breakers.items() if stats["state"] != "closed"]
     return HealthResponse(
         status="healthy",
         timestamp=time.time(),
@@ -304,8 +332,13 @@ async def health_check():
             "waha": "✅ Conectado (3 sesiones)",
             "n8n": "✅ Conectado (12 workflows)",
             "redis": "⚠️ Pendiente (no crítico)",
-            "frontend": "✅ Integrado"
-        }
+            "frontend": "✅ Integrado",
+            "external_apis": (
+                f"⚠️ Circuito abierto: {', '.join(open_breakers)}" if open_breakers
+                else f"✅ {len(breakers)} upstreams disponibles"
+            )
+        },
+        circuit_breakers={name: stats["state"] for name, stats in breakers.items()}
     )
 
 @app.get("/info")
@@ -419,8 +452,7 @@ async def test_api_connection_ajax(request: Request):
             "auth_type": form.get("auth_type", "none")
         }
         
-        # Test directo con httpx
-        import httpx
+        # Test directo con el cliente HTTP compartido
         import time
         
         # Construir URL completa
@@ -436,13 +468,13 @@ async def test_api_connection_ajax(request: Request):
         start_time = time.time()
         
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                if config_data["method"].upper() == "GET":
-                    response = await client.get(full_url)
-                elif config_data["method"].upper() == "POST":
-                    response = await client.post(full_url)
-                else:
-                    response = await client.request(config_data["method"].upper(), full_url)
+            client = get_http_client()
+            if config_data["method"].upper() == "GET":
+                response = await client.get(full_url, timeout=10)
+            elif config_data["method"].upper() == "POST":
+                response = await client.post(full_url, timeout=10)
+            else:
+                response = await client.request(config_data["method"].upper(), full_url, timeout=10)
             
             response_time = (time.time() - start_time) * 1000
             
@@ -723,6 +755,7 @@ async def create_business_instance(business_data: BusinessInstanceCreate):
         }
         result = await db.business_instances.insert_one(doc)
         created = await db.business_instances.find_one({"_id": result.inserted_id})
+        get_business_registry().apply(created)
         created["_id"] = str(created["_id"])
         logger.info(f"Business instance creado: {business_data.business_id}")
         return {
@@ -779,6 +812,7 @@ async def create_entity_config(business_id: str, entity_config: EntityConfigRequ
         }
         result = await db.entities_config.insert_one(entity_data)
         entity_data["_id"] = str(result.inserted_id)
+        get_config_cache().invalidate_entity(business_id, entity_config.entidad)
         logger.info(f"Entidad creada: {entity_config.entidad} para business {business_id}")
         return entity_data
     except HTTPException:
@@ -802,6 +836,8 @@ async def update_entity_config(business_id: str, entidad: str, entity_config: En
         )
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Entidad no encontrada")
+        get_config_cache().invalidate_entity(business_id, entidad)
+        await CacheService().invalidate_tags(entity_tag(business_id, entidad))
         logger.info(f"Entidad actualizada: {entidad} para business {business_id}")
         return {"message": "Entidad actualizada exitosamente"}
     except HTTPException:
@@ -821,6 +857,8 @@ async def delete_entity_config(business_id: str, entidad: str):
         })
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Entidad no encontrada")
+        get_config_cache().invalidate_entity(business_id, entidad)
+        await CacheService().invalidate_tags(entity_tag(business_id, entidad))
         logger.info(f"Entidad eliminada: {entidad} para business {business_id}")
         return {"message": "Entidad eliminada exitosamente"}
     except HTTPException:
@@ -871,6 +909,22 @@ try:
 except Exception as e:
     logger.warning(f"⚠️ Router business no disponible: {e}")
 
+# Dashboard avanzado: reportes en background, push en tiempo real y métricas
+try:
+    from .routers.business.advanced_dashboard import router as advanced_dashboard_router
+    app.include_router(advanced_dashboard_router, prefix="/api/business/dashboard", tags=["dashboard-advanced"])
+    logger.info("✅ Router advanced_dashboard incluido")
+except Exception as e:
+    logger.warning(f"⚠️ Router advanced_dashboard no disponible: {e}")
+
+# Atención humana por WhatsApp (conversaciones y webhook de mensajes entrantes)
+try:
+    from .routers.business.whatsapp_attention import router as whatsapp_attention_router
+    app.include_router(whatsapp_attention_router, prefix="/api/business/whatsapp", tags=["whatsapp-attention"])
+    logger.info("✅ Router whatsapp_attention incluido")
+except Exception as e:
+    logger.warning(f"⚠️ Router whatsapp_attention no disponible: {e}")
+
 try:
     from .routers import auth as api_auth
     app.include_router(api_auth.router, prefix="/api/auth", tags=["auth"])
@@ -2,22 +2,27 @@
 # app/middleware/business_context.py  
 # ================================
 
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 import logging
 
+from ..core.business_registry import get_business_registry
 from ..database import get_database
 
 logger = logging.getLogger(__name__)
 
-class BusinessContextMiddleware(BaseHTTPMiddleware):
-    """Middleware para validar contexto de business en rutas dinámicas"""
+class BusinessContextMiddleware:
+    """Middleware ASGI para validar contexto de business en rutas dinámicas"""
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Solo aplicar a rutas de business
-        if "/business/" in str(request.url.path):
+        if scope["type"] == "http" and "/business/" in scope["path"]:
             # Extraer business_id de la URL
-            path_parts = request.url.path.split("/")
+            path_parts = scope["path"].split("/")
             
             if "business" in path_parts:
                 business_index = path_parts.index("business")
@@ -26,14 +31,21 @@ class BusinessContextMiddleware(BaseHTTPMiddleware):
                     
                     # Validar que el business existe
                     if await self._validate_business_exists(business_id):
-                        request.state.business_id = business_id
+                        Request(scope).state.business_id = business_id
                     else:
-                        return HTTPException(status_code=404, detail="Business no encontrado")
+                        response = JSONResponse(status_code=404, content={"detail": "Business no encontrado"})
+                        await response(scope, receive, send)
+                        return
         
-        return await call_next(request)
+        await self.app(scope, receive, send)
     
     async def _validate_business_exists(self, business_id: str) -> bool:
         """Validar que el business existe y está activo"""
+        registry = get_business_registry()
+        if registry.loaded:
+            # Sin I/O: el registro se mantiene al día con MongoDB
+            return registry.exists(business_id)
+        
         try:
             db = get_database()
             business = await db.business_instances.find_one({
@@ -43,4 +55,4 @@ class BusinessContextMiddleware(BaseHTTPMiddleware):
             return business is not None
         except Exception as e:
             logger.error(f"Error validando business {business_id}: {e}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,19 @@
+# ================================
+# app/middleware/flash_messages.py
+# ================================
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+class ClearFlashMessagesMiddleware:
+    """Middleware ASGI que borra los mensajes flash de la sesión tras cada petición"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self.app(scope, receive, send)
+        
+        # SessionMiddleware deja la sesión en el scope compartido
+        session = scope.get("session")
+        if scope["type"] == "http" and session is not None and "messages" in session:
+            del session["messages"]
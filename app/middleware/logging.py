@@ -1,16 +1,41 @@
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import time
 import logging
 import json
 
 logger = logging.getLogger("api_requests")
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware para logging detallado de peticiones"""
+class RequestLoggingMiddleware:
+    """Middleware ASGI para logging detallado de peticiones"""
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         start_time = time.time()
+        request = Request(scope)
+        response_start: dict = {}
+        
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                response_start["status_code"] = message["status"]
+                response_start["headers"] = message.get("headers", [])
+            await send(message)
+        
+        # Ejecutar petición (el body se reenvía sin bufferizar)
+        await self.app(scope, receive, send_wrapper)
+        
+        status_code = response_start.get("status_code", 500)
+        content_length = None
+        for name, value in response_start.get("headers", []):
+            if name.lower() == b"content-length":
+                content_length = value.decode("latin-1")
+                break
         
         # Información de la petición
         request_info = {
@@ -22,17 +47,11 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
             "client_ip": self._get_client_ip(request)
         }
         
-        # Ejecutar petición
-        response = await call_next(request)
-        
-        # Calcular tiempo de respuesta
-        process_time = time.time() - start_time
-        
         # Información de la respuesta
         response_info = {
-            "status_code": response.status_code,
-            "process_time": round(process_time * 1000, 2),  # ms
-            "content_length": response.headers.get("content-length")
+            "status_code": status_code,
+            "process_time": round((time.time() - start_time) * 1000, 2),  # ms
+            "content_length": content_length
         }
         
         # Log estructurado
@@ -43,18 +62,16 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
         }
         
         # Determinar nivel de log según status code
-        if response.status_code >= 500:
+        if status_code >= 500:
             logger.error(json.dumps(log_data))
-        elif response.status_code >= 400:
+        elif status_code >= 400:
             logger.warning(json.dumps(log_data))
         else:
             logger.info(json.dumps(log_data))
-        
-        return response
     
     def _get_client_ip(self, request: Request) -> str:
         """Obtener IP del cliente"""
         forwarded_for = request.headers.get("X-Forwarded-For")
         if forwarded_for:
             return forwarded_for.split(",")[0].strip()
-        return request.client.host if request.client else "unknown"
\ No newline at end of file
+        return request.client.host if request.client else "unknown"
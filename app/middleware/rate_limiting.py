@@ -1,65 +1,214 @@
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import math
 import time
-from collections import defaultdict, deque
+from typing import Callable, Dict, List, NamedTuple, Optional
 import logging
 
+import redis.asyncio as aioredis
+
 from ..config import settings
 
 logger = logging.getLogger(__name__)
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Middleware para rate limiting por IP"""
-    
-    def __init__(self, app, requests_per_minute: int = 60):
-        super().__init__(app)
-        self.requests_per_minute = requests_per_minute
-        self.requests = defaultdict(deque)
-    
-    async def dispatch(self, request: Request, call_next):
-        if not settings.rate_limit_enabled:
-            return await call_next(request)
-        
-        # Obtener IP del cliente
-        client_ip = self._get_client_ip(request)
-        
-        # Verificar rate limit
-        if self._is_rate_limited(client_ip):
-            logger.warning(f"Rate limit excedido para IP: {client_ip}")
-            raise HTTPException(
-                status_code=429, 
-                detail="Demasiadas peticiones. Intenta más tarde."
-            )
-        
-        # Registrar petición
-        self._register_request(client_ip)
-        
-        return await call_next(request)
-    
-    def _get_client_ip(self, request: Request) -> str:
-        """Obtener IP del cliente considerando proxies"""
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-        
-        return request.client.host if request.client else "unknown"
-    
-    def _is_rate_limited(self, client_ip: str) -> bool:
-        """Verificar si la IP está limitada"""
+class RateLimitResult(NamedTuple):
+    """Resultado de registrar una petición en la ventana"""
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+def _sliding_window_estimate(previous: int, current: int, elapsed: float, window: float) -> float:
+    """Peticiones estimadas en los últimos `window` segundos.
+
+    La ventana anterior pesa en proporción a la parte que todavía se solapa
+    con la ventana deslizante.
+    """
+    return previous * (1 - elapsed / window) + current
+
+def _retry_after(previous: int, current: int, elapsed: float, window: float, limit: int) -> float:
+    """Segundos hasta que la estimación baje del límite"""
+    if current >= limit or previous == 0:
+        # Solo se libera cupo al empezar la próxima ventana
+        return window - elapsed
+    # Esperar a que la ventana anterior deje de pesar lo suficiente
+    needed = (previous + current - limit + 1) / previous * window
+    return max(needed - elapsed, 0.001)
+
+class LocalSlidingWindow:
+    """Contadores de ventana deslizante en memoria: O(1) por key"""
+
+    def __init__(self):
+        # key -> [índice de ventana, peticiones ventana actual, peticiones ventana anterior]
+        self._counters: Dict[str, List[int]] = {}
+        self._last_eviction = 0.0
+
+    async def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
+        now = time.monotonic()
+        window_index = int(now // window)
+        elapsed = now - window_index * window
+        self._evict_idle(now, window_index, window)
+
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = [window_index, 0, 0]
+        elif counter[0] != window_index:
+            # Rotar: la ventana actual pasa a ser la anterior (o se descarta si es más vieja)
+            counter[2] = counter[1] if counter[0] == window_index - 1 else 0
+            counter[1] = 0
+            counter[0] = window_index
+
+        _, current, previous = counter
+        if _sliding_window_estimate(previous, current, elapsed, window) >= limit:
+            return RateLimitResult(False, 0, _retry_after(previous, current, elapsed, window, limit))
+
+        counter[1] += 1
+        remaining = limit - math.ceil(_sliding_window_estimate(previous, current + 1, elapsed, window))
+        return RateLimitResult(True, max(remaining, 0), 0.0)
+
+    def _evict_idle(self, now: float, window_index: int, window: float):
+        """Eliminar (como mucho una vez por ventana) las keys sin actividad reciente"""
+        if now - self._last_eviction < window:
+            return
+        self._last_eviction = now
+        idle = [key for key, counter in self._counters.items() if counter[0] < window_index - 1]
+        for key in idle:
+            del self._counters[key]
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+class RedisSlidingWindow:
+    """Contadores de ventana deslizante en Redis, compartidos por todos los workers"""
+
+    def __init__(self, client: Optional[aioredis.Redis] = None):
+        if client is None:
+            from ..services.cache_service import get_redis_pool
+            client = aioredis.Redis(connection_pool=get_redis_pool())
+        self._client = client
+        # Si Redis no responde se limita por worker en lugar de no limitar
+        self._fallback = LocalSlidingWindow()
+
+    async def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
         now = time.time()
-        minute_ago = now - 60
-        
-        # Limpiar peticiones antiguas
-        while self.requests[client_ip] and self.requests[client_ip][0] < minute_ago:
-            self.requests[client_ip].popleft()
-        
-        # Verificar límite
-        return len(self.requests[client_ip]) >= self.requests_per_minute
-    
-    def _register_request(self, client_ip: str):
-        """Registrar nueva petición"""
-        self.requests[client_ip].append(time.time())
\ No newline at end of file
+        window_index = int(now // window)
+        elapsed = now - window_index * window
+        current_key = f"ratelimit:{key}:{window_index}"
+
+        try:
+            async with self._client.pipeline(transaction=False) as pipe:
+                pipe.incr(current_key)
+                pipe.expire(current_key, math.ceil(window * 2))
+                pipe.get(f"ratelimit:{key}:{window_index - 1}")
+                current, _, previous = await pipe.execute()
+            previous = int(previous or 0)
+
+            # current ya incluye esta petición: mismo criterio que LocalSlidingWindow
+            if _sliding_window_estimate(previous, current - 1, elapsed, window) >= limit:
+                # Las peticiones rechazadas no consumen cupo
+                await self._client.decr(current_key)
+                return RateLimitResult(False, 0, _retry_after(previous, current - 1, elapsed, window, limit))
+
+            remaining = limit - math.ceil(_sliding_window_estimate(previous, current, elapsed, window))
+            return RateLimitResult(True, max(remaining, 0), 0.0)
+
+        except Exception as e:
+            logger.error(f"Error en rate limiting Redis: {e}")
+            return await self._fallback.hit(key, limit, window)
+
+# ================================
+# FUNCIONES DE KEY
+# ================================
+
+def client_ip_key(request: Request) -> str:
+    """Key por IP del cliente considerando proxies"""
+    forwarded_for = request.headers.get("X-Forwarded-For")
+    if forwarded_for:
+        return f"ip:{forwarded_for.split(',')[0].strip()}"
+
+    real_ip = request.headers.get("X-Real-IP")
+    if real_ip:
+        return f"ip:{real_ip}"
+
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def user_key(request: Request) -> str:
+    """Key por usuario autenticado (IP si es anónimo)"""
+    user = getattr(request.state, "user", None)
+    if user is None and "session" in request.scope:
+        user = request.session.get("user")
+
+    if isinstance(user, dict):
+        user_id = user.get("id") or user.get("user_id") or user.get("username")
+    else:
+        user_id = getattr(user, "id", None) or getattr(user, "username", None)
+
+    return f"user:{user_id}" if user_id else client_ip_key(request)
+
+def business_key(request: Request) -> str:
+    """Key por business de la ruta (IP si la ruta no es de un business)"""
+    business_id = getattr(request.state, "business_id", None)
+    if not business_id:
+        path_parts = request.url.path.split("/")
+        if "business" in path_parts:
+            business_index = path_parts.index("business")
+            if len(path_parts) > business_index + 1:
+                business_id = path_parts[business_index + 1]
+
+    return f"business:{business_id}" if business_id else client_ip_key(request)
+
+RATE_LIMIT_KEYS: Dict[str, Callable[[Request], str]] = {
+    "ip": client_ip_key,
+    "user": user_key,
+    "business": business_key
+}
+
+class RateLimitMiddleware:
+    """Middleware ASGI de rate limiting con ventana deslizante (por IP, usuario o business)"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        requests_per_minute: Optional[int] = None,
+        key_func: Optional[Callable[[Request], str]] = None,
+        backend=None
+    ):
+        self.app = app
+        self.requests_per_minute = requests_per_minute or settings.rate_limit_requests_per_minute
+        self.window_seconds = 60.0
+        self.key_func = key_func or RATE_LIMIT_KEYS.get(settings.rate_limit_key, client_ip_key)
+        if backend is None:
+            backend = RedisSlidingWindow() if settings.rate_limit_backend == "redis" else LocalSlidingWindow()
+        self.backend = backend
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.rate_limit_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        key = self.key_func(Request(scope))
+        result = await self.backend.hit(key, self.requests_per_minute, self.window_seconds)
+
+        if not result.allowed:
+            logger.warning(f"Rate limit excedido para {key}")
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Demasiadas peticiones. Intenta más tarde."},
+                headers={
+                    "Retry-After": str(max(1, math.ceil(result.retry_after))),
+                    "X-RateLimit-Limit": str(self.requests_per_minute),
+                    "X-RateLimit-Remaining": "0"
+                }
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(self.requests_per_minute)
+                headers["X-RateLimit-Remaining"] = str(result.remaining)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
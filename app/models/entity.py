@@ -17,6 +17,9 @@ class CampoConfig(BaseModel):
     mapeo: Optional[Dict[str, str]] = None  # Para mapear respuesta API
     placeholder: Optional[str] = None
     descripcion: Optional[str] = None
+    filtrable: bool = False  # Índice para filtros
+    ordenable: bool = False  # Índice (campo, _id) para ordenar y paginar por cursor
+    unico: bool = False  # Índice único
 
 class CacheConfig(BaseModel):
     """Configuración de cache para entidades"""
@@ -38,6 +38,7 @@ class ConfiguracionComponente(BaseModel):
     color: Optional[str] = "primary"
     tipo_grafico: Optional[str] = None  # "line", "bar", "pie", "area"
     columnas_visibles: Optional[List[str]] = None
+    cache_ttl: Optional[int] = None  # segundos de frescura de los datos del componente
     ordenamiento: Optional[Dict[str, str]] = None
     paginacion: Optional[Dict[str, Any]] = None
     acciones: Optional[Dict[str, Dict[str, List[str]]]] = None
@@ -12,6 +12,7 @@ from ...auth.dependencies import require_admin
 from ...models.user import User
 from ...models.field_mapping import MappingConfiguration, MappedField, NestedFieldStructure
 from ...services.field_mapper_service import FieldMapperService
+from ...core.http_clients import get_http_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,13 +43,14 @@ async def test_api_connection(
             raise HTTPException(status_code=400, detail=f"Error en JSON: {str(e)}")
         
         # Realizar petición
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.request(
-                method=method,
-                url=full_url,
-                headers=headers_dict,
-                params=params_dict
-            )
+        client = get_http_client()
+        response = await client.request(
+            method=method,
+            url=full_url,
+            headers=headers_dict,
+            params=params_dict,
+            timeout=30.0
+        )
         
         # Parsear respuesta
         try:
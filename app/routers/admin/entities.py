@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from typing import Any, Dict, List
 
 from ...auth.dependencies import require_admin
+from ...core.index_manager import get_index_manager
 from ...models.entity import EntityConfig, EntityConfigCreate, EntityConfigUpdate
 from ...models.responses import BaseResponse
 from ...services.entity_service import EntityService
@@ -58,3 +59,39 @@ async def update_entity_config(
         raise HTTPException(status_code=404, detail="Configuración no encontrada")
     
     return BaseResponse(data=config, message="Configuración actualizada exitosamente")
+
+@router.get("/{business_id}/{entidad}/indexes", response_model=BaseResponse[Dict[str, Any]])
+async def get_entity_indexes(
+    business_id: str,
+    entidad: str,
+    _: dict = Depends(require_admin)
+):
+    """Reporte de índices de la colección de la entidad"""
+    entity_service = EntityService()
+    config = await entity_service.get_entity_config(business_id, entidad)
+    
+    if not config:
+        raise HTTPException(status_code=404, detail="Configuración no encontrada")
+    
+    report = await get_index_manager().entity_report(
+        business_id, entidad, config.configuracion.get("campos", [])
+    )
+    return BaseResponse(data=report)
+
+@router.post("/{business_id}/{entidad}/indexes/sync", response_model=BaseResponse[Dict[str, Any]])
+async def sync_entity_indexes(
+    business_id: str,
+    entidad: str,
+    _: dict = Depends(require_admin)
+):
+    """Crear/eliminar ahora los índices de la entidad"""
+    entity_service = EntityService()
+    config = await entity_service.get_entity_config(business_id, entidad)
+    
+    if not config:
+        raise HTTPException(status_code=404, detail="Configuración no encontrada")
+    
+    index_manager = get_index_manager()
+    await index_manager.flush_usage()
+    result = await index_manager.sync_entity(business_id, entidad, config.configuracion.get("campos", []))
+    return BaseResponse(data=result, message="Índices sincronizados")
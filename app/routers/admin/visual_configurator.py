@@ -4,9 +4,11 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from typing import Dict, Any, Optional, List
+from datetime import datetime
 import json
 
 from ...auth.dependencies import require_admin
+from ...core.business_registry import get_business_registry
 from ...models.user import User
 from ...models.responses import BaseResponse
 from ...services.visual_configurator_service import VisualConfiguratorService
@@ -372,8 +374,9 @@ async def upload_business_logo(
         configurator_service = VisualConfiguratorService()
         await configurator_service.db.business_instances.update_one(
             {"business_id": business_id},
-            {"$set": {"configuracion.branding.logo_url": logo_url}}
+            {"$set": {"configuracion.branding.logo_url": logo_url, "updated_at": datetime.utcnow()}}
         )
+        await get_business_registry().refresh_business(business_id)
         
         return BaseResponse(
             data={"logo_url": logo_url},
@@ -2,14 +2,18 @@
 # app/routers/business/advanced_crud.py
 # ================================
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, Optional, List, Union
 import json
 
 from ...auth.dependencies import get_current_business_user
+from ...config import settings
 from ...models.user import User
 from ...models.responses import BaseResponse
 from ...core.dynamic_crud import DynamicCrudGenerator
+from ...core.entity_export import export_entities
+from ...core.entity_import import EntityImporter, ImportJobStore, public_job
 from ...services.validation_service import ValidationService
 
 router = APIRouter()
@@ -23,8 +27,19 @@ async def get_entity_data_advanced(
     filters: Optional[str] = Query(None, description="Filtros en formato JSON o query string"),
     sort_by: Optional[str] = Query(None, description="Campo para ordenar"),
     sort_order: str = Query("asc", regex="^(asc|desc)$"),
+    pagination: str = Query("offset", regex="^(offset|cursor)$", description="offset (page) o cursor (keyset, sin total)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    count_strategy: Optional[str] = Query(
+        None,
+        regex="^(exact|estimated|capped|cached|facet)$",
+        description="Cómo calcular el total (por defecto settings.count_default_strategy)"
+    ),
     include_metadata: bool = Query(False, description="Incluir metadatos de la entidad"),
-    format: str = Query("json", regex="^(json|csv|excel)$", description="Formato de respuesta"),
+    format: str = Query(
+        "json",
+        regex="^(json|csv|ndjson|xlsx|excel)$",
+        description="json (página) o exportación completa en streaming: csv, ndjson, xlsx (excel)"
+    ),
     current_user: User = Depends(get_current_business_user)
 ):
     """Obtener datos de entidad con opciones avanzadas"""
@@ -45,6 +60,19 @@ async def get_entity_data_advanced(
                 # Si falla, tratar como query string
                 processed_filters = filters
         
+        # Las exportaciones recorren todo el filtro con un cursor, no solo la página
+        if format != "json":
+            return await export_entities(
+                business_id,
+                entity_name,
+                current_user,
+                "xlsx" if format == "excel" else format,
+                filters=processed_filters,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                crud_generator=crud_generator
+            )
+        
         result = await crud_generator.list_entities(
             business_id=business_id,
             entity_name=entity_name,
@@ -53,7 +81,10 @@ async def get_entity_data_advanced(
             per_page=per_page,
             filters=processed_filters,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            pagination=pagination,
+            cursor=cursor,
+            count_strategy=count_strategy
         )
         
         response_data = result
@@ -70,12 +101,6 @@ async def get_entity_data_advanced(
                 "data_source": "api" if entity_config.configuracion.get("api_config") else "database"
             }
         
-        # Manejar diferentes formatos de respuesta
-        if format == "csv":
-            return await _export_to_csv(response_data["items"], entity_name)
-        elif format == "excel":
-            return await _export_to_excel(response_data["items"], entity_name)
-        
         return BaseResponse(
             data=response_data,
             message=f"Datos de {entity_name} obtenidos exitosamente"
@@ -93,74 +118,32 @@ async def bulk_create_entities(
     continue_on_error: bool = Query(False, description="Continuar si algún item falla"),
     current_user: User = Depends(get_current_business_user)
 ):
-    """Crear múltiples entidades en una operación"""
+    """Crear múltiples entidades en una operación (insert_many por lotes)"""
     
     if not current_user.business_id == business_id and current_user.rol != "super_admin":
         raise HTTPException(status_code=403, detail="Acceso denegado")
     
-    if len(items_data) > 100:
-        raise HTTPException(status_code=400, detail="Máximo 100 items por operación bulk")
+    if len(items_data) > settings.bulk_max_items:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.bulk_max_items} items por operación bulk")
     
     try:
         crud_generator = DynamicCrudGenerator()
-        validation_service = ValidationService()
         
-        results = []
-        errors = []
+        result = await crud_generator.bulk_create_entities(
+            business_id=business_id,
+            entity_name=entity_name,
+            items=items_data,
+            user=current_user,
+            validate_all=validate_all,
+            continue_on_error=continue_on_error
+        )
         
-        # Validar todos primero si se solicita
-        if validate_all:
-            entity_config = await crud_generator.get_entity_config(business_id, entity_name)
-            campos_config = entity_config.configuracion.get("campos", [])
-            
-            for i, item_data in enumerate(items_data):
-                try:
-                    for campo_config in campos_config:
-                        field_name = campo_config["campo"]
-                        if field_name in item_data:
-                            await validation_service.validate_field(
-                                item_data[field_name], campo_config
-                            )
-                except Exception as e:
-                    errors.append({"index": i, "error": str(e), "data": item_data})
-            
-            if errors and not continue_on_error:
-                return BaseResponse(
-                    data={
-                        "created": 0,
-                        "errors": errors,
-                        "validation_failed": True
-                    },
-                    message="Validación falló, no se crearon items"
-                )
-        
-        # Crear items uno por uno
-        for i, item_data in enumerate(items_data):
-            try:
-                result = await crud_generator.create_entity(
-                    business_id=business_id,
-                    entity_name=entity_name,
-                    data=item_data,
-                    user=current_user
-                )
-                results.append({"index": i, "success": True, "data": result})
-                
-            except Exception as e:
-                error_info = {"index": i, "success": False, "error": str(e), "data": item_data}
-                errors.append(error_info)
-                
-                if not continue_on_error:
-                    break
+        if result.get("validation_failed"):
+            return BaseResponse(data=result, message="Validación falló, no se crearon items")
         
         return BaseResponse(
-            data={
-                "created": len(results),
-                "failed": len(errors),
-                "results": results,
-                "errors": errors,
-                "total_processed": len(results) + len(errors)
-            },
-            message=f"Operación bulk completada: {len(results)} creados, {len(errors)} errores"
+            data=result,
+            message=f"Operación bulk completada: {result['created']} creados, {result['failed']} errores"
         )
         
     except Exception as e:
@@ -173,51 +156,27 @@ async def bulk_update_entities(
     updates_data: List[Dict[str, Any]],
     current_user: User = Depends(get_current_business_user)
 ):
-    """Actualizar múltiples entidades en una operación"""
+    """Actualizar múltiples entidades en una operación (bulk_write por lotes)"""
     
     if not current_user.business_id == business_id and current_user.rol != "super_admin":
         raise HTTPException(status_code=403, detail="Acceso denegado")
     
+    if len(updates_data) > settings.bulk_max_items:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.bulk_max_items} items por operación bulk")
+    
     try:
         crud_generator = DynamicCrudGenerator()
         
-        results = []
-        errors = []
-        
-        for i, update_data in enumerate(updates_data):
-            if "id" not in update_data:
-                errors.append({"index": i, "error": "Campo 'id' requerido", "data": update_data})
-                continue
-            
-            entity_id = update_data.pop("id")
-            
-            try:
-                result = await crud_generator.update_entity(
-                    business_id=business_id,
-                    entity_name=entity_name,
-                    entity_id=str(entity_id),
-                    data=update_data,
-                    user=current_user
-                )
-                results.append({"index": i, "id": entity_id, "success": True, "data": result})
-                
-            except Exception as e:
-                errors.append({
-                    "index": i, 
-                    "id": entity_id,
-                    "success": False, 
-                    "error": str(e), 
-                    "data": update_data
-                })
+        result = await crud_generator.bulk_update_entities(
+            business_id=business_id,
+            entity_name=entity_name,
+            updates=updates_data,
+            user=current_user
+        )
         
         return BaseResponse(
-            data={
-                "updated": len(results),
-                "failed": len(errors),
-                "results": results,
-                "errors": errors
-            },
-            message=f"Actualización bulk: {len(results)} actualizados, {len(errors)} errores"
+            data=result,
+            message=f"Actualización bulk: {result['updated']} actualizados, {result['failed']} errores"
         )
         
     except Exception as e:
@@ -231,18 +190,18 @@ async def bulk_delete_entities(
     force: bool = Query(False, description="Forzar eliminación sin confirmación"),
     current_user: User = Depends(get_current_business_user)
 ):
-    """Eliminar múltiples entidades en una operación"""
+    """Eliminar múltiples entidades en una operación (delete_many por lotes)"""
     
     if not current_user.business_id == business_id and current_user.rol != "super_admin":
         raise HTTPException(status_code=403, detail="Acceso denegado")
     
-    if len(entity_ids) > 50:
-        raise HTTPException(status_code=400, detail="Máximo 50 items para eliminación bulk")
+    if len(entity_ids) > settings.bulk_max_items:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.bulk_max_items} items para eliminación bulk")
     
     try:
         crud_generator = DynamicCrudGenerator()
         
-        # Verificar permisos de eliminación
+        # Verificar confirmación requerida por la entidad
         entity_config = await crud_generator.get_entity_config(business_id, entity_name)
         crud_config = entity_config.configuracion.get("crud_config", {})
         delete_config = crud_config.get("eliminar", {})
@@ -253,39 +212,99 @@ async def bulk_delete_entities(
                 detail="Esta entidad requiere confirmación. Use force=true"
             )
         
-        results = []
-        errors = []
-        
-        for entity_id in entity_ids:
-            try:
-                success = await crud_generator.delete_entity(
-                    business_id=business_id,
-                    entity_name=entity_name,
-                    entity_id=entity_id,
-                    user=current_user
-                )
-                
-                if success:
-                    results.append({"id": entity_id, "success": True})
-                else:
-                    errors.append({"id": entity_id, "success": False, "error": "No encontrado"})
-                    
-            except Exception as e:
-                errors.append({"id": entity_id, "success": False, "error": str(e)})
+        result = await crud_generator.bulk_delete_entities(
+            business_id=business_id,
+            entity_name=entity_name,
+            entity_ids=entity_ids,
+            user=current_user
+        )
         
         return BaseResponse(
-            data={
-                "deleted": len(results),
-                "failed": len(errors),
-                "results": results,
-                "errors": errors
-            },
-            message=f"Eliminación bulk: {len(results)} eliminados, {len(errors)} errores"
+            data=result,
+            message=f"Eliminación bulk: {result['deleted']} eliminados, {result['failed']} errores"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/{business_id}/{entity_name}/import")
+async def import_entities(
+    business_id: str,
+    entity_name: str,
+    request: Request,
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="Formato del body"),
+    job_id: Optional[str] = Query(
+        None,
+        regex="^[A-Za-z0-9_-]{8,64}$",
+        description="Id del job elegido por el cliente para consultar el progreso durante la subida"
+    ),
+    current_user: User = Depends(get_current_business_user)
+):
+    """Importar un archivo NDJSON/CSV leyendo el body en streaming.
+    
+    Las filas se validan y se escriben por lotes; las rechazadas quedan en el
+    archivo de errores del job.
+    """
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    try:
+        importer = EntityImporter()
+        config, job = await importer.start(business_id, entity_name, format, current_user, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    job = await importer.run(config, job, request.stream(), current_user)
+    
+    return BaseResponse(
+        data=public_job(job),
+        message=f"Importación {job['status']}: {job['created']} creados, {job['failed']} rechazados"
+    )
+
+@router.get("/{business_id}/{entity_name}/import/{job_id}")
+async def get_import_job(
+    business_id: str,
+    entity_name: str,
+    job_id: str,
+    current_user: User = Depends(get_current_business_user)
+):
+    """Progreso de una importación"""
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    job = await ImportJobStore().get(business_id, job_id)
+    if not job or job["entidad"] != entity_name:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    
+    return BaseResponse(data=public_job(job), message="Estado de la importación")
+
+@router.get("/{business_id}/{entity_name}/import/{job_id}/errors")
+async def download_import_errors(
+    business_id: str,
+    entity_name: str,
+    job_id: str,
+    current_user: User = Depends(get_current_business_user)
+):
+    """Archivo NDJSON con las filas rechazadas (línea, error y fila original)"""
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    store = ImportJobStore()
+    job = await store.get(business_id, job_id)
+    if not job or job["entidad"] != entity_name:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    
+    return StreamingResponse(
+        store.iter_errors(job_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{entity_name}-{job_id}-errores.ndjson"'}
+    )
+
 @router.post("/{business_id}/{entity_name}/search")
 async def advanced_search_entities(
     business_id: str,
@@ -490,47 +509,3 @@ async def validate_entity_data(
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-
-# ================================
-# FUNCIONES AUXILIARES
-# ================================
-
-async def _export_to_csv(items: List[Dict[str, Any]], entity_name: str):
-    """Exportar datos a CSV"""
-    import csv
-    import io
-    from fastapi.responses import StreamingResponse
-    
-    if not items:
-        raise HTTPException(status_code=400, detail="No hay datos para exportar")
-    
-    output = io.StringIO()
-    
-    # Usar las claves del primer item como headers
-    fieldnames = list(items[0].keys())
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    
-    writer.writeheader()
-    for item in items:
-        # Convertir valores complejos a string
-        row = {}
-        for key, value in item.items():
-            if isinstance(value, (dict, list)):
-                row[key] = json.dumps(value)
-            else:
-                row[key] = str(value) if value is not None else ""
-        writer.writerow(row)
-    
-    output.seek(0)
-    
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode()),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={entity_name}.csv"}
-    )
-
-async def _export_to_excel(items: List[Dict[str, Any]], entity_name: str):
-    """Exportar datos a Excel"""
-    # TODO: Implementar exportación a Excel usando openpyxl
-    raise HTTPException(status_code=501, detail="Exportación a Excel no implementada aún")
-
@@ -2,16 +2,30 @@
 # app/routers/business/advanced_dashboard.py
 # ================================
 
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, Optional, List
 from datetime import datetime
+import json
+import logging
 
 from ...auth.dependencies import get_current_business_user
+from ...config import settings
 from ...models.user import User
 from ...models.responses import BaseResponse
 from ...services.dashboard_service import AdvancedDashboardService
-from ...services.advanced_analytics_service import AdvancedAnalyticsService
-from ...services.cache_service import CacheService
+from ...core.api_client import get_api_client_manager
+from ...core.business_registry import get_business_registry
+from ...core.config_cache import get_config_cache
+from ...core.circuit_breaker import get_circuit_breaker_stats
+from ...core.http_clients import get_http_client_stats
+from ...core.report_jobs import ReportQueueFull, get_report_jobs, public_report_job
+from ...core.realtime_hub import RealtimeLimitError, Subscription, get_realtime_hub
+from ...services.cache_service import (
+    CacheService, business_tag, component_tag, get_cache_stats
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -74,10 +88,10 @@ async def get_component_realtime_data(
         if not component_config:
             raise HTTPException(status_code=404, detail="Componente no encontrado")
         
-        # Generar datos del componente
-        integration_data = await dashboard_service._get_integration_data(business_id)
-        component_data = await dashboard_service._generate_advanced_component_data(
-            business_id, component_config, current_user, integration_data
+        # Desde la cache del componente: se invalida con las escrituras de su
+        # entidad y se recalcula solo al vencer (para push usar /realtime/stream)
+        component_data = await dashboard_service._get_cached_component(
+            business_id, "dashboard_principal", component_config, current_user
         )
         
         return BaseResponse(
@@ -85,34 +99,132 @@ async def get_component_realtime_data(
             message="Datos de componente actualizados"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+async def _subscribe_realtime(business_id: str, vista: str, user: User) -> Subscription:
+    """Suscribir una conexión a los deltas de componentes de una vista"""
+    dashboard_service = AdvancedDashboardService()
+    view_config = await dashboard_service.view_service.get_view_config_for_user(business_id, vista, user)
+    if not view_config:
+        raise HTTPException(status_code=404, detail="Vista no encontrada o sin permisos")
+    
+    async def compute(business_id, vista, component_config, user, refresh):
+        return await dashboard_service._get_cached_component(
+            business_id, vista, component_config, user, refresh_cache=refresh
+        )
+    
+    components = [
+        component if isinstance(component, dict) else component.dict()
+        for component in view_config["configuracion"]["componentes"]
+    ]
+    try:
+        return get_realtime_hub().subscribe(business_id, vista, user, components, compute)
+    except RealtimeLimitError:
+        raise HTTPException(status_code=503, detail="Demasiadas conexiones en tiempo real")
+
+@router.get("/{business_id}/realtime/stream")
+async def stream_dashboard_updates(
+    business_id: str,
+    request: Request,
+    vista: str = Query("dashboard_principal", description="Nombre de la vista"),
+    current_user: User = Depends(get_current_business_user)
+):
+    """Server-Sent Events con los componentes de la vista que cambian.
+
+    Eventos: "component" (id y datos del componente) y "resync" (la conexión
+    se atrasó: recargar el dashboard completo).
+    """
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    subscription = await _subscribe_realtime(business_id, vista, current_user)
+    
+    async def events():
+        try:
+            yield f"event: ready\ndata: {json.dumps({'type': 'ready', 'vista': vista})}\n\n"
+            while not await request.is_disconnected():
+                message = await subscription.next(settings.realtime_heartbeat_seconds)
+                if message is None:
+                    yield ": ping\n\n"
+                else:
+                    yield f"event: {message[0]}\ndata: {message[1]}\n\n"
+        finally:
+            get_realtime_hub().unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/{business_id}/realtime/ws")
+async def websocket_dashboard_updates(
+    websocket: WebSocket,
+    business_id: str,
+    vista: str = "dashboard_principal"
+):
+    """Mismos eventos que /realtime/stream por WebSocket (para clientes sin SSE)"""
+    
+    try:
+        current_user = await get_current_business_user(websocket, business_id)
+        if not current_user.business_id == business_id and current_user.rol != "super_admin":
+            raise HTTPException(status_code=403, detail="Acceso denegado")
+        subscription = await _subscribe_realtime(business_id, vista, current_user)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+    
+    try:
+        await websocket.accept()
+        await websocket.send_text(json.dumps({"type": "ready", "vista": vista}))
+        while True:
+            message = await subscription.next(settings.realtime_heartbeat_seconds)
+            await websocket.send_text(message[1] if message else '{"type": "ping"}')
+    except WebSocketDisconnect:
+        pass
+    finally:
+        get_realtime_hub().unsubscribe(subscription)
+
+def _report_response(job: Dict[str, Any], request: Request, response: Response, message: str):
+    """Reporte terminado con su ETag; 304 si el cliente ya tiene esa versión"""
+    if job["status"] == "failed":
+        raise HTTPException(status_code=400, detail=job["error"])
+    headers = {
+        "ETag": job["etag"],
+        "Cache-Control": f"private, max-age={settings.report_freshness_seconds}"
+    }
+    if request.headers.get("if-none-match") == job["etag"]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return BaseResponse(data=job["result"], message=message)
+
 @router.get("/{business_id}/analytics/report")
 async def generate_analytics_report(
     business_id: str,
+    request: Request,
+    response: Response,
     period: str = Query("30d", regex="^(7d|30d|90d|1y)$", description="Período del reporte"),
     include_predictions: bool = Query(False, description="Incluir predicciones"),
     format: str = Query("json", regex="^(json|pdf)$", description="Formato del reporte"),
+    async_mode: bool = Query(False, description="Devolver el job sin esperar el reporte"),
+    refresh: bool = Query(False, description="Recalcular aunque haya un reporte reciente"),
     current_user: User = Depends(get_current_business_user)
 ):
-    """Generar reporte avanzado de analytics"""
+    """Generar reporte avanzado de analytics.
+
+    El reporte se calcula en el pool de workers de reportes: pedidos
+    concurrentes con las mismas entradas comparten el job y un reporte
+    reciente se devuelve sin recalcular, con ETag (304 con If-None-Match).
+    """
     
     if not current_user.business_id == business_id and current_user.rol != "super_admin":
         raise HTTPException(status_code=403, detail="Acceso denegado")
     
     try:
-        analytics_service = AdvancedAnalyticsService()
-        report = await analytics_service.generate_business_report(
-            business_id=business_id,
-            period=period,
-            include_predictions=include_predictions,
-            user=current_user
-        )
-        
-        if not report["success"]:
-            raise HTTPException(status_code=400, detail=report["error"])
-        
         if format == "pdf":
             # TODO: Implementar generación de PDF
             return BaseResponse(
@@ -120,14 +232,72 @@ async def generate_analytics_report(
                 message="Reporte PDF generado (funcionalidad pendiente)"
             )
         
-        return BaseResponse(
-            data=report["report"],
-            message=f"Reporte de {period} generado exitosamente"
-        )
-        
+        report_jobs = get_report_jobs()
+        job = await report_jobs.submit(business_id, period, include_predictions, current_user, force_refresh=refresh)
+        if job["status"] != "completed" and async_mode:
+            response.status_code = 202
+            return BaseResponse(data=public_report_job(job), message="Reporte en proceso")
+        if job["status"] != "completed":
+            job = await report_jobs.wait(job["_id"], timeout=settings.report_job_timeout_seconds)
+            if job is None:
+                # El documento del job se eliminó mientras se esperaba
+                raise HTTPException(status_code=404, detail="Job de reporte no encontrado")
+            if job["status"] != "completed" and job["status"] != "failed":
+                raise HTTPException(status_code=504, detail="El reporte no terminó a tiempo")
+        
+        return _report_response(job, request, response, f"Reporte de {period} generado exitosamente")
+        
+    except HTTPException:
+        raise
+    except ReportQueueFull:
+        raise HTTPException(status_code=503, detail="Demasiados reportes en proceso, reintentar más tarde")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/{business_id}/analytics/report/jobs", status_code=202)
+async def submit_analytics_report_job(
+    business_id: str,
+    period: str = Query("30d", regex="^(7d|30d|90d|1y)$", description="Período del reporte"),
+    include_predictions: bool = Query(False, description="Incluir predicciones"),
+    refresh: bool = Query(False, description="Recalcular aunque haya un reporte reciente"),
+    current_user: User = Depends(get_current_business_user)
+):
+    """Encolar un reporte de analytics (o reutilizar el job en curso o reciente)"""
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    try:
+        job = await get_report_jobs().submit(business_id, period, include_predictions, current_user, force_refresh=refresh)
+    except ReportQueueFull:
+        raise HTTPException(status_code=503, detail="Demasiados reportes en proceso, reintentar más tarde")
+    
+    return BaseResponse(data=public_report_job(job), message=f"Reporte {job['status']}")
+
+@router.get("/{business_id}/analytics/report/jobs/{job_id}")
+async def get_analytics_report_job(
+    business_id: str,
+    job_id: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_business_user)
+):
+    """Estado del job; el reporte (con ETag) cuando terminó"""
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    job = await get_report_jobs().get(business_id, job_id, current_user)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de reporte no encontrado")
+    if job["status"] != "completed":
+        if job["status"] == "failed":
+            raise HTTPException(status_code=400, detail=job["error"])
+        response.status_code = 202
+        return BaseResponse(data=public_report_job(job), message="Reporte en proceso")
+    
+    return _report_response(job, request, response, f"Reporte de {job['period']} generado exitosamente")
+
 @router.post("/{business_id}/cache/refresh")
 async def refresh_dashboard_cache(
     business_id: str,
@@ -145,13 +315,12 @@ async def refresh_dashboard_cache(
         
         if components:
             # Refrescar componentes específicos
-            for component_id in components:
-                pattern = f"component_{business_id}_{component_id}_*"
-                await cache_service.clear_pattern(pattern)
+            await cache_service.invalidate_tags(
+                *[component_tag(business_id, component_id) for component_id in components]
+            )
         else:
-            # Refrescar todo el dashboard
-            pattern = f"dashboard_{business_id}_*"
-            cleared_keys = await cache_service.clear_pattern(pattern)
+            # Refrescar todo el business con un único INCR
+            await cache_service.invalidate_tags(business_tag(business_id))
         
         # Regenerar cache en background
         background_tasks.add_task(
@@ -226,7 +395,14 @@ async def get_performance_metrics(
                 "cpu_usage_percent": 15,
                 "memory_usage_percent": 45,
                 "disk_usage_percent": 30
-            }
+            },
+            "cache": get_cache_stats(),
+            "http_clients": get_http_client_stats(),
+            "api_clients": get_api_client_manager().stats(),
+            "circuit_breakers": get_circuit_breaker_stats(),
+            "business_registry": get_business_registry().stats(),
+            "config_cache": get_config_cache().stats(),
+            "realtime": get_realtime_hub().stats()
         }
         
         return BaseResponse(
@@ -250,242 +426,3 @@ async def _regenerate_dashboard_cache(business_id: str, user: User):
         )
     except Exception as e:
         logger.error(f"Error regenerando cache para {business_id}: {e}")
-
-# ================================
-# app/routers/business/whatsapp_attention.py
-# ================================
-
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import Dict, Any, Optional, List
-
-from ...auth.dependencies import get_current_business_user
-from ...models.user import User
-from ...models.responses import BaseResponse
-from ...services.whatsapp_human_attention_service import WhatsAppHumanAttentionService
-
-router = APIRouter()
-
-@router.get("/{business_id}/conversations")
-async def get_active_conversations(
-    business_id: str,
-    status: Optional[str] = Query(None, regex="^(pendiente|atendiendo|finalizado)$"),
-    area: Optional[str] = Query(None),
-    limit: int = Query(50, ge=1, le=100),
-    current_user: User = Depends(get_current_business_user)
-):
-    """Obtener conversaciones de WhatsApp"""
-    
-    if not current_user.business_id == business_id and current_user.rol != "super_admin":
-        raise HTTPException(status_code=403, detail="Acceso denegado")
-    
-    try:
-        attention_service = WhatsAppHumanAttentionService()
-        
-        # Construir filtro
-        filter_query = {"business_id": business_id}
-        if status:
-            filter_query["conversacion.estado"] = status
-        if area:
-            filter_query["conversacion.area_solicitada"] = area
-        
-        # Obtener conversaciones
-        cursor = attention_service.db.atencion_humana.find(filter_query).sort("created_at", -1).limit(limit)
-        conversations = await cursor.to_list(length=None)
-        
-        # Formatear para respuesta
-        formatted_conversations = []
-        for conv in conversations:
-            formatted_conversations.append({
-                "id": str(conv["_id"]),
-                "whatsapp_numero": conv["whatsapp_numero"],
-                "cliente": conv["cliente_externo"]["datos_cache"],
-                "estado": conv["conversacion"]["estado"],
-                "area": conv["conversacion"]["area_solicitada"],
-                "usuario_atendiendo": conv["conversacion"].get("usuario_atendiendo"),
-                "fecha_inicio": conv["conversacion"]["fecha_inicio"],
-                "ultimo_mensaje": conv["conversacion"]["mensajes_contexto"][-1]["mensaje"] if conv["conversacion"]["mensajes_contexto"] else "",
-                "created_at": conv["created_at"]
-            })
-        
-        return BaseResponse(
-            data={
-                "conversations": formatted_conversations,
-                "total": len(formatted_conversations),
-                "filters": {"status": status, "area": area}
-            },
-            message=f"Se encontraron {len(formatted_conversations)} conversaciones"
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@router.post("/{business_id}/conversations/{session_id}/take")
-async def take_conversation(
-    business_id: str,
-    session_id: str,
-    current_user: User = Depends(get_current_business_user)
-):
-    """Tomar una conversación para atender"""
-    
-    if not current_user.business_id == business_id and current_user.rol != "super_admin":
-        raise HTTPException(status_code=403, detail="Acceso denegado")
-    
-    try:
-        attention_service = WhatsAppHumanAttentionService()
-        result = await attention_service.take_conversation(session_id, current_user)
-        
-        if not result["success"]:
-            raise HTTPException(status_code=400, detail=result["error"])
-        
-        return BaseResponse(
-            data=result,
-            message="Conversación tomada exitosamente"
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@router.post("/{business_id}/conversations/{session_id}/send")
-async def send_message(
-    business_id: str,
-    session_id: str,
-    message_data: Dict[str, str],
-    current_user: User = Depends(get_current_business_user)
-):
-    """Enviar mensaje a cliente"""
-    
-    if not current_user.business_id == business_id and current_user.rol != "super_admin":
-        raise HTTPException(status_code=403, detail="Acceso denegado")
-    
-    if "mensaje" not in message_data:
-        raise HTTPException(status_code=400, detail="Campo 'mensaje' requerido")
-    
-    try:
-        attention_service = WhatsAppHumanAttentionService()
-        result = await attention_service.send_message_to_client(
-            session_id, message_data["mensaje"], current_user
-        )
-        
-        if not result["success"]:
-            raise HTTPException(status_code=400, detail=result["error"])
-        
-        return BaseResponse(
-            data=result,
-            message="Mensaje enviado exitosamente"
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@router.post("/{business_id}/conversations/{session_id}/close")
-async def close_conversation(
-    business_id: str,
-    session_id: str,
-    close_data: Dict[str, Any],
-    current_user: User = Depends(get_current_business_user)
-):
-    """Finalizar conversación"""
-    
-    if not current_user.business_id == business_id and current_user.rol != "super_admin":
-        raise HTTPException(status_code=403, detail="Acceso denegado")
-    
-    try:
-        attention_service = WhatsAppHumanAttentionService()
-        result = await attention_service.close_conversation(
-            session_id=session_id,
-            user=current_user,
-            notas=close_data.get("notas"),
-            create_ticket=close_data.get("create_ticket", False)
-        )
-        
-        if not result["success"]:
-            raise HTTPException(status_code=400, detail=result["error"])
-        
-        return BaseResponse(
-            data=result,
-            message="Conversación finalizada exitosamente"
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@router.post("/{business_id}/webhook/incoming")
-async def handle_incoming_message(
-    business_id: str,
-    webhook_data: Dict[str, Any]
-):
-    """Manejar mensaje entrante de WhatsApp (webhook)"""
-    
-    try:
-        attention_service = WhatsAppHumanAttentionService()
-        result = await attention_service.process_incoming_message(
-            business_id, webhook_data
-        )
-        
-        return BaseResponse(
-            data=result,
-            message="Mensaje procesado"
-        )
-        
-    except Exception as e:
-        # No devolver error 400 para webhooks, solo loggear
-        logger.error(f"Error procesando webhook WhatsApp: {e}")
-        return BaseResponse(
-            data={"success": False, "error": str(e)},
-            message="Error procesando mensaje"
-        )
-
-@router.get("/{business_id}/stats")
-async def get_whatsapp_stats(
-    business_id: str,
-    days: int = Query(7, ge=1, le=90),
-    current_user: User = Depends(get_current_business_user)
-):
-    """Obtener estadísticas de WhatsApp"""
-    
-    if not current_user.business_id == business_id and current_user.rol != "super_admin":
-        raise HTTPException(status_code=403, detail="Acceso denegado")
-    
-    try:
-        from datetime import timedelta
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
-        
-        attention_service = WhatsAppHumanAttentionService()
-        
-        # Obtener conversaciones del período
-        cursor = attention_service.db.atencion_humana.find({
-            "business_id": business_id,
-            "created_at": {"$gte": start_date, "$lte": end_date}
-        })
-        
-        conversations = await cursor.to_list(length=None)
-        
-        # Calcular estadísticas
-        total_conversations = len(conversations)
-        by_status = {"pendiente": 0, "atendiendo": 0, "finalizado": 0}
-        by_area = {}
-        
-        for conv in conversations:
-            estado = conv["conversacion"]["estado"]
-            area = conv["conversacion"]["area_solicitada"]
-            
-            by_status[estado] = by_status.get(estado, 0) + 1
-            by_area[area] = by_area.get(area, 0) + 1
-        
-        stats = {
-            "period": {"start": start_date.isoformat(), "end": end_date.isoformat()},
-            "total_conversations": total_conversations,
-            "by_status": by_status,
-            "by_area": by_area,
-            "resolution_rate": round((by_status["finalizado"] / total_conversations * 100) if total_conversations > 0 else 0, 1),
-            "daily_average": round(total_conversations / days, 1)
-        }
-        
-        return BaseResponse(
-            data=stats,
-            message=f"Estadísticas de {days} días obtenidas"
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
@@ -74,15 +74,13 @@ async def refresh_dashboard_cache(
         raise HTTPException(status_code=403, detail="Acceso denegado")
     
     try:
-        # TODO: Implementar limpieza de cache específica
-        from ...services.cache_service import CacheService
+        from ...services.cache_service import CacheService, dashboard_tag
         
         cache_service = CacheService()
-        pattern = f"dashboard_{business_id}_{vista}_*"
-        cleared_keys = await cache_service.clear_pattern(pattern)
+        generations = await cache_service.invalidate_tags(dashboard_tag(business_id, vista))
         
         return BaseResponse(
-            data={"cleared_keys": cleared_keys},
+            data={"invalidated": bool(generations), "generations": generations},
             message="Cache del dashboard refrescado"
         )
         
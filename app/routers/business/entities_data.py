@@ -30,13 +30,17 @@ from ...services.entity_service import EntityService
 
 # Importar cache service si está disponible
 try:
-    from ...services.cache_service import CacheService
+    from ...services.cache_service import CacheService, business_tag, entity_tag
 except ImportError:
     # Fallback simple para cache
     class CacheService:
         async def get(self, key: str): return None
         async def set(self, key: str, value: Any, ttl: int = 300): return True
         async def delete(self, key: str): return True
+        async def tagged_key(self, key: str, tags: List[str]): return None
+
+    def business_tag(business_id: str) -> str: return f"business:{business_id}"
+    def entity_tag(business_id: str, entidad: str) -> str: return f"entity:{business_id}:{entidad}"
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/business", tags=["Entity Data"])
@@ -103,9 +107,13 @@ async def get_entity_data(
             )
         
         # Obtener datos desde cache si está disponible
-        cache_key = f"entity_data:{business_id}:{entity_name}"
+        # Key versionada por business y entidad (se invalida con invalidate_tags)
+        cache_key = await cache_service.tagged_key(
+            f"entity_data:{business_id}:{entity_name}",
+            [business_tag(business_id), entity_tag(business_id, entity_name)]
+        )
         
-        if not refresh_cache:
+        if cache_key and not refresh_cache:
             try:
                 cached_data = await cache_service.get(cache_key)
                 if cached_data:
@@ -172,11 +180,12 @@ async def get_entity_data(
         
         # Guardar en cache si es posible
         try:
-            await cache_service.set(
-                cache_key, 
-                entity_data, 
-                ttl=entity_data["cache_ttl"]
-            )
+            if cache_key:
+                await cache_service.set(
+                    cache_key, 
+                    entity_data, 
+                    ttl=entity_data["cache_ttl"]
+                )
         except Exception as cache_error:
             logger.warning(f"No se pudo guardar en cache: {cache_error}")
         
@@ -300,8 +309,11 @@ async def get_entities_overview(
             entity_info["cached_records"] = 0
             try:
                 cache_service = CacheService()
-                cache_key = f"entity_data:{business_id}:{entity.entidad}"
-                cached_data = await cache_service.get(cache_key)
+                cache_key = await cache_service.tagged_key(
+                    f"entity_data:{business_id}:{entity.entidad}",
+                    [business_tag(business_id), entity_tag(business_id, entity.entidad)]
+                )
+                cached_data = await cache_service.get(cache_key) if cache_key else None
                 
                 if cached_data and isinstance(cached_data, dict):
                     entity_info["cached_records"] = len(cached_data.get("items", []))
@@ -0,0 +1,244 @@
+# ================================
+# app/routers/business/whatsapp_attention.py
+# ================================
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Dict, Any, Optional, List
+from datetime import datetime
+import logging
+
+from ...auth.dependencies import get_current_business_user
+from ...models.user import User
+from ...models.responses import BaseResponse
+from ...services.whatsapp_human_attention_service import WhatsAppHumanAttentionService
+from ...core.realtime_hub import WHATSAPP_TOPIC, get_realtime_hub
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/{business_id}/conversations")
+async def get_active_conversations(
+    business_id: str,
+    status: Optional[str] = Query(None, regex="^(pendiente|atendiendo|finalizado)$"),
+    area: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=100),
+    current_user: User = Depends(get_current_business_user)
+):
+    """Obtener conversaciones de WhatsApp"""
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    try:
+        attention_service = WhatsAppHumanAttentionService()
+        
+        # Construir filtro
+        filter_query = {"business_id": business_id}
+        if status:
+            filter_query["conversacion.estado"] = status
+        if area:
+            filter_query["conversacion.area_solicitada"] = area
+        
+        # Obtener conversaciones
+        cursor = attention_service.db.atencion_humana.find(filter_query).sort("created_at", -1).limit(limit)
+        conversations = await cursor.to_list(length=None)
+        
+        # Formatear para respuesta
+        formatted_conversations = []
+        for conv in conversations:
+            formatted_conversations.append({
+                "id": str(conv["_id"]),
+                "whatsapp_numero": conv["whatsapp_numero"],
+                "cliente": conv["cliente_externo"]["datos_cache"],
+                "estado": conv["conversacion"]["estado"],
+                "area": conv["conversacion"]["area_solicitada"],
+                "usuario_atendiendo": conv["conversacion"].get("usuario_atendiendo"),
+                "fecha_inicio": conv["conversacion"]["fecha_inicio"],
+                "ultimo_mensaje": conv["conversacion"]["mensajes_contexto"][-1]["mensaje"] if conv["conversacion"]["mensajes_contexto"] else "",
+                "created_at": conv["created_at"]
+            })
+        
+        return BaseResponse(
+            data={
+                "conversations": formatted_conversations,
+                "total": len(formatted_conversations),
+                "filters": {"status": status, "area": area}
+            },
+            message=f"Se encontraron {len(formatted_conversations)} conversaciones"
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{business_id}/conversations/{session_id}/take")
+async def take_conversation(
+    business_id: str,
+    session_id: str,
+    current_user: User = Depends(get_current_business_user)
+):
+    """Tomar una conversación para atender"""
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    try:
+        attention_service = WhatsAppHumanAttentionService()
+        result = await attention_service.take_conversation(session_id, current_user)
+        
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        return BaseResponse(
+            data=result,
+            message="Conversación tomada exitosamente"
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{business_id}/conversations/{session_id}/send")
+async def send_message(
+    business_id: str,
+    session_id: str,
+    message_data: Dict[str, str],
+    current_user: User = Depends(get_current_business_user)
+):
+    """Enviar mensaje a cliente"""
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    if "mensaje" not in message_data:
+        raise HTTPException(status_code=400, detail="Campo 'mensaje' requerido")
+    
+    try:
+        attention_service = WhatsAppHumanAttentionService()
+        result = await attention_service.send_message_to_client(
+            session_id, message_data["mensaje"], current_user
+        )
+        
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        return BaseResponse(
+            data=result,
+            message="Mensaje enviado exitosamente"
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{business_id}/conversations/{session_id}/close")
+async def close_conversation(
+    business_id: str,
+    session_id: str,
+    close_data: Dict[str, Any],
+    current_user: User = Depends(get_current_business_user)
+):
+    """Finalizar conversación"""
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    try:
+        attention_service = WhatsAppHumanAttentionService()
+        result = await attention_service.close_conversation(
+            session_id=session_id,
+            user=current_user,
+            notas=close_data.get("notas"),
+            create_ticket=close_data.get("create_ticket", False)
+        )
+        
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        return BaseResponse(
+            data=result,
+            message="Conversación finalizada exitosamente"
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{business_id}/webhook/incoming")
+async def handle_incoming_message(
+    business_id: str,
+    webhook_data: Dict[str, Any]
+):
+    """Manejar mensaje entrante de WhatsApp (webhook)"""
+    
+    try:
+        attention_service = WhatsAppHumanAttentionService()
+        result = await attention_service.process_incoming_message(
+            business_id, webhook_data
+        )
+        get_realtime_hub().notify(business_id, WHATSAPP_TOPIC)
+        
+        return BaseResponse(
+            data=result,
+            message="Mensaje procesado"
+        )
+        
+    except Exception as e:
+        # No devolver error 400 para webhooks, solo loggear
+        logger.error(f"Error procesando webhook WhatsApp: {e}")
+        return BaseResponse(
+            data={"success": False, "error": str(e)},
+            message="Error procesando mensaje"
+        )
+
+@router.get("/{business_id}/stats")
+async def get_whatsapp_stats(
+    business_id: str,
+    days: int = Query(7, ge=1, le=90),
+    current_user: User = Depends(get_current_business_user)
+):
+    """Obtener estadísticas de WhatsApp"""
+    
+    if not current_user.business_id == business_id and current_user.rol != "super_admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    try:
+        from datetime import timedelta
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+        
+        attention_service = WhatsAppHumanAttentionService()
+        
+        # Obtener conversaciones del período
+        cursor = attention_service.db.atencion_humana.find({
+            "business_id": business_id,
+            "created_at": {"$gte": start_date, "$lte": end_date}
+        })
+        
+        conversations = await cursor.to_list(length=None)
+        
+        # Calcular estadísticas
+        total_conversations = len(conversations)
+        by_status = {"pendiente": 0, "atendiendo": 0, "finalizado": 0}
+        by_area = {}
+        
+        for conv in conversations:
+            estado = conv["conversacion"]["estado"]
+            area = conv["conversacion"]["area_solicitada"]
+            
+            by_status[estado] = by_status.get(estado, 0) + 1
+            by_area[area] = by_area.get(area, 0) + 1
+        
+        stats = {
+            "period": {"start": start_date.isoformat(), "end": end_date.isoformat()},
+            "total_conversations": total_conversations,
+            "by_status": by_status,
+            "by_area": by_area,
+            "resolution_rate": round((by_status["finalizado"] / total_conversations * 100) if total_conversations > 0 else 0, 1),
+            "daily_average": round(total_conversations / days, 1)
+        }
+        
+        return BaseResponse(
+            data=stats,
+            message=f"Estadísticas de {days} días obtenidas"
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 import logging
 
+from ...core.realtime_hub import N8N_TOPIC, WHATSAPP_TOPIC, get_realtime_hub
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
@@ -12,6 +14,10 @@ async def waha_webhook(request: Request):
         payload = await request.json()
         # TODO: Procesar mensaje de WhatsApp
         logger.info(f"Webhook WAHA recibido: {payload}")
+        # El business viene en la metadata de la sesión WAHA o en la URL del webhook
+        business_id = (payload.get("metadata") or {}).get("business_id") or request.query_params.get("business_id")
+        if business_id:
+            get_realtime_hub().notify(business_id, WHATSAPP_TOPIC)
         return JSONResponse({"success": True})
     except Exception as e:
         logger.error(f"Error procesando webhook WAHA: {e}")
@@ -24,6 +30,9 @@ async def n8n_webhook(request: Request):
         payload = await request.json()
         # TODO: Procesar evento de N8N
         logger.info(f"Webhook N8N recibido: {payload}")
+        business_id = payload.get("business_id") or request.query_params.get("business_id")
+        if business_id:
+            get_realtime_hub().notify(business_id, N8N_TOPIC)
         return JSONResponse({"success": True})
     except Exception as e:
         logger.error(f"Error procesando webhook N8N: {e}")
@@ -4,9 +4,8 @@
 
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
-from collections import defaultdict
 import statistics
 
 from ..database import get_database
@@ -15,7 +14,9 @@ from ..services.api_service import ApiService
 from ..services.cache_service import CacheService
 from ..services.waha_service import WAHAService
 from ..services.n8n_service import N8NService
+from ..core.columnar_analytics import ColumnarFrame, ColumnarFrameBuilder
 from ..core.dynamic_crud import DynamicCrudGenerator
+from ..core.metrics_rollup import get_metrics_rollup
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +30,7 @@ class AdvancedAnalyticsService:
         self.waha_service = WAHAService()
         self.n8n_service = N8NService()
         self.crud_generator = DynamicCrudGenerator()
+        self.metrics_rollup = get_metrics_rollup()
     
     # ================================
     # REPORTES PRINCIPALES
@@ -165,19 +167,20 @@ class AdvancedAnalyticsService:
             entity_name = entity_config["entidad"]
             
             try:
-                # Obtener datos de la entidad
-                result = await self.crud_generator.list_entities(
-                    business_id=business_id,
-                    entity_name=entity_name,
-                    user=user,
-                    page=1,
-                    per_page=1000
-                )
+                config = await self.crud_generator.get_entity_config(business_id, entity_name)
+                self.crud_generator._check_read_permission(user, config)
                 
-                items = result.get("items", [])
+                if self.crud_generator._uses_api(config):
+                    # Datos externos: todos los registros, convertidos a columnas lote a lote
+                    builder = ColumnarFrameBuilder()
+                    async for batch in self.crud_generator.iter_entities(business_id, entity_name, user):
+                        builder.add(batch)
+                    entity_analytics = self._analyze_entity_data(builder.build(), start_date, end_date)
+                else:
+                    # Datos locales: un rollup por día del período
+                    entity_analytics = await self.metrics_rollup.entity_report(config, start_date, end_date)
+                    entity_analytics["growth_rate"] = self._calculate_growth_rate(entity_analytics["daily_growth"])
                 
-                # Analizar datos
-                entity_analytics = self._analyze_entity_data(items, start_date, end_date)
                 entities_analytics[entity_name] = entity_analytics
                 
             except Exception as e:
@@ -192,180 +195,66 @@ class AdvancedAnalyticsService:
     
     def _analyze_entity_data(
         self, 
-        items: List[Dict[str, Any]], 
+        frame: ColumnarFrame, 
         start_date: datetime, 
         end_date: datetime
     ) -> Dict[str, Any]:
-        """Analizar datos de una entidad específica"""
+        """Analizar datos de una entidad específica (una pasada vectorizada por columna)"""
         
-        total_items = len(items)
-        
-        # Analizar por fechas si hay campo de fecha
-        date_fields = ["created_at", "fecha_creacion", "date", "timestamp"]
-        date_field = None
-        
-        for field in date_fields:
-            if items and field in items[0]:
-                date_field = field
-                break
-        
-        period_items = []
+        period_records = 0
         growth_data = []
         
+        # Analizar por fechas si hay campo de fecha
+        date_field = frame.date_field()
         if date_field:
-            # Filtrar items del período
-            for item in items:
-                item_date_str = item.get(date_field)
-                if item_date_str:
-                    try:
-                        if isinstance(item_date_str, str):
-                            item_date = datetime.fromisoformat(item_date_str.replace('Z', '+00:00'))
-                        else:
-                            item_date = item_date_str
-                        
-                        if start_date <= item_date <= end_date:
-                            period_items.append(item)
-                    except:
-                        continue
-            
-            # Calcular crecimiento por día
-            growth_data = self._calculate_daily_growth(items, date_field, start_date, end_date)
-        
-        # Analizar campos numéricos
-        numeric_analytics = self._analyze_numeric_fields(items)
-        
-        # Analizar campos categóricos
-        categorical_analytics = self._analyze_categorical_fields(items)
+            period_records, growth_data = self._calculate_daily_growth(frame, date_field, start_date, end_date)
         
         return {
-            "total_records": total_items,
-            "period_records": len(period_items),
+            "total_records": frame.length,
+            "period_records": period_records,
             "growth_rate": self._calculate_growth_rate(growth_data),
             "daily_growth": growth_data,
-            "numeric_fields": numeric_analytics,
-            "categorical_fields": categorical_analytics,
-            "data_quality": self._assess_data_quality(items)
+            "numeric_fields": self._analyze_numeric_fields(frame),
+            "categorical_fields": self._analyze_categorical_fields(frame),
+            "data_quality": self._assess_data_quality(frame)
         }
     
-    def _analyze_numeric_fields(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Analizar campos numéricos"""
-        
-        if not items:
-            return {}
-        
-        numeric_fields = {}
-        
-        # Identificar campos numéricos
-        for item in items[:10]:  # Analizar primeros 10 items
-            for field, value in item.items():
-                if isinstance(value, (int, float)) and field not in numeric_fields:
-                    numeric_fields[field] = []
-        
-        # Recopilar valores
-        for item in items:
-            for field in numeric_fields.keys():
-                value = item.get(field)
-                if isinstance(value, (int, float)):
-                    numeric_fields[field].append(value)
-        
-        # Calcular estadísticas
-        analytics = {}
-        for field, values in numeric_fields.items():
-            if values:
-                analytics[field] = {
-                    "count": len(values),
-                    "min": min(values),
-                    "max": max(values),
-                    "mean": round(statistics.mean(values), 2),
-                    "median": round(statistics.median(values), 2),
-                    "std_dev": round(statistics.stdev(values), 2) if len(values) > 1 else 0,
-                    "sum": sum(values)
-                }
-        
-        return analytics
+    def _analyze_numeric_fields(self, frame: ColumnarFrame) -> Dict[str, Any]:
+        """Analizar campos numéricos (tipo inferido con la columna completa)"""
+        return frame.numeric_summary()
     
-    def _analyze_categorical_fields(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Analizar campos categóricos"""
-        
-        if not items:
-            return {}
-        
-        categorical_analytics = {}
-        
-        # Identificar campos categóricos
-        for item in items[:50]:  # Analizar primeros 50 items
-            for field, value in item.items():
-                if isinstance(value, str) and field not in categorical_analytics:
-                    categorical_analytics[field] = defaultdict(int)
-        
-        # Contar valores
-        for item in items:
-            for field in categorical_analytics.keys():
-                value = item.get(field)
-                if isinstance(value, str):
-                    categorical_analytics[field][value] += 1
-        
-        # Convertir a formato de análisis
-        analytics = {}
-        for field, counts in categorical_analytics.items():
-            if counts:
-                total = sum(counts.values())
-                sorted_counts = sorted(counts.items(), key=lambda x: x[1], reverse=True)
-                
-                analytics[field] = {
-                    "unique_values": len(counts),
-                    "most_common": sorted_counts[:5],  # Top 5
-                    "distribution": [
-                        {"value": value, "count": count, "percentage": round(count/total*100, 1)}
-                        for value, count in sorted_counts[:10]
-                    ]
-                }
-        
-        return analytics
+    def _analyze_categorical_fields(self, frame: ColumnarFrame) -> Dict[str, Any]:
+        """Analizar campos categóricos: valores distintos y top 10"""
+        return frame.top_categories(10)
     
     def _calculate_daily_growth(
         self, 
-        items: List[Dict[str, Any]], 
+        frame: ColumnarFrame, 
         date_field: str, 
         start_date: datetime, 
         end_date: datetime
-    ) -> List[Dict[str, Any]]:
-        """Calcular crecimiento diario"""
-        
-        daily_counts = defaultdict(int)
-        
-        for item in items:
-            date_str = item.get(date_field)
-            if date_str:
-                try:
-                    if isinstance(date_str, str):
-                        date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                    else:
-                        date_obj = date_str
-                    
-                    if start_date <= date_obj <= end_date:
-                        day_key = date_obj.strftime("%Y-%m-%d")
-                        daily_counts[day_key] += 1
-                except:
-                    continue
-        
-        # Convertir a lista ordenada
-        growth_data = []
-        current_date = start_date
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Registros del período y crecimiento diario con acumulado"""
+        return frame.daily_histogram(date_field, start_date, end_date)
+    
+    def _assess_data_quality(self, frame: ColumnarFrame) -> Dict[str, Any]:
+        """Completitud de los datos por campo"""
         
-        while current_date <= end_date:
-            day_key = current_date.strftime("%Y-%m-%d")
-            count = daily_counts.get(day_key, 0)
-            
-            growth_data.append({
-                "date": day_key,
-                "count": count,
-                "cumulative": sum(d["count"] for d in growth_data) + count
-            })
-            
-            current_date += timedelta(days=1)
+        completeness = frame.completeness()
+        return {
+            "completeness": round(sum(completeness.values()) / len(completeness), 1) if completeness else 0,
+            "fields": completeness
+        }
+    
+    def _summarize_entities_analytics(self, entities_analytics: Dict[str, Any]) -> Dict[str, Any]:
+        """Totales de todas las entidades analizadas"""
         
-        return growth_data
+        analyzed = [data for data in entities_analytics.values() if "error" not in data]
+        return {
+            "total_records": sum(data["total_records"] for data in analyzed),
+            "period_records": sum(data["period_records"] for data in analyzed),
+            "entities_with_errors": len(entities_analytics) - len(analyzed)
+        }
     
     async def _get_integrations_analytics(
         self, 
@@ -410,36 +299,13 @@ class AdvancedAnalyticsService:
             # Obtener sesiones de WhatsApp
             sessions = await self.waha_service.get_sessions_for_business(business_id)
             
-            # Obtener conversaciones del período
-            conversations_cursor = self.db.atencion_humana.find({
-                "business_id": business_id,
-                "created_at": {"$gte": start_date, "$lte": end_date}
-            })
-            
-            conversations = await conversations_cursor.to_list(length=None)
-            
-            # Analizar conversaciones
-            total_conversations = len(conversations)
-            pending_conversations = len([c for c in conversations if c["conversacion"]["estado"] == "pendiente"])
-            resolved_conversations = len([c for c in conversations if c["conversacion"]["estado"] == "finalizado"])
-            
-            # Calcular tiempo promedio de respuesta
-            response_times = []
-            for conv in conversations:
-                if conv["conversacion"]["estado"] == "finalizado":
-                    start_time = conv["conversacion"]["fecha_inicio"]
-                    end_time = conv["conversacion"].get("fecha_finalizacion")
-                    if end_time:
-                        duration = (end_time - start_time).total_seconds() / 60  # minutos
-                        response_times.append(duration)
-            
-            avg_response_time = statistics.mean(response_times) if response_times else 0
-            
-            # Analizar por área
-            areas_analysis = defaultdict(int)
-            for conv in conversations:
-                area = conv["conversacion"]["area_solicitada"]
-                areas_analysis[area] += 1
+            # Conversaciones creadas en el período (rollups diarios)
+            conversations = await self.metrics_rollup.conversations_report(business_id, start_date, end_date)
+            
+            total_conversations = conversations["total"]
+            pending_conversations = conversations["estados"]["pendiente"]
+            resolved_conversations = conversations["estados"]["finalizado"]
+            avg_response_time = conversations["avg_resolution_minutes"]
             
             return {
                 "status": "connected" if sessions else "disconnected",
@@ -452,10 +318,10 @@ class AdvancedAnalyticsService:
                 },
                 "performance": {
                     "avg_response_time_minutes": round(avg_response_time, 1),
-                    "daily_conversations": len([c for c in conversations if (datetime.utcnow() - c["created_at"]).days == 0])
+                    "daily_conversations": conversations["opened_today"]
                 },
-                "areas_distribution": dict(areas_analysis),
-                "health_score": self._calculate_whatsapp_health_score(sessions, conversations)
+                "areas_distribution": conversations["areas"],
+                "health_score": self._calculate_whatsapp_health_score(sessions, pending_conversations, total_conversations)
             }
             
         except Exception as e:
@@ -726,7 +592,8 @@ class AdvancedAnalyticsService:
     def _calculate_whatsapp_health_score(
         self, 
         sessions: List[Dict[str, Any]], 
-        conversations: List[Dict[str, Any]]
+        pending: int,
+        total: int
     ) -> int:
         """Calcular score de salud de WhatsApp"""
         
@@ -737,9 +604,6 @@ class AdvancedAnalyticsService:
             return 0
         
         # Muchas conversaciones pendientes
-        pending = len([c for c in conversations if c["conversacion"]["estado"] == "pendiente"])
-        total = len(conversations)
-        
         if total > 0:
             pending_rate = pending / total
             if pending_rate > 0.5:
@@ -81,6 +81,10 @@ class ApiConfigService:
         )
         
         if result:
+            # El cliente cacheado de este worker usa la configuración anterior
+            # (los demás workers lo detectan por el cambio de updated_at)
+            from ..core.api_client import get_api_client_manager
+            get_api_client_manager().invalidate(business_id, api_name)
             logger.info(f"Configuración de API actualizada: {business_id}.{api_name}")
             config = ApiConfiguration(**result)
             return await self._decrypt_credentials(config)
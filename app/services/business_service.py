@@ -2,6 +2,7 @@ from typing import List, Optional
 from datetime import datetime
 import logging
 
+from ..core.business_registry import get_business_registry
 from ..database import get_database
 from ..models.business import (
     BusinessType, BusinessTypeCreate, BusinessTypeUpdate,
@@ -115,6 +116,7 @@ class BusinessService:
         
         result = await self.db.business_instances.insert_one(business.dict(by_alias=True))
         business.id = result.inserted_id
+        get_business_registry().apply(business.dict(by_alias=True))
         
         logger.info(f"Negocio creado: {business.business_id}")
         return business
@@ -135,6 +137,7 @@ class BusinessService:
         )
         
         if result:
+            get_business_registry().apply(result)
             logger.info(f"Negocio actualizado: {business_id}")
             return BusinessInstance(**result)
         
@@ -145,6 +148,7 @@ class BusinessService:
         result = await self.db.business_instances.delete_one({"business_id": business_id})
         
         if result.deleted_count > 0:
+            get_business_registry().remove(business_id)
             logger.info(f"Negocio eliminado: {business_id}")
             return True
         
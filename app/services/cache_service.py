@@ -1,20 +1,272 @@
 # ================================
-# app/services/cache_service.py (ACTUALIZADO para Redis Cloud)
+# app/services/cache_service.py (Redis Cloud API o Redis nativo)
 # ================================
 
+import asyncio
+import fnmatch
 import httpx
 import json
 import logging
-from typing import Any, Optional, Union
-from datetime import timedelta
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from datetime import datetime, timedelta
+
+import redis.asyncio as aioredis
 
 from ..config import settings
 
 logger = logging.getLogger(__name__)
 
-class CacheService:
-    """Servicio para manejo de cache con Redis Cloud API"""
-    
+# Pool de conexiones compartido por todo el proceso (backend "redis")
+_redis_pool: Optional[aioredis.ConnectionPool] = None
+
+def get_redis_pool() -> aioredis.ConnectionPool:
+    """Obtener (o crear) el pool de conexiones Redis del proceso"""
+    global _redis_pool
+    if _redis_pool is None:
+        _redis_pool = aioredis.ConnectionPool.from_url(
+            settings.redis_dsn,
+            max_connections=settings.redis_max_connections,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+            decode_responses=True
+        )
+    return _redis_pool
+
+async def close_redis_pool():
+    """Cerrar el pool de conexiones Redis (shutdown de la app)"""
+    global _redis_pool
+    if _redis_pool is not None:
+        await _redis_pool.disconnect()
+        _redis_pool = None
+
+class LocalLRUCache:
+    """Cache L1 en proceso: LRU con límite de items y bytes, y TTL por key"""
+
+    def __init__(self, max_items: int, max_bytes: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        raw, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return raw
+
+    def set(self, key: str, raw: str, ttl: float):
+        if ttl <= 0 or len(raw) > self.max_bytes:
+            self._remove(key)
+            return
+
+        self._remove(key)
+        self._entries[key] = (raw, time.monotonic() + ttl)
+        self._bytes += len(raw)
+
+        while len(self._entries) > self.max_items or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._remove(key))
+
+    def delete_pattern(self, pattern: str) -> int:
+        matching = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+        return self.delete(*matching)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= len(entry[0])
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._entries),
+            "bytes": self._bytes,
+            "max_items": self.max_items,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate_percent": round(self.hits / lookups * 100, 1) if lookups else 0
+        }
+
+# Estado L1 compartido por todas las instancias de CacheService del proceso
+_WORKER_ID = uuid.uuid4().hex
+_local_cache: Optional[LocalLRUCache] = None
+_l2_stats = {"hits": 0, "misses": 0, "errors": 0}
+_listener_task: Optional[asyncio.Task] = None
+_listener_ready = False
+# Se incrementa con cada invalidación; evita repoblar la L1 con lecturas previas a ella
+_invalidation_epoch = 0
+# Cálculos en curso por key (single-flight) y refrescos anticipados en background
+_inflight: Dict[str, "asyncio.Future"] = {}
+_background_refreshes: set = set()
+_XFETCH_MARKER = "__xfetch__"
+# Contadores de generación por tag (invalidación O(1) con invalidate_tags)
+_GENERATION_PREFIX = "gen:"
+
+def business_tag(business_id: str) -> str:
+    """Tag de todo lo cacheado para un business"""
+    return f"business:{business_id}"
+
+def dashboard_tag(business_id: str, vista: str) -> str:
+    """Tag de una vista de dashboard de un business"""
+    return f"dashboard:{business_id}:{vista}"
+
+def component_tag(business_id: str, component_id: str) -> str:
+    """Tag de un componente de dashboard de un business"""
+    return f"component:{business_id}:{component_id}"
+
+def entity_tag(business_id: str, entidad: str) -> str:
+    """Tag de los datos de una entidad de un business"""
+    return f"entity:{business_id}:{entidad}"
+
+def _generation_seed() -> int:
+    # Un contador perdido (eviction/flush) se recrea con un valor nuevo,
+    # así nunca vuelve a una generación que todavía tenga keys vivas
+    return int(time.time() * 1000)
+
+def get_local_cache() -> LocalLRUCache:
+    """Obtener (o crear) la cache L1 del proceso"""
+    global _local_cache
+    if _local_cache is None:
+        _local_cache = LocalLRUCache(
+            max_items=settings.cache_l1_max_items,
+            max_bytes=settings.cache_l1_max_bytes
+        )
+    return _local_cache
+
+def _apply_invalidation(message: Dict[str, Any]):
+    """Aplicar en la L1 local un mensaje de invalidación"""
+    global _invalidation_epoch
+    _invalidation_epoch += 1
+    local_cache = get_local_cache()
+    if message.get("clear"):
+        local_cache.clear()
+    if message.get("keys"):
+        local_cache.delete(*message["keys"])
+    if message.get("pattern"):
+        local_cache.delete_pattern(message["pattern"])
+
+async def _listen_for_invalidations(client: aioredis.Redis):
+    """Escuchar invalidaciones de otros workers y aplicarlas en la L1"""
+    global _listener_ready
+    retry_delay = 1.0
+
+    while True:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(settings.cache_invalidation_channel)
+            # Pudimos perder mensajes mientras no estábamos suscritos
+            get_local_cache().clear()
+            _listener_ready = True
+            retry_delay = 1.0
+            logger.info("Escuchando invalidaciones de cache L1")
+
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    payload = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                if payload.get("origin") != _WORKER_ID:
+                    _apply_invalidation(payload)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error en listener de invalidación de cache: {e}")
+        finally:
+            # Sin listener la L1 no es confiable: se deja de usar hasta reconectar
+            _listener_ready = False
+            get_local_cache().clear()
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+        await asyncio.sleep(retry_delay)
+        retry_delay = min(retry_delay * 2, 30.0)
+
+async def start_cache_invalidation_listener(client: Optional[aioredis.Redis] = None):
+    """Iniciar el listener de invalidaciones (startup de la app)"""
+    global _listener_task
+    if not settings.cache_l1_enabled or _listener_task is not None:
+        return
+    if client is None:
+        if settings.cache_backend != "redis":
+            logger.info("Cache L1 deshabilitada: requiere cache_backend='redis'")
+            return
+        client = aioredis.Redis(connection_pool=get_redis_pool())
+    _listener_task = asyncio.create_task(_listen_for_invalidations(client))
+
+async def stop_cache_invalidation_listener():
+    """Detener el listener de invalidaciones (shutdown de la app)"""
+    global _listener_task, _listener_ready
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+    _listener_ready = False
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Contadores de hit/miss/eviction por nivel de cache"""
+    l2_lookups = _l2_stats["hits"] + _l2_stats["misses"]
+    return {
+        "l1": {
+            **get_local_cache().stats(),
+            "active": _listener_ready
+        },
+        "l2": {
+            "backend": settings.cache_backend,
+            **_l2_stats,
+            "hit_rate_percent": round(_l2_stats["hits"] / l2_lookups * 100, 1) if l2_lookups else 0
+        }
+    }
+
+class HttpCacheBackend:
+    """Backend de cache sobre la API HTTP de Redis Cloud"""
+
+    # Sin pub/sub ni SET NX: no hay invalidación de L1 ni lock entre workers
+    supports_invalidation = False
+    supports_locking = False
+    # La API exige TTL: los contadores de generación viven 30 días
+    COUNTER_TTL = 30 * 24 * 3600
+
     def __init__(self):
         self.redis_url = settings.redis_url
         self.api_key = settings.redis_api_key
@@ -24,7 +276,11 @@ class CacheService:
         }
         self._client = None
         self._connected = False
-    
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
     async def _get_client(self):
         """Obtener cliente HTTP para Redis Cloud"""
         if not self._client:
@@ -34,7 +290,7 @@ class CacheService:
                 timeout=30.0
             )
         return self._client
-    
+
     async def connect(self):
         """Conectar a Redis Cloud"""
         if not self._connected and settings.cache_enabled:
@@ -48,119 +304,661 @@ class CacheService:
             except Exception as e:
                 logger.error(f"Error conectando a Redis Cloud: {e}")
                 self._client = None
-    
+
+    async def get(self, key: str) -> Optional[str]:
+        client = await self._get_client()
+        response = await client.get(f"/get/{key}")
+        if response.status_code == 200:
+            return response.json().get("value") or None
+        return None
+
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        return [await self.get(key) for key in keys]
+
+    async def mget_with_ttl(self, keys: List[str]) -> List[Tuple[Optional[str], Optional[float]]]:
+        return [(raw, None) for raw in await self.mget(keys)]
+
+    async def set(self, key: str, raw: str, ttl: int) -> bool:
+        client = await self._get_client()
+        response = await client.post("/set", json={"key": key, "value": raw, "ttl": ttl})
+        return response.status_code == 200
+
+    async def mset(self, items: Dict[str, str], ttl: int) -> bool:
+        results = [await self.set(key, raw, ttl) for key, raw in items.items()]
+        return all(results)
+
+    async def delete(self, *keys: str) -> int:
+        client = await self._get_client()
+        deleted = 0
+        for key in keys:
+            response = await client.delete(f"/delete/{key}")
+            if response.status_code == 200:
+                deleted += 1
+        return deleted
+
+    async def clear_pattern(self, pattern: str) -> int:
+        client = await self._get_client()
+        # Para Redis Cloud no tenemos acceso directo a KEYS
+        response = await client.post("/keys", json={"pattern": pattern})
+        if response.status_code != 200:
+            return 0
+        keys = response.json().get("keys", [])
+        return await self.delete(*keys) if keys else 0
+
+    async def exists(self, key: str) -> bool:
+        client = await self._get_client()
+        response = await client.get(f"/exists/{key}")
+        if response.status_code == 200:
+            return response.json().get("exists", False)
+        return False
+
+    async def seed_counters(self, keys: List[str], seed: int) -> List[int]:
+        values = []
+        for key in keys:
+            raw = await self.get(key)
+            if raw is None:
+                await self.set(key, str(seed), self.COUNTER_TTL)
+            values.append(int(raw or seed))
+        return values
+
+    async def incr_counters(self, keys: List[str], seed: int) -> List[int]:
+        # La API HTTP no expone INCR: lectura + escritura (no atómico entre workers,
+        # pero cualquier valor nuevo invalida igual las keys de la generación anterior)
+        values = []
+        for key in keys:
+            raw = await self.get(key)
+            value = int(raw) + 1 if raw else seed + 1
+            await self.set(key, str(value), self.COUNTER_TTL)
+            values.append(value)
+        return values
+
+    async def publish(self, message: Dict[str, Any]):
+        pass
+
+    async def close(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+            self._connected = False
+
+class RedisCacheBackend:
+    """Backend de cache sobre protocolo Redis nativo (RESP) con pool compartido"""
+
+    SCAN_BATCH = 500
+    supports_invalidation = True
+    supports_locking = True
+
+    _RELEASE_LOCK_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, client: Optional[aioredis.Redis] = None):
+        self._client = client or aioredis.Redis(connection_pool=get_redis_pool())
+
+    @property
+    def connected(self) -> bool:
+        # El pool conecta bajo demanda; los errores se reportan por operación
+        return True
+
+    @property
+    def client(self) -> aioredis.Redis:
+        return self._client
+
+    async def connect(self):
+        try:
+            await self._client.ping()
+        except Exception as e:
+            logger.error(f"Error conectando a Redis: {e}")
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        return await self._client.mget(keys)
+
+    async def mget_with_ttl(self, keys: List[str]) -> List[Tuple[Optional[str], Optional[float]]]:
+        """MGET + PTTL de cada key en un solo round trip"""
+        if not keys:
+            return []
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.mget(keys)
+            for key in keys:
+                pipe.pttl(key)
+            results = await pipe.execute()
+        raws, pttls = results[0], results[1:]
+        return [
+            (raw, pttl / 1000 if pttl and pttl > 0 else None)
+            for raw, pttl in zip(raws, pttls)
+        ]
+
+    async def set(self, key: str, raw: str, ttl: int) -> bool:
+        return bool(await self._client.set(key, raw, ex=ttl))
+
+    async def mset(self, items: Dict[str, str], ttl: int) -> bool:
+        if not items:
+            return True
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key, raw in items.items():
+                pipe.set(key, raw, ex=ttl)
+            results = await pipe.execute()
+        return all(results)
+
+    async def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        return await self._client.unlink(*keys)
+
+    async def clear_pattern(self, pattern: str) -> int:
+        deleted = 0
+        batch = []
+        async for key in self._client.scan_iter(match=pattern, count=self.SCAN_BATCH):
+            batch.append(key)
+            if len(batch) >= self.SCAN_BATCH:
+                deleted += await self.delete(*batch)
+                batch = []
+        if batch:
+            deleted += await self.delete(*batch)
+        return deleted
+
+    async def exists(self, key: str) -> bool:
+        return bool(await self._client.exists(key))
+
+    async def seed_counters(self, keys: List[str], seed: int) -> List[int]:
+        """Crear los contadores que falten (SET NX) y leerlos en un round trip"""
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, seed, nx=True)
+            pipe.mget(keys)
+            results = await pipe.execute()
+        return [int(value) for value in results[-1]]
+
+    async def incr_counters(self, keys: List[str], seed: int) -> List[int]:
+        """INCR atómico de cada contador (creándolo con seed si no existe)"""
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, seed, nx=True)
+                pipe.incr(key)
+            results = await pipe.execute()
+        return [int(value) for value in results[1::2]]
+
+    async def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if await self._client.set(name, token, nx=True, px=int(ttl * 1000)):
+            return token
+        return None
+
+    async def release_lock(self, name: str, token: str):
+        # Solo libera si el lock sigue siendo nuestro
+        await self._client.eval(self._RELEASE_LOCK_SCRIPT, 1, name, token)
+
+    async def publish(self, message: Dict[str, Any]):
+        await self._client.publish(
+            settings.cache_invalidation_channel,
+            json.dumps({**message, "origin": _WORKER_ID})
+        )
+
+    async def close(self):
+        # El pool es compartido; se cierra con close_redis_pool() en el shutdown
+        pass
+
+def _create_backend():
+    """Crear el backend configurado en settings.cache_backend"""
+    if settings.cache_backend == "redis":
+        return RedisCacheBackend()
+    return HttpCacheBackend()
+
+class CacheService:
+    """Servicio de cache en dos niveles: L1 en proceso + backend compartido (L2)"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or _create_backend()
+
+    @property
+    def _connected(self) -> bool:
+        return self.backend.connected
+
+    @property
+    def _l1(self) -> Optional[LocalLRUCache]:
+        """L1 solo se usa mientras el listener de invalidaciones está activo"""
+        if settings.cache_l1_enabled and self.backend.supports_invalidation and _listener_ready:
+            return get_local_cache()
+        return None
+
+    async def connect(self):
+        """Conectar al backend de cache"""
+        if settings.cache_enabled:
+            await self.backend.connect()
+
     async def get(self, key: str) -> Optional[Any]:
         """Obtener valor del cache"""
         if not settings.cache_enabled or not self._connected:
             return None
-        
-        try:
-            await self.connect()
-            client = await self._get_client()
-            
-            response = await client.get(f"/get/{key}")
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("value"):
-                    return json.loads(data["value"])
-            return None
-        except Exception as e:
-            logger.error(f"Error obteniendo cache key {key}: {e}")
-            return None
-    
+
+        values = await self.get_many([key])
+        return values.get(key)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Obtener varias keys: primero L1, el resto en una sola operación (MGET)"""
+        values = await self._get_decoded(keys)
+        # Valores guardados por get_or_compute llevan metadatos de XFetch
+        return {
+            key: value["value"] if isinstance(value, dict) and _XFETCH_MARKER in value else value
+            for key, value in values.items()
+        }
+
+    async def _get_decoded(self, keys: List[str]) -> Dict[str, Any]:
+        if not settings.cache_enabled or not self._connected or not keys:
+            return {}
+
+        l1 = self._l1
+        found: Dict[str, str] = {}
+        pending = []
+
+        for key in keys:
+            raw = l1.get(key) if l1 else None
+            if raw is not None:
+                found[key] = raw
+            else:
+                pending.append(key)
+
+        if pending:
+            epoch = _invalidation_epoch
+            try:
+                if l1:
+                    results = await self.backend.mget_with_ttl(pending)
+                else:
+                    results = [(raw, None) for raw in await self.backend.mget(pending)]
+            except Exception as e:
+                _l2_stats["errors"] += 1
+                logger.error(f"Error obteniendo cache keys {pending}: {e}")
+                results = []
+
+            for key, (raw, remaining_ttl) in zip(pending, results):
+                if not raw:
+                    _l2_stats["misses"] += 1
+                    continue
+                _l2_stats["hits"] += 1
+                found[key] = raw
+                if l1 and epoch == _invalidation_epoch:
+                    l1_ttl = min(remaining_ttl or settings.cache_l1_ttl_seconds, settings.cache_l1_ttl_seconds)
+                    l1.set(key, raw, l1_ttl)
+
+        values = {}
+        for key, raw in found.items():
+            try:
+                values[key] = json.loads(raw)
+            except ValueError as e:
+                logger.error(f"Valor de cache inválido en key {key}: {e}")
+        return values
+
     async def set(
-        self, 
-        key: str, 
-        value: Any, 
+        self,
+        key: str,
+        value: Any,
         ttl: Optional[int] = None
     ) -> bool:
         """Guardar valor en cache"""
-        if not settings.cache_enabled:
+        return await self.set_many({key: value}, ttl=ttl)
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Guardar varias keys en una sola operación (pipeline)"""
+        if not settings.cache_enabled or not items:
             return False
-        
+
         try:
-            await self.connect()
-            client = await self._get_client()
-            
             ttl = ttl or settings.cache_ttl_seconds
-            
-            payload = {
-                "key": key,
-                "value": json.dumps(value, default=str),
-                "ttl": ttl
-            }
-            
-            response = await client.post("/set", json=payload)
-            return response.status_code == 200
+            raw_items = {key: json.dumps(value, default=str) for key, value in items.items()}
+            stored = await self.backend.mset(raw_items, ttl)
         except Exception as e:
-            logger.error(f"Error guardando cache key {key}: {e}")
+            logger.error(f"Error guardando cache keys {list(items)}: {e}")
+            return False
+
+        l1 = self._l1
+        if l1:
+            # Este y otros workers pueden tener el valor anterior en su L1
+            await self._invalidate_local({"keys": list(raw_items)})
+            for key, raw in raw_items.items():
+                l1.set(key, raw, min(ttl, settings.cache_l1_ttl_seconds))
+
+        return stored
+
+    async def get_or_compute(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        force_refresh: bool = False,
+        lock: Optional[bool] = None,
+        tags: Optional[List[str]] = None
+    ) -> Any:
+        """Obtener de cache o calcular una sola vez aunque haya misses concurrentes.
+
+        Los misses simultáneos de una key esperan al mismo cálculo en curso.
+        Con lock=True (o settings.cache_lock_enabled) se coordina además entre
+        workers con un lock en Redis. Cerca de la expiración, un request elegido
+        probabilísticamente (XFetch) refresca la key en background mientras se
+        sigue sirviendo el valor vigente. Si factory devuelve None no se cachea.
+        Con tags, la key se versiona con tagged_key() y se invalida con
+        invalidate_tags().
+        """
+        ttl = ttl or settings.cache_ttl_seconds
+
+        if tags:
+            key = await self.tagged_key(key, tags)
+            if key is None:
+                # Sin generaciones no se puede garantizar frescura: no cachear
+                return await factory()
+
+        if not force_refresh:
+            envelope = await self._get_envelope(key)
+            if envelope is not None:
+                if self._should_refresh_early(envelope):
+                    self._refresh_in_background(key, factory, ttl, lock)
+                return envelope["value"]
+
+        return await self._compute_single_flight(key, factory, ttl, lock)
+
+    async def get_stale_while_revalidate(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+        timeout: Optional[float] = None,
+        force_refresh: bool = False,
+        tags: Optional[List[str]] = None
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """(valor, frescura) sin esperar el recálculo de un valor vencido.
+
+        Pasado su ttl, el valor se sigue sirviendo durante stale_ttl mientras
+        se recalcula en background (single-flight). En un miss se calcula;
+        con timeout, si el cálculo tarda más se devuelve (None, pending) y el
+        cálculo sigue hasta quedar en cache. Si factory lanza una excepción
+        no se cachea nada (un valor vencido se sigue sirviendo).
+        frescura: status ("fresh", "stale", "computed" o "pending"),
+        computed_at, age_seconds y ttl.
+        """
+        ttl = ttl or settings.cache_ttl_seconds
+        stale_ttl = settings.cache_stale_ttl_seconds if stale_ttl is None else stale_ttl
+
+        if tags:
+            key = await self.tagged_key(key, tags)
+            if key is None:
+                return await factory(), self._freshness("computed", time.time(), ttl)
+
+        if not force_refresh:
+            envelope = await self._get_envelope(key)
+            if envelope is not None:
+                expiry = envelope.get("expiry")
+                if expiry is not None and time.time() >= expiry:
+                    self._refresh_in_background(key, factory, ttl, None, stale_ttl)
+                    return envelope["value"], self._freshness("stale", envelope.get("computed_at"), ttl)
+                if self._should_refresh_early(envelope):
+                    self._refresh_in_background(key, factory, ttl, None, stale_ttl)
+                return envelope["value"], self._freshness("fresh", envelope.get("computed_at"), ttl)
+
+        if timeout is None:
+            value = await self._compute_single_flight(key, factory, ttl, None, stale_ttl)
+        else:
+            task = self._track_background(
+                asyncio.create_task(self._compute_single_flight(key, factory, ttl, None, stale_ttl))
+            )
+            try:
+                value = await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                return None, self._freshness("pending", None, ttl)
+        return value, self._freshness("computed", time.time(), ttl)
+
+    @staticmethod
+    def _freshness(status: str, computed_at: Optional[float], ttl: int) -> Dict[str, Any]:
+        return {
+            "status": status,
+            "computed_at": datetime.utcfromtimestamp(computed_at).isoformat() if computed_at else None,
+            "age_seconds": round(max(time.time() - computed_at, 0), 1) if computed_at else None,
+            "ttl": ttl
+        }
+
+    async def _get_envelope(self, key: str) -> Optional[Dict[str, Any]]:
+        values = await self._get_decoded([key])
+        if key not in values:
+            return None
+        value = values[key]
+        if isinstance(value, dict) and _XFETCH_MARKER in value:
+            return value
+        # Valor escrito con set(): sin metadatos para refresco anticipado
+        return {"value": value, "delta": 0, "expiry": None}
+
+    def _should_refresh_early(self, envelope: Dict[str, Any]) -> bool:
+        """XFetch: now - delta * beta * ln(rand) >= expiry"""
+        beta = settings.cache_xfetch_beta
+        expiry = envelope.get("expiry")
+        delta = envelope.get("delta") or 0
+        if beta <= 0 or expiry is None or delta <= 0:
             return False
-    
+        return time.time() - delta * beta * math.log(1.0 - random.random()) >= expiry
+
+    def _refresh_in_background(self, key, factory, ttl, lock, stale_ttl=0):
+        if key in _inflight:
+            return
+        self._track_background(asyncio.create_task(self._compute_single_flight(key, factory, ttl, lock, stale_ttl)))
+
+    def _track_background(self, task: "asyncio.Task") -> "asyncio.Task":
+        _background_refreshes.add(task)
+        task.add_done_callback(self._finish_background_refresh)
+        return task
+
+    @staticmethod
+    def _finish_background_refresh(task: "asyncio.Task"):
+        _background_refreshes.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Error en cálculo de cache en background: {task.exception()}")
+
+    async def _compute_single_flight(self, key, factory, ttl, lock, stale_ttl=0) -> Any:
+        while True:
+            inflight = _inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Cancelaron al que calculaba y no a este request: tomar su lugar
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        _inflight[key] = future
+        try:
+            value = await self._compute_with_lock(key, factory, ttl, lock, stale_ttl)
+        except Exception as e:
+            future.set_exception(e)
+            # Evita el warning de "exception never retrieved" si nadie esperaba
+            future.exception()
+            raise
+        except BaseException:
+            # La cancelación es de este request, no del cálculo: los que
+            # esperaban vuelven a intentar y uno de ellos calcula
+            future.cancel()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            if _inflight.get(key) is future:
+                del _inflight[key]
+
+    async def _compute_with_lock(self, key, factory, ttl, lock, stale_ttl=0) -> Any:
+        use_lock = settings.cache_lock_enabled if lock is None else lock
+        if not use_lock or not self.backend.supports_locking or not self._connected:
+            return await self._compute_and_store(key, factory, ttl, stale_ttl)
+
+        lock_name = f"lock:{key}"
+        timeout = settings.cache_lock_timeout_seconds
+        deadline = time.monotonic() + timeout
+        token = None
+
+        while token is None:
+            try:
+                token = await self.backend.acquire_lock(lock_name, timeout)
+            except Exception as e:
+                logger.error(f"Error adquiriendo lock de cache {lock_name}: {e}")
+                break
+            if token is not None:
+                break
+            # Otro worker está calculando: esperar su resultado
+            await asyncio.sleep(0.05)
+            envelope = await self._get_envelope(key)
+            if envelope is not None:
+                return envelope["value"]
+            if time.monotonic() >= deadline:
+                logger.warning(f"Timeout esperando lock de cache {lock_name}, calculando localmente")
+                break
+
+        try:
+            return await self._compute_and_store(key, factory, ttl, stale_ttl)
+        finally:
+            if token is not None:
+                try:
+                    await self.backend.release_lock(lock_name, token)
+                except Exception as e:
+                    logger.error(f"Error liberando lock de cache {lock_name}: {e}")
+
+    async def _compute_and_store(self, key, factory, ttl, stale_ttl=0) -> Any:
+        start = time.time()
+        value = await factory()
+        if value is None:
+            return None
+
+        now = time.time()
+        # expiry es el vencimiento lógico; la key vive stale_ttl más para
+        # servirla vencida mientras se recalcula
+        await self.set(key, {
+            _XFETCH_MARKER: 1,
+            "value": value,
+            "delta": round(now - start, 4),
+            "expiry": now + ttl,
+            "computed_at": now
+        }, ttl=ttl + stale_ttl)
+        return value
+
     async def delete(self, key: str) -> bool:
         """Eliminar valor del cache"""
         if not self._connected:
             return False
-        
+
         try:
-            await self.connect()
-            client = await self._get_client()
-            
-            response = await client.delete(f"/delete/{key}")
-            return response.status_code == 200
+            deleted = await self.backend.delete(key) > 0
         except Exception as e:
             logger.error(f"Error eliminando cache key {key}: {e}")
             return False
-    
+
+        await self._invalidate_local({"keys": [key]})
+        return deleted
+
     async def clear_pattern(self, pattern: str) -> int:
-        """Eliminar todas las keys que coincidan con un patrón"""
+        """Eliminar todas las keys que coincidan con un patrón.
+
+        Recorre todas las keys (O(N)); para invalidar un business o una
+        entidad usar invalidate_tags().
+        """
         if not self._connected:
             return 0
-        
+
         try:
-            await self.connect()
-            client = await self._get_client()
-            
-            # Para Redis Cloud, necesitamos hacer esto de manera diferente
-            # ya que no tenemos acceso directo a KEYS
-            payload = {"pattern": pattern}
-            response = await client.post("/keys", json=payload)
-            
-            if response.status_code == 200:
-                keys = response.json().get("keys", [])
-                deleted_count = 0
-                
-                for key in keys:
-                    if await self.delete(key):
-                        deleted_count += 1
-                
-                return deleted_count
-            
-            return 0
+            deleted = await self.backend.clear_pattern(pattern)
         except Exception as e:
             logger.error(f"Error limpiando cache pattern {pattern}: {e}")
             return 0
-    
+
+        await self._invalidate_local({"pattern": pattern})
+        return deleted
+
     async def exists(self, key: str) -> bool:
         """Verificar si existe una key"""
         if not self._connected:
             return False
-        
+
         try:
-            await self.connect()
-            client = await self._get_client()
-            
-            response = await client.get(f"/exists/{key}")
-            if response.status_code == 200:
-                return response.json().get("exists", False)
-            return False
+            return await self.backend.exists(key)
         except Exception as e:
             logger.error(f"Error verificando cache key {key}: {e}")
             return False
-    
+
+    async def get_generations(self, tags: List[str]) -> Optional[Dict[str, int]]:
+        """Generación actual de cada tag (None si el backend no responde)"""
+        keys = [f"{_GENERATION_PREFIX}{tag}" for tag in tags]
+        # Los contadores pasan por la L1 como cualquier otra key
+        values = await self._get_decoded(keys)
+        missing = [key for key in keys if not isinstance(values.get(key), int)]
+
+        if missing:
+            try:
+                seeded = await self.backend.seed_counters(missing, _generation_seed())
+            except Exception as e:
+                _l2_stats["errors"] += 1
+                logger.error(f"Error leyendo generaciones de cache {missing}: {e}")
+                return None
+            values.update(zip(missing, seeded))
+
+        return {tag: values[key] for tag, key in zip(tags, keys)}
+
+    async def tagged_key(self, key: str, tags: List[str]) -> Optional[str]:
+        """Key versionada con la generación de cada tag.
+
+        Las entradas escritas con una generación anterior quedan inaccesibles
+        (y expiran por su TTL). Devuelve None si no se pudieron leer las
+        generaciones: en ese caso no se debe leer ni escribir la cache.
+        """
+        if not settings.cache_enabled or not self._connected:
+            return None
+
+        generations = await self.get_generations(tags)
+        if generations is None:
+            return None
+        return f"{key}@" + ".".join(str(generations[tag]) for tag in tags)
+
+    async def invalidate_tags(self, *tags: str) -> Dict[str, int]:
+        """Invalidar todas las keys de los tags con un INCR por tag (O(1))"""
+        if not self._connected or not tags:
+            return {}
+
+        keys = [f"{_GENERATION_PREFIX}{tag}" for tag in tags]
+        try:
+            generations = await self.backend.incr_counters(keys, _generation_seed())
+        except Exception as e:
+            logger.error(f"Error invalidando tags de cache {list(tags)}: {e}")
+            return {}
+
+        l1 = self._l1
+        if l1:
+            await self._invalidate_local({"keys": keys})
+            for key, generation in zip(keys, generations):
+                l1.set(key, str(generation), settings.cache_l1_ttl_seconds)
+
+        return dict(zip(tags, generations))
+
+    async def _invalidate_local(self, message: Dict[str, Any]):
+        """Invalidar la L1 de este worker y avisar al resto"""
+        if self._l1:
+            _apply_invalidation(message)
+            await self._broadcast_invalidation(message)
+
+    async def _broadcast_invalidation(self, message: Dict[str, Any]):
+        try:
+            await self.backend.publish(message)
+        except Exception as e:
+            # El resto de workers queda acotado por cache_l1_ttl_seconds
+            logger.error(f"Error publicando invalidación de cache: {e}")
+            get_local_cache().clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de hit/miss/eviction por nivel"""
+        return get_cache_stats()
+
     async def close(self):
         """Cerrar conexión"""
-        if self._client:
-            await self._client.aclose()
-            self._client = None
-            self._connected = False
-
+        await self.backend.close()
@@ -2,19 +2,21 @@
 # app/services/dashboard_service.py (VERSIÓN AVANZADA)
 # ================================
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import logging
+from collections import Counter
 from datetime import datetime, timedelta
-from collections import defaultdict
 import asyncio
 
+from ..config import settings
 from ..database import get_database
 from ..models.user import User
 from ..services.view_service import ViewService
 from ..services.api_service import ApiService
-from ..services.cache_service import CacheService
+from ..services.cache_service import CacheService, business_tag, component_tag, dashboard_tag, entity_tag
 from ..services.waha_service import WAHAService
 from ..services.n8n_service import N8NService
+from ..core.aggregation_pushdown import AggregationPushdown, spec_from_component
 from ..core.dynamic_crud import DynamicCrudGenerator
 from ..utils.helpers import parse_filter_string
 
@@ -31,6 +33,7 @@ class AdvancedDashboardService:
         self.waha_service = WAHAService()
         self.n8n_service = N8NService()
         self.crud_generator = DynamicCrudGenerator()
+        self.aggregations = AggregationPushdown(self.crud_generator)
     
     async def get_complete_dashboard_data(
         self, 
@@ -39,18 +42,15 @@ class AdvancedDashboardService:
         user: User,
         refresh_cache: bool = False
     ) -> Dict[str, Any]:
-        """Obtener datos completos del dashboard con información real"""
-        
-        cache_key = f"dashboard_{business_id}_{vista}_{user.rol}"
-        
-        # Verificar cache si no se solicita refresh
-        if not refresh_cache:
-            cached_data = await self.cache_service.get(cache_key)
-            if cached_data:
-                logger.debug(f"Dashboard cache hit: {cache_key}")
-                return cached_data
+        """Obtener datos completos del dashboard con información real.
+
+        Cada componente se cachea por separado (stale-while-revalidate) con el
+        TTL de su configuracion.cache_ttl y vuelve con su cache_info. Uno
+        vencido se sirve en el acto y se recalcula en background; uno sin
+        cache que tarda más de dashboard_component_timeout_seconds vuelve
+        pendiente, así un upstream lento no demora al resto del dashboard.
+        """
         
-        # Obtener configuración de la vista
         view_config = await self.view_service.get_view_config_for_user(
             business_id, vista, user
         )
@@ -58,52 +58,109 @@ class AdvancedDashboardService:
         if not view_config:
             return {"error": "Vista no encontrada o sin permisos"}
         
-        # Obtener datos base del business
-        business_info = await self._get_business_info(business_id)
-        
-        # Obtener datos de integraciónes en paralelo
-        integration_data = await self._get_integration_data(business_id)
+        timeout = settings.dashboard_component_timeout_seconds
+        business_info, (integration_data, integration_cache), *components = await asyncio.gather(
+            self._get_business_info(business_id),
+            self._get_cached_integration_data(business_id, refresh_cache, timeout),
+            *[
+                self._get_cached_component(business_id, vista, component_config, user, refresh_cache, timeout)
+                for component_config in view_config["configuracion"]["componentes"]
+            ]
+        )
         
-        dashboard_data = {
+        return {
             "business_id": business_id,
             "business_info": business_info,
             "vista": vista,
             "layout": view_config["configuracion"]["layout"],
             "navegacion": view_config["configuracion"]["navegacion"],
-            "componentes": [],
+            "componentes": components,
             "integration_status": integration_data,
             "last_updated": datetime.utcnow().isoformat(),
             "cache_info": {
-                "cached": False,
-                "ttl": 300
+                "integrations": integration_cache,
+                "components": dict(Counter(component["cache_info"]["status"] for component in components))
             }
         }
-        
-        # Generar datos para cada componente en paralelo
-        component_tasks = []
-        for component_config in view_config["configuracion"]["componentes"]:
-            task = self._generate_advanced_component_data(
+    
+    async def _get_cached_integration_data(
+        self,
+        business_id: str,
+        refresh_cache: bool = False,
+        timeout: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Datos de integraciones (WAHA/N8N) cacheados por business, con su frescura"""
+        integration_data, freshness = await self.cache_service.get_stale_while_revalidate(
+            f"dashboard_integrations_{business_id}",
+            lambda: self._get_integration_data(business_id),
+            ttl=60,
+            timeout=timeout,
+            force_refresh=refresh_cache,
+            tags=[business_tag(business_id)]
+        )
+        if integration_data is None:
+            integration_data = {
+                "whatsapp": {"status": "pending", "sessions_count": 0, "sessions": []},
+                "n8n": {"status": "pending", "workflows_count": 0, "active_workflows": 0, "workflows": []}
+            }
+        return integration_data, freshness
+    
+    async def _get_cached_component(
+        self,
+        business_id: str,
+        vista: str,
+        component_config: Dict[str, Any],
+        user: User,
+        refresh_cache: bool = False,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Datos de un componente desde su propia key de cache (con cache_info)"""
+        component_config = component_config if isinstance(component_config, dict) else component_config.dict()
+        component_id = component_config["id"]
+        config = component_config.get("configuracion") or {}
+        ttl = config.get("cache_ttl") or settings.dashboard_component_ttl_seconds
+        
+        async def build_component():
+            # Las integraciones se resuelven dentro del cálculo: un WAHA/N8N
+            # lento solo demora a los componentes que esperan este cálculo
+            integration_data, _ = await self._get_cached_integration_data(business_id)
+            component = await self._generate_advanced_component_data(
                 business_id, component_config, user, integration_data
             )
-            component_tasks.append(task)
-        
-        # Ejecutar componentes en paralelo
-        components_data = await asyncio.gather(*component_tasks, return_exceptions=True)
-        
-        for i, component_data in enumerate(components_data):
-            if isinstance(component_data, Exception):
-                logger.error(f"Error en componente {i}: {component_data}")
-                component_data = {
-                    "id": f"component_{i}",
-                    "error": str(component_data)
-                }
-            dashboard_data["componentes"].append(component_data)
+            if "error" in component:
+                # Los errores no se cachean: se reintenta en el próximo pedido
+                raise RuntimeError(component["error"])
+            return component
         
-        # Guardar en cache
-        await self.cache_service.set(cache_key, dashboard_data, ttl=300)
-        dashboard_data["cache_info"]["cached"] = True
+        try:
+            component, freshness = await self.cache_service.get_stale_while_revalidate(
+                f"dashboard_component_{business_id}_{vista}_{component_id}_{user.rol}",
+                build_component,
+                ttl=ttl,
+                timeout=timeout,
+                force_refresh=refresh_cache,
+                tags=[
+                    business_tag(business_id),
+                    dashboard_tag(business_id, vista),
+                    component_tag(business_id, component_id),
+                    # Las escrituras de la entidad invalidan sus componentes
+                    *([entity_tag(business_id, config["entidad"])] if config.get("entidad") else [])
+                ]
+            )
+        except Exception as e:
+            component = {"error": str(e)}
+            freshness = {"status": "error", "computed_at": None, "age_seconds": None, "ttl": ttl}
         
-        return dashboard_data
+        if component is None or "error" in component:
+            component = {
+                "id": component_id,
+                "tipo": component_config["tipo"],
+                "posicion": component_config.get("posicion", {}),
+                "titulo": config.get("titulo", "Sin título"),
+                "data": None,
+                **({"error": component["error"]} if component else {"pending": True})
+            }
+        return {**component, "cache_info": freshness}
     
     async def _get_business_info(self, business_id: str) -> Dict[str, Any]:
         """Obtener información del business"""
@@ -176,9 +233,9 @@ class AdvancedDashboardService:
             }
             
             if component_type == "stats_card":
-                data = await self._generate_real_stats_card(business_id, config, integration_data)
+                data = await self._generate_real_stats_card(business_id, config, integration_data, component_id)
             elif component_type == "chart":
-                data = await self._generate_real_chart_data(business_id, config, user)
+                data = await self._generate_real_chart_data(business_id, config, user, component_id)
             elif component_type == "data_table":
                 data = await self._generate_real_table_data(business_id, config, user)
             elif component_type == "whatsapp_panel":
@@ -207,7 +264,8 @@ class AdvancedDashboardService:
         self, 
         business_id: str, 
         config: Dict[str, Any],
-        integration_data: Dict[str, Any]
+        integration_data: Dict[str, Any],
+        component_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """Generar tarjeta de estadísticas con datos reales"""
         
@@ -251,39 +309,26 @@ class AdvancedDashboardService:
         else:
             # Datos de entidades dinámicas
             try:
-                result = await self.crud_generator.list_entities(
-                    business_id=business_id,
-                    entity_name=entidad,
-                    user=User(
+                # Solo vuelve el escalar: count/sum/avg/min/max se calculan en MongoDB
+                valor = await self.aggregations.aggregate(
+                    business_id,
+                    spec_from_component(config),
+                    User(
                         clerk_user_id="system",
                         email="system@cms.com",
                         rol="admin",
                         perfil={"nombre": "Sistema"}
                     ),
-                    page=1,
-                    per_page=1000
+                    component_id
                 )
                 
-                items = result.get("items", [])
-                valor = len(items)
-                
-                if operacion == "sum":
-                    campo = config.get("campo_suma")
-                    if campo:
-                        valor = sum(item.get(campo, 0) for item in items if isinstance(item.get(campo), (int, float)))
-                elif operacion == "avg":
-                    campo = config.get("campo_promedio")
-                    if campo:
-                        valores = [item.get(campo, 0) for item in items if isinstance(item.get(campo), (int, float))]
-                        valor = sum(valores) / len(valores) if valores else 0
-                
                 return {
                     "valor": valor,
                     "formato": config.get("formato", "number"),
                     "icono": config.get("icono", "database"),
                     "color": config.get("color", "primary"),
                     "descripcion": f"Total {entidad}",
-                    "tendencia": await self._calculate_trend(business_id, entidad, items)
+                    "tendencia": await self._calculate_trend(business_id, entidad, valor)
                 }
                 
             except Exception as e:
@@ -298,7 +343,8 @@ class AdvancedDashboardService:
         self, 
         business_id: str, 
         config: Dict[str, Any], 
-        user: User
+        user: User,
+        component_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """Generar datos reales para gráficos"""
         
@@ -319,17 +365,8 @@ class AdvancedDashboardService:
             else:
                 # Datos de entidades dinámicas
                 try:
-                    result = await self.crud_generator.list_entities(
-                        business_id=business_id,
-                        entity_name=entidad_name,
-                        user=user,
-                        page=1,
-                        per_page=500
-                    )
-                    
-                    items = result.get("items", [])
-                    campo_fecha = entidad_config.get("campo_fecha", "created_at")
-                    data = self._group_by_period(items, campo_fecha, "day")
+                    spec = spec_from_component({"periodo": "day", **entidad_config})
+                    data = await self.aggregations.aggregate(business_id, spec, user, component_id)
                     
                 except Exception as e:
                     logger.error(f"Error obteniendo datos de gráfico para {entidad_name}: {e}")
@@ -467,7 +504,7 @@ class AdvancedDashboardService:
         self, 
         business_id: str, 
         entidad: str, 
-        current_items: List[Dict[str, Any]]
+        current_value: float
     ) -> Dict[str, Any]:
         """Calcular tendencia comparando con período anterior"""
         
@@ -477,7 +514,7 @@ class AdvancedDashboardService:
             days_ago = 30  # Comparar con 30 días atrás
             
             # Por ahora, generar tendencia simulada basada en datos actuales
-            current_count = len(current_items)
+            current_count = current_value
             
             # Simular tendencia basada en el día del mes
             day_factor = now.day / 31.0
@@ -539,43 +576,3 @@ class AdvancedDashboardService:
         except Exception as e:
             logger.error(f"Error obteniendo conversaciones pendientes: {e}")
             return []
-    
-    def _group_by_period(
-        self, 
-        items: List[Dict[str, Any]], 
-        date_field: str, 
-        period: str = "day"
-    ) -> List[Dict[str, Any]]:
-        """Agrupar items por período de tiempo"""
-        
-        grouped = defaultdict(int)
-        
-        for item in items:
-            date_value = item.get(date_field)
-            if not date_value:
-                continue
-            
-            try:
-                if isinstance(date_value, str):
-                    date_obj = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
-                else:
-                    date_obj = date_value
-                
-                if period == "day":
-                    key = date_obj.strftime("%Y-%m-%d")
-                elif period == "month":
-                    key = date_obj.strftime("%Y-%m")
-                elif period == "hour":
-                    key = date_obj.strftime("%Y-%m-%d %H:00")
-                else:
-                    key = date_obj.strftime("%Y-%m-%d")
-                
-                grouped[key] += 1
-                
-            except Exception:
-                continue
-        
-        return [
-            {"fecha": period, "valor": count}
-            for period, count in sorted(grouped.items())
-        ]
\ No newline at end of file
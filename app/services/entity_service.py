@@ -2,6 +2,7 @@ from typing import List, Optional
 from datetime import datetime
 import logging
 
+from ..core.config_cache import get_config_cache
 from ..database import get_database
 from ..models.entity import EntityConfig, EntityConfigCreate, EntityConfigUpdate
 
@@ -25,11 +26,8 @@ class EntityService:
     
     async def get_entity_config(self, business_id: str, entidad: str) -> Optional[EntityConfig]:
         """Obtener configuración específica de entidad"""
-        doc = await self.db.entities_config.find_one({
-            "business_id": business_id,
-            "entidad": entidad
-        })
-        return EntityConfig(**doc) if doc else None
+        plan = await get_config_cache().get_entity_plan(business_id, entidad)
+        return plan.config if plan else None
     
     async def create_entity_config(self, config_data: EntityConfigCreate) -> EntityConfig:
         """Crear nueva configuración de entidad"""
@@ -37,6 +35,7 @@ class EntityService:
         
         result = await self.db.entities_config.insert_one(config.dict(by_alias=True))
         config.id = result.inserted_id
+        get_config_cache().invalidate_entity(config.business_id, config.entidad)
         
         logger.info(f"Configuración de entidad creada: {config.business_id}.{config.entidad}")
         return config
@@ -58,6 +57,7 @@ class EntityService:
         )
         
         if result:
+            get_config_cache().invalidate_entity(business_id, entidad)
             logger.info(f"Configuración actualizada: {business_id}.{entidad}")
             return EntityConfig(**result)
         
@@ -183,17 +183,16 @@ class MappingConfigService:
                 }
             
             # Hacer petición a la API para obtener datos de muestra
-            import httpx
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(api_endpoint)
-                
-                if response.status_code != 200:
-                    return {
-                        "success": False,
-                        "error": f"API returned status {response.status_code}"
-                    }
-                
-                api_data = response.json()
+            from ..core.http_clients import get_http_client
+            response = await get_http_client().get(api_endpoint, timeout=30.0)
+            
+            if response.status_code != 200:
+                return {
+                    "success": False,
+                    "error": f"API returned status {response.status_code}"
+                }
+            
+            api_data = response.json()
             
             # Aplicar mapping a los datos
             result = await self.apply_mapping_to_data(mapping_id, [api_data] if isinstance(api_data, dict) else api_data)
@@ -3,7 +3,8 @@
 # ================================
 
 import re
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 import logging
 
@@ -11,238 +12,283 @@ from ..utils.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
 
-class ValidationService:
-    """Servicio para validaciones dinámicas de campos"""
-    
-    def __init__(self):
-        self.validators = {
-            "email": self._validate_email,
-            "phone": self._validate_phone,
-            "url": self._validate_url,
-            "min": self._validate_min,
-            "max": self._validate_max,
-            "regex": self._validate_regex,
-            "required": self._validate_required,
-            "numeric": self._validate_numeric,
-            "date": self._validate_date,
-            "boolean": self._validate_boolean
-        }
-    
-    async def validate_field(self, value: Any, field_config: Dict[str, Any]) -> Any:
-        """Validar un campo según su configuración"""
-        
-        field_name = field_config.get("campo", "unknown")
-        field_type = field_config.get("tipo", "text")
-        validacion = field_config.get("validacion")
-        obligatorio = field_config.get("obligatorio", False)
-        
-        # Verificar si es obligatorio
-        if obligatorio and (value is None or value == ""):
-            raise ValidationError(field_name, "Campo obligatorio")
-        
-        # Si el valor está vacío y no es obligatorio, permitir
-        if value is None or value == "":
-            return value
-        
-        # Validar por tipo de campo
-        validated_value = await self._validate_by_type(value, field_type, field_name)
-        
-        # Aplicar validaciones personalizadas
-        if validacion:
-            validated_value = await self._apply_custom_validations(
-                validated_value, validacion, field_name
-            )
-        
-        return validated_value
-    
-    async def _validate_by_type(self, value: Any, field_type: str, field_name: str) -> Any:
-        """Validar por tipo de campo"""
-        
-        if field_type == "text":
-            return str(value)
-        
-        elif field_type == "number":
-            try:
-                return float(value) if '.' in str(value) else int(value)
-            except (ValueError, TypeError):
-                raise ValidationError(field_name, "Debe ser un número válido")
-        
-        elif field_type == "email":
-            return await self._validate_email(value, field_name)
-        
-        elif field_type == "phone":
-            return await self._validate_phone(value, field_name)
-        
-        elif field_type == "date":
-            return await self._validate_date(value, field_name)
-        
-        elif field_type == "boolean":
-            return await self._validate_boolean(value, field_name)
-        
-        elif field_type == "select":
-            return str(value)  # Las opciones se validan en el frontend
-        
-        elif field_type == "url":
-            return await self._validate_url(value, field_name)
-        
-        else:
-            return value
-    
-    async def _apply_custom_validations(
-        self, 
-        value: Any, 
-        validacion: str, 
-        field_name: str
-    ) -> Any:
-        """Aplicar validaciones personalizadas"""
-        
-        # Parsear string de validación (ej: "min:5,max:100,regex:^[a-z]+$")
-        validations = self._parse_validation_string(validacion)
-        
-        for validation_name, validation_param in validations.items():
-            if validation_name in self.validators:
-                value = await self.validators[validation_name](
-                    value, validation_param, field_name
-                )
-        
-        return value
-    
-    def _parse_validation_string(self, validacion: str) -> Dict[str, str]:
-        """Parsear string de validación"""
-        validations = {}
-        
-        for rule in validacion.split(','):
-            rule = rule.strip()
-            if ':' in rule:
-                name, param = rule.split(':', 1)
-                validations[name] = param
-            else:
-                validations[rule] = None
-        
-        return validations
-    
-    # === VALIDATORS ESPECÍFICOS ===
-    
-    async def _validate_email(self, value: Any, param: Any = None, field_name: str = "email") -> str:
-        """Validar email"""
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        email_str = str(value)
-        
-        if not re.match(email_pattern, email_str):
-            raise ValidationError(field_name, "Formato de email inválido")
-        
-        return email_str
-    
-    async def _validate_phone(self, value: Any, param: Any = None, field_name: str = "phone") -> str:
-        """Validar teléfono"""
-        phone_str = str(value).strip()
-        
-        # Remover caracteres no numéricos excepto + al inicio
-        clean_phone = re.sub(r'[^\d+]', '', phone_str)
-        
-        # Verificar formato básico
-        if not clean_phone:
-            raise ValidationError(field_name, "Número de teléfono requerido")
-        
-        # Verificar longitud mínima
-        digits_only = re.sub(r'[^\d]', '', clean_phone)
-        if len(digits_only) < 10:
-            raise ValidationError(field_name, "Número de teléfono muy corto")
-        
-        return clean_phone
-    
-    async def _validate_url(self, value: Any, param: Any = None, field_name: str = "url") -> str:
-        """Validar URL"""
-        url_pattern = r'^https?:\/\/[^\s/$.?#].[^\s]*$'
-        url_str = str(value)
-        
-        if not re.match(url_pattern, url_str):
-            raise ValidationError(field_name, "URL inválida")
-        
-        return url_str
-    
-    async def _validate_min(self, value: Any, param: str, field_name: str) -> Any:
-        """Validar valor mínimo"""
-        min_val = float(param)
-        
-        if isinstance(value, (int, float)):
-            if value < min_val:
-                raise ValidationError(field_name, f"Valor mínimo: {min_val}")
-        elif isinstance(value, str):
-            if len(value) < min_val:
-                raise ValidationError(field_name, f"Longitud mínima: {min_val} caracteres")
-        
-        return value
-    
-    async def _validate_max(self, value: Any, param: str, field_name: str) -> Any:
-        """Validar valor máximo"""
-        max_val = float(param)
-        
-        if isinstance(value, (int, float)):
-            if value > max_val:
-                raise ValidationError(field_name, f"Valor máximo: {max_val}")
-        elif isinstance(value, str):
-            if len(value) > max_val:
-                raise ValidationError(field_name, f"Longitud máxima: {max_val} caracteres")
-        
-        return value
-    
-    async def _validate_regex(self, value: Any, param: str, field_name: str) -> Any:
-        """Validar con expresión regular"""
-        if not re.match(param, str(value)):
-            raise ValidationError(field_name, "Formato inválido")
-        
+# Validador compilado de un campo: recibe el valor y devuelve el valor validado/convertido
+FieldValidator = Callable[[Any], Any]
+
+_EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_URL_PATTERN = re.compile(r'^https?:\/\/[^\s/$.?#].[^\s]*$')
+_PHONE_CHARS = re.compile(r'[^\d+]')
+_NON_DIGITS = re.compile(r'[^\d]')
+
+_DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%SZ",
+    "%d/%m/%Y",
+    "%d-%m-%Y"
+)
+# Fechas ISO con dígitos completos: fromisoformat da el mismo resultado que strptime y es mucho más rápido
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}:\d{2}|T\d{2}:\d{2}:\d{2}Z?)?$')
+_TRUE_VALUES = frozenset(['true', '1', 'yes', 'on', 'active'])
+_FALSE_VALUES = frozenset(['false', '0', 'no', 'off', 'inactive'])
+
+# === VALIDATORS ESPECÍFICOS (síncronos: todos son solo CPU) ===
+
+def _validate_email(value: Any, field_name: str) -> str:
+    email_str = str(value)
+    if not _EMAIL_PATTERN.match(email_str):
+        raise ValidationError(field_name, "Formato de email inválido")
+    return email_str
+
+def _validate_phone(value: Any, field_name: str) -> str:
+    # Remover caracteres no numéricos excepto + al inicio
+    clean_phone = _PHONE_CHARS.sub('', str(value).strip())
+    if not clean_phone:
+        raise ValidationError(field_name, "Número de teléfono requerido")
+    if len(_NON_DIGITS.sub('', clean_phone)) < 10:
+        raise ValidationError(field_name, "Número de teléfono muy corto")
+    return clean_phone
+
+def _validate_url(value: Any, field_name: str) -> str:
+    url_str = str(value)
+    if not _URL_PATTERN.match(url_str):
+        raise ValidationError(field_name, "URL inválida")
+    return url_str
+
+def _validate_number(value: Any, field_name: str, message: str = "Debe ser un número válido") -> Any:
+    try:
+        return float(value) if '.' in str(value) else int(value)
+    except (ValueError, TypeError):
+        raise ValidationError(field_name, message)
+
+def _validate_date(value: Any, field_name: str) -> datetime:
+    if isinstance(value, datetime):
         return value
-    
-    async def _validate_required(self, value: Any, param: Any = None, field_name: str = "field") -> Any:
-        """Validar campo requerido"""
-        if value is None or value == "":
-            raise ValidationError(field_name, "Campo requerido")
-        
+    date_str = str(value)
+    if _ISO_DATE.match(date_str):
+        try:
+            return datetime.fromisoformat(date_str.rstrip("Z"))
+        except ValueError:
+            raise ValidationError(field_name, "Formato de fecha inválido")
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    raise ValidationError(field_name, "Formato de fecha inválido")
+
+def _validate_boolean(value: Any, field_name: str) -> bool:
+    if isinstance(value, bool):
         return value
-    
-    async def _validate_numeric(self, value: Any, param: Any = None, field_name: str = "field") -> Any:
-        """Validar que sea numérico"""
+    value_str = str(value).lower()
+    if value_str in _TRUE_VALUES:
+        return True
+    if value_str in _FALSE_VALUES:
+        return False
+    raise ValidationError(field_name, "Debe ser verdadero o falso")
+
+def _validate_required(value: Any, field_name: str) -> Any:
+    if value is None or value == "":
+        raise ValidationError(field_name, "Campo requerido")
+    return value
+
+_TYPE_VALIDATORS: Dict[str, Callable[[Any, str], Any]] = {
+    "text": lambda value, field_name: str(value),
+    "number": _validate_number,
+    "email": _validate_email,
+    "phone": _validate_phone,
+    "date": _validate_date,
+    "boolean": _validate_boolean,
+    "select": lambda value, field_name: str(value),  # Las opciones se validan en el frontend
+    "url": _validate_url
+}
+
+# === COMPILACIÓN DE REGLAS ===
+
+def parse_validation_string(validacion: str) -> Dict[str, Optional[str]]:
+    """Parsear string de validación (ej: "min:5,max:100,regex:^[a-z]+$")"""
+    validations = {}
+    for rule in validacion.split(','):
+        rule = rule.strip()
+        if ':' in rule:
+            name, param = rule.split(':', 1)
+            validations[name] = param
+        else:
+            validations[rule] = None
+    return validations
+
+def _invalid_rule(field_name: str, rule: str) -> Callable[[Any], Any]:
+    def check(value):
+        raise ValidationError(field_name, f"Regla de validación inválida: {rule}")
+    return check
+
+def _compile_bound(field_name: str, rule: str, param: Optional[str]) -> Callable[[Any], Any]:
+    """min/max: valor para números, longitud para textos"""
+    try:
+        bound = float(param)
+    except (TypeError, ValueError):
+        return _invalid_rule(field_name, rule)
+
+    if rule == "min":
+        def check(value):
+            if isinstance(value, (int, float)):
+                if value < bound:
+                    raise ValidationError(field_name, f"Valor mínimo: {bound}")
+            elif isinstance(value, str) and len(value) < bound:
+                raise ValidationError(field_name, f"Longitud mínima: {bound} caracteres")
+            return value
+    else:
+        def check(value):
+            if isinstance(value, (int, float)):
+                if value > bound:
+                    raise ValidationError(field_name, f"Valor máximo: {bound}")
+            elif isinstance(value, str) and len(value) > bound:
+                raise ValidationError(field_name, f"Longitud máxima: {bound} caracteres")
+            return value
+    return check
+
+def _compile_rule(field_name: str, rule: str, param: Optional[str]) -> Optional[Callable[[Any], Any]]:
+    """Función de una regla de `validacion` (None si la regla no existe)"""
+    if rule in ("min", "max"):
+        return _compile_bound(field_name, rule, param)
+    if rule == "regex":
         try:
-            return float(value) if '.' in str(value) else int(value)
-        except (ValueError, TypeError):
-            raise ValidationError(field_name, "Debe ser un número")
-    
-    async def _validate_date(self, value: Any, param: Any = None, field_name: str = "date") -> datetime:
-        """Validar fecha"""
-        if isinstance(value, datetime):
+            pattern = re.compile(param or "")
+        except re.error:
+            return _invalid_rule(field_name, rule)
+
+        def check(value):
+            if not pattern.match(str(value)):
+                raise ValidationError(field_name, "Formato inválido")
             return value
-        
-        date_str = str(value)
-        
-        # Intentar varios formatos de fecha
-        date_formats = [
-            "%Y-%m-%d",
-            "%Y-%m-%d %H:%M:%S",
-            "%Y-%m-%dT%H:%M:%S",
-            "%Y-%m-%dT%H:%M:%SZ",
-            "%d/%m/%Y",
-            "%d-%m-%Y"
+        return check
+    if rule == "numeric":
+        return lambda value: _validate_number(value, field_name, "Debe ser un número")
+
+    simple = {
+        "email": _validate_email,
+        "phone": _validate_phone,
+        "url": _validate_url,
+        "required": _validate_required,
+        "date": _validate_date,
+        "boolean": _validate_boolean
+    }.get(rule)
+    if simple is None:
+        return None
+    return lambda value: simple(value, field_name)
+
+@lru_cache(maxsize=4096)
+def _compile_field(
+    field_name: str,
+    field_type: str,
+    validacion: Optional[str],
+    obligatorio: bool
+) -> FieldValidator:
+    type_check = _TYPE_VALIDATORS.get(field_type)
+    steps: List[Callable[[Any], Any]] = []
+    if validacion:
+        for rule, param in parse_validation_string(validacion).items():
+            step = _compile_rule(field_name, rule, param)
+            if step is not None:
+                steps.append(step)
+
+    if type_check is None:
+        type_check = lambda value, field_name: value
+
+    # Variantes sin bucle para los casos comunes (sin reglas o una sola)
+    if not steps:
+        def validate(value: Any) -> Any:
+            if value is None or value == "":
+                if obligatorio:
+                    raise ValidationError(field_name, "Campo obligatorio")
+                return value
+            return type_check(value, field_name)
+    elif len(steps) == 1:
+        step = steps[0]
+
+        def validate(value: Any) -> Any:
+            if value is None or value == "":
+                if obligatorio:
+                    raise ValidationError(field_name, "Campo obligatorio")
+                return value
+            return step(type_check(value, field_name))
+    else:
+        def validate(value: Any) -> Any:
+            if value is None or value == "":
+                if obligatorio:
+                    raise ValidationError(field_name, "Campo obligatorio")
+                return value
+            value = type_check(value, field_name)
+            for step in steps:
+                value = step(value)
+            return value
+
+    return validate
+
+def compile_field_validator(field_config: Dict[str, Any]) -> FieldValidator:
+    """Validador síncrono de un campo: reglas parseadas y regex compiladas una sola vez"""
+    return _compile_field(
+        field_config.get("campo", "unknown"),
+        field_config.get("tipo", "text"),
+        field_config.get("validacion"),
+        bool(field_config.get("obligatorio", False))
+    )
+
+class EntityValidator:
+    """Validación compilada de todos los `campos` de una entidad.
+
+    Se construye una vez por versión de la configuración (EntityPlan) y
+    valida filas sin crear una corrutina por campo, así que sirve igual
+    para un create que para lotes de miles de filas.
+    """
+
+    __slots__ = ("_fields",)
+
+    def __init__(self, campos: List[Dict[str, Any]]):
+        self._fields: List[Tuple[str, bool, FieldValidator]] = [
+            (campo["campo"], bool(campo.get("obligatorio", False)), compile_field_validator(campo))
+            for campo in campos
         ]
-        
-        for fmt in date_formats:
+
+    def validate(self, data: Dict[str, Any], is_create: bool = True) -> Dict[str, Any]:
+        """Campos configurados presentes en data, validados y convertidos"""
+        validated = {}
+        for name, obligatorio, check in self._fields:
+            value = data.get(name)
+            if obligatorio and is_create and (value is None or value == ""):
+                raise ValidationError(name, "Campo obligatorio")
+            if value is not None:
+                validated[name] = check(value)
+        return validated
+
+    def validate_many(
+        self,
+        rows: List[Dict[str, Any]],
+        is_create: bool = True
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, Exception]]]:
+        """(índice, fila validada) y (índice, error) para un lote de filas"""
+        valid = []
+        errors = []
+        validate = self.validate
+        for index, row in enumerate(rows):
             try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
-        
-        raise ValidationError(field_name, "Formato de fecha inválido")
-    
-    async def _validate_boolean(self, value: Any, param: Any = None, field_name: str = "boolean") -> bool:
-        """Validar booleano"""
-        if isinstance(value, bool):
-            return value
-        
-        value_str = str(value).lower()
-        
-        if value_str in ['true', '1', 'yes', 'on', 'active']:
-            return True
-        elif value_str in ['false', '0', 'no', 'off', 'inactive']:
-            return False
-        else:
-            raise ValidationError(field_name, "Debe ser verdadero o falso")
\ No newline at end of file
+                valid.append((index, validate(row, is_create)))
+            except Exception as e:
+                errors.append((index, e))
+        return valid, errors
+
+class ValidationService:
+    """Servicio para validaciones dinámicas de campos"""
+
+    def validate(self, value: Any, field_config: Dict[str, Any]) -> Any:
+        """Validar un campo según su configuración (síncrono)"""
+        return compile_field_validator(field_config)(value)
+
+    async def validate_field(self, value: Any, field_config: Dict[str, Any]) -> Any:
+        """Validar un campo según su configuración"""
+        return compile_field_validator(field_config)(value)
+
+    def compile_entity(self, campos: List[Dict[str, Any]]) -> EntityValidator:
+        """Validador compilado para los campos de una entidad"""
+        return EntityValidator(campos)
@@ -2,6 +2,7 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 import logging
 
+from ..core.config_cache import get_config_cache
 from ..database import get_database
 from ..models.view import ViewConfig, ViewConfigCreate, ViewConfigUpdate
 from ..models.user import User
@@ -27,11 +28,7 @@ class ViewService:
     
     async def get_view_config(self, business_id: str, vista: str) -> Optional[ViewConfig]:
         """Obtener configuración específica de vista"""
-        doc = await self.db.views_config.find_one({
-            "business_id": business_id,
-            "vista": vista
-        })
-        return ViewConfig(**doc) if doc else None
+        return await get_config_cache().get_view_config(business_id, vista)
     
     async def get_view_config_for_user(
         self, 
@@ -73,6 +70,7 @@ class ViewService:
         
         result = await self.db.views_config.insert_one(config.dict(by_alias=True))
         config.id = result.inserted_id
+        get_config_cache().invalidate_view(config.business_id, config.vista)
         
         logger.info(f"Configuración de vista creada: {config.business_id}.{config.vista}")
         return config
@@ -94,6 +92,7 @@ class ViewService:
         )
         
         if result:
+            get_config_cache().invalidate_view(business_id, vista)
             logger.info(f"Configuración de vista actualizada: {business_id}.{vista}")
             return ViewConfig(**result)
         
@@ -107,6 +106,7 @@ class ViewService:
         })
         
         if result.deleted_count > 0:
+            get_config_cache().invalidate_view(business_id, vista)
             logger.info(f"Configuración de vista eliminada: {business_id}.{vista}")
             return True
         
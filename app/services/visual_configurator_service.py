@@ -7,6 +7,8 @@ import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from ..core.business_registry import get_business_registry
+from ..core.config_cache import get_config_cache
 from ..database import get_database
 from ..models.entity import EntityConfig, CampoConfig, ApiConfig, CrudConfig
 from ..models.view import ViewConfig, ComponenteVista, ConfiguracionVista, LayoutConfig
@@ -106,6 +108,7 @@ class VisualConfiguratorService:
             
             # 7. Guardar en base de datos
             result = await self.db.entities_config.insert_one(entity_config.dict(by_alias=True))
+            get_config_cache().invalidate_entity(business_id, entity_name)
             
             return {
                 "success": True,
@@ -424,6 +427,7 @@ class VisualConfiguratorService:
             
             # Guardar en base de datos
             result = await self.db.views_config.insert_one(view_config.dict(by_alias=True))
+            get_config_cache().invalidate_view(business_id, dashboard_name)
             
             return {
                 "success": True,
@@ -515,9 +519,10 @@ class VisualConfiguratorService:
                 return {"success": False, "error": "Business no encontrado"}
             
             # Limpiar cache de dashboards que usan branding
-            from ..services.cache_service import CacheService
+            from ..services.cache_service import CacheService, business_tag
             cache_service = CacheService()
-            await cache_service.clear_pattern(f"dashboard_{business_id}_*")
+            await cache_service.invalidate_tags(business_tag(business_id))
+            await get_business_registry().refresh_business(business_id)
             
             return {
                 "success": True,
@@ -2,7 +2,6 @@
 # app/services/waha_service.py (ACTUALIZADO con API Key)
 # ================================
 
-import httpx
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
@@ -10,6 +9,7 @@ from datetime import datetime
 from ..database import get_database
 from ..models.atencion_humana import AtencionHumana, AtencionHumanaCreate
 from ..config import settings
+from ..core.http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -25,16 +25,12 @@ class WAHAService:
         }
         if self.api_key:
             self.headers["X-Api-Key"] = self.api_key
+        self.client = get_http_client(self.base_url, self.headers)
     
     async def get_sessions(self):
         """Obtener sesiones de WhatsApp"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/api/sessions",
-                headers=self.headers,
-                timeout=30.0
-            )
-            return response.json() if response.status_code == 200 else None
+        response = await self.client.get("/api/sessions", timeout=30.0)
+        return response.json() if response.status_code == 200 else None
 
 class N8NService:
     """Servicio N8N con headers correctos"""
@@ -48,13 +44,9 @@ class N8NService:
         }
         if self.api_key:
             self.headers["X-N8N-API-KEY"] = self.api_key
+        self.client = get_http_client(self.base_url, self.headers)
     
     async def get_workflows(self):
         """Obtener workflows activos"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/api/v1/workflows?active=true",
-                headers=self.headers,
-                timeout=30.0
-            )
-            return response.json() if response.status_code == 200 else None
+        response = await self.client.get("/api/v1/workflows", params={"active": "true"}, timeout=30.0)
+        return response.json() if response.status_code == 200 else None
@@ -13,6 +13,8 @@ from ..models.atencion_humana import (
     ClienteExterno, ConversacionData, MensajeWhatsApp, TicketExterno
 )
 from ..models.user import User
+from ..core.metrics_rollup import get_metrics_rollup
+from ..core.realtime_hub import CONVERSATIONS_TOPIC, get_realtime_hub
 from ..services.waha_service import WAHAService
 from ..services.api_service import ApiService
 from ..services.n8n_service import N8NService
@@ -249,6 +251,10 @@ class WhatsAppHumanAttentionService:
             # Guardar en base de datos
             atencion = AtencionHumana(**atencion_data.dict())
             result = await self.db.atencion_humana.insert_one(atencion.dict(by_alias=True))
+            await get_metrics_rollup().conversation_changed(
+                business_id, atencion.created_at, "pendiente", area=area
+            )
+            get_realtime_hub().notify(business_id, CONVERSATIONS_TOPIC)
             
             # Notificar a usuarios del área correspondiente
             await self._notify_area_users(business_id, area, atencion)
@@ -427,6 +433,10 @@ class WhatsAppHumanAttentionService:
                     }
                 }
             )
+            await get_metrics_rollup().conversation_changed(
+                sesion.business_id, sesion.created_at, "atendiendo", previous_estado=sesion.conversacion.estado
+            )
+            get_realtime_hub().notify(sesion.business_id, CONVERSATIONS_TOPIC)
             
             # Enviar notificación al cliente
             await self._send_agent_joined_notification(
@@ -537,18 +547,28 @@ class WhatsAppHumanAttentionService:
                 ticket_externo = await self._create_external_ticket(sesion, user, notas)
             
             # Finalizar conversación
+            fecha_finalizacion = datetime.utcnow()
             await self.db.atencion_humana.update_one(
                 {"_id": session_id},
                 {
                     "$set": {
                         "conversacion.estado": "finalizado",
-                        "conversacion.fecha_finalizacion": datetime.utcnow(),
+                        "conversacion.fecha_finalizacion": fecha_finalizacion,
                         "conversacion.notas_atencion": notas or "",
                         "ticket_externo": ticket_externo.dict() if ticket_externo else None,
                         "updated_at": datetime.utcnow()
                     }
                 }
             )
+            if sesion.conversacion.estado != "finalizado":
+                await get_metrics_rollup().conversation_changed(
+                    sesion.business_id,
+                    sesion.created_at,
+                    "finalizado",
+                    previous_estado=sesion.conversacion.estado,
+                    resolution_minutes=(fecha_finalizacion - sesion.conversacion.fecha_inicio).total_seconds() / 60
+                )
+                get_realtime_hub().notify(sesion.business_id, CONVERSATIONS_TOPIC)
             
             # Enviar mensaje de cierre al cliente
             await self._send_conversation_closed_notification(
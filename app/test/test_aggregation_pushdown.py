@@ -0,0 +1,134 @@
+# ================================
+# tests/test_aggregation_pushdown.py
+# ================================
+
+import pytest
+from types import SimpleNamespace
+
+from app.core.aggregation_pushdown import (
+    AggregationPushdown, aggregate_items, build_pipeline, spec_from_component
+)
+from app.core.dynamic_crud import DynamicCrudGenerator
+from app.models.entity import EntityConfig
+from app.models.view import ComponenteVista
+from app.utils.exceptions import PermissionDeniedError
+
+class _Aggregate:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length):
+        return self._docs
+
+class _Collection:
+    def __init__(self, result):
+        self.result = result
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return _Aggregate(self.result)
+
+class _Cache:
+    def __init__(self):
+        self.calls = []
+
+    async def get_or_compute(self, key, factory, ttl=None, force_refresh=False, tags=None):
+        self.calls.append((key, tags))
+        return await factory()
+
+def _pushdown(collection, campos=None):
+    generator = DynamicCrudGenerator.__new__(DynamicCrudGenerator)
+    generator.db = {"b1_pedidos": collection}
+    config = EntityConfig(business_id="b1", entidad="pedidos", configuracion={"campos": campos or []})
+
+    async def get_entity_config(business_id, entity_name):
+        return config
+
+    generator.get_entity_config = get_entity_config
+    pushdown = AggregationPushdown(generator)
+    pushdown.cache_service = _Cache()
+    return pushdown
+
+def test_pipeline_groups_numeric_values_by_period():
+    """Test pipeline de suma mensual: solo valores numéricos y una fila por mes"""
+    spec = spec_from_component({"entidad": "pedidos", "operacion": "sum", "campo_suma": "total", "periodo": "month"})
+
+    pipeline = build_pipeline(spec, {"estado": "pagado"})
+
+    assert pipeline[0] == {"$match": {"$and": [{"estado": "pagado"}, {"total": {"$type": "number"}}]}}
+    assert pipeline[1]["$group"]["valor"] == {"$sum": "$total"}
+    assert pipeline[1]["$group"]["_id"]["$dateToString"]["format"] == "%Y-%m"
+    assert [next(iter(stage)) for stage in pipeline[2:]] == ["$match", "$sort", "$limit"]
+
+def test_python_fallback_matches_legacy_chart_operations():
+    """Test count_by_day sobre items (entidades de API externa)"""
+    spec = spec_from_component({"entidad": "pedidos", "operacion": "count_by_day"})
+    items = [
+        {"created_at": "2024-05-02T10:00:00Z"},
+        {"created_at": "2024-05-01T09:00:00Z"},
+        {"created_at": "2024-05-02T18:30:00"},
+        {"created_at": None}
+    ]
+
+    assert aggregate_items(items, spec) == [
+        {"fecha": "2024-05-01", "valor": 1},
+        {"fecha": "2024-05-02", "valor": 2}
+    ]
+    avg = spec_from_component({"entidad": "pedidos", "operacion": "avg", "campo_promedio": "total"})
+    assert aggregate_items([{"total": 4}, {"total": "x"}, {"total": 8}], avg) == 6
+
+def test_saved_component_config_defaults_to_count():
+    """Test la configuración volcada del modelo (claves en None) es un count sobre created_at"""
+    config = ComponenteVista(id="a", tipo="stats_card", configuracion={"entidad": "clientes"}).model_dump()["configuracion"]
+
+    spec = spec_from_component(config)
+
+    assert (spec.entidad, spec.operacion, spec.campo_fecha) == ("clientes", "count", "created_at")
+
+@pytest.mark.asyncio
+async def test_api_entity_is_aggregated_over_every_page():
+    """Test con api_config se agregan todas las páginas, no solo la primera"""
+    pushdown = _pushdown(_Collection([]))
+    pages = [[{"total": 1}] * 3, [{"total": 1}] * 3, [{"total": 2}]]
+
+    async def get_entity_config(business_id, entity_name):
+        return EntityConfig(business_id="b1", entidad="pedidos", configuracion={"api_config": {"fuente": "erp"}})
+
+    async def iter_entities(business_id, entity_name, user, filters=None):
+        for page in pages:
+            yield page
+
+    pushdown.crud_generator.get_entity_config = get_entity_config
+    pushdown.crud_generator.iter_entities = iter_entities
+    spec = spec_from_component({"entidad": "pedidos", "operacion": "sum", "campo": "total"})
+
+    assert await pushdown.aggregate("b1", spec, SimpleNamespace(rol="admin")) == 8
+
+@pytest.mark.asyncio
+async def test_scalar_is_computed_in_db_and_cached_per_component():
+    """Test stats_card: un aggregate que devuelve solo el escalar, cacheado por componente"""
+    collection = _Collection([{"_id": None, "valor": 42}])
+    pushdown = _pushdown(collection)
+    spec = spec_from_component({"entidad": "pedidos", "operacion": "max", "campo": "total"})
+
+    valor = await pushdown.aggregate("b1", spec, SimpleNamespace(rol="admin"), "kpi_total")
+
+    assert valor == 42
+    assert collection.pipelines[0][-1] == {"$group": {"_id": None, "valor": {"$max": "$total"}}}
+    key, tags = pushdown.cache_service.calls[0]
+    assert key.startswith("agg:b1:pedidos:kpi_total:")
+    assert tags == ["entity:b1:pedidos", "component:b1:kpi_total"]
+
+@pytest.mark.asyncio
+async def test_hidden_field_cannot_be_aggregated():
+    """Test un rol no puede agregar un campo que no ve"""
+    campos = [
+        {"campo": "cliente", "tipo": "text"},
+        {"campo": "costo", "tipo": "number", "visible_roles": ["admin"]}
+    ]
+    pushdown = _pushdown(_Collection([]), campos)
+    spec = spec_from_component({"entidad": "pedidos", "operacion": "sum", "campo_suma": "costo"})
+
+    with pytest.raises(PermissionDeniedError):
+        await pushdown.aggregate("b1", spec, SimpleNamespace(rol="empleado", permisos=SimpleNamespace(entidades_acceso=[])))
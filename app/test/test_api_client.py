@@ -0,0 +1,62 @@
+# ================================
+# tests/test_api_client.py
+# ================================
+
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from app.core.api_client import ApiAuth, ApiClientManager
+from app.models.api_config import ApiConfiguration, AuthConfig
+from app.services.crypto_service import CryptoService
+
+async def _encrypted_config(updated_at: datetime) -> ApiConfiguration:
+    crypto = CryptoService()
+    return ApiConfiguration(
+        business_id="isp_demo",
+        name="clientes",
+        base_url="https://api.example.com",
+        endpoint="/clientes",
+        auth=AuthConfig(tipo="bearer", token=await crypto.encrypt("secreto")),
+        updated_at=updated_at
+    )
+
+@pytest.mark.asyncio
+async def test_api_auth_resolves_without_mutating_config():
+    """Test credenciales desencriptadas en un objeto inmutable"""
+    config = await _encrypted_config(datetime.utcnow())
+    encrypted_token = config.auth.token
+
+    auth = await ApiAuth.from_config(config.auth, CryptoService())
+
+    assert dict(auth.headers) == {"Authorization": "Bearer secreto"}
+    assert config.auth.token == encrypted_token
+    with pytest.raises(Exception):
+        auth.headers = ()
+
+@pytest.mark.asyncio
+async def test_manager_reuses_client_until_config_changes():
+    """Test un cliente por (business_id, api_name, updated_at)"""
+    manager = ApiClientManager()
+    updated_at = datetime.utcnow()
+
+    with patch.object(CryptoService, "decrypt", AsyncMock(return_value="secreto")) as decrypt:
+        client = await manager.get_client(await _encrypted_config(updated_at))
+        assert await manager.get_client(await _encrypted_config(updated_at)) is client
+        assert decrypt.await_count == 1
+
+        new_client = await manager.get_client(await _encrypted_config(updated_at + timedelta(seconds=1)))
+        assert new_client is not client
+        assert decrypt.await_count == 2
+
+    assert manager.stats()["created"] == 2
+    assert manager.stats()["retiring"] == 1
+
+    # Salir del context manager no cierra un cliente compartido
+    async with new_client:
+        pass
+    assert new_client._client is not None
+
+    await manager.close()
+    assert client._client is None
+    assert new_client._client is None
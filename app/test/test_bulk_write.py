@@ -0,0 +1,188 @@
+# ================================
+# tests/test_bulk_write.py
+# ================================
+
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.core.dynamic_crud import DynamicCrudGenerator
+from app.models.entity import EntityConfig
+
+class _Find:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length):
+        return self._docs
+
+class _Collection:
+    def __init__(self, duplicate_names=()):
+        self.docs = {}
+        self.calls = []
+        self.duplicate_names = set(duplicate_names)
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls.append(("insert_many", len(docs), ordered))
+        write_errors = []
+        for position, doc in enumerate(docs):
+            doc["_id"] = ObjectId()
+            if doc.get("nombre") in self.duplicate_names:
+                write_errors.append({"index": position, "code": 11000, "keyValue": {"nombre": doc["nombre"]}})
+                if ordered:
+                    break
+                continue
+            self.docs[doc["_id"]] = doc
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": len(docs) - len(write_errors)})
+
+    def find(self, query, projection=None):
+        self.calls.append(("find", len(query["_id"]["$in"])))
+        return _Find([{"_id": _id} for _id in query["_id"]["$in"] if _id in self.docs])
+
+    async def bulk_write(self, operations, ordered=True):
+        self.calls.append(("bulk_write", len(operations), ordered))
+        for operation in operations:
+            self.docs[operation._filter["_id"]].update(operation._doc["$set"])
+
+    async def delete_many(self, query):
+        self.calls.append(("delete_many", len(query["_id"]["$in"])))
+        for _id in query["_id"]["$in"]:
+            self.docs.pop(_id, None)
+
+def _generator(collection):
+    generator = DynamicCrudGenerator.__new__(DynamicCrudGenerator)
+    generator.db = {"b1_clientes": collection}
+    generator.validation_service = SimpleNamespace(validate_field=_identity)
+    config = EntityConfig(business_id="b1", entidad="clientes", configuracion={"campos": [
+        {"campo": "nombre", "tipo": "text", "obligatorio": True},
+        {"campo": "edad", "tipo": "number"}
+    ]})
+
+    async def get_entity_config(business_id, entity_name):
+        return config
+
+    generator.get_entity_config = get_entity_config
+    return generator
+
+async def _identity(value, field_config):
+    return value
+
+async def _no_invalidate(self, *tags):
+    return None
+
+_USER = SimpleNamespace(id="u1", rol="admin")
+
+@pytest.mark.asyncio
+@patch("app.core.dynamic_crud.CacheService.invalidate_tags", _no_invalidate)
+async def test_bulk_create_chunks_inserts_and_maps_write_errors():
+    """Test insert_many por lotes con errores de duplicado en su índice original"""
+    collection = _Collection(duplicate_names={"c3"})
+    generator = _generator(collection)
+    items = [{"nombre": f"c{i}", "edad": i} for i in range(5)]
+
+    with patch("app.core.dynamic_crud.settings.bulk_write_batch_size", 2):
+        result = await generator.bulk_create_entities("b1", "clientes", items, _USER, continue_on_error=True)
+
+    assert (result["created"], result["failed"]) == (4, 1)
+    assert result["errors"][0]["index"] == 3 and "duplicado" in result["errors"][0]["error"]
+    assert [call for call in collection.calls] == [
+        ("insert_many", 2, False), ("insert_many", 2, False), ("insert_many", 1, False)
+    ]
+
+@pytest.mark.asyncio
+@patch("app.core.dynamic_crud.CacheService.invalidate_tags", _no_invalidate)
+async def test_bulk_create_validates_all_before_writing_and_stops_in_order():
+    """Test validate_all no escribe nada si un item falla; ordered se detiene en el primer error"""
+    collection = _Collection(duplicate_names={"c1"})
+    generator = _generator(collection)
+
+    invalid = await generator.bulk_create_entities("b1", "clientes", [{"nombre": "a"}, {"edad": 3}], _USER)
+    assert invalid["validation_failed"] and invalid["errors"][0]["index"] == 1
+    assert collection.calls == []
+
+    ordered = await generator.bulk_create_entities(
+        "b1", "clientes", [{"nombre": f"c{i}"} for i in range(4)], _USER, validate_all=False
+    )
+    assert (ordered["created"], ordered["failed"], ordered["total_processed"]) == (1, 1, 2)
+
+@pytest.mark.asyncio
+@patch("app.core.dynamic_crud.CacheService.invalidate_tags", _no_invalidate)
+async def test_bulk_update_and_delete_report_missing_ids():
+    """Test bulk_write/delete_many por lote con ids inexistentes reportados por item"""
+    collection = _Collection()
+    generator = _generator(collection)
+    created = await generator.bulk_create_entities("b1", "clientes", [{"nombre": "a"}, {"nombre": "b"}], _USER)
+    ids = [item["id"] for item in created["results"]]
+    missing = str(ObjectId())
+
+    updated = await generator.bulk_update_entities(
+        "b1", "clientes", [{"id": ids[0], "edad": 30}, {"id": missing, "edad": 1}, {"edad": 2}], _USER
+    )
+    assert updated["updated"] == 1
+    assert [(error["index"], error["error"]) for error in updated["errors"]] == [
+        (1, "No encontrado"), (2, "Campo 'id' requerido")
+    ]
+    assert collection.docs[ObjectId(ids[0])]["edad"] == 30
+
+    deleted = await generator.bulk_delete_entities("b1", "clientes", [*ids, missing], _USER)
+    assert (deleted["deleted"], deleted["failed"]) == (2, 1)
+    assert collection.docs == {}
+
+@pytest.mark.asyncio
+@patch("app.core.dynamic_crud.CacheService.invalidate_tags", _no_invalidate)
+async def test_bulk_create_50k_items_uses_few_round_trips():
+    """Test 50k items: una validación por item y un insert_many por lote"""
+    collection = _Collection()
+    generator = _generator(collection)
+    items = [{"nombre": f"c{i}", "edad": i % 90} for i in range(50_000)]
+
+    start = time.perf_counter()
+    result = await generator.bulk_create_entities("b1", "clientes", items, _USER)
+    elapsed = time.perf_counter() - start
+
+    assert result["created"] == 50_000
+    assert len(collection.calls) == 50
+    assert elapsed < 10
+
+class _ApiService:
+    """API externa en memoria: registra método y endpoint de cada request"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def make_request(self, business_id, fuente, endpoint, method="GET", data=None, params=None, use_cache=True):
+        self.requests.append((method, endpoint, data))
+        return {"id": endpoint.rsplit("/", 1)[-1], **(data or {})}
+
+@pytest.mark.asyncio
+async def test_bulk_operations_on_api_entity_all_go_upstream():
+    """Test con api_config crear, editar y eliminar en bulk van a la API y nunca a la colección local"""
+    collection = _Collection()
+    generator = _generator(collection)
+    config = EntityConfig(business_id="b1", entidad="clientes", configuracion={
+        "campos": [{"campo": "nombre", "tipo": "text", "obligatorio": True}, {"campo": "edad", "tipo": "number"}],
+        "api_config": {"fuente": "crm", "endpoint": "/clientes"},
+        "crud_config": {"crear": {"habilitado": True}, "editar": {"habilitado": True}, "eliminar": {"habilitado": True}}
+    })
+
+    async def get_entity_config(business_id, entity_name):
+        return config
+
+    generator.get_entity_config = get_entity_config
+    generator.api_service = _ApiService()
+
+    created = await generator.bulk_create_entities("b1", "clientes", [{"nombre": "a"}], _USER)
+    updated = await generator.bulk_update_entities("b1", "clientes", [{"id": "7", "edad": 30}, {"id": "8", "edad": "x"}], _USER)
+    deleted = await generator.bulk_delete_entities("b1", "clientes", ["7", "8"], _USER)
+
+    assert (created["created"], updated["updated"], updated["failed"], deleted["deleted"]) == (1, 1, 1, 2)
+    assert [(method, endpoint) for method, endpoint, _ in generator.api_service.requests] == [
+        ("POST", "/clientes"), ("PUT", "/clientes/7"), ("DELETE", "/clientes/7"), ("DELETE", "/clientes/8")
+    ]
+    assert generator.api_service.requests[1][2] == {"edad": 30}
+    assert collection.calls == [] and collection.docs == {}
@@ -0,0 +1,83 @@
+# ================================
+# tests/test_business_registry.py
+# ================================
+
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from app.core.business_registry import BusinessRegistry
+from app.middleware.business_context import BusinessContextMiddleware
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class _Collection:
+    """Lo mínimo de business_instances que usa el registro"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        since = query.get("updated_at", {}).get("$gte")
+        return _Cursor([dict(doc) for doc in self.docs if since is None or doc["updated_at"] >= since])
+
+    async def count_documents(self, query):
+        return len(self.docs)
+
+class _Db:
+    def __init__(self, docs):
+        self.business_instances = _Collection(docs)
+
+def _doc(_id, business_id, updated_at, activo=True):
+    return {"_id": _id, "business_id": business_id, "nombre": business_id, "activo": activo, "updated_at": updated_at}
+
+@pytest.mark.asyncio
+async def test_polling_applies_updates_deactivations_and_deletes():
+    """Test refresco por updated_at incluyendo borrados"""
+    t0 = datetime(2024, 1, 1)
+    db = _Db([_doc(1, "b1", t0), _doc(2, "b2", t0), _doc(3, "old", t0, activo=False)])
+    registry = BusinessRegistry(db=db)
+    await registry.load()
+
+    assert registry.exists("b1") and registry.exists("b2")
+    assert not registry.exists("old")
+
+    db.business_instances.docs[0] = _doc(1, "b1", t0 + timedelta(seconds=5), activo=False)
+    db.business_instances.docs.append(_doc(4, "b3", t0 + timedelta(seconds=6)))
+    await registry.poll_once()
+    assert not registry.exists("b1")
+    assert registry.exists("b3")
+    assert db.business_instances.queries[-1] == {"updated_at": {"$gte": t0}}
+    assert registry.stats()["watermark"] == (t0 + timedelta(seconds=6)).isoformat()
+
+    del db.business_instances.docs[1]
+    await registry.poll_once()
+    assert not registry.exists("b2")
+
+@pytest.mark.asyncio
+async def test_change_stream_delete_and_middleware_without_io():
+    """Test delete por _id y validación del middleware sin consultar MongoDB"""
+    registry = BusinessRegistry(db=_Db([_doc(1, "b1", datetime(2024, 1, 1))]))
+    await registry.load()
+
+    middleware = BusinessContextMiddleware(app=None)
+    with patch("app.middleware.business_context.get_business_registry", return_value=registry), \
+         patch("app.middleware.business_context.get_database", side_effect=AssertionError("sin I/O")):
+        assert await middleware._validate_business_exists("b1")
+        assert not await middleware._validate_business_exists("b9")
+
+    registry._apply_change({"operationType": "delete", "documentKey": {"_id": 1}})
+    assert not registry.exists("b1")
@@ -0,0 +1,311 @@
+# ================================
+# tests/test_cache_service.py
+# ================================
+
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+import fakeredis
+import fakeredis.aioredis
+
+from app.config import settings
+from app.services import cache_service as cache_module
+from app.services.cache_service import (
+    CacheService, LocalLRUCache, RedisCacheBackend, business_tag, entity_tag, get_cache_stats,
+    get_local_cache, start_cache_invalidation_listener, stop_cache_invalidation_listener
+)
+
+@pytest.fixture
+def fake_redis():
+    """Redis en memoria compatible con redis.asyncio (servidor aislado por test)"""
+    return fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+@pytest.fixture
+def cache(fake_redis):
+    return CacheService(backend=RedisCacheBackend(client=fake_redis))
+
+@pytest.mark.asyncio
+async def test_set_and_get_roundtrip(cache, fake_redis):
+    """Test guardar y leer un valor con TTL del servidor"""
+    assert await cache.set("dashboard_b1_principal_admin", {"total": 3}, ttl=120)
+
+    assert await cache.get("dashboard_b1_principal_admin") == {"total": 3}
+    # Un solo nivel de JSON (sin JSON dentro de JSON)
+    assert json.loads(await fake_redis.get("dashboard_b1_principal_admin")) == {"total": 3}
+    assert 0 < await fake_redis.ttl("dashboard_b1_principal_admin") <= 120
+
+@pytest.mark.asyncio
+async def test_get_missing_key_returns_none(cache):
+    """Test key inexistente"""
+    assert await cache.get("no_existe") is None
+    assert not await cache.exists("no_existe")
+
+@pytest.mark.asyncio
+async def test_get_many_and_set_many(cache):
+    """Test MGET y SET en pipeline"""
+    assert await cache.set_many({"a": 1, "b": [1, 2]}, ttl=60)
+
+    result = await cache.get_many(["a", "b", "c"])
+
+    assert result == {"a": 1, "b": [1, 2]}
+
+@pytest.mark.asyncio
+async def test_delete_and_clear_pattern(cache):
+    """Test eliminar keys individuales y por patrón"""
+    await cache.set_many({
+        "dashboard_b1_x_admin": 1,
+        "dashboard_b1_y_admin": 2,
+        "dashboard_b2_x_admin": 3
+    })
+
+    assert await cache.delete("dashboard_b1_x_admin")
+    assert await cache.clear_pattern("dashboard_b1_*") == 1
+    assert await cache.get("dashboard_b2_x_admin") == 3
+
+def test_local_lru_limits_and_ttl():
+    """Test L1: expulsión por items, por bytes y expiración por TTL"""
+    lru = LocalLRUCache(max_items=2, max_bytes=10)
+
+    lru.set("a", "1111", ttl=60)
+    lru.set("b", "2222", ttl=60)
+    lru.get("a")  # "a" pasa a ser la más reciente
+    lru.set("c", "3333", ttl=60)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == "1111"
+    assert lru.stats()["evictions"] == 1
+
+    lru.set("e", "12345678", ttl=60)  # 16 bytes > 10: expulsa "a" y "c"
+    assert lru.stats()["items"] == 1
+    assert lru.stats()["evictions"] == 3
+
+    lru.set("d", "x", ttl=0)
+    assert lru.get("d") is None
+
+@pytest_asyncio.fixture
+async def two_tier_cache(fake_redis):
+    """CacheService con L1 activa y listener de invalidaciones sobre fake Redis"""
+    await start_cache_invalidation_listener(client=fake_redis)
+    for _ in range(50):
+        if cache_module._listener_ready:
+            break
+        await asyncio.sleep(0.01)
+    yield CacheService(backend=RedisCacheBackend(client=fake_redis))
+    await stop_cache_invalidation_listener()
+    get_local_cache().clear()
+
+@pytest.mark.asyncio
+async def test_l1_serves_hits_and_drops_remote_invalidations(two_tier_cache, fake_redis):
+    """Test L1: hits locales e invalidación publicada por otro worker"""
+    await two_tier_cache.set("entity_data:b1:clientes", {"items": [1]}, ttl=300)
+    l1_hits = get_cache_stats()["l1"]["hits"]
+
+    assert await two_tier_cache.get("entity_data:b1:clientes") == {"items": [1]}
+    assert get_cache_stats()["l1"]["hits"] == l1_hits + 1
+
+    # Otro worker borra en Redis y publica la invalidación
+    await fake_redis.delete("entity_data:b1:clientes")
+    await fake_redis.publish(
+        settings.cache_invalidation_channel,
+        json.dumps({"origin": "otro_worker", "pattern": "entity_data:b1:*"})
+    )
+    for _ in range(50):
+        if get_local_cache().get("entity_data:b1:clientes") is None:
+            break
+        await asyncio.sleep(0.01)
+
+    assert await two_tier_cache.get("entity_data:b1:clientes") is None
+
+@pytest.mark.asyncio
+async def test_get_or_compute_coalesces_concurrent_misses(cache):
+    """Test single-flight: misses concurrentes ejecutan un solo cálculo"""
+    calls = 0
+
+    async def build_dashboard():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"componentes": [1, 2, 3]}
+
+    results = await asyncio.gather(*[
+        cache.get_or_compute("dashboard_b1_principal_admin", build_dashboard, ttl=60)
+        for _ in range(20)
+    ])
+
+    assert calls == 1
+    assert all(result == {"componentes": [1, 2, 3]} for result in results)
+    # get() devuelve el valor sin los metadatos de XFetch
+    assert await cache.get("dashboard_b1_principal_admin") == {"componentes": [1, 2, 3]}
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_waiting_requests(cache):
+    """Test si se cancela el request que calculaba, otro de los que esperaban calcula el valor"""
+    calls = 0
+
+    async def build_dashboard():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(10 if calls == 1 else 0.01)
+        return {"calls": calls}
+
+    leader = asyncio.create_task(cache.get_or_compute("dashboard_b1_cancel", build_dashboard, ttl=60))
+    await asyncio.sleep(0.01)
+    followers = [
+        asyncio.create_task(cache.get_or_compute("dashboard_b1_cancel", build_dashboard, ttl=60))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    results = await asyncio.gather(*followers)
+
+    assert leader.cancelled()
+    assert calls == 2
+    assert results == [{"calls": 2}] * 3
+    assert "dashboard_b1_cancel" not in cache_module._inflight
+
+@pytest.mark.asyncio
+async def test_get_or_compute_refreshes_hot_key_before_expiry(cache):
+    """Test XFetch: una key a punto de expirar se refresca en background"""
+    versions = iter([1, 2])
+
+    async def build():
+        return {"version": next(versions)}
+
+    await cache.get_or_compute("hot_key", build, ttl=60)
+    # Simular que la key está por expirar y que su cálculo fue costoso
+    await cache.set("hot_key", {"__xfetch__": 1, "value": {"version": 1}, "delta": 30, "expiry": 0}, ttl=60)
+
+    assert await cache.get_or_compute("hot_key", build, ttl=60) == {"version": 1}
+    await asyncio.gather(*cache_module._background_refreshes)
+
+    assert await cache.get("hot_key") == {"version": 2}
+
+@pytest.mark.asyncio
+async def test_get_or_compute_does_not_cache_none(cache):
+    """Test que un resultado None no se guarda"""
+    async def build():
+        return None
+
+    assert await cache.get_or_compute("vista_inexistente", build) is None
+    assert not await cache.exists("vista_inexistente")
+
+@pytest.mark.asyncio
+async def test_invalidate_tags_bumps_generation(cache):
+    """Test invalidación por tag: un INCR deja inaccesibles todas las keys del tag"""
+    tags_b1 = [business_tag("b1"), entity_tag("b1", "clientes")]
+    key_b1 = await cache.tagged_key("entity_data:b1:clientes", tags_b1)
+    key_b2 = await cache.tagged_key("entity_data:b2:clientes", [business_tag("b2")])
+    await cache.set_many({key_b1: {"items": [1]}, key_b2: {"items": [2]}})
+
+    assert await cache.tagged_key("entity_data:b1:clientes", tags_b1) == key_b1
+
+    generations = await cache.invalidate_tags(business_tag("b1"))
+
+    new_key_b1 = await cache.tagged_key("entity_data:b1:clientes", tags_b1)
+    assert new_key_b1 != key_b1
+    assert generations[business_tag("b1")] == int(new_key_b1.split("@")[1].split(".")[0])
+    assert await cache.get(new_key_b1) is None
+    # Otros business no se ven afectados
+    assert await cache.tagged_key("entity_data:b2:clientes", [business_tag("b2")]) == key_b2
+    assert await cache.get(key_b2) == {"items": [2]}
+
+@pytest.mark.asyncio
+async def test_get_or_compute_with_tags(two_tier_cache):
+    """Test get_or_compute versionado por tag (con L1 activa)"""
+    versions = iter([1, 2])
+
+    async def build():
+        return {"version": next(versions)}
+
+    tags = [business_tag("b1")]
+    assert await two_tier_cache.get_or_compute("dashboard_b1_principal_admin", build, tags=tags) == {"version": 1}
+    assert await two_tier_cache.get_or_compute("dashboard_b1_principal_admin", build, tags=tags) == {"version": 1}
+
+    await two_tier_cache.invalidate_tags(business_tag("b1"))
+
+    assert await two_tier_cache.get_or_compute("dashboard_b1_principal_admin", build, tags=tags) == {"version": 2}
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate_serves_stale_and_refreshes(cache, fake_redis):
+    """Test un valor vencido se sirve en el acto y se recalcula en background"""
+    versions = iter([1, 2])
+
+    async def build():
+        return {"version": next(versions)}
+
+    assert (await cache.get_stale_while_revalidate("component_b1_ventas", build, ttl=60, stale_ttl=600))[1]["status"] == "computed"
+    value, freshness = await cache.get_stale_while_revalidate("component_b1_ventas", build, ttl=60, stale_ttl=600)
+    assert value == {"version": 1} and freshness["status"] == "fresh" and freshness["ttl"] == 60
+    # La key vive ttl + stale_ttl
+    assert 600 < await fake_redis.ttl("component_b1_ventas") <= 660
+
+    # Vencer el valor lógico
+    envelope = json.loads(await fake_redis.get("component_b1_ventas"))
+    envelope["expiry"] = 0
+    await cache.set("component_b1_ventas", envelope, ttl=600)
+
+    value, freshness = await cache.get_stale_while_revalidate("component_b1_ventas", build, ttl=60, stale_ttl=600)
+    assert value == {"version": 1} and freshness["status"] == "stale" and freshness["computed_at"]
+    await asyncio.gather(*cache_module._background_refreshes)
+
+    value, freshness = await cache.get_stale_while_revalidate("component_b1_ventas", build, ttl=60, stale_ttl=600)
+    assert value == {"version": 2} and freshness["status"] == "fresh"
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate_slow_miss_does_not_block_others(cache):
+    """Test 12 componentes con uno lento: responden en el tiempo de los rápidos y el lento queda en cache"""
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return {"valor": "lento"}
+
+    def fast(i):
+        async def build():
+            return {"valor": i}
+        return build
+
+    factories = [fast(i) for i in range(11)] + [slow]
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    results = await asyncio.gather(*[
+        cache.get_stale_while_revalidate(f"component_{i}", factory, ttl=60, timeout=0.1)
+        for i, factory in enumerate(factories)
+    ])
+    assert loop.time() - start < 1
+
+    assert [value for value, _ in results[:11]] == [{"valor": i} for i in range(11)]
+    assert results[11] == (None, {"status": "pending", "computed_at": None, "age_seconds": None, "ttl": 60})
+
+    # El cálculo siguió en background y el próximo pedido lo encuentra en cache
+    release.set()
+    await asyncio.gather(*cache_module._background_refreshes)
+    value, freshness = await cache.get_stale_while_revalidate("component_11", slow, ttl=60, timeout=0.1)
+    assert value == {"valor": "lento"} and freshness["status"] == "fresh"
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate_keeps_stale_value_when_refresh_fails(cache, fake_redis):
+    """Test si el recálculo falla no se cachea nada y se sigue sirviendo el valor vencido"""
+    calls = 0
+
+    async def build():
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            raise RuntimeError("upstream caído")
+        return {"valor": 1}
+
+    await cache.get_stale_while_revalidate("component_api", build, ttl=60, stale_ttl=600)
+    envelope = json.loads(await fake_redis.get("component_api"))
+    envelope["expiry"] = 0
+    await cache.set("component_api", envelope, ttl=600)
+
+    assert (await cache.get_stale_while_revalidate("component_api", build, ttl=60))[0] == {"valor": 1}
+    await asyncio.gather(*cache_module._background_refreshes, return_exceptions=True)
+
+    value, freshness = await cache.get_stale_while_revalidate("component_api", build, ttl=60)
+    assert value == {"valor": 1} and freshness["status"] == "stale"
+    with pytest.raises(RuntimeError):
+        await cache.get_stale_while_revalidate("component_api", build, ttl=60, force_refresh=True)
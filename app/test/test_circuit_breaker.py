@@ -0,0 +1,118 @@
+# ================================
+# tests/test_circuit_breaker.py
+# ================================
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.core import circuit_breaker as breaker_module
+from app.core.api_client import GenericApiClient
+from app.core.circuit_breaker import CircuitBreaker, RetryBudget
+from app.models.api_config import ApiConfiguration, RetryConfig
+from app.utils.exceptions import CircuitOpenError, CMSException
+
+@pytest.fixture(autouse=True)
+def isolated_breakers():
+    """Cada test con sus propios circuitos"""
+    breaker_module._breakers.clear()
+    breaker_module._retry_budgets.clear()
+    yield
+    breaker_module._breakers.clear()
+    breaker_module._retry_budgets.clear()
+
+def _client(handler) -> GenericApiClient:
+    config = ApiConfiguration(
+        business_id="isp_demo",
+        name="clientes",
+        base_url="https://isp.example.com",
+        endpoint="/clientes",
+        retry_config=RetryConfig(max_retries=3)
+    )
+    client = GenericApiClient(config)
+    client._client = httpx.AsyncClient(base_url=config.base_url, transport=httpx.MockTransport(handler))
+    return client
+
+def test_breaker_opens_and_recovers_through_half_open():
+    """Test closed -> open -> half_open -> closed"""
+    breaker = CircuitBreaker("isp.example.com", failure_threshold=2, open_seconds=30)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    breaker.opened_at -= 30
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Solo una petición de prueba a la vez
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_retry_budget_is_fraction_of_traffic():
+    """Test presupuesto: min_retries + ratio * peticiones"""
+    budget = RetryBudget(ratio=0.1, min_retries=1)
+    for _ in range(10):
+        budget.record_request()
+
+    assert budget.try_withdraw()
+    assert budget.try_withdraw()
+    assert not budget.try_withdraw()
+
+def test_retry_budget_keeps_only_the_window_without_retries():
+    """Test un upstream sano que nunca reintenta no acumula una marca por petición"""
+    budget = RetryBudget(window_seconds=10)
+    with patch("app.core.circuit_breaker.time.monotonic") as monotonic:
+        for second in range(1000):
+            monotonic.return_value = float(second)
+            budget.record_request()
+
+    assert len(budget._requests) == 11
+
+@pytest.mark.asyncio
+async def test_post_is_not_retried():
+    """Test métodos no idempotentes: un solo intento"""
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503)
+
+    client = _client(handler)
+    with patch("app.core.api_client.asyncio.sleep", AsyncMock()):
+        with pytest.raises(CMSException):
+            await client._request_with_retry("POST", "/clientes", None, {"a": 1}, None, None)
+
+    assert calls == 1
+
+@pytest.mark.asyncio
+async def test_get_retries_with_jitter_then_circuit_fails_fast():
+    """Test reintentos con jitter y fail-fast con el circuito abierto"""
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        raise httpx.ConnectError("sin conexión")
+
+    client = _client(handler)
+    sleep = AsyncMock()
+    with patch("app.core.api_client.asyncio.sleep", sleep):
+        with pytest.raises(CMSException):
+            await client._request_with_retry("GET", "/clientes", None, None, None, None)
+        assert calls == 4
+        assert all(0.1 <= call.args[0] <= 2.0 for call in sleep.await_args_list)
+
+        # Tras 5 fallos seguidos el circuito queda abierto: no sale la petición
+        with pytest.raises(CMSException):
+            await client._request_with_retry("GET", "/clientes", None, None, None, None)
+        with pytest.raises(CircuitOpenError):
+            await client._request_with_retry("GET", "/clientes", None, None, None, None)
+
+    assert breaker_module.get_circuit_breaker("isp.example.com").state == CircuitBreaker.OPEN
+    assert calls == 5
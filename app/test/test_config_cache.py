@@ -0,0 +1,79 @@
+# ================================
+# tests/test_config_cache.py
+# ================================
+
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+from app.core.config_cache import ConfigCache
+
+class _Collection:
+    def __init__(self, doc):
+        self.doc = doc
+        self.projections = []
+
+    async def find_one(self, query, projection=None):
+        self.projections.append(projection)
+        if self.doc is None:
+            return None
+        if projection:
+            return {key: self.doc[key] for key in projection if key in self.doc}
+        return dict(self.doc)
+
+class _Db:
+    def __init__(self, doc):
+        self.entities_config = _Collection(doc)
+
+def _entity_doc(updated_at):
+    return {
+        "business_id": "b1",
+        "entidad": "clientes",
+        "configuracion": {
+            "campos": [
+                {"campo": "nombre", "tipo": "text", "obligatorio": True},
+                {"campo": "saldo", "tipo": "number", "visible_roles": ["admin"]}
+            ],
+            "api_config": {"fuente": "erp", "endpoint": "/clientes", "mapeo": {"name": "nombre"}}
+        },
+        "updated_at": updated_at
+    }
+
+@pytest.mark.asyncio
+async def test_entity_plan_is_compiled_once_per_version():
+    """Test plan compilado: dict lookups dentro del TTL y revalidación por updated_at"""
+    db = _Db(_entity_doc(datetime(2024, 1, 1)))
+    cache = ConfigCache(db=db, ttl_seconds=60)
+
+    plan = await cache.get_entity_plan("b1", "clientes")
+    assert plan.visible_fields("vendedor") == ("nombre",)
+    assert plan.visible_fields("admin") == ("nombre", "saldo")
+    assert plan.reverse_mapeo == {"nombre": "name"}
+    assert [name for name, obligatorio, _ in plan.validators if obligatorio] == ["nombre"]
+
+    assert await cache.get_entity_plan("b1", "clientes") is plan
+    assert len(db.entities_config.projections) == 1
+
+    # Pasado el TTL sin cambios: solo se lee updated_at
+    with patch("app.core.config_cache.time.monotonic", return_value=10**9):
+        assert await cache.get_entity_plan("b1", "clientes") is plan
+    assert db.entities_config.projections[-1] == {"updated_at": 1}
+
+    # Con una nueva versión se recompila
+    db.entities_config.doc = _entity_doc(datetime(2024, 2, 1))
+    with patch("app.core.config_cache.time.monotonic", return_value=10**10):
+        assert await cache.get_entity_plan("b1", "clientes") is not plan
+
+@pytest.mark.asyncio
+async def test_invalidate_entity_forces_reload():
+    """Test invalidación al escribir desde admin"""
+    db = _Db(_entity_doc(datetime(2024, 1, 1)))
+    cache = ConfigCache(db=db, ttl_seconds=60)
+    plan = await cache.get_entity_plan("b1", "clientes")
+
+    cache.invalidate_entity("b1", "clientes")
+    assert await cache.get_entity_plan("b1", "clientes") is not plan
+
+    db.entities_config.doc = None
+    cache.invalidate_entity("b1")
+    assert await cache.get_entity_plan("b1", "clientes") is None
@@ -0,0 +1,70 @@
+# ================================
+# tests/test_count_strategies.py
+# ================================
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.core.dynamic_crud import DynamicCrudGenerator
+from app.models.entity import EntityConfig
+
+class _Aggregate:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length):
+        return self._docs[:length]
+
+class _Collection:
+    def __init__(self, n):
+        self.docs = [{"_id": i, "activo": i % 2 == 0} for i in range(n)]
+        self.calls = []
+
+    async def estimated_document_count(self):
+        self.calls.append("estimated")
+        return len(self.docs)
+
+    async def count_documents(self, query, limit=0):
+        self.calls.append(("count", limit))
+        matching = [doc for doc in self.docs if all(doc.get(k) == v for k, v in query.items())]
+        return min(len(matching), limit) if limit else len(matching)
+
+    def aggregate(self, pipeline):
+        self.calls.append(("aggregate", [next(iter(stage)) for stage in pipeline]))
+        if "$facet" in pipeline[-1]:
+            return _Aggregate([{"items": self.docs[:2], "total": [{"n": len(self.docs)}]}])
+        return _Aggregate(self.docs)
+
+def _list(collection, filters, strategy):
+    generator = DynamicCrudGenerator.__new__(DynamicCrudGenerator)
+    generator.db = {"b1_pedidos": collection}
+    config = EntityConfig(business_id="b1", entidad="pedidos")
+    return generator._list_from_db(config, 1, 2, filters, None, "asc", SimpleNamespace(rol="admin"), strategy)
+
+@pytest.mark.asyncio
+async def test_capped_and_estimated_totals_report_strategy():
+    """Test total acotado ("1000+") y estimado sin filtro"""
+    collection = _Collection(30)
+
+    with patch("app.core.dynamic_crud.settings.count_cap", 10):
+        capped = await _list(collection, "activo=true", "capped")
+        assert (capped["total"], capped["total_capped"], capped["count_strategy"]) == (10, True, "capped")
+        assert ("count", 11) in collection.calls
+
+        estimated = await _list(collection, None, "estimated")
+        assert (estimated["total"], estimated["count_strategy"]) == (30, "estimated")
+
+        # Con filtro no hay estimación posible: se acota
+        assert (await _list(collection, "activo=true", "estimated"))["count_strategy"] == "capped"
+
+@pytest.mark.asyncio
+async def test_facet_returns_page_and_total_in_one_round_trip():
+    """Test $facet con un solo aggregate"""
+    collection = _Collection(7)
+
+    result = await _list(collection, None, "facet")
+
+    assert result["total"] == 7 and len(result["items"]) == 2
+    assert result["count_strategy"] == "facet"
+    assert collection.calls == [("aggregate", ["$match", "$facet"])]
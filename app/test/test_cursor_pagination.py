@@ -0,0 +1,101 @@
+# ================================
+# tests/test_cursor_pagination.py
+# ================================
+
+import pytest
+from types import SimpleNamespace
+from bson import ObjectId
+
+from app.core.dynamic_crud import DynamicCrudGenerator
+from app.models.entity import EntityConfig
+from app.utils.exceptions import InvalidCursorError
+
+def _sort_key(value):
+    # null/ausente primero, como en MongoDB
+    return (value is not None, value if value is not None else 0)
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(_matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            for op, operand in condition.items():
+                if op == "$ne" and value == operand:
+                    return False
+                if op in ("$gt", "$lt") and (value is None or operand is None):
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+class _Find:
+    def __init__(self, docs, query):
+        self._docs = [doc for doc in docs if _matches(doc, query)]
+
+    def sort(self, spec):
+        for field, direction in reversed(spec):
+            self._docs.sort(key=lambda doc: _sort_key(doc.get(field)), reverse=direction == -1)
+        return self
+
+    def limit(self, n):
+        self._docs = self._docs[:n]
+        return self
+
+    async def to_list(self, length):
+        return self._docs[:length]
+
+class _Collection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query):
+        return _Find(self.docs, query)
+
+def _generator(docs):
+    generator = DynamicCrudGenerator.__new__(DynamicCrudGenerator)
+    generator.db = {"b1_pedidos": _Collection(docs)}
+    return generator
+
+async def _all_pages(generator, config, user, sort_order):
+    seen, cursor = [], None
+    while True:
+        page = await generator._list_from_db_by_cursor(config, 2, None, "total", sort_order, cursor, user)
+        seen.extend(item["_id"] for item in page["items"])
+        if not page["has_more"]:
+            return seen
+        cursor = page["next_cursor"]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+async def test_cursor_pages_cover_ties_and_nulls_once(sort_order):
+    """Test keyset: cada documento aparece una vez aunque haya empates y nulls"""
+    docs = [{"_id": ObjectId(), "total": total} for total in (5, None, 3, 5, None, 7, 3)]
+    generator = _generator(docs)
+    config = EntityConfig(business_id="b1", entidad="pedidos")
+    user = SimpleNamespace(rol="admin")
+
+    seen = await _all_pages(generator, config, user, sort_order)
+
+    expected = _Find(docs, {}).sort([("total", 1 if sort_order == "asc" else -1), ("_id", 1 if sort_order == "asc" else -1)])._docs
+    assert seen == [str(doc["_id"]) for doc in expected]
+
+@pytest.mark.asyncio
+async def test_cursor_for_another_sort_is_rejected():
+    """Test cursor de otro orden"""
+    docs = [{"_id": ObjectId(), "total": total} for total in range(3)]
+    generator = _generator(docs)
+    config = EntityConfig(business_id="b1", entidad="pedidos")
+    user = SimpleNamespace(rol="admin")
+
+    page = await generator._list_from_db_by_cursor(config, 1, None, "total", "asc", None, user)
+    with pytest.raises(InvalidCursorError):
+        await generator._list_from_db_by_cursor(config, 1, None, "total", "desc", page["next_cursor"], user)
@@ -0,0 +1,171 @@
+# ================================
+# tests/test_entity_export.py
+# ================================
+
+import csv
+import io
+import json
+import tracemalloc
+import zipfile
+import pytest
+from types import SimpleNamespace
+from xml.etree import ElementTree
+
+from app.core.dynamic_crud import DynamicCrudGenerator
+from app.core.entity_export import export_columns, stream_export
+from app.models.entity import EntityConfig
+
+_SHEET_NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+        self.batch = None
+
+    def batch_size(self, n):
+        self.batch = n
+        return self
+
+    def sort(self, spec):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class _Collection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query):
+        self.queries.append(query)
+        return _Cursor([doc for doc in self.docs if all(doc.get(k) == v for k, v in query.items())])
+
+async def _batches(n_batches, batch_size):
+    for b in range(n_batches):
+        yield [
+            {"_id": f"{b}-{i}", "nombre": f"Cliente {b}-{i}", "total": b * batch_size + i, "tags": ["a", "b"]}
+            for i in range(batch_size)
+        ]
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+@pytest.mark.asyncio
+async def test_iter_entities_reads_one_cursor_in_batches_with_configured_columns():
+    """Test lotes desde un cursor y columnas desde `campos` visibles para el rol"""
+    docs = [{"_id": i, "nombre": f"c{i}", "secreto": "x", "activo": True} for i in range(5)]
+    collection = _Collection(docs)
+    generator = DynamicCrudGenerator.__new__(DynamicCrudGenerator)
+    generator.db = {"b1_clientes": collection}
+    config = EntityConfig(business_id="b1", entidad="clientes", configuracion={"campos": [
+        {"campo": "nombre", "tipo": "text"},
+        {"campo": "secreto", "tipo": "text", "visible_roles": ["admin"]}
+    ]})
+
+    async def get_entity_config(business_id, entity_name):
+        return config
+
+    generator.get_entity_config = get_entity_config
+    user = SimpleNamespace(rol="empleado", permisos=SimpleNamespace(entidades_acceso=[]))
+
+    batches = [batch async for batch in generator.iter_entities("b1", "clientes", user, "activo=true", batch_size=2)]
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0] == {"_id": 0, "nombre": "c0"}
+    assert collection.queries == [{"activo": True}]
+    assert export_columns(config, user) == ["_id", "nombre"]
+
+class _CappedApi:
+    """API externa que devuelve como máximo `cap` items por página, con o sin total"""
+
+    def __init__(self, rows, cap, with_total):
+        self.rows = rows
+        self.cap = cap
+        self.with_total = with_total
+        self.pages = []
+
+    async def make_request(self, business_id, fuente, endpoint, method="GET", data=None, params=None, use_cache=True):
+        self.pages.append(params["page"])
+        per_page = min(params["per_page"], self.cap)
+        start = (params["page"] - 1) * per_page
+        response = {"data": self.rows[start:start + per_page]}
+        if self.with_total:
+            response["total"] = len(self.rows)
+        return response
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("with_total, requests", [(True, [1, 2, 3]), (False, [1, 2, 3, 4])])
+async def test_iter_entities_pages_api_past_a_capped_per_page(with_total, requests):
+    """Test una API que limita per_page por debajo del lote no corta la exportación en la primera página"""
+    generator = DynamicCrudGenerator.__new__(DynamicCrudGenerator)
+    generator.api_service = _CappedApi([{"id": i, "name": f"c{i}"} for i in range(8)], cap=3, with_total=with_total)
+    config = EntityConfig(business_id="b1", entidad="clientes", configuracion={
+        "campos": [{"campo": "nombre", "tipo": "text"}],
+        "api_config": {"fuente": "crm", "endpoint": "/clientes", "mapeo": {"id": "_id", "name": "nombre"}}
+    })
+
+    async def get_entity_config(business_id, entity_name):
+        return config
+
+    generator.get_entity_config = get_entity_config
+    user = SimpleNamespace(rol="admin", permisos=SimpleNamespace(entidades_acceso=[]))
+
+    batches = [batch async for batch in generator.iter_entities("b1", "clientes", user, batch_size=1000)]
+
+    assert [len(batch) for batch in batches] == [3, 3, 2]
+    assert batches[-1][-1] == {"_id": 7, "nombre": "c7"}
+    assert generator.api_service.pages == requests
+
+@pytest.mark.asyncio
+async def test_csv_and_ndjson_are_encoded_per_batch():
+    """Test CSV con headers configurados y NDJSON una línea por documento"""
+    chunks = await _collect(stream_export(_batches(3, 2), ["_id", "total", "tags", "falta"], "csv"))
+
+    assert len(chunks) == 4  # header + un chunk por lote
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert rows[0] == ["_id", "total", "tags", "falta"]
+    assert rows[1] == ["0-0", "0", '["a", "b"]', ""]
+    assert len(rows) == 7
+
+    ndjson = b"".join(await _collect(stream_export(_batches(1, 2), ["_id", "total"], "ndjson")))
+    assert [json.loads(line) for line in ndjson.splitlines()] == [{"_id": "0-0", "total": 0}, {"_id": "0-1", "total": 1}]
+
+@pytest.mark.asyncio
+async def test_streamed_xlsx_is_a_valid_workbook():
+    """Test XLSX generado en streaming legible como zip/SpreadsheetML"""
+    chunks = await _collect(stream_export(_batches(3, 4), ["_id", "nombre", "total"], "xlsx", "clientes"))
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as workbook:
+        assert "clientes" in workbook.read("xl/workbook.xml").decode()
+        sheet = ElementTree.fromstring(workbook.read("xl/worksheets/sheet1.xml"))
+
+    rows = sheet.findall(".//s:row", _SHEET_NS)
+    assert len(rows) == 13
+    header = [cell.findtext(".//s:t", namespaces=_SHEET_NS) for cell in rows[0]]
+    assert header == ["_id", "nombre", "total"]
+    last = rows[-1].findall("s:c", _SHEET_NS)
+    assert last[2].get("t") == "n" and last[2].findtext("s:v", namespaces=_SHEET_NS) == "11"
+
+async def _peak_memory(n_batches):
+    tracemalloc.start()
+    try:
+        async for _ in stream_export(_batches(n_batches, 500), ["_id", "nombre", "total", "tags"], "csv"):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.asyncio
+async def test_export_memory_does_not_grow_with_row_count():
+    """Test memoria pico acotada por el lote, no por el total exportado"""
+    small = await _peak_memory(10)
+    large = await _peak_memory(50)
+
+    assert large < small * 1.5
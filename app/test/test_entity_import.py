@@ -0,0 +1,119 @@
+# ================================
+# tests/test_entity_import.py
+# ================================
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from bson import ObjectId
+
+from app.core.dynamic_crud import DynamicCrudGenerator
+from app.core.entity_import import EntityImporter, iter_csv_records, iter_lines
+from app.models.entity import EntityConfig
+from app.services.validation_service import ValidationService
+
+class _Collection:
+    def __init__(self):
+        self.docs = []
+        self.batches = []
+
+    async def insert_many(self, docs, ordered=True):
+        self.batches.append(len(docs))
+        for doc in docs:
+            doc["_id"] = ObjectId()
+        self.docs.extend(docs)
+
+class _Store:
+    def __init__(self):
+        self.jobs = {}
+        self.errors = []
+        self.updates = []
+
+    async def create(self, job_id, business_id, entidad, format, user):
+        self.jobs[job_id] = {
+            "_id": job_id, "business_id": business_id, "entidad": entidad, "format": format,
+            "status": "running", "bytes_read": 0, "rows_processed": 0, "created": 0,
+            "failed": 0, "errors_stored": 0
+        }
+        return dict(self.jobs[job_id])
+
+    async def update(self, job_id, changes):
+        self.updates.append(dict(changes))
+        self.jobs[job_id].update(changes)
+
+    async def add_errors(self, job_id, rows):
+        self.errors.extend(rows)
+
+def _importer(collection, store):
+    generator = DynamicCrudGenerator.__new__(DynamicCrudGenerator)
+    generator.db = {"b1_clientes": collection}
+    generator.validation_service = ValidationService()
+    config = EntityConfig(business_id="b1", entidad="clientes", configuracion={
+        "campos": [
+            {"campo": "nombre", "tipo": "text", "obligatorio": True},
+            {"campo": "edad", "tipo": "number"}
+        ]
+    })
+
+    async def get_entity_config(business_id, entity_name):
+        return config
+
+    generator.get_entity_config = get_entity_config
+    return EntityImporter(generator, store)
+
+async def _chunks(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+async def _no_invalidate(self, *tags):
+    return None
+
+_USER = SimpleNamespace(id="u1", rol="admin")
+
+@pytest.mark.asyncio
+async def test_csv_records_span_chunks_and_quoted_newlines():
+    """Test líneas partidas entre chunks y campos entre comillas con saltos de línea"""
+    data = 'nombre,nota\r\nAna,"hola\r\nmundo"\r\nLuis,ok\r\n'.encode()
+
+    records = [record async for record in iter_csv_records(iter_lines(_chunks(data, 3), 1000), 1000)]
+
+    assert records == [(2, {"nombre": "Ana", "nota": "hola\nmundo"}), (4, {"nombre": "Luis", "nota": "ok"})]
+
+@pytest.mark.asyncio
+@patch("app.core.dynamic_crud.CacheService.invalidate_tags", _no_invalidate)
+async def test_ndjson_import_writes_bounded_batches_and_rejects_bad_rows():
+    """Test lotes acotados, columnas desconocidas, filas rechazadas y progreso del job"""
+    collection = _Collection()
+    store = _Store()
+    importer = _importer(collection, store)
+    lines = [f'{{"nombre": "c{i}", "edad": "{i}", "extra": 1}}' for i in range(7)]
+    lines[2] = '{"edad": "x"}'
+    lines[5] = "no es json"
+    data = ("\n".join(lines) + "\n").encode()
+
+    with patch("app.core.entity_import.settings.import_batch_size", 3):
+        config, job = await importer.start("b1", "clientes", "ndjson", _USER, "job-12345")
+        job = await importer.run(config, job, _chunks(data, 16), _USER)
+
+    assert job["status"] == "completed"
+    assert (job["rows_processed"], job["created"], job["failed"]) == (7, 5, 2)
+    assert job["bytes_read"] == len(data) and job["ignored_columns"] == ["extra"]
+    assert collection.docs[0]["nombre"] == "c0" and collection.docs[0]["edad"] == 0
+    assert max(collection.batches) <= 3
+    assert [error["line"] for error in store.errors] == [3, 6]
+    # Progreso guardado después de cada lote
+    assert len(store.updates) >= 3
+
+@pytest.mark.asyncio
+@patch("app.core.dynamic_crud.CacheService.invalidate_tags", _no_invalidate)
+async def test_line_longer_than_limit_fails_the_job():
+    """Test una línea sin fin no se acumula en memoria: el job falla"""
+    store = _Store()
+    importer = _importer(_Collection(), store)
+
+    with patch("app.core.entity_import.settings.import_max_line_bytes", 64):
+        config, job = await importer.start("b1", "clientes", "csv", _USER)
+        job = await importer.run(config, job, _chunks(b"x" * 1000, 10), _USER)
+
+    assert job["status"] == "failed" and "64" in job["error"]
@@ -0,0 +1,69 @@
+# ================================
+# tests/test_http_clients.py
+# ================================
+
+import httpx
+import pytest
+
+from app.core.http_clients import HttpClientRegistry, _InstrumentedTransport
+
+@pytest.mark.asyncio
+async def test_registry_reuses_client_per_base_url_and_auth():
+    """Test un cliente por base URL + credenciales"""
+    registry = HttpClientRegistry()
+
+    n8n = registry.get("https://n8n.example.com/", {"Authorization": "Bearer a"})
+
+    assert registry.get("https://n8n.example.com", {"Authorization": "Bearer a"}) is n8n
+    assert registry.get("https://n8n.example.com", {"Authorization": "Bearer b"}) is not n8n
+    # Las credenciales no aparecen en las métricas
+    assert not any("Bearer" in key for key in registry.stats()["clients"])
+
+    await registry.aclose()
+    assert n8n.is_closed
+    assert registry.get("https://n8n.example.com", {"Authorization": "Bearer a"}) is not n8n
+    await registry.aclose()
+
+@pytest.mark.asyncio
+async def test_shared_client_does_not_carry_cookies_between_requests():
+    """Test la cookie de una respuesta no se envía en el request siguiente (de otro usuario)"""
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request.headers.get("cookie"))
+        return httpx.Response(200, headers={"set-cookie": "session=usuario-a; Path=/"})
+
+    registry = HttpClientRegistry()
+    client = registry.get("https://crm.example.com")
+    client._transport = httpx.MockTransport(handler)
+
+    await client.get("/login")
+    await client.get("/clientes")
+    await client.get("/clientes", cookies={"explicita": "1"})
+    await registry.aclose()
+
+    assert sent == [None, None, "explicita=1"]
+    assert not client.cookies
+
+@pytest.mark.asyncio
+async def test_instrumented_transport_counts_per_host():
+    """Test métricas por host: requests, errores y en curso"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/error":
+            raise httpx.ConnectError("sin conexión")
+        return httpx.Response(200, json={"ok": True})
+
+    host_stats = {}
+    transport = _InstrumentedTransport(httpx.MockTransport(handler), host_stats)
+
+    async with httpx.AsyncClient(transport=transport, base_url="https://waha.example.com") as client:
+        await client.get("/api/sessions")
+        await client.get("/api/sessions")
+        with pytest.raises(httpx.ConnectError):
+            await client.get("/error")
+
+    stats = host_stats["waha.example.com"]
+    assert stats["requests"] == 3
+    assert stats["errors"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["peak_in_flight"] == 1
@@ -0,0 +1,172 @@
+# ================================
+# tests/test_index_manager.py
+# ================================
+
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from app.core.index_manager import IndexManager
+from app.models.entity import EntityConfig
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+_BSON_TYPES = {"string": (str,), "number": (int, float), "bool": (bool,)}
+
+def _in_partial(doc, partial):
+    """Subconjunto de partialFilterExpression: $exists y $type por campo"""
+    for field, condition in partial.items():
+        if field not in doc:
+            return False
+        types = tuple(t for name in condition.get("$type", []) for t in _BSON_TYPES.get(name, ()))
+        if types and not isinstance(doc[field], types):
+            return False
+    return True
+
+class _DataCollection:
+    def __init__(self, name, indexes, stats=None, docs=None):
+        self.name = name
+        self.indexes = indexes
+        self.stats = stats or {}
+        self.docs = docs or []
+        self.options = {}
+
+    def list_indexes(self):
+        return _Cursor([{"name": name, "key": dict(keys)} for name, keys in self.indexes.items()])
+
+    def aggregate(self, pipeline):
+        return _Cursor([{"name": name, "accesses": accesses} for name, accesses in self.stats.items()])
+
+    async def create_index(self, keys, name, unique=False, background=False, partialFilterExpression=None):
+        if unique:
+            # Como MongoDB: el campo ausente se indexa como null
+            indexed = [doc for doc in self.docs if partialFilterExpression is None or _in_partial(doc, partialFilterExpression)]
+            values = [tuple(doc.get(field) for field, _ in keys) for doc in indexed]
+            if len(values) != len(set(values)):
+                raise Exception(f"E11000 duplicate key error: {name}")
+        self.indexes[name] = keys
+        self.options[name] = partialFilterExpression
+
+    async def drop_index(self, name):
+        del self.indexes[name]
+
+class _UsageCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query):
+        return _Cursor([
+            doc for doc in self.docs
+            if doc["entidad"] == query["entidad"] and doc["hits"] >= query.get("hits", {}).get("$gte", 0)
+        ])
+
+    async def delete_one(self, query):
+        self.docs = [doc for doc in self.docs if not all(doc[k] == v for k, v in query.items())]
+
+class _Db(dict):
+    def __init__(self, collection, usage):
+        super().__init__({collection.name: collection})
+        self.entity_index_usage = usage
+
+CAMPOS = [
+    {"campo": "email", "unico": True, "obligatorio": True},
+    {"campo": "estado", "filtrable": True},
+    {"campo": "fecha", "ordenable": True, "filtrable": True},
+    {"campo": "total", "tipo": "number"},
+    {"campo": "zona", "tipo": "text"}
+]
+
+@pytest.mark.asyncio
+async def test_sync_creates_config_and_learned_indexes_and_drops_obsolete():
+    """Test índices desde flags de campos, aprendidos de consultas lentas y obsoletos"""
+    collection = _DataCollection("b1_pedidos", {"_id_": [("_id", 1)], "cms_cfg_viejo": [("viejo", 1)]})
+    usage = _UsageCollection([
+        {"business_id": "b1", "entidad": "pedidos", "kind": "sort", "field": "total", "hits": 9},
+        {"business_id": "b1", "entidad": "pedidos", "kind": "filter", "field": "estado", "hits": 50},
+        {"business_id": "b1", "entidad": "pedidos", "kind": "filter", "field": "zona", "hits": 1}
+    ])
+    manager = IndexManager(db=_Db(collection, usage))
+
+    result = await manager.sync_entity("b1", "pedidos", CAMPOS)
+
+    assert sorted(result["created"]) == ["cms_auto_sort_total", "cms_cfg_estado", "cms_sort_fecha", "cms_uniq_email"]
+    assert result["dropped"] == ["cms_cfg_viejo"]
+    assert collection.indexes["cms_sort_fecha"] == [("fecha", 1), ("_id", 1)]
+    assert "_id_" in collection.indexes
+
+@pytest.mark.asyncio
+async def test_unused_learned_index_is_dropped_and_usage_forgotten():
+    """Test eliminación de índices aprendidos sin uso según $indexStats"""
+    old = datetime.utcnow() - timedelta(days=90)
+    collection = _DataCollection(
+        "b1_pedidos",
+        {"_id_": [("_id", 1)], "cms_auto_total": [("total", 1)]},
+        stats={"cms_auto_total": {"ops": 0, "since": old}}
+    )
+    usage = _UsageCollection([{"business_id": "b1", "entidad": "pedidos", "kind": "filter", "field": "total", "hits": 9}])
+    manager = IndexManager(db=_Db(collection, usage))
+
+    result = await manager.sync_entity("b1", "pedidos", [{"campo": "total", "tipo": "number"}])
+
+    assert result["dropped"] == ["cms_auto_total"]
+    assert usage.docs == []
+
+@pytest.mark.asyncio
+async def test_optional_unique_field_allows_many_documents_without_value():
+    """Test único sobre un campo opcional: los documentos sin el campo no chocan entre sí"""
+    docs = [{"_id": 1, "rut": "1-9"}, {"_id": 2}, {"_id": 3}, {"_id": 4, "rut": None}]
+    collection = _DataCollection("b1_pedidos", {"_id_": [("_id", 1)], "cms_uniq_rut": [("rut", 1)]}, docs=docs)
+    manager = IndexManager(db=_Db(collection, _UsageCollection([])))
+
+    result = await manager.sync_entity("b1", "pedidos", [{"campo": "rut", "unico": True, "filtrable": True}])
+
+    assert result["errors"] == []
+    assert sorted(result["created"]) == ["cms_cfg_rut", "cms_uniqp_rut"]
+    assert result["dropped"] == ["cms_uniq_rut"]
+    assert collection.options["cms_uniqp_rut"] == {"rut": {"$exists": True, "$type": ["string", "number", "date", "bool", "objectId"]}}
+
+    # Un índice único sin filtro parcial no se puede construir con esos datos
+    with pytest.raises(Exception):
+        await collection.create_index([("rut", 1)], name="plano", unique=True)
+
+def test_only_slow_queries_are_recorded():
+    """Test registro de campos de filtro/orden solo para consultas lentas"""
+    manager = IndexManager(db=object())
+    config = EntityConfig(business_id="b1", entidad="pedidos", configuracion={"campos": CAMPOS})
+    with patch("app.core.index_manager.settings.index_slow_query_ms", 100):
+        manager.record_query(config, {"estado": "x"}, "fecha", 5)
+        manager.record_query(config, {"estado": "x", "$or": [], "inventado": 1}, "fecha", 500)
+        manager.record_query(config, {}, "otro_inventado", 500)
+
+    assert manager._pending == {("b1", "pedidos", "filter", "estado"): 1, ("b1", "pedidos", "sort", "fecha"): 1}
+
+@pytest.mark.asyncio
+async def test_learned_indexes_are_declared_fields_and_capped():
+    """Test campos no declarados no generan índices y solo se crean los más consultados"""
+    collection = _DataCollection("b1_pedidos", {"_id_": [("_id", 1)], "cms_auto_zona": [("zona", 1)]})
+    usage = _UsageCollection([
+        {"business_id": "b1", "entidad": "pedidos", "kind": "filter", "field": "zona", "hits": 6},
+        {"business_id": "b1", "entidad": "pedidos", "kind": "filter", "field": "total", "hits": 40},
+        {"business_id": "b1", "entidad": "pedidos", "kind": "sort", "field": "created_at", "hits": 20},
+        {"business_id": "b1", "entidad": "pedidos", "kind": "filter", "field": "x_aleatorio", "hits": 500}
+    ])
+    manager = IndexManager(db=_Db(collection, usage))
+
+    with patch("app.core.index_manager.settings.index_max_learned_per_collection", 2):
+        result = await manager.sync_entity("b1", "pedidos", CAMPOS)
+
+    assert sorted(name for name in result["created"] if name.startswith("cms_auto_")) == [
+        "cms_auto_sort_created_at", "cms_auto_total"
+    ]
+    assert result["dropped"] == ["cms_auto_zona"]
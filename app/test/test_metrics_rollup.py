@@ -0,0 +1,221 @@
+# ================================
+# tests/test_metrics_rollup.py
+# ================================
+
+import pytest
+from datetime import datetime, timedelta
+
+from app.core.metrics_rollup import EntityRollupDelta, MetricsRollup
+from app.models.entity import EntityConfig
+
+_NOW = datetime(2024, 3, 10, 15)
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+
+    def sort(self, field, direction):
+        self._docs.sort(key=lambda doc: doc[field])
+        return self
+
+    async def to_list(self, length):
+        return self._docs
+
+    def __aiter__(self):
+        self._iter = iter(self._docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+def _set_path(doc, path, update):
+    *parents, leaf = path.split(".")
+    for key in parents:
+        doc = doc.setdefault(key, {})
+    doc[leaf] = update(doc.get(leaf))
+
+class _Rollups:
+    """metrics_rollups en memoria: upserts con $inc/$min/$max/$setOnInsert"""
+
+    def __init__(self):
+        self.docs = {}
+        self.writes = 0
+
+    async def bulk_write(self, operations, ordered=True):
+        self.writes += 1
+        for operation in operations:
+            _id = operation._filter["_id"]
+            doc = self.docs.get(_id)
+            if doc is None:
+                doc = self.docs[_id] = {"_id": _id, **operation._doc["$setOnInsert"]}
+            for path, amount in operation._doc.get("$inc", {}).items():
+                _set_path(doc, path, lambda current: (current or 0) + amount)
+            for path, value in operation._doc.get("$min", {}).items():
+                _set_path(doc, path, lambda current: value if current is None else min(current, value))
+            for path, value in operation._doc.get("$max", {}).items():
+                _set_path(doc, path, lambda current: value if current is None else max(current, value))
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update):
+        for path, value in update["$set"].items():
+            _set_path(self.docs[query["_id"]], path, lambda current: value)
+
+    def find(self, query):
+        return _Cursor(
+            doc for doc in self.docs.values()
+            if doc["business_id"] == query["business_id"] and doc["name"] == query["name"]
+            and doc["day"] is not None and query["day"]["$gte"] <= doc["day"] <= query["day"]["$lte"]
+        )
+
+    async def delete_many(self, query):
+        self.docs = {_id: doc for _id, doc in self.docs.items() if doc["name"] != query["name"]}
+
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            self.docs[doc["_id"]] = doc
+
+class _Entities:
+    """Colección de datos: devuelve filas ya agregadas por cada pipeline"""
+
+    def __init__(self, rows, category_rows, count):
+        self.rows = rows
+        self.category_rows = category_rows
+        self.count = count
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        if "min" in pipeline[-1]["$group"]:
+            return _Cursor(self.rows)
+        return _Cursor(self.rows if "created" in pipeline[-1]["$group"] else self.category_rows)
+
+    async def count_documents(self, query):
+        return self.count
+
+class _Db(dict):
+    def __init__(self, **collections):
+        super().__init__(collections)
+        self.metrics_rollups = _Rollups()
+
+_CONFIG = EntityConfig(business_id="b1", entidad="pedidos", configuracion={"campos": [
+    {"campo": "total", "tipo": "number"},
+    {"campo": "estado", "tipo": "select"},
+    {"campo": "nota", "tipo": "text"}
+]})
+
+@pytest.mark.asyncio
+async def test_events_are_folded_into_one_document_per_day():
+    """Test altas, modificaciones y bajas incrementan el día y el total con un bulk_write"""
+    db = _Db()
+    rollup = MetricsRollup(db=db)
+    delta = EntityRollupDelta(_CONFIG)
+    for i, total in enumerate([10, 30, 20]):
+        delta.created({"total": total, "estado": "pago.ok" if i else "pendiente", "created_at": _NOW - timedelta(days=i % 2)})
+    await rollup.apply(delta)
+    await rollup.entity_deleted(_CONFIG, [{"nota": "sin fecha"}])
+    await rollup.entity_updated(_CONFIG, [({"nota": "x"}, {"nota": "y"})] * 4)
+
+    assert db.metrics_rollups.writes == 3
+    today = db.metrics_rollups.docs["b1|entity|pedidos|2024-03-10"]
+    assert today["created"] == 2 and today["fields"]["total"] == {"count": 2, "sum": 30, "sumsq": 500, "min": 10, "max": 20}
+    assert today["present"] == {"total": 2, "estado": 2}
+    total = db.metrics_rollups.docs["b1|entity|pedidos|total"]
+    assert (total["created"], total["deleted"], total["updated"]) == (3, 1, 4)
+
+@pytest.mark.asyncio
+async def test_update_and_delete_correct_the_creation_day():
+    """Test modificar o borrar un documento de otro día corrige sumas, categorías, presencia y altas de ese día"""
+    db = _Db()
+    rollup = MetricsRollup(db=db)
+    created_at = _NOW - timedelta(days=3)
+    docs = [
+        {"total": 10, "estado": "pendiente", "created_at": created_at},
+        {"total": 30, "estado": "pendiente", "nota": "urgente", "created_at": created_at}
+    ]
+    await rollup.entity_created(_CONFIG, docs)
+
+    await rollup.entity_updated(_CONFIG, [(docs[0], {**docs[0], "total": 15, "estado": "pagado"})])
+    await rollup.entity_deleted(_CONFIG, [docs[1]])
+
+    day = db.metrics_rollups.docs["b1|entity|pedidos|2024-03-07"]
+    assert day["created"] == 1
+    assert {stat: day["fields"]["total"][stat] for stat in ("count", "sum", "sumsq")} == {"count": 1, "sum": 15, "sumsq": 225}
+    assert day["categories"]["estado"] == {"pendiente": 0, "pagado": 1}
+    assert day["present"] == {"total": 1, "estado": 1, "nota": 0}
+    total = db.metrics_rollups.docs["b1|entity|pedidos|total"]
+    assert (total["created"], total["updated"], total["deleted"]) == (2, 1, 1)
+
+@pytest.mark.asyncio
+async def test_removed_extreme_is_recalculated_from_the_day_data():
+    """Test min/max no se descuentan: si se quitó el extremo se recalcula con los datos del día"""
+    entities = _Entities([{"_id": None, "min": 15, "max": 20}], [], count=0)
+    db = _Db(b1_pedidos=entities)
+    rollup = MetricsRollup(db=db)
+    created_at = _NOW - timedelta(days=1)
+    docs = [{"total": total, "created_at": created_at} for total in (10, 20, 30)]
+    await rollup.entity_created(_CONFIG, docs)
+
+    # Quitar un valor intermedio no necesita leer los datos
+    await rollup.entity_deleted(_CONFIG, [docs[1]])
+    assert entities.pipelines == []
+
+    await rollup.entity_updated(_CONFIG, [(docs[0], {**docs[0], "total": 15}), (docs[2], {**docs[2], "total": 20})])
+
+    stats = db.metrics_rollups.docs["b1|entity|pedidos|2024-03-09"]["fields"]["total"]
+    assert len(entities.pipelines) == 1
+    assert entities.pipelines[0][0]["$match"]["created_at"] == {"$gte": datetime(2024, 3, 9), "$lt": datetime(2024, 3, 10)}
+    assert (stats["count"], stats["sum"], stats["min"], stats["max"]) == (2, 35, 15, 20)
+
+@pytest.mark.asyncio
+async def test_report_rebuilds_missing_rollups_then_reads_days():
+    """Test sin built_at se reconstruye con agregaciones y el reporte sale de los días del período"""
+    rows = [
+        {"_id": "2024-03-09", "created": 2, "p0": 2, "p1": 2, "p2": 0,
+         "n0_count": 2, "n0_sum": 30, "n0_sumsq": 500, "n0_min": 10, "n0_max": 20},
+        {"_id": "2024-01-01", "created": 5, "p0": 0, "p1": 0, "p2": 0,
+         "n0_count": 0, "n0_sum": 0, "n0_sumsq": 0, "n0_min": None, "n0_max": None}
+    ]
+    category_rows = [{"_id": {"day": "2024-03-09", "value": "pago.ok"}, "n": 2}]
+    entities = _Entities(rows, category_rows, count=7)
+    db = _Db(b1_pedidos=entities)
+    rollup = MetricsRollup(db=db)
+    # Un evento anterior a la reconstrucción (sin built_at)
+    await rollup.entity_updated(_CONFIG, [({}, {})])
+
+    report = await rollup.entity_report(_CONFIG, _NOW - timedelta(days=7), _NOW)
+
+    assert len(entities.pipelines) == 2
+    assert db.metrics_rollups.docs["b1|entity|pedidos|total"]["built_at"]
+    assert (report["total_records"], report["period_records"]) == (7, 2)
+    assert [day["count"] for day in report["daily_growth"]][-3:] == [0, 2, 0]
+    assert report["numeric_fields"]["total"] == {"count": 2, "min": 10, "max": 20, "mean": 15.0, "std_dev": 7.07, "sum": 30}
+    assert report["categorical_fields"]["estado"]["most_common"] == [("pago.ok", 2)]
+    assert report["data_quality"]["fields"] == {"total": 100.0, "estado": 100.0, "nota": 0.0}
+
+    # Ya construido: otro reporte no vuelve a agregar los datos
+    await rollup.entity_report(_CONFIG, _NOW - timedelta(days=30), _NOW)
+    assert len(entities.pipelines) == 2
+
+@pytest.mark.asyncio
+async def test_conversation_state_changes_move_counters_of_their_creation_day():
+    """Test una conversación cuenta en su día de creación con su estado actual"""
+    db = _Db()
+    rollup = MetricsRollup(db=db)
+    created = _NOW - timedelta(days=2)
+    await rollup.conversation_changed("b1", created, "pendiente", area="ventas")
+    await rollup.conversation_changed("b1", _NOW, "pendiente", area="soporte")
+    await rollup.conversation_changed("b1", created, "atendiendo", previous_estado="pendiente")
+    await rollup.conversation_changed("b1", created, "finalizado", previous_estado="atendiendo", resolution_minutes=30)
+    db.metrics_rollups.docs["b1|whatsapp|atencion_humana|total"]["built_at"] = _NOW
+
+    report = await rollup.conversations_report("b1", _NOW - timedelta(days=7), _NOW)
+
+    assert report["total"] == 2 and report["opened_today"] == 1
+    assert report["estados"] == {"pendiente": 1, "atendiendo": 0, "finalizado": 1}
+    assert report["avg_resolution_minutes"] == 30
+    assert report["areas"] == {"ventas": 1, "soporte": 1}
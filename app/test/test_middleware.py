@@ -0,0 +1,44 @@
+# ================================
+# tests/test_middleware.py
+# ================================
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from app.middleware.business_context import BusinessContextMiddleware
+from app.middleware.logging import RequestLoggingMiddleware
+from app.middleware.rate_limiting import LocalSlidingWindow, RateLimitMiddleware
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestLoggingMiddleware)
+    app.add_middleware(RateLimitMiddleware, requests_per_minute=100, backend=LocalSlidingWindow())
+    app.add_middleware(BusinessContextMiddleware)
+
+    @app.get("/api/business/{business_id}/export")
+    async def export(business_id: str):
+        async def rows():
+            yield b"id,nombre\n"
+            yield b"1,uno\n"
+        return StreamingResponse(rows(), media_type="text/csv")
+
+    return app
+
+def test_streaming_response_passes_through_stack():
+    """Test que los middlewares ASGI no rompen respuestas en streaming"""
+    with patch.object(BusinessContextMiddleware, "_validate_business_exists", AsyncMock(return_value=True)):
+        response = TestClient(_app()).get("/api/business/b1/export")
+
+    assert response.status_code == 200
+    assert response.text == "id,nombre\n1,uno\n"
+    assert response.headers["X-RateLimit-Limit"] == "100"
+
+def test_unknown_business_returns_404():
+    """Test 404 para business inexistente"""
+    with patch.object(BusinessContextMiddleware, "_validate_business_exists", AsyncMock(return_value=False)):
+        response = TestClient(_app()).get("/api/business/nope/export")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Business no encontrado"
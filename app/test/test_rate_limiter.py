@@ -0,0 +1,53 @@
+# ================================
+# tests/test_rate_limiter.py
+# ================================
+
+import pytest
+from unittest.mock import patch
+
+from app.core.api_client import GenericApiClient
+from app.core.rate_limiter import LocalRateLimiter, TokenBucket
+from app.models.api_config import ApiConfiguration, RateLimitConfig
+from app.utils.exceptions import RateLimitExceededError
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    """Test burst inicial y tiempo de espera sin consumir tokens"""
+    bucket = TokenBucket(requests_per_minute=60, burst=3)
+    now = bucket.updated_at
+
+    assert all(bucket.try_acquire(now=now).allowed for _ in range(3))
+
+    denied = bucket.try_acquire(now=now)
+    assert not denied.allowed
+    assert denied.wait_ms == 1000
+    # Medio segundo después falta la mitad
+    assert bucket.try_acquire(now=now + 0.5).wait_ms == 500
+    assert bucket.try_acquire(now=now + 1.0).allowed
+
+@pytest.mark.asyncio
+async def test_local_limiter_buckets_are_per_api():
+    """Test un bucket por API"""
+    limiter = LocalRateLimiter()
+
+    assert (await limiter.try_acquire("b1:clientes", 60, 1)).allowed
+    assert not (await limiter.try_acquire("b1:clientes", 60, 1)).allowed
+    assert (await limiter.try_acquire("b1:facturas", 60, 1)).allowed
+
+@pytest.mark.asyncio
+async def test_client_without_wait_raises_with_wait_ms():
+    """Test respuesta no bloqueante del cliente"""
+    config = ApiConfiguration(
+        business_id="b1",
+        name="clientes",
+        base_url="https://api.example.com",
+        endpoint="/clientes",
+        rate_limit=RateLimitConfig(requests_per_minute=6, burst=1)
+    )
+    client = GenericApiClient(config)
+
+    with patch("app.core.api_client.get_rate_limiter", return_value=LocalRateLimiter()):
+        await client._check_rate_limit(wait=False)
+        with pytest.raises(RateLimitExceededError) as exc_info:
+            await client._check_rate_limit(wait=False)
+
+    assert 0 < exc_info.value.wait_ms <= 10000
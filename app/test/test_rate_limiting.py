@@ -0,0 +1,81 @@
+# ================================
+# tests/test_rate_limiting.py
+# ================================
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.middleware.rate_limiting import (
+    LocalSlidingWindow, RateLimitMiddleware, RedisSlidingWindow, business_key
+)
+
+def _app(backend, requests_per_minute=2, key_func=None) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(
+        RateLimitMiddleware,
+        requests_per_minute=requests_per_minute,
+        key_func=key_func,
+        backend=backend
+    )
+
+    @app.get("/api/business/{business_id}/dashboard")
+    async def dashboard(business_id: str):
+        return {"business_id": business_id}
+
+    return app
+
+def test_returns_429_with_retry_after():
+    """Test 429 con Retry-After en lugar de excepción en el middleware"""
+    client = TestClient(_app(LocalSlidingWindow()))
+
+    assert client.get("/api/business/b1/dashboard").headers["X-RateLimit-Remaining"] == "1"
+    assert client.get("/api/business/b1/dashboard").status_code == 200
+
+    response = client.get("/api/business/b1/dashboard")
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+
+def test_business_key_limits_each_business_separately():
+    """Test key por business"""
+    client = TestClient(_app(LocalSlidingWindow(), requests_per_minute=1, key_func=business_key))
+
+    assert client.get("/api/business/b1/dashboard").status_code == 200
+    assert client.get("/api/business/b1/dashboard").status_code == 429
+    assert client.get("/api/business/b2/dashboard").status_code == 200
+
+@pytest.mark.asyncio
+async def test_sliding_window_weights_previous_window_and_evicts_idle_keys():
+    """Test estimación con la ventana anterior y expulsión de keys inactivas"""
+    window = LocalSlidingWindow()
+
+    with patch("app.middleware.rate_limiting.time.monotonic", return_value=60.0):
+        for _ in range(10):
+            assert (await window.hit("ip:1", 10, 60)).allowed
+        assert not (await window.hit("ip:1", 10, 60)).allowed
+
+    # A mitad de la ventana siguiente las 10 anteriores pesan 5
+    with patch("app.middleware.rate_limiting.time.monotonic", return_value=150.0):
+        results = [await window.hit("ip:1", 10, 60) for _ in range(6)]
+    assert [result.allowed for result in results] == [True] * 5 + [False]
+
+    with patch("app.middleware.rate_limiting.time.monotonic", return_value=400.0):
+        await window.hit("ip:2", 10, 60)
+    assert len(window) == 1
+
+@pytest.mark.asyncio
+async def test_redis_backend_shares_limit_between_workers():
+    """Test dos workers contra el mismo Redis"""
+    server = fakeredis.FakeServer()
+    worker_a = RedisSlidingWindow(fakeredis.aioredis.FakeRedis(server=server))
+    worker_b = RedisSlidingWindow(fakeredis.aioredis.FakeRedis(server=server))
+
+    assert (await worker_a.hit("ip:1", 2, 60)).allowed
+    assert (await worker_b.hit("ip:1", 2, 60)).allowed
+    denied = await worker_a.hit("ip:1", 2, 60)
+
+    assert not denied.allowed
+    assert denied.retry_after > 0
@@ -0,0 +1,108 @@
+# ================================
+# tests/test_realtime_hub.py
+# ================================
+
+import asyncio
+import json
+import pytest
+
+from app.config import settings
+from app.core.realtime_hub import CONVERSATIONS_TOPIC, RealtimeHub, RealtimeLimitError, entity_topic
+from app.models.user import User
+
+_COMPONENTS = [
+    {"id": "total_pedidos", "tipo": "stats_card", "configuracion": {"entidad": "pedidos"}},
+    {"id": "clientes", "tipo": "data_table", "configuracion": {"entidad": "clientes"}},
+    {"id": "whatsapp", "tipo": "whatsapp_panel", "configuracion": {}}
+]
+
+def _user(rol="admin"):
+    return User(email="ana@example.com", clerk_user_id="ck", business_id="b1", perfil={"nombre": "Ana"}, rol=rol)
+
+class _Compute:
+    """Datos de componentes controlados por el test (cuenta cálculos por componente)"""
+
+    def __init__(self):
+        self.values = {component["id"]: 0 for component in _COMPONENTS}
+        self.calls = []
+
+    async def __call__(self, business_id, vista, component_config, user, refresh):
+        self.calls.append((component_config["id"], refresh))
+        return {"id": component_config["id"], "data": {"valor": self.values[component_config["id"]]}, "timestamp": len(self.calls)}
+
+@pytest.fixture(autouse=True)
+def fast_debounce(monkeypatch):
+    monkeypatch.setattr(settings, "realtime_debounce_seconds", 0.01)
+
+async def _settle():
+    await asyncio.sleep(0.05)
+
+@pytest.mark.asyncio
+async def test_only_changed_components_are_pushed_to_every_connection():
+    """Test un evento recalcula una vez los componentes afectados y envía solo los que cambiaron"""
+    hub = RealtimeHub()
+    compute = _Compute()
+    connections = [hub.subscribe("b1", "principal", _user(), _COMPONENTS, compute) for _ in range(3)]
+    await _settle()
+    assert hub.stats()["channels"] == 1 and hub.stats()["connections"] == 3
+    primed = len(compute.calls)
+
+    # Datos sin cambios: nada que enviar
+    hub.notify("b1", entity_topic("pedidos"))
+    await _settle()
+    assert all(connection.queue.empty() for connection in connections)
+
+    compute.values["total_pedidos"] = 5
+    for _ in range(10):
+        hub.notify("b1", entity_topic("pedidos"))
+    hub.notify("b2", entity_topic("pedidos"))
+    await _settle()
+
+    # Una ráfaga de eventos es un único recálculo, solo del componente afectado
+    assert compute.calls[primed + 1:] == [("total_pedidos", True)]
+    for connection in connections:
+        event, data = connection.queue.get_nowait()
+        assert event == "component" and json.loads(data)["component"]["data"] == {"valor": 5}
+        assert connection.queue.empty()
+
+    compute.values["whatsapp"] = 1
+    hub.notify("b1", CONVERSATIONS_TOPIC)
+    await _settle()
+    assert json.loads(connections[0].queue.get_nowait()[1])["id"] == "whatsapp"
+
+    for connection in connections:
+        hub.unsubscribe(connection)
+    assert hub.stats() == {"connections": 0, "channels": 0, "businesses": 0, "events": 13, "relay": False}
+
+@pytest.mark.asyncio
+async def test_slow_connection_gets_resync_instead_of_unbounded_queue(monkeypatch):
+    """Test la cola por conexión es acotada: al llenarse se reemplaza por un resync"""
+    monkeypatch.setattr(settings, "realtime_queue_size", 3)
+    hub = RealtimeHub()
+    compute = _Compute()
+    connection = hub.subscribe("b1", "principal", _user(), _COMPONENTS, compute)
+    await _settle()
+
+    for value in range(1, 6):
+        compute.values["clientes"] = value
+        hub.notify("b1", entity_topic("clientes"))
+        await _settle()
+
+    assert connection.resyncs == 1
+    messages = [connection.queue.get_nowait() for _ in range(connection.queue.qsize())]
+    assert [event for event, _ in messages] == ["resync", "component"]
+    assert await connection.next(0.01) is None
+
+@pytest.mark.asyncio
+async def test_channels_are_separated_by_permissions(monkeypatch):
+    """Test conexiones con otro rol reciben datos calculados con su propio usuario"""
+    monkeypatch.setattr(settings, "realtime_max_connections", 2)
+    hub = RealtimeHub()
+    admin = hub.subscribe("b1", "principal", _user(), _COMPONENTS, _Compute())
+    tecnico = hub.subscribe("b1", "principal", _user("tecnico"), _COMPONENTS, _Compute())
+
+    assert admin.channel is not tecnico.channel and tecnico.channel.user.rol == "tecnico"
+    with pytest.raises(RealtimeLimitError):
+        hub.subscribe("b1", "principal", _user(), _COMPONENTS, _Compute())
+    hub.unsubscribe(admin)
+    hub.unsubscribe(tecnico)
@@ -0,0 +1,152 @@
+# ================================
+# tests/test_report_jobs.py
+# ================================
+
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+from app.core.report_jobs import ReportJobs
+from app.models.user import User
+
+class _Result:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+class _ReportJobsCollection:
+    """report_jobs en memoria con _id único y filtros por igualdad"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def _matches(self, doc, query):
+        return doc is not None and all(doc.get(key) == value for key, value in query.items())
+
+    async def find_one(self, query):
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if self._matches(doc, query) else None
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicado")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def replace_one(self, query, doc):
+        if not self._matches(self.docs.get(query["_id"]), query):
+            return _Result(0)
+        self.docs[query["_id"]] = dict(doc)
+        return _Result(1)
+
+    async def update_one(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if self._matches(doc, query):
+            doc.update(update["$set"])
+
+class _Db:
+    def __init__(self):
+        self.report_jobs = _ReportJobsCollection()
+
+def _user(rol="admin", entidades=None):
+    return User(
+        email="ana@example.com", clerk_user_id="ck", business_id="b1", perfil={"nombre": "Ana"},
+        rol=rol, permisos={"entidades_acceso": entidades or []}
+    )
+
+class _Generator:
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, business_id, period, include_predictions, user):
+        self.calls += 1
+        await self.release.wait()
+        return {"period": period, "generated_at": datetime(2024, 1, 1), "calls": self.calls}
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_job():
+    """Test pedidos concurrentes con las mismas entradas esperan un único cálculo"""
+    generate = _Generator()
+    jobs = ReportJobs(db=_Db(), generate=generate)
+    user = _user()
+
+    submitted = await asyncio.gather(*[jobs.submit("b1", "30d", False, user) for _ in range(5)])
+    assert len({job["_id"] for job in submitted}) == 1
+
+    waiters = asyncio.gather(*[jobs.wait(submitted[0]["_id"], timeout=5) for _ in range(5)])
+    await asyncio.sleep(0)
+    generate.release.set()
+    finished = await waiters
+    await jobs.stop()
+
+    assert generate.calls == 1
+    assert {job["status"] for job in finished} == {"completed"}
+    assert finished[0]["result"] == {"period": "30d", "generated_at": "2024-01-01 00:00:00", "calls": 1}
+    assert finished[0]["etag"].startswith('"')
+
+@pytest.mark.asyncio
+async def test_fresh_report_is_reused_until_it_expires():
+    """Test un reporte reciente se devuelve sin recalcular; vencido o con refresh se recalcula"""
+    generate = _Generator()
+    generate.release.set()
+    db = _Db()
+    jobs = ReportJobs(db=db, generate=generate)
+    user = _user()
+
+    job = await jobs.submit("b1", "7d", False, user)
+    first = await jobs.wait(job["_id"], timeout=5)
+    again = await jobs.submit("b1", "7d", False, user)
+    assert again["status"] == "completed" and again["etag"] == first["etag"]
+    assert generate.calls == 1
+
+    # Otros permisos o período son otro reporte
+    other = await jobs.submit("b1", "7d", False, _user(rol="user", entidades=["pedidos"]))
+    assert other["_id"] != job["_id"]
+    await jobs.wait(other["_id"], timeout=5)
+    assert generate.calls == 2
+
+    db.report_jobs.docs[job["_id"]]["finished_at"] = datetime.utcnow() - timedelta(hours=1)
+    stale = await jobs.submit("b1", "7d", False, user)
+    refreshed = await jobs.wait(stale["_id"], timeout=5)
+    forced = await jobs.submit("b1", "7d", False, user, force_refresh=True)
+    await jobs.wait(forced["_id"], timeout=5)
+    await jobs.stop()
+
+    assert generate.calls == 4
+    assert refreshed["etag"] != first["etag"]
+
+@pytest.mark.asyncio
+async def test_failed_report_is_recorded_and_retried():
+    """Test un error del reporte queda en el job y el próximo pedido lo vuelve a intentar"""
+    attempts = []
+
+    async def generate(business_id, period, include_predictions, user):
+        attempts.append(period)
+        if len(attempts) == 1:
+            raise RuntimeError("sin datos")
+        return {"ok": True}
+
+    jobs = ReportJobs(db=_Db(), generate=generate)
+    job = await jobs.submit("b1", "90d", True, _user())
+    failed = await jobs.wait(job["_id"], timeout=5)
+    retried = await jobs.wait((await jobs.submit("b1", "90d", True, _user()))["_id"], timeout=5)
+    await jobs.stop()
+
+    assert (failed["status"], failed["error"]) == ("failed", "sin datos")
+    assert retried["status"] == "completed" and retried["result"] == {"ok": True}
+
+@pytest.mark.asyncio
+async def test_job_is_only_readable_with_the_same_permissions():
+    """Test el job_id se puede deducir: otro rol del mismo business no lee el reporte del admin"""
+    generate = _Generator()
+    generate.release.set()
+    jobs = ReportJobs(db=_Db(), generate=generate)
+    admin = _user()
+    job = await jobs.submit("b1", "30d", False, admin)
+    await jobs.wait(job["_id"], timeout=5)
+    await jobs.stop()
+
+    assert (await jobs.get("b1", job["_id"], admin))["status"] == "completed"
+    assert await jobs.get("b1", job["_id"], _user(rol="user", entidades=["pedidos"])) is None
+    assert await jobs.get("b2", job["_id"], admin) is None
@@ -0,0 +1,59 @@
+# ================================
+# tests/test_validation_engine.py
+# ================================
+
+import pytest
+from datetime import datetime
+
+from app.services.validation_service import EntityValidator, ValidationService, compile_field_validator
+from app.utils.exceptions import ValidationError
+
+_CAMPOS = [
+    {"campo": "nombre", "tipo": "text", "obligatorio": True, "validacion": "min:2,max:10"},
+    {"campo": "edad", "tipo": "number", "validacion": "min:0,max:120"},
+    {"campo": "codigo", "tipo": "text", "validacion": "regex:^[A-Z]{3}-[0-9]{4}$"},
+    {"campo": "alta", "tipo": "date"},
+    {"campo": "activo", "tipo": "boolean"}
+]
+
+def test_field_validator_is_compiled_once_and_converts_types():
+    """Test mismo validador para la misma configuración y conversión por tipo"""
+    campo = {"campo": "edad", "tipo": "number", "validacion": "min:0,max:120"}
+
+    assert compile_field_validator(campo) is compile_field_validator(dict(campo))
+    assert compile_field_validator(campo)("42") == 42
+    assert compile_field_validator(campo)("1.5") == 1.5
+    assert compile_field_validator({"campo": "alta", "tipo": "date"})("2024-05-01T10:00:00Z") == datetime(2024, 5, 1, 10)
+    assert compile_field_validator({"campo": "alta", "tipo": "date"})("01/05/2024") == datetime(2024, 5, 1)
+    with pytest.raises(ValidationError, match="Valor máximo"):
+        compile_field_validator(campo)("200")
+    with pytest.raises(ValidationError, match="Regla de validación inválida"):
+        compile_field_validator({"campo": "x", "tipo": "text", "validacion": "min:abc"})("hola")
+
+def test_entity_validator_batch_reports_errors_by_index():
+    """Test validate_many sin corrutinas: filas válidas convertidas y errores con su índice"""
+    validator = EntityValidator(_CAMPOS)
+    rows = [
+        {"nombre": "Ana", "edad": "30", "codigo": "ABC-1234", "activo": "yes", "extra": 1},
+        {"edad": "5"},
+        {"nombre": "Luis", "codigo": "abc"},
+        {"nombre": "Eva", "alta": "2024-02-30"}
+    ]
+
+    valid, errors = validator.validate_many(rows)
+
+    assert valid == [(0, {"nombre": "Ana", "edad": 30, "codigo": "ABC-1234", "activo": True})]
+    assert [index for index, _ in errors] == [1, 2, 3]
+    assert "nombre" in str(errors[0][1]) and "codigo" in str(errors[1][1]) and "alta" in str(errors[2][1])
+    # En un update los obligatorios pueden faltar
+    assert validator.validate({"edad": "5"}, is_create=False) == {"edad": 5}
+
+@pytest.mark.asyncio
+async def test_async_validate_field_keeps_its_contract():
+    """Test validate_field sigue disponible para los routers"""
+    service = ValidationService()
+
+    assert await service.validate_field("", {"campo": "email", "tipo": "email"}) == ""
+    assert await service.validate_field(" +54 11 5555-1234 ", {"campo": "tel", "tipo": "phone"}) == "+541155551234"
+    with pytest.raises(ValidationError):
+        await service.validate_field(None, {"campo": "email", "tipo": "email", "obligatorio": True})
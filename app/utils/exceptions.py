@@ -26,3 +26,23 @@ class ValidationError(CMSException):
     """Error de validación"""
     def __init__(self, field: str, message: str):
         super().__init__(f"Error de validación en {field}: {message}", "VALIDATION_ERROR")
+
+class RateLimitExceededError(CMSException):
+    """Error cuando una API externa no tiene cupo disponible"""
+    def __init__(self, api_key: str, wait_ms: int):
+        self.wait_ms = wait_ms
+        super().__init__(f"Rate limit de {api_key} alcanzado, reintentar en {wait_ms}ms", "RATE_LIMITED")
+
+class CircuitOpenError(CMSException):
+    """Error cuando el circuito de una API externa está abierto"""
+    def __init__(self, upstream: str, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            f"API {upstream} no disponible (circuito abierto), reintentar en {retry_after:.0f}s",
+            "CIRCUIT_OPEN"
+        )
+
+class InvalidCursorError(CMSException):
+    """Error cuando un cursor de paginación no es válido para la consulta"""
+    def __init__(self):
+        super().__init__("Cursor de paginación inválido", "INVALID_CURSOR")
@@ -1,7 +1,10 @@
 from typing import Dict, Any, List
+import base64
 import re
 from datetime import datetime
 
+from bson import json_util
+
 def validate_business_id(business_id: str) -> bool:
     """Validar formato de business_id"""
     pattern = r'^[a-z0-9_]+$'
@@ -59,3 +62,19 @@ def parse_filter_string(filter_str: str) -> Dict[str, Any]:
             filters[key] = value
     
     return filters
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """Codificar un cursor de paginación opaco (conserva ObjectId y fechas)"""
+    raw = json_util.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decodificar un cursor generado por encode_cursor (ValueError si no es válido)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json_util.loads(raw)
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("Cursor inválido")
+    return payload
@@ -8,6 +8,8 @@ Backend API: localhost:8000
 import os
 import httpx
 import logging
+from contextlib import asynccontextmanager
+from http.cookiejar import CookieJar, DefaultCookiePolicy
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 
@@ -30,11 +32,29 @@ logger = logging.getLogger(__name__)
 BACKEND_URL = "http://localhost:8000"
 SECRET_KEY = "your-secret-key-for-sessions-change-in-production"
 
+# Cliente HTTP para comunicarse con el backend: uno por proceso, con keep-alive
+_backend_client: Optional[httpx.AsyncClient] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _backend_client
+    # Compartido entre todos los usuarios: no guardar cookies de las respuestas
+    _backend_client = httpx.AsyncClient(
+        base_url=BACKEND_URL,
+        cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+    )
+    yield
+    await _backend_client.aclose()
+    _backend_client = None
+
 # Crear aplicación FastAPI
 app = FastAPI(
     title="CMS Dinámico - Dashboard Usuario Final",
     description="Dashboard personalizado para usuarios finales",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Middleware
@@ -55,9 +75,9 @@ templates = Jinja2Templates(directory="templates")
 os.makedirs("static", exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Cliente HTTP para comunicarse con el backend
-async def get_backend_client():
-    return httpx.AsyncClient(base_url=BACKEND_URL, timeout=30.0)
+def get_backend_client() -> httpx.AsyncClient:
+    """Cliente compartido con el backend (no cerrar: lo cierra el lifespan)"""
+    return _backend_client
 
 # ================================
 # UTILIDADES DE AUTENTICACIÓN
@@ -188,14 +208,14 @@ async def dashboard(request: Request, user: dict = Depends(require_auth)):
 async def admin_dashboard(request: Request, user: dict):
     """Dashboard para super admin"""
     try:
-        async with httpx.AsyncClient() as client:
-            # Obtener estadísticas generales
-            stats_response = await client.get(f"{BACKEND_URL}/api/admin/stats")
-            stats = stats_response.json() if stats_response.status_code == 200 else {}
+        client = get_backend_client()
+        # Obtener estadísticas generales
+        stats_response = await client.get(f"{BACKEND_URL}/api/admin/stats")
+        stats = stats_response.json() if stats_response.status_code == 200 else {}
             
-            # Obtener lista de businesses
-            businesses_response = await client.get(f"{BACKEND_URL}/api/admin/businesses")
-            businesses = businesses_response.json() if businesses_response.status_code == 200 else []
+        # Obtener lista de businesses
+        businesses_response = await client.get(f"{BACKEND_URL}/api/admin/businesses")
+        businesses = businesses_response.json() if businesses_response.status_code == 200 else []
             
     except Exception as e:
         logger.error(f"Error obteniendo datos admin: {e}")
@@ -237,43 +257,43 @@ def safe_get_list_data(response_data, max_items=10):
 async def business_dashboard(request: Request, user: dict, business_id: str):
     """Dashboard personalizado para business específico"""
     try:
-        async with httpx.AsyncClient() as client:
-            # Obtener datos del business
-            business_response = await client.get(f"{BACKEND_URL}/api/admin/businesses/{business_id}")
-            business_data = business_response.json() if business_response.status_code == 200 else {}
+        client = get_backend_client()
+        # Obtener datos del business
+        business_response = await client.get(f"{BACKEND_URL}/api/admin/businesses/{business_id}")
+        business_data = business_response.json() if business_response.status_code == 200 else {}
             
-            # Obtener datos del dashboard
-            dashboard_response = await client.get(f"{BACKEND_URL}/api/business/dashboard/{business_id}")
-            dashboard_data = dashboard_response.json() if dashboard_response.status_code == 200 else {}
+        # Obtener datos del dashboard
+        dashboard_response = await client.get(f"{BACKEND_URL}/api/business/dashboard/{business_id}")
+        dashboard_data = dashboard_response.json() if dashboard_response.status_code == 200 else {}
             
-            # Obtener datos de clientes (ejemplo) - FIX AQUÍ
-            clientes_response = await client.get(f"{BACKEND_URL}/api/business/entities/{business_id}/clientes")
+        # Obtener datos de clientes (ejemplo) - FIX AQUÍ
+        clientes_response = await client.get(f"{BACKEND_URL}/api/business/entities/{business_id}/clientes")
             
-            # FIX: Manejar correctamente la estructura de datos
-            clientes_data = []
-            if clientes_response.status_code == 200:
-                response_json = clientes_response.json()
-                logger.info(f"🔍 Estructura de clientes_data: {type(response_json)}")
-                logger.info(f"🔍 Contenido: {response_json}")
+        # FIX: Manejar correctamente la estructura de datos
+        clientes_data = []
+        if clientes_response.status_code == 200:
+            response_json = clientes_response.json()
+            logger.info(f"🔍 Estructura de clientes_data: {type(response_json)}")
+            logger.info(f"🔍 Contenido: {response_json}")
                 
-                # Extraer items según la estructura de la respuesta
-                if isinstance(response_json, dict):
-                    if "data" in response_json and isinstance(response_json["data"], dict):
-                        if "items" in response_json["data"]:
-                            clientes_data = response_json["data"]["items"]
-                        else:
-                            clientes_data = list(response_json["data"].values())
-                    elif "data" in response_json and isinstance(response_json["data"], list):
-                        clientes_data = response_json["data"]
-                    elif isinstance(response_json, list):
-                        clientes_data = response_json
+            # Extraer items según la estructura de la respuesta
+            if isinstance(response_json, dict):
+                if "data" in response_json and isinstance(response_json["data"], dict):
+                    if "items" in response_json["data"]:
+                        clientes_data = response_json["data"]["items"]
+                    else:
+                        clientes_data = list(response_json["data"].values())
+                elif "data" in response_json and isinstance(response_json["data"], list):
+                    clientes_data = response_json["data"]
                 elif isinstance(response_json, list):
                     clientes_data = response_json
+            elif isinstance(response_json, list):
+                clientes_data = response_json
             
-            # Asegurar que clientes_data es una lista
-            if not isinstance(clientes_data, list):
-                logger.warning(f"⚠️ clientes_data no es lista: {type(clientes_data)}")
-                clientes_data = []
+        # Asegurar que clientes_data es una lista
+        if not isinstance(clientes_data, list):
+            logger.warning(f"⚠️ clientes_data no es lista: {type(clientes_data)}")
+            clientes_data = []
             
     except Exception as e:
         logger.error(f"Error obteniendo datos business {business_id}: {e}")
@@ -298,9 +318,9 @@ async def business_dashboard(request: Request, user: dict, business_id: str):
 async def get_clientes(business_id: str, user: dict = Depends(require_auth)):
     """Obtener lista de clientes"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{BACKEND_URL}/api/business/entities/{business_id}/clientes")
-            return response.json()
+        client = get_backend_client()
+        response = await client.get(f"{BACKEND_URL}/api/business/entities/{business_id}/clientes")
+        return response.json()
     except Exception as e:
         logger.error(f"Error obteniendo clientes: {e}")
         raise HTTPException(status_code=500, detail="Error obteniendo datos")
@@ -309,9 +329,9 @@ async def get_clientes(business_id: str, user: dict = Depends(require_auth)):
 async def get_business_stats(business_id: str, user: dict = Depends(require_auth)):
     """Obtener estadísticas del business"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{BACKEND_URL}/api/business/dashboard/{business_id}")
-            return response.json()
+        client = get_backend_client()
+        response = await client.get(f"{BACKEND_URL}/api/business/dashboard/{business_id}")
+        return response.json()
     except Exception as e:
         logger.error(f"Error obteniendo stats: {e}")
         raise HTTPException(status_code=500, detail="Error obteniendo estadísticas")
@@ -325,9 +345,9 @@ async def get_business_stats(business_id: str, user: dict = Depends(require_auth
 async def health_check():
     """Health check del frontend"""
     try:
-        async with httpx.AsyncClient() as client:
-            backend_response = await client.get(f"{BACKEND_URL}/health")
-            backend_status = "✅ Conectado" if backend_response.status_code == 200 else "❌ Error"
+        client = get_backend_client()
+        backend_response = await client.get(f"{BACKEND_URL}/health")
+        backend_status = "✅ Conectado" if backend_response.status_code == 200 else "❌ Error"
     except:
         backend_status = "❌ No disponible"
     
@@ -399,105 +419,105 @@ async def get_entities_config(
     logger.info(f"🔍 [FRONTEND] Solicitando entidades para {business_id}")
     
     try:
-        async with httpx.AsyncClient() as client:
-            # Verificar backend
-            try:
-                health_response = await client.get(f"{BACKEND_URL}/health", timeout=5.0)
-                logger.info(f"✅ Backend disponible: {health_response.status_code}")
-            except Exception as e:
-                logger.error(f"❌ Backend no disponible: {e}")
-                return {"success": False, "error": "Backend no disponible en puerto 8000"}
+        client = get_backend_client()
+        # Verificar backend
+        try:
+            health_response = await client.get(f"{BACKEND_URL}/health", timeout=5.0)
+            logger.info(f"✅ Backend disponible: {health_response.status_code}")
+        except Exception as e:
+            logger.error(f"❌ Backend no disponible: {e}")
+            return {"success": False, "error": "Backend no disponible en puerto 8000"}
             
-            # Obtener configuraciones del backend
-            entities_url = f"{BACKEND_URL}/api/admin/entities/{business_id}"
-            logger.info(f"📡 Llamando a: {entities_url}")
+        # Obtener configuraciones del backend
+        entities_url = f"{BACKEND_URL}/api/admin/entities/{business_id}"
+        logger.info(f"📡 Llamando a: {entities_url}")
             
-            response = await client.get(entities_url, timeout=10.0)
-            logger.info(f"📥 Response: {response.status_code}")
+        response = await client.get(entities_url, timeout=10.0)
+        logger.info(f"📥 Response: {response.status_code}")
             
-            if response.status_code == 200:
-                entities_data = response.json()
-                logger.info(f"📄 Raw data: {entities_data}")
+        if response.status_code == 200:
+            entities_data = response.json()
+            logger.info(f"📄 Raw data: {entities_data}")
                 
-                # MANEJAR DIFERENTES FORMATOS DE RESPUESTA
-                entities_list = []
+            # MANEJAR DIFERENTES FORMATOS DE RESPUESTA
+            entities_list = []
                 
-                if isinstance(entities_data, list):
-                    # Backend devuelve lista directa: [{"entidad": "clientes"}, ...]
-                    entities_list = entities_data
-                    logger.info(f"📋 Formato: Lista directa con {len(entities_list)} entidades")
+            if isinstance(entities_data, list):
+                # Backend devuelve lista directa: [{"entidad": "clientes"}, ...]
+                entities_list = entities_data
+                logger.info(f"📋 Formato: Lista directa con {len(entities_list)} entidades")
                     
-                elif isinstance(entities_data, dict):
-                    if not entities_data.get("success", True):
-                        logger.warning(f"⚠️ Backend error: {entities_data.get('error')}")
-                        return {"success": False, "error": entities_data.get("error", "Error del backend")}
+            elif isinstance(entities_data, dict):
+                if not entities_data.get("success", True):
+                    logger.warning(f"⚠️ Backend error: {entities_data.get('error')}")
+                    return {"success": False, "error": entities_data.get("error", "Error del backend")}
                     
-                    # Backend devuelve objeto: {"success": true, "data": [...]}
-                    entities_list = entities_data.get("data", [])
-                    logger.info(f"📋 Formato: Objeto con {len(entities_list)} entidades")
+                # Backend devuelve objeto: {"success": true, "data": [...]}
+                entities_list = entities_data.get("data", [])
+                logger.info(f"📋 Formato: Objeto con {len(entities_list)} entidades")
                 
-                else:
-                    logger.error(f"❌ Formato inesperado: {type(entities_data)}")
-                    return {"success": False, "error": f"Formato inesperado del backend: {type(entities_data)}"}
+            else:
+                logger.error(f"❌ Formato inesperado: {type(entities_data)}")
+                return {"success": False, "error": f"Formato inesperado del backend: {type(entities_data)}"}
                 
-                # Transformar datos
-                entities_config = {}
+            # Transformar datos
+            entities_config = {}
                 
-                for entity in entities_list:
-                    entity_name = entity.get("entidad")
-                    if not entity_name:
-                        continue
+            for entity in entities_list:
+                entity_name = entity.get("entidad")
+                if not entity_name:
+                    continue
                     
-                    campos = entity.get("configuracion", {}).get("campos", [])
+                campos = entity.get("configuracion", {}).get("campos", [])
                     
-                    config = {
-                        "titulo": f"Gestión de {entity_name.title()}",
-                        "titulo_singular": entity_name.rstrip('s').title(),
-                        "descripcion": entity.get("descripcion", f"Administra {entity_name}"),
-                        "permisos": {
-                            "crear": True,
-                            "editar": True,
-                            "eliminar": user.get("role") == "admin",
-                            "exportar": True
-                        },
-                        "campos_tabla": [
-                            {
-                                "campo": campo["campo"],
-                                "nombre": campo.get("nombre", campo["campo"].title()),
-                                "tipo": campo.get("tipo", "text")
-                            }
-                            for campo in campos if campo.get("mostrar_en_tabla", True)
-                        ],
-                        "campos_form": [
-                            {
-                                "campo": campo["campo"],
-                                "nombre": campo.get("nombre", campo["campo"].title()),
-                                "tipo": campo.get("tipo", "text"),
-                                "obligatorio": campo.get("obligatorio", False),
-                                "placeholder": campo.get("placeholder", ""),
-                                "opciones": campo.get("opciones", [])
-                            }
-                            for campo in campos
-                        ],
-                        "campos_filtros": [
-                            {
-                                "campo": campo["campo"],
-                                "nombre": campo.get("nombre", campo["campo"].title()),
-                                "opciones": campo.get("opciones", [])
-                            }
-                            for campo in campos if campo.get("tipo") == "select" and campo.get("opciones")
-                        ]
-                    }
+                config = {
+                    "titulo": f"Gestión de {entity_name.title()}",
+                    "titulo_singular": entity_name.rstrip('s').title(),
+                    "descripcion": entity.get("descripcion", f"Administra {entity_name}"),
+                    "permisos": {
+                        "crear": True,
+                        "editar": True,
+                        "eliminar": user.get("role") == "admin",
+                        "exportar": True
+                    },
+                    "campos_tabla": [
+                        {
+                            "campo": campo["campo"],
+                            "nombre": campo.get("nombre", campo["campo"].title()),
+                            "tipo": campo.get("tipo", "text")
+                        }
+                        for campo in campos if campo.get("mostrar_en_tabla", True)
+                    ],
+                    "campos_form": [
+                        {
+                            "campo": campo["campo"],
+                            "nombre": campo.get("nombre", campo["campo"].title()),
+                            "tipo": campo.get("tipo", "text"),
+                            "obligatorio": campo.get("obligatorio", False),
+                            "placeholder": campo.get("placeholder", ""),
+                            "opciones": campo.get("opciones", [])
+                        }
+                        for campo in campos
+                    ],
+                    "campos_filtros": [
+                        {
+                            "campo": campo["campo"],
+                            "nombre": campo.get("nombre", campo["campo"].title()),
+                            "opciones": campo.get("opciones", [])
+                        }
+                        for campo in campos if campo.get("tipo") == "select" and campo.get("opciones")
+                    ]
+                }
                     
-                    entities_config[entity_name] = config
+                entities_config[entity_name] = config
                 
-                logger.info(f"✅ Entidades procesadas: {list(entities_config.keys())}")
-                return {"success": True, "data": entities_config}
+            logger.info(f"✅ Entidades procesadas: {list(entities_config.keys())}")
+            return {"success": True, "data": entities_config}
                 
-            else:
-                error_text = response.text
-                logger.error(f"❌ Backend error {response.status_code}: {error_text}")
-                return {"success": False, "error": f"Error del backend: HTTP {response.status_code}"}
+        else:
+            error_text = response.text
+            logger.error(f"❌ Backend error {response.status_code}: {error_text}")
+            return {"success": False, "error": f"Error del backend: HTTP {response.status_code}"}
                 
     except Exception as e:
         logger.error(f"❌ Error general: {e}")
@@ -523,31 +543,31 @@ async def get_entity_data(
         if user["business_id"] != business_id and user["role"] != "super_admin":
             raise HTTPException(status_code=403, detail="Acceso denegado")
         
-        async with httpx.AsyncClient() as client:
-            params = {
-                "page": page,
-                "per_page": per_page,
-                "sort_order": sort_order
-            }
+        client = get_backend_client()
+        params = {
+            "page": page,
+            "per_page": per_page,
+            "sort_order": sort_order
+        }
             
-            if filters:
-                params["filters"] = filters
-            if sort_by:
-                params["sort_by"] = sort_by
+        if filters:
+            params["filters"] = filters
+        if sort_by:
+            params["sort_by"] = sort_by
             
-            url = f"{BACKEND_URL}/api/business/entities/{business_id}/{entity_name}"
-            logger.info(f"📡 Backend URL: {url}")
+        url = f"{BACKEND_URL}/api/business/entities/{business_id}/{entity_name}"
+        logger.info(f"📡 Backend URL: {url}")
             
-            response = await client.get(url, params=params, timeout=10.0)
-            logger.info(f"📥 Status: {response.status_code}")
+        response = await client.get(url, params=params, timeout=10.0)
+        logger.info(f"📥 Status: {response.status_code}")
             
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"✅ Datos: {len(data.get('data', {}).get('items', []))} items")
-                return data
-            else:
-                logger.warning(f"❌ Error {response.status_code}: {response.text}")
-                return {"success": False, "error": f"Error: HTTP {response.status_code}"}
+        if response.status_code == 200:
+            data = response.json()
+            logger.info(f"✅ Datos: {len(data.get('data', {}).get('items', []))} items")
+            return data
+        else:
+            logger.warning(f"❌ Error {response.status_code}: {response.text}")
+            return {"success": False, "error": f"Error: HTTP {response.status_code}"}
                 
     except Exception as e:
         logger.error(f"❌ Error: {e}")
@@ -565,14 +585,14 @@ async def create_entity_item(
         if user["business_id"] != business_id and user["role"] != "super_admin":
             raise HTTPException(status_code=403, detail="Acceso denegado")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BACKEND_URL}/api/business/entities/{business_id}/{entity_name}",
-                json=item_data,
-                timeout=10.0
-            )
+        client = get_backend_client()
+        response = await client.post(
+            f"{BACKEND_URL}/api/business/entities/{business_id}/{entity_name}",
+            json=item_data,
+            timeout=10.0
+        )
             
-            return response.json() if response.status_code == 200 else {"success": False, "error": "Error creando"}
+        return response.json() if response.status_code == 200 else {"success": False, "error": "Error creando"}
             
     except Exception as e:
         logger.error(f"❌ Error create: {e}")
@@ -591,14 +611,14 @@ async def update_entity_item(
         if user["business_id"] != business_id and user["role"] != "super_admin":
             raise HTTPException(status_code=403, detail="Acceso denegado")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                f"{BACKEND_URL}/api/business/entities/{business_id}/{entity_name}/{item_id}",
-                json=item_data,
-                timeout=10.0
-            )
+        client = get_backend_client()
+        response = await client.put(
+            f"{BACKEND_URL}/api/business/entities/{business_id}/{entity_name}/{item_id}",
+            json=item_data,
+            timeout=10.0
+        )
             
-            return response.json() if response.status_code == 200 else {"success": False, "error": "Error actualizando"}
+        return response.json() if response.status_code == 200 else {"success": False, "error": "Error actualizando"}
             
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -615,13 +635,13 @@ async def delete_entity_item(
         if user["business_id"] != business_id and user["role"] != "super_admin":
             raise HTTPException(status_code=403, detail="Acceso denegado")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"{BACKEND_URL}/api/business/entities/{business_id}/{entity_name}/{item_id}",
-                timeout=10.0
-            )
+        client = get_backend_client()
+        response = await client.delete(
+            f"{BACKEND_URL}/api/business/entities/{business_id}/{entity_name}/{item_id}",
+            timeout=10.0
+        )
             
-            return response.json() if response.status_code == 200 else {"success": False, "error": "Error eliminando"}
+        return response.json() if response.status_code == 200 else {"success": False, "error": "Error eliminando"}
             
     except Exception as e:
         return {"success": False, "error": str(e)}
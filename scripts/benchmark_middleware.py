@@ -0,0 +1,120 @@
+# ================================
+# scripts/benchmark_middleware.py
+# ================================
+
+#!/usr/bin/env python3
+"""
+Micro-benchmark del overhead por petición del stack de middlewares.
+
+Compara la app sin middlewares, el stack ASGI actual (logging, rate limit,
+business context y flash messages) y el mismo número de capas
+BaseHTTPMiddleware que solo llaman a call_next (lo mínimo que costaba el
+stack anterior). Llama a la app ASGI directamente para no medir el cliente HTTP.
+
+Uso: python scripts/benchmark_middleware.py [--requests 5000]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.middleware.business_context import BusinessContextMiddleware
+from app.middleware.flash_messages import ClearFlashMessagesMiddleware
+from app.middleware.logging import RequestLoggingMiddleware
+from app.middleware.rate_limiting import LocalSlidingWindow, RateLimitMiddleware
+
+class PassthroughMiddleware(BaseHTTPMiddleware):
+    """Capa BaseHTTPMiddleware vacía (solo el coste del wrapper)"""
+
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(10):
+                yield f"{i},fila\n".encode()
+        return StreamingResponse(chunks(), media_type="text/csv")
+
+    if stack == "asgi":
+        app.add_middleware(RequestLoggingMiddleware)
+        app.add_middleware(RateLimitMiddleware, requests_per_minute=10**9, backend=LocalSlidingWindow())
+        app.add_middleware(BusinessContextMiddleware)
+        app.add_middleware(ClearFlashMessagesMiddleware)
+    elif stack == "base_http":
+        for _ in range(4):
+            app.add_middleware(PassthroughMiddleware)
+    return app
+
+async def call(app, path: str):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Igual que un servidor real: bloquear hasta que el cliente se desconecte
+        await asyncio.Event().wait()
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+async def measure(app, path: str, requests: int) -> float:
+    """Microsegundos por petición"""
+    for _ in range(200):
+        await call(app, path)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, path)
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+async def main(requests: int):
+    # Medir el middleware, no el handler de logging
+    logging.getLogger("api_requests").setLevel(logging.CRITICAL)
+
+    for path in ("/ping", "/stream"):
+        results = {stack: await measure(build_app(stack), path, requests) for stack in ("none", "base_http", "asgi")}
+        print(f"\n{path} ({requests} peticiones)")
+        for stack, micros in results.items():
+            overhead = micros - results["none"]
+            print(f"  {stack:<10} {micros:8.1f} µs/petición  (+{overhead:.1f} µs de middlewares)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    asyncio.run(main(parser.parse_args().requests))
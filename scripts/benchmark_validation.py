@@ -0,0 +1,159 @@
+# ================================
+# scripts/benchmark_validation.py
+# ================================
+
+#!/usr/bin/env python3
+"""
+Benchmark de validación de filas de una entidad.
+
+Compara, sobre filas de un cliente típico (texto con longitudes, email,
+número con rango, teléfono, regex, booleano y fecha):
+
+- la cadena anterior: un await por campo y por regla, con la regla
+  parseada y la regex compilada en cada llamada (copia abajo, tal como
+  estaba ValidationService antes del validador compilado);
+- validate_field actual por campo (validador compilado y cacheado);
+- el validador de la entidad (EntityValidator.validate_many).
+
+Uso: python scripts/benchmark_validation.py [--rows 100000]
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.validation_service import EntityValidator, ValidationService
+from app.utils.exceptions import ValidationError
+
+CAMPOS = [
+    {"campo": "nombre", "tipo": "text", "obligatorio": True, "validacion": "min:2,max:80"},
+    {"campo": "email", "tipo": "email", "obligatorio": True},
+    {"campo": "edad", "tipo": "number", "validacion": "min:0,max:120"},
+    {"campo": "telefono", "tipo": "phone"},
+    {"campo": "codigo", "tipo": "text", "validacion": "regex:^[A-Z]{3}-[0-9]{4}$"},
+    {"campo": "activo", "tipo": "boolean"},
+    {"campo": "alta", "tipo": "date"},
+]
+
+def build_rows(n: int):
+    return [
+        {
+            "nombre": f"Cliente {i}",
+            "email": f"cliente{i}@mail.com",
+            "edad": str(i % 90),
+            "telefono": "+54 11 5555-1234",
+            "codigo": f"ABC-{i % 10000:04d}",
+            "activo": "true",
+            "alta": "2024-05-01"
+        }
+        for i in range(n)
+    ]
+
+class LegacyValidationService:
+    """Cadena async por regla de ValidationService antes de compilar validadores"""
+
+    async def validate_field(self, value, field_config):
+        field_name = field_config.get("campo", "unknown")
+        validacion = field_config.get("validacion")
+        if field_config.get("obligatorio", False) and (value is None or value == ""):
+            raise ValidationError(field_name, "Campo obligatorio")
+        if value is None or value == "":
+            return value
+        value = await self._validate_by_type(value, field_config.get("tipo", "text"), field_name)
+        if validacion:
+            validators = {"min": self._validate_min, "max": self._validate_max, "regex": self._validate_regex}
+            for rule in validacion.split(","):
+                name, _, param = rule.strip().partition(":")
+                if name in validators:
+                    value = await validators[name](value, param, field_name)
+        return value
+
+    async def _validate_by_type(self, value, field_type, field_name):
+        if field_type in ("text", "select"):
+            return str(value)
+        if field_type == "number":
+            try:
+                return float(value) if "." in str(value) else int(value)
+            except (ValueError, TypeError):
+                raise ValidationError(field_name, "Debe ser un número válido")
+        if field_type == "email":
+            if not re.match(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$", str(value)):
+                raise ValidationError(field_name, "Formato de email inválido")
+            return str(value)
+        if field_type == "phone":
+            clean_phone = re.sub(r"[^\d+]", "", str(value).strip())
+            if len(re.sub(r"[^\d]", "", clean_phone)) < 10:
+                raise ValidationError(field_name, "Número de teléfono muy corto")
+            return clean_phone
+        if field_type == "date":
+            for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M:%SZ", "%d/%m/%Y", "%d-%m-%Y"):
+                try:
+                    return datetime.strptime(str(value), fmt)
+                except ValueError:
+                    continue
+            raise ValidationError(field_name, "Formato de fecha inválido")
+        if field_type == "boolean":
+            if str(value).lower() in ("true", "1", "yes", "on", "active"):
+                return True
+            if str(value).lower() in ("false", "0", "no", "off", "inactive"):
+                return False
+            raise ValidationError(field_name, "Debe ser verdadero o falso")
+        return value
+
+    async def _validate_min(self, value, param, field_name):
+        limit = float(param)
+        if isinstance(value, (int, float)) and value < limit or isinstance(value, str) and len(value) < limit:
+            raise ValidationError(field_name, f"Mínimo: {limit}")
+        return value
+
+    async def _validate_max(self, value, param, field_name):
+        limit = float(param)
+        if isinstance(value, (int, float)) and value > limit or isinstance(value, str) and len(value) > limit:
+            raise ValidationError(field_name, f"Máximo: {limit}")
+        return value
+
+    async def _validate_regex(self, value, param, field_name):
+        if not re.match(param, str(value)):
+            raise ValidationError(field_name, "Formato inválido")
+        return value
+
+async def per_field(rows, service) -> float:
+    start = time.perf_counter()
+    for row in rows:
+        validated = {}
+        for campo in CAMPOS:
+            value = row.get(campo["campo"])
+            if value is not None:
+                validated[campo["campo"]] = await service.validate_field(value, campo)
+    return time.perf_counter() - start
+
+def compiled(rows) -> float:
+    start = time.perf_counter()
+    valid, errors = EntityValidator(CAMPOS).validate_many(rows)
+    elapsed = time.perf_counter() - start
+    assert len(valid) == len(rows) and not errors
+    return elapsed
+
+def main(n: int):
+    rows = build_rows(n)
+    results = {
+        "cadena anterior": asyncio.run(per_field(rows, LegacyValidationService())),
+        "validate_field": asyncio.run(per_field(rows, ValidationService())),
+        "compilado (sync)": compiled(rows)
+    }
+    base = results["cadena anterior"]
+    print(f"\n{n} filas x {len(CAMPOS)} campos")
+    for name, seconds in results.items():
+        print(f"  {name:<18} {seconds:7.2f} s  {n / seconds:10.0f} filas/s  (x{base / seconds:.1f})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    main(parser.parse_args().rows)